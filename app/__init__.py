@@ -135,6 +135,10 @@ def setup_logging(app):
     logging.getLogger('socketio').setLevel(logging.WARNING)
     logging.getLogger('engineio').setLevel(logging.WARNING)
     
+    # 按模块覆盖日志级别（如只看AI链路的DEBUG日志）
+    from app.utils.log_policy import apply_module_levels
+    apply_module_levels(app.config.get('LOG_MODULE_LEVELS') or os.environ.get('LOG_MODULE_LEVELS'))
+    
     app.logger.info('日志系统已初始化')
 
 # 加载项目根目录
@@ -284,6 +288,9 @@ def create_app(config_name='default'):
     print(f"模板文件夹路径: {app.template_folder}")
     
     app.config.from_object(load_config(config_name))
+    # 批量上传等端点需要高于全局 MAX_CONTENT_LENGTH 的请求体上限
+    from app.utils.file_handler import UploadRequest
+    app.request_class = UploadRequest
     
     # 创建必要的目录
     create_directories(app)
@@ -331,6 +338,23 @@ def create_app(config_name='default'):
     socketio.init_app(app, cors_allowed_origins="*")
     app.logger.info("SocketIO已初始化")
     
+    # 作文状态推送（状态缓存、Socket.IO订阅、Redis订阅线程）
+    from app.core.correction.status_cache import init_status_push
+    init_status_push(app, socketio)
+    app.logger.info("作文状态推送已初始化")
+    
+    # 用户活动写回缓冲（登录时间/IP等批量写回）
+    from app.core.user.activity_buffer import user_activity_buffer
+    user_activity_buffer.init_app(app)
+    
+    # 全文检索索引（FTS5表、发件箱和触发器，已存在时跳过）
+    try:
+        from app.core.search import fulltext_index
+        with app.app_context():
+            fulltext_index.ensure_schema()
+    except Exception as e:
+        app.logger.warning(f"初始化全文检索索引失败: {str(e)}")
+    
     # 初始化源类型管理器
     from app.core.source_type_manager import init_source_types
     init_source_types()
@@ -420,11 +444,25 @@ def register_commands(app):
         db.create_all()
         click.echo('数据库表已创建')
         
+        from app.core.search import fulltext_index
+        if fulltext_index.ensure_schema():
+            click.echo('全文检索索引已创建')
+        
         # 创建默认角色和用户
         create_default_roles_and_users() # type: ignore
         
         click.echo('所有扩展（包括数据库）已初始化')
     
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        """重建作文和用户的全文检索索引"""
+        from app.core.search import fulltext_index
+        if not fulltext_index.ensure_schema():
+            click.echo('当前数据库不支持全文检索索引')
+            return
+        count = fulltext_index.rebuild()
+        click.echo(f'全文检索索引已重建，共索引 {count} 篇作文')
+    
     @app.cli.command('create-admin')
     @click.argument('username')
     @click.argument('password')
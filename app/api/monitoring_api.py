@@ -179,6 +179,92 @@ def get_alerts():
         }), 500
 
 
+@monitoring_bp.route('/circuit-breakers', methods=['GET'])
+def get_circuit_breakers():
+    """获取AI提供商熔断器状态"""
+    from app.core.ai.circuit_breaker import get_all_breaker_states
+    
+    try:
+        return jsonify({
+            'success': True,
+            'data': get_all_breaker_states()
+        })
+    
+    except Exception as e:
+        logger.exception(f"获取熔断器状态失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取熔断器状态失败: {str(e)}'
+        }), 500
+
+
+@monitoring_bp.route('/api-monitor', methods=['GET'])
+def get_api_monitor_stats():
+    """获取API调用监控的缓冲与写入统计，以及最近日志中各提供商的延迟/错误汇总"""
+    from app.core.ai.api_monitor import api_monitor, summarize_api_logs
+    
+    try:
+        since = request.args.get('since') or datetime.now().strftime('%Y%m%d')
+        return jsonify({
+            'success': True,
+            'data': {
+                'sink': api_monitor.get_stats(),
+                'providers': summarize_api_logs(api_monitor.log_dir, since=since,
+                                                provider=request.args.get('provider'))
+            }
+        })
+    
+    except Exception as e:
+        logger.exception(f"获取API监控统计失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取API监控统计失败: {str(e)}'
+        }), 500
+
+
+@monitoring_bp.route('/essays/<int:essay_id>/timeline', methods=['GET'])
+def get_essay_timeline(essay_id):
+    """获取作文在批改流水线各阶段的时间线（上传、提取、排队、加锁、状态转换、LLM调用、解析、映射、写库）"""
+    from app.core.monitoring.tracing import get_essay_timeline as load_timeline
+    
+    try:
+        return jsonify({
+            'success': True,
+            'data': load_timeline(essay_id)
+        })
+    
+    except Exception as e:
+        logger.exception(f"获取作文时间线失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取作文时间线失败: {str(e)}'
+        }), 500
+
+
+@monitoring_bp.route('/prompts', methods=['GET'])
+def get_prompt_stats():
+    """获取提示词模板、各版本的token与前缀缓存命中统计，以及生成参数策略的观测数据"""
+    from app.core.ai.prompt_templates import prompt_registry, prompt_metrics
+    from app.core.ai.generation_policy import generation_policy
+    
+    try:
+        return jsonify({
+            'success': True,
+            'data': {
+                'templates': prompt_registry.list_templates(),
+                'usage': prompt_metrics.get_stats(),
+                'generation': generation_policy.get_stats()
+            }
+        })
+    
+    except Exception as e:
+        logger.exception(f"获取提示词统计失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取提示词统计失败: {str(e)}'
+        }), 500
+
+
 @monitoring_bp.route('/events/<event_type>', methods=['GET'])
 def get_events(event_type):
     """获取事件历史"""
@@ -18,6 +18,15 @@ from app.core.correction.correction_service import CorrectionService
 from app.utils.response import success_response, error_response
 from app.utils.exceptions import ValidationError, ResourceNotFoundError
 from app.extensions import db
+from app.models.user import User
+from app.models.essay import Essay
+from app.models.correction import Correction
+from app.core.db.query_profiles import essay_detail_options, correction_detail_options
+from app.core.search import fulltext_index
+from app.core.admin.admin_queries import (
+    user_listing_query, essay_listing_query, filter_users_by_keyword, get_user_detail,
+    recent_user_essays, essay_counts
+)
 
 # 创建日志记录器
 logger = logging.getLogger(__name__)
@@ -75,6 +84,29 @@ def safe_service_call(service_func, default_value=None, *args, **kwargs):
             return default_value
         raise
 
+def membership_data(membership):
+    """
+    会员信息转换为JSON（会员计划需已随查询加载）
+    
+    Args:
+        membership: 会员记录，可以为None
+        
+    Returns:
+        dict: 会员信息，没有会员记录时返回None
+    """
+    if membership is None:
+        return None
+    plan = membership.plan
+    return {
+        'plan_code': plan.code if plan else None,
+        'plan_name': plan.name if plan else None,
+        'start_date': membership.start_date.isoformat() if membership.start_date else None,
+        'end_date': membership.end_date.isoformat() if membership.end_date else None,
+        'is_active': membership.is_active,
+        'essays_used_today': membership.essays_used_today,
+        'essays_used_total': membership.essays_used_total
+    }
+
 @admin_api_bp.before_request
 @login_required
 @admin_required
@@ -201,33 +233,29 @@ def get_users():
         limit = int(request.args.get('limit', 10))
         search = request.args.get('search', '')
         
-        # 获取用户列表
-        users, total = user_service.get_users_with_pagination(
-            page=page,
-            per_page=limit,
-            search_term=search
-        )
+        # 获取用户列表（会员信息按页批量加载）
+        query = filter_users_by_keyword(user_listing_query(with_membership=True), search)
+        pagination = query.order_by(User.created_at.desc()).paginate(page=page, per_page=limit, error_out=False)
+        users, total = pagination.items, pagination.total
         
         # 计算总页数
         total_pages = (total + limit - 1) // limit
         
+        # 本页用户的作文数量（一次分组查询）
+        counts = essay_counts([user.id for user in users])
+        
         # 转换为 JSON 格式
         users_data = []
         for user in users:
-            # 获取用户的会员信息
-            membership = membership_service.get_user_membership(user.id)
-            # 获取用户的作文数量
-            essay_count = correction_service.count_user_essays(user.id)
-            
             users_data.append({
                 'id': user.id,
                 'username': user.username,
                 'email': user.email,
                 'is_admin': user.is_admin,
                 'is_active': user.is_active,
-                'created_at': user.created_at.isoformat(),
-                'membership': membership.to_dict() if membership else None,
-                'essay_count': essay_count
+                'created_at': user.created_at.isoformat() if user.created_at else None,
+                'membership': membership_data(user.membership),
+                'essay_count': counts.get(user.id, 0)
             })
         
         # 构建响应数据
@@ -253,17 +281,22 @@ def get_user(user_id):
     获取用户详情
     """
     try:
-        # 获取用户
-        user = user_service.get_user_by_id(user_id)
+        # 获取用户（资料、会员一并加载）
+        user = get_user_detail(user_id)
         if not user:
             return error_response("用户不存在", 404)
         
-        # 获取用户的会员信息
-        membership = membership_service.get_user_membership(user.id)
-        
-        # 获取用户的作文信息
-        essays, _ = correction_service.get_user_essays(user.id, page=1, per_page=5)
-        essays_data = [essay.to_dict() for essay in essays]
+        # 获取用户最近的作文和作文总数（只加载列表列）
+        essays, essay_count = recent_user_essays(user.id, limit=5)
+        essays_data = [{
+            'id': essay.id,
+            'title': essay.title,
+            'preview': essay.preview or '',
+            'word_count': essay.word_count,
+            'status': essay.status,
+            'score': essay.score,
+            'created_at': essay.created_at.isoformat() if essay.created_at else None
+        } for essay in essays]
         
         # 构建用户详情数据
         user_data = {
@@ -272,11 +305,11 @@ def get_user(user_id):
             'email': user.email,
             'is_admin': user.is_admin,
             'is_active': user.is_active,
-            'created_at': user.created_at.isoformat(),
-            'membership': membership.to_dict() if membership else None,
+            'created_at': user.created_at.isoformat() if user.created_at else None,
+            'membership': membership_data(user.membership),
             'recent_essays': essays_data,
-            'essay_count': correction_service.count_user_essays(user.id),
-            'last_login': user.last_login.isoformat() if user.last_login else None
+            'essay_count': essay_count,
+            'last_login': user.last_login_at.isoformat() if user.last_login_at else None
         }
         
         logger.info(f"获取用户详情成功，用户ID：{user_id}")
@@ -590,12 +623,17 @@ def get_essays():
         limit = int(request.args.get('limit', 10))
         search = request.args.get('search', '')
         
-        # 获取作文列表
-        essays, total = correction_service.get_essays_with_pagination(
-            page=page,
-            per_page=limit,
-            search_term=search
-        )
+        # 获取作文列表（作者随主查询JOIN，不加载正文）
+        query = essay_listing_query()
+        if search:
+            # 标题检索走全文索引，索引不可用时回退到LIKE
+            matches = fulltext_index.essay_matches(search, columns=('title',))
+            if matches is not None:
+                query = query.join(matches, matches.c.essay_id == Essay.id)
+            else:
+                query = query.filter(Essay.title.like(f'%{search}%'))
+        pagination = query.order_by(Essay.created_at.desc()).paginate(page=page, per_page=limit, error_out=False)
+        essays, total = pagination.items, pagination.total
         
         # 计算总页数
         total_pages = (total + limit - 1) // limit
@@ -603,16 +641,16 @@ def get_essays():
         # 转换为 JSON 格式
         essays_data = []
         for essay in essays:
-            # 获取作者信息
-            author = user_service.get_user_by_id(essay.user_id)
+            author = essay.user
+            preview = essay.preview or ''
             
             essays_data.append({
                 'id': essay.id,
                 'title': essay.title,
-                'content': essay.content[:100] + '...' if len(essay.content) > 100 else essay.content,
+                'content': preview[:100] + '...' if len(preview) > 100 else preview,
                 'word_count': essay.word_count,
                 'status': essay.status,
-                'created_at': essay.created_at.isoformat(),
+                'created_at': essay.created_at.isoformat() if essay.created_at else None,
                 'author': {
                     'id': author.id if author else None,
                     'username': author.username if author else '未知用户'
@@ -642,16 +680,16 @@ def get_essay(essay_id):
     获取作文详情
     """
     try:
-        # 获取作文
-        essay = correction_service.get_essay_by_id(essay_id)
+        # 获取作文（正文、批改结果和作者一并加载）
+        essay = Essay.query.options(*essay_detail_options()).filter(Essay.id == essay_id).first()
         if not essay:
             return error_response("作文不存在", 404)
         
-        # 获取作者信息
-        author = user_service.get_user_by_id(essay.user_id)
+        author = essay.user
         
-        # 获取作文的批改结果
-        correction = correction_service.get_correction_by_essay_id(essay_id)
+        # 获取作文最新的批改结果
+        correction = essay.corrections.options(*correction_detail_options()) \
+            .order_by(Correction.created_at.desc()).first()
         
         # 构建作文详情数据
         essay_data = {
@@ -8,12 +8,14 @@
 
 import os
 import logging
-from flask import Blueprint, request, jsonify, g, current_app
+from flask import Blueprint, request, jsonify, g, current_app, stream_with_context
 from werkzeug.utils import secure_filename
 
 from app.core.correction import CorrectionService, FileService, AnalysisService
 from app.core.auth import login_required, admin_required
 from app.utils.api_decorators import api_error_handler, user_compatibility
+from app.core.monitoring.tracing import traced
+from app.core.correction.status_cache import essay_status_cache, status_payload, make_etag
 
 # 创建蓝图
 correction_bp = Blueprint('correction', __name__)
@@ -24,6 +26,7 @@ logger = logging.getLogger('app.api.correction')
 @correction_bp.route('/essays', methods=['POST'])
 @login_required
 @api_error_handler
+@traced('http_submit')
 def submit_essay():
     """
     提交作文进行批改
@@ -82,6 +85,7 @@ def submit_essay():
 @login_required
 @api_error_handler
 @user_compatibility
+@traced('http_submit')
 def submit_essay_file():
     """
     上传文件提交作文进行批改
@@ -216,26 +220,64 @@ def get_essay(essay_id):
 @api_error_handler
 def get_essay_status(essay_id):
     """
-    获取作文批改状态
+    获取作文批改状态（只读状态缓存）
     
     URL参数:
         - essay_id: 作文ID
+    
+    查询参数:
+        - wait: 携带 If-None-Match 时长轮询等待状态变化的秒数，默认0
         
     返回:
         {
             "success": true/false,
             "status": "pending/processing/completed/failed",
             "is_active": true/false,
+            "version": 3,
             ...
         }
+        状态与 If-None-Match 一致且等待超时返回304
+    """
+    record, error_response = _get_status_record(essay_id)
+    if error_response:
+        return error_response
+    
+    record, not_modified = essay_status_cache.wait_if_unchanged(
+        record, request.headers.get('If-None-Match'), request.args.get('wait', 0, type=float))
+    response = current_app.response_class(status=304) if not_modified else jsonify(status_payload(record))
+    response.headers['ETag'] = make_etag(record)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@correction_bp.route('/essays/status/<int:essay_id>/stream', methods=['GET'])
+@login_required
+@api_error_handler
+def stream_essay_status(essay_id):
     """
-    # 获取作文状态
-    result = CorrectionService().get_correction_status(essay_id)
+    以SSE推送作文批改状态
     
-    if result.get("success", False):
-        return jsonify(result), 200
-    else:
-        return jsonify(result), 404
+    先发送当前状态，之后每次状态变化发送一次 essay_status 事件，
+    到达最终状态或 ESSAY_STATUS_MAX_WAIT 秒后结束，客户端（EventSource）会自动重连
+    """
+    record, error_response = _get_status_record(essay_id)
+    if error_response:
+        return error_response
+    
+    response = current_app.response_class(stream_with_context(essay_status_cache.stream(essay_id, record)),
+                                          mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _get_status_record(essay_id):
+    """读取状态缓存并校验访问权限，返回 (记录, 错误响应)"""
+    user = g.current_user
+    record = essay_status_cache.get_status(essay_id)
+    if not record:
+        return None, (jsonify({"success": False, "message": f"作文不存在，ID: {essay_id}"}), 404)
+    if record.get('user_id') != user.id and not user.is_admin:
+        return None, (jsonify({"success": False, "message": "没有权限查看此作文"}), 403)
+    return record, None
 
 @correction_bp.route('/essays', methods=['GET'])
 @login_required
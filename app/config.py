@@ -31,6 +31,17 @@ class Config:
     DB_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'essay_correction.db'))
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or f'sqlite:///{DB_PATH}'
     
+    # SQLite 生产模式配置（仅对文件型SQLite生效，见 app/core/db/sqlite_profile.py）
+    SQLITE_PRODUCTION_MODE = os.environ.get('SQLITE_PRODUCTION_MODE', 'true').lower() == 'true'
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)),  # 256MB
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -65536)),   # 64MB
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # 毫秒
+        'temp_store': 'MEMORY',
+    }
+    
     # JWT 配置
     JWT_SECRET_KEY = SECRET_KEY
     JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour
@@ -43,6 +54,10 @@ class Config:
     # 文件上传配置
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB
+    # 批量上传一次提交多个文件或压缩包（单个压缩包上限 BATCH_UPLOAD_MAX_ARCHIVE_SIZE），单独放宽请求体上限
+    ENDPOINT_MAX_CONTENT_LENGTH = {
+        'main.batch_upload': int(os.environ.get('BATCH_UPLOAD_MAX_CONTENT_LENGTH', 210 * 1024 * 1024)),
+    }
     # ---- 保留顶层的扁平集合 ----
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'docx', 'doc'}
     # ---------------------------
@@ -166,7 +181,9 @@ class Config:
         'backup_filename_template': 'backup_%Y%m%d_%H%M%S.zip',
         'auto_backup_enabled': True,
         'notification_enabled': True,
-        'notification_emails': ['admin@autocorrection.com']
+        'notification_emails': ['admin@autocorrection.com'],
+        'backup_step_pages': 1024,  # 在线备份每步复制的页数
+        'backup_step_sleep': 0.005  # 每步之间让出写锁的时间（秒）
     }
     
     # 数据库配置
@@ -339,7 +356,9 @@ class DevelopmentConfig(Config):
         'compression': True,
         'notify_on_success': True,
         'notify_on_failure': True,
-        'backup_types': ['database', 'uploads', 'logs']
+        'backup_types': ['database', 'uploads', 'logs'],
+        'backup_step_pages': 1024,  # 在线备份每步复制的页数
+        'backup_step_sleep': 0.005  # 每步之间让出写锁的时间（秒）
     }
     
     # AI 配置
@@ -347,6 +366,10 @@ class DevelopmentConfig(Config):
         'model': 'gpt-4',
         'api_key': os.getenv('OPENAI_API_KEY'),
         'text_api_url': os.getenv('AI_TEXT_API_URL', 'https://api.openai.com/v1/chat/completions'),
+        # 图片作文识别（千问视觉模型，DashScope协议）
+        'QWEN_API_KEY': os.getenv('QWEN_API_KEY') or os.getenv('DASHSCOPE_API_KEY', ''),
+        'QWEN_API_URL': os.getenv('QWEN_API_URL', 'https://dashscope.aliyuncs.com/api/v1/services/aigc/multimodal-generation/generation'),
+        'QWEN_MODEL': os.getenv('QWEN_MODEL', 'qwen-vl-plus-latest'),
         'max_tokens': 2000,
         'temperature': 0.7,
         'timeout': 30,  # 秒
@@ -473,6 +496,7 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False # 测试时通常禁用CSRF保护
+    SQLITE_PRODUCTION_MODE = False  # 测试数据库不切换WAL模式
     
     # Celery同步执行配置
     CELERY_TASK_ALWAYS_EAGER = True  # 测试环境下同步执行任务
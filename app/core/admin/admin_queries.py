@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+管理后台数据访问模块
+管理后台的用户/作文列表和详情统一从这里取数，每个页面的查询次数固定，不随行数增长：
+  - 多对一、一对一关系（作者、资料、会员）随主查询JOIN，一对多关系（订阅）按页批量加载
+  - 列表只加载展示所需的列（加载策略见 app.core.db.query_profiles）
+  - 按主键查找用户摘要经过请求级身份缓存，同一请求内的多次查找合并为一次IN查询
+"""
+
+import logging
+
+from flask import g, has_app_context
+from sqlalchemy import func, or_
+
+from app.models import db, User, Essay
+from app.core.db.query_profiles import essay_listing_options, user_listing_options, user_detail_options
+from app.core.search import fulltext_index
+
+# 获取logger
+logger = logging.getLogger(__name__)
+
+# flask.g 上缓存用户摘要的属性名
+USER_SUMMARY_CACHE = '_admin_user_summaries'
+
+
+def _user_summary_cache():
+    """当前请求的用户摘要缓存（没有应用上下文时不缓存）"""
+    if not has_app_context():
+        return {}
+    cache = g.get(USER_SUMMARY_CACHE)
+    if cache is None:
+        cache = {}
+        setattr(g, USER_SUMMARY_CACHE, cache)
+    return cache
+
+
+def user_summaries(user_ids):
+    """
+    按主键批量获取用户摘要（id、用户名、邮箱、姓名）
+
+    结果缓存在本次请求的 flask.g 中，只有尚未缓存的ID才查询数据库（一次IN查询）
+
+    Args:
+        user_ids: 用户ID列表，可以重复或包含None
+
+    Returns:
+        dict: {用户ID: 摘要行}，用户不存在时为None
+    """
+    cache = _user_summary_cache()
+    missing = {user_id for user_id in user_ids if user_id is not None and user_id not in cache}
+    if missing:
+        rows = db.session.query(User.id, User.username, User.email, User.name).filter(User.id.in_(missing)).all()
+        found = {row.id: row for row in rows}
+        for user_id in missing:
+            cache[user_id] = found.get(user_id)
+    return {user_id: cache[user_id] for user_id in user_ids if user_id is not None}
+
+
+def user_summary(user_id):
+    """获取单个用户摘要，见 user_summaries"""
+    return user_summaries([user_id]).get(user_id)
+
+
+def filter_users_by_keyword(query, keyword):
+    """
+    按用户名/邮箱子串过滤用户查询：走三元组索引，索引不可用时回退到LIKE
+
+    Args:
+        query: User 查询
+        keyword: 检索关键词
+
+    Returns:
+        过滤后的查询
+    """
+    if not keyword:
+        return query
+    matches = fulltext_index.user_matches(keyword=keyword)
+    if matches is not None:
+        return query.filter(User.id.in_(matches))
+    return query.filter(or_(User.username.ilike(f'%{keyword}%'), User.email.ilike(f'%{keyword}%')))
+
+
+def user_listing_query(with_profile=False, with_membership=False):
+    """
+    管理后台用户列表查询：只加载列表列，资料和会员按页批量加载
+
+    Returns:
+        Query: User 查询
+    """
+    return User.query.options(*user_listing_options(with_profile=with_profile, with_membership=with_membership))
+
+
+def essay_listing_query():
+    """
+    管理后台作文列表查询：只加载列表列，作者用户名随主查询JOIN
+
+    Returns:
+        Query: Essay 查询，结果的 essay.user 已加载（作者不存在时为None）
+    """
+    return Essay.query.outerjoin(Essay.user).options(*essay_listing_options(with_user=True))
+
+
+def get_user_detail(user_id):
+    """
+    获取用户详情实体：资料、会员、订阅一并加载
+
+    Returns:
+        User: 用户，不存在时返回None
+    """
+    return User.query.options(*user_detail_options()).filter(User.id == user_id).first()
+
+
+def recent_user_essays(user_id, limit=10):
+    """
+    获取用户最近的作文和作文总数（一次查询，总数用窗口函数计算）
+
+    Args:
+        user_id: 用户ID
+        limit: 返回的作文数量
+
+    Returns:
+        tuple: (作文列表, 作文总数)
+    """
+    rows = db.session.query(Essay, func.count().over().label('total')) \
+        .options(*essay_listing_options()) \
+        .filter(Essay.user_id == user_id) \
+        .order_by(Essay.created_at.desc(), Essay.id.desc()) \
+        .limit(limit).all()
+    return [row[0] for row in rows], (rows[0].total if rows else 0)
+
+
+def essay_counts(user_ids):
+    """
+    统计一批用户的作文数量（一次分组查询）
+
+    Returns:
+        dict: {用户ID: 作文数量}，没有作文的用户为0
+    """
+    if not user_ids:
+        return {}
+    counts = dict(db.session.query(Essay.user_id, func.count(Essay.id))
+                  .filter(Essay.user_id.in_(set(user_ids)))
+                  .group_by(Essay.user_id).all())
+    return {user_id: counts.get(user_id, 0) for user_id in user_ids}
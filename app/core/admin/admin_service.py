@@ -10,8 +10,14 @@ import logging
 from datetime import datetime, timedelta
 import json
 
-from app.database.models import db, User, Essay, Subscription, Payment, UserProfile, Membership, MembershipPlan, Role
+from sqlalchemy import or_
+
+from app.models import db, User, Essay, Subscription, Membership, MembershipPlan, Role
+from app.models.payment import Payment
+from app.models.subscription import SubscriptionStatus
 from app.utils.exceptions import ValidationError, ResourceNotFoundError
+from app.core.search import fulltext_index
+from app.core.admin.admin_queries import user_listing_query, essay_listing_query, get_user_detail, recent_user_essays
 
 # 获取logger
 logger = logging.getLogger(__name__)
@@ -30,8 +36,8 @@ class AdminService:
         Args:
             page: 页码
             per_page: 每页数量
-            username: 用户名过滤
-            email: 邮箱过滤
+            username: 用户名过滤（子串匹配）
+            email: 邮箱过滤（子串匹配）
             role: 角色过滤
             is_active: 是否激活过滤
             
@@ -39,17 +45,23 @@ class AdminService:
             dict: 用户列表分页数据
         """
         try:
-            query = User.query
+            query = user_listing_query()
+            
+            # 用户名/邮箱子串匹配走三元组索引，索引不可用时回退到LIKE
+            matches = fulltext_index.user_matches(username=username, email=email)
+            if matches is not None:
+                query = query.filter(User.id.in_(matches))
+            else:
+                if username:
+                    query = query.filter(User.username.like(f'%{username}%'))
+                if email:
+                    query = query.filter(User.email.like(f'%{email}%'))
             
             # 应用过滤条件
-            if username:
-                query = query.filter(User.username.like(f'%{username}%'))
-            if email:
-                query = query.filter(User.email.like(f'%{email}%'))
             if role:
-                query = query.filter(User.role == role)
+                query = query.filter(User._is_admin == (role == 'admin'))
             if is_active is not None:
-                query = query.filter(User.is_active == is_active)
+                query = query.filter(User._is_active == is_active)
             
             # 分页
             pagination = query.order_by(User.created_at.desc()).paginate(
@@ -64,7 +76,7 @@ class AdminService:
                     "username": user.username,
                     "email": user.email,
                     "name": user.name,
-                    "role": user.role,
+                    "role": "admin" if user.is_admin else "user",
                     "is_active": user.is_active,
                     "created_at": user.created_at.isoformat() if user.created_at else None,
                     "last_login_at": user.last_login_at.isoformat() if user.last_login_at else None,
@@ -100,21 +112,19 @@ class AdminService:
             dict: 用户详情
         """
         try:
-            user = User.query.get(user_id)
+            # 用户、资料和订阅一并加载
+            user = get_user_detail(user_id)
             if not user:
                 return {
                     "status": "error",
                     "message": f"用户不存在: {user_id}"
                 }
             
-            # 获取用户资料
-            profile = UserProfile.query.filter_by(user_id=user_id).first()
-            
-            # 获取用户订阅
-            subscriptions = Subscription.query.filter_by(user_id=user_id).order_by(Subscription.created_at.desc()).all()
+            profile = user.profile
+            subscriptions = sorted(user.subscriptions, key=lambda sub: sub.created_at or datetime.min, reverse=True)
             
             # 获取用户批改的作文
-            essays = Essay.query.filter_by(user_id=user_id).order_by(Essay.created_at.desc()).limit(10).all()
+            essays, essay_count = recent_user_essays(user_id, limit=10)
             
             # 格式化响应
             user_data = {
@@ -122,7 +132,7 @@ class AdminService:
                 "username": user.username,
                 "email": user.email,
                 "name": user.name,
-                "role": user.role,
+                "role": "admin" if user.is_admin else "user",
                 "is_active": user.is_active,
                 "created_at": user.created_at.isoformat() if user.created_at else None,
                 "last_login_at": user.last_login_at.isoformat() if user.last_login_at else None,
@@ -135,12 +145,14 @@ class AdminService:
                 "subscriptions": [
                     {
                         "id": sub.id,
-                        "plan": sub.plan,
+                        "plan": sub.plan.code if sub.plan else None,
+                        "status": sub.status,
                         "start_date": sub.start_date.isoformat() if sub.start_date else None,
                         "end_date": sub.end_date.isoformat() if sub.end_date else None,
-                        "is_active": sub.is_active
+                        "is_active": sub.status == SubscriptionStatus.ACTIVE.value
                     } for sub in subscriptions
                 ],
+                "essay_count": essay_count,
                 "essays": [
                     {
                         "id": essay.id,
@@ -272,7 +284,8 @@ class AdminService:
                 "message": f"重置用户密码失败: {str(e)}"
             }
     
-    def get_essays(self, page=1, per_page=10, title=None, status=None, user_id=None, start_date=None, end_date=None):
+    def get_essays(self, page=1, per_page=10, title=None, status=None, user_id=None, start_date=None, end_date=None,
+                   keyword=None):
         """
         获取作文列表
         
@@ -284,16 +297,29 @@ class AdminService:
             user_id: 用户ID过滤
             start_date: 开始日期
             end_date: 结束日期
+            keyword: 全文检索关键词（标题、正文、批改反馈），结果按相关度排序并带高亮
             
         Returns:
             dict: 作文列表分页数据
         """
         try:
-            query = Essay.query
+            # 作者用户名随主查询JOIN，不再逐行查询用户
+            query = essay_listing_query()
             
-            # 应用过滤条件
+            # 标题和关键词走全文索引，索引不可用时回退到LIKE
             if title:
-                query = query.filter(Essay.title.like(f'%{title}%'))
+                title_matches = fulltext_index.essay_matches(title, columns=('title',), name='title_matches')
+                if title_matches is not None:
+                    query = query.join(title_matches, title_matches.c.essay_id == Essay.id)
+                else:
+                    query = query.filter(Essay.title.like(f'%{title}%'))
+            keyword_matches = fulltext_index.essay_matches(keyword) if keyword else None
+            if keyword_matches is not None:
+                query = query.join(keyword_matches, keyword_matches.c.essay_id == Essay.id)
+            elif keyword:
+                query = query.filter(or_(Essay.title.like(f'%{keyword}%'), Essay.content.like(f'%{keyword}%')))
+            
+            # 应用过滤条件
             if status:
                 query = query.filter(Essay.status == status)
             if user_id:
@@ -308,17 +334,20 @@ class AdminService:
                 end = end + timedelta(days=1)  # 包含结束日期
                 query = query.filter(Essay.created_at < end)
             
-            # 分页
-            pagination = query.order_by(Essay.created_at.desc()).paginate(
+            # 分页（关键词检索按相关度排序）
+            order_by = [Essay.created_at.desc()]
+            if keyword_matches is not None:
+                order_by.insert(0, keyword_matches.c.rank)
+            pagination = query.order_by(*order_by).paginate(
                 page=page, per_page=per_page, error_out=False
             )
+            highlights = fulltext_index.highlights([essay.id for essay in pagination.items], keyword or title) \
+                if keyword or title else {}
             
             # 格式化响应
             essays = []
             for essay in pagination.items:
-                # 获取用户信息
-                user = User.query.get(essay.user_id)
-                
+                user = essay.user
                 essay_data = {
                     "id": essay.id,
                     "title": essay.title,
@@ -329,6 +358,8 @@ class AdminService:
                     "word_count": essay.word_count,
                     "score": essay.score
                 }
+                if essay.id in highlights:
+                    essay_data["highlight"] = highlights[essay.id]
                 essays.append(essay_data)
             
             return {
@@ -69,7 +69,7 @@ class AIClientFactory:
             Any: 客户端实例
             
         Raises:
-            ConfigurationError: 当无法确定AI提供商时
+            ValueError: 提供商名称未知时（不回退到默认提供商，避免配置错误被掩盖）
         """
         # 尝试从多个来源获取提供商名称
         provider = provider_name or os.environ.get('AI_PROVIDER') or os.environ.get('DEFAULT_AI_PROVIDER')
@@ -87,15 +87,18 @@ class AIClientFactory:
         # 创建新客户端
         client = None
         
-        if provider == "openai":
+        if provider == "router":
+            # 多提供商对冲路由，成员由AI_ROUTER_PROVIDERS配置
+            from app.core.ai.provider_router import create_router_from_env
+            client = create_router_from_env(self)
+        elif provider == "openai":
             client = OpenAIClient()
         elif provider == "deepseek":
             client = DeepseekClient()
         elif provider == "aliyun_qianwen":
             client = AliyunQianwenClient()
         else:
-            logger.warning(f"未知的AI提供商: {provider}，使用默认提供商(deepseek)")
-            client = DeepseekClient()
+            raise ValueError(f"不支持的AI提供商: {provider}")
         
         # 缓存客户端
         if client:
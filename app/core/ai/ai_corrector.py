@@ -11,9 +11,12 @@ import random
 import logging
 import traceback
 import os
+import time
 import asyncio
 from typing import Dict, Any, List, Optional, Union
-from datetime import datetime
+
+from app.core.ai.circuit_breaker import get_client_breaker, circuit_open_result
+from app.utils.log_policy import log_policy
 
 logger = logging.getLogger(__name__)
 
@@ -69,28 +72,32 @@ class AICorrectionService:
                 logger.info(f"调试模式：生成模拟批改结果，essay_id={essay_id}")
                 return self._generate_mock_result(content)
             
-            # 记录正在处理的作文
-            essay_info = f"ID: {essay_id}" if essay_id else f"长度: {len(content)}"
-            logger.info(f"[AICorrectionService] 开始AI批改，内容长度: {len(content)}，时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            # 记录客户端信息
-            client_type = type(self.ai_client).__name__
-            client_methods = dir(self.ai_client)
-            available_methods = [m for m in client_methods if not m.startswith('_') and callable(getattr(self.ai_client, m))]
+            # 记录正在处理的作文（延迟格式化，不在每次批改时枚举客户端方法）
+            logger.info("[AICorrectionService] 开始AI批改，essay_id=%s，内容长度: %d，客户端: %s",
+                        essay_id, len(content), type(self.ai_client).__name__)
             
-            logger.info(f"[AICorrectionService] 使用的AI客户端类型: {client_type}")
-            logger.info(f"[AICorrectionService] 客户端可用方法: {available_methods}")
+            # 熔断器打开时快速失败，不回退到模拟结果
+            breaker = get_client_breaker(self.ai_client)
+            if not breaker.allow_request():
+                return circuit_open_result(breaker, essay_id)
             
             # 调用AI客户端进行批改
             logger.info(f"[AICorrectionService] 调用correct_essay方法进行批改")
-            result = self.ai_client.correct_essay(content)
+            start = time.perf_counter()
+            try:
+                result = self.ai_client.correct_essay(content)
+            except Exception:
+                breaker.record_failure(time.perf_counter() - start)
+                raise
+            breaker.record(not (isinstance(result, dict) and result.get("status") == "error"),
+                           time.perf_counter() - start)
             
             # 验证结果有效性
             if self._is_valid_result(result):
                 logger.info(f"AI批改成功，essay_id={essay_id}")
                 return result
             else:
-                logger.warning(f"AI返回无效结果，essay_id={essay_id}，结果: {result}")
+                logger.warning("AI返回无效结果，essay_id=%s，结果: %s", essay_id, log_policy.payload(result))
                 # 如果结果无效，返回模拟结果
                 mock_result = self._generate_mock_result(content)
                 mock_result["result"]["ai_error"] = "AI返回无效结果结构"
@@ -124,17 +131,15 @@ class AICorrectionService:
                 logger.info(f"调试模式：生成模拟批改结果，essay_id={essay_id}")
                 return self._generate_mock_result(content)
             
-            # 记录正在处理的作文
-            essay_info = f"ID: {essay_id}" if essay_id else f"长度: {len(content)}"
-            logger.info(f"[AICorrectionService] 开始异步AI批改，内容长度: {len(content)}，时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            # 记录客户端信息
-            client_type = type(self.ai_client).__name__
-            client_methods = dir(self.ai_client)
-            available_methods = [m for m in client_methods if not m.startswith('_') and callable(getattr(self.ai_client, m))]
+            # 记录正在处理的作文（延迟格式化，不在每次批改时枚举客户端方法）
+            logger.info("[AICorrectionService] 开始异步AI批改，essay_id=%s，内容长度: %d，客户端: %s",
+                        essay_id, len(content), type(self.ai_client).__name__)
             
-            logger.info(f"[AICorrectionService] 使用的AI客户端类型: {client_type}")
-            logger.info(f"[AICorrectionService] 客户端可用方法: {available_methods}")
+            # 熔断器打开时快速失败
+            breaker = get_client_breaker(self.ai_client)
+            if not breaker.allow_request():
+                return circuit_open_result(breaker, essay_id)
+            start = time.perf_counter()
             
             # 检查客户端是否支持异步方法
             if hasattr(self.ai_client, 'correct_essay_async') and callable(getattr(self.ai_client, 'correct_essay_async')):
@@ -149,13 +154,15 @@ class AICorrectionService:
                     None,
                     lambda: self.ai_client.correct_essay(content)
                 )
+            breaker.record(not (isinstance(result, dict) and result.get("status") == "error"),
+                           time.perf_counter() - start)
             
             # 验证结果有效性
             if self._is_valid_result(result):
                 logger.info(f"异步AI批改成功，essay_id={essay_id}")
                 return result
             else:
-                logger.warning(f"异步AI返回无效结果，essay_id={essay_id}，结果: {result}")
+                logger.warning("异步AI返回无效结果，essay_id=%s，结果: %s", essay_id, log_policy.payload(result))
                 # 如果结果无效，返回模拟结果
                 mock_result = self._generate_mock_result(content)
                 mock_result["result"]["ai_error"] = "异步AI返回无效结果结构"
@@ -163,6 +170,8 @@ class AICorrectionService:
                 return mock_result
                 
         except Exception as e:
+            if 'start' in locals():
+                breaker.record_failure(time.perf_counter() - start)
             logger.error(f"异步AI批改服务发生错误: {str(e)}")
             logger.error(traceback.format_exc())
             
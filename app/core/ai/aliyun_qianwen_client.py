@@ -14,6 +14,8 @@ from typing import Dict, Any, List, Optional, Union
 import requests
 
 from app.core.ai.api_client import BaseAPIClient, APIError
+from app.core.ai.json_extract import parse_json_object
+from app.utils.field_mapper import get_field_mapper
 from config.ai_config import AI_CONFIG
 
 # 配置日志
@@ -152,27 +154,15 @@ class AliyunQianwenClient(BaseAPIClient):
                 # 从返回结果中提取内容
                 if "output" in result and "text" in result["output"]:
                     content = result["output"]["text"]
-                    try:
-                        # 尝试解析JSON
-                        json_content = json.loads(content)
+                    json_content = parse_json_object(content)
+                    if json_content is not None:
                         return self._extract_result(json_content)
-                    except json.JSONDecodeError:
-                        # 尝试从文本中提取JSON部分
-                        json_start = content.find('{')
-                        json_end = content.rfind('}') + 1
-                        
-                        if json_start >= 0 and json_end > json_start:
-                            json_str = content[json_start:json_end]
-                            try:
-                                json_content = json.loads(json_str)
-                                return self._extract_result(json_content)
-                            except json.JSONDecodeError:
-                                logger.error(f"无法从文本中提取有效JSON")
-                        
-                        return {
-                            "status": "error",
-                            "message": "无法解析返回的JSON内容"
-                        }
+                    
+                    logger.error(f"无法从文本中提取有效JSON")
+                    return {
+                        "status": "error",
+                        "message": "无法解析返回的JSON内容"
+                    }
                 else:
                     logger.error(f"通义千问响应格式异常: {result}")
                     return {
@@ -205,41 +195,28 @@ class AliyunQianwenClient(BaseAPIClient):
             Dict: 提取的结果
         """
         try:
-            # 提取分数
-            total_score = response.get("总得分", 0)
-            
-            # 提取分项得分
-            分项得分 = response.get("分项得分", {})
-            content_score = 分项得分.get("内容主旨", 0)
-            language_score = 分项得分.get("语言文采", 0)
-            structure_score = 分项得分.get("文章结构", 0)
-            writing_score = 分项得分.get("写作技巧", 0)
-            
-            # 提取评价和分析
-            overall_assessment = response.get("总体评价", "")
-            content_analysis = response.get("内容分析", "")
-            language_analysis = response.get("语言分析", "")
-            structure_analysis = response.get("结构分析", "")
-            improvement_suggestions = response.get("写作建议", "")
-            
-            # 提取错别字
-            spelling_errors = response.get("错别字", [])
+            # 使用共享的字段映射计划（dashscope）标准化字段
+            normalized = get_field_mapper().normalize_result(response, "dashscope")
+            scores = normalized["scores"]
+            dimensions = scores.get("dimensions", {})
+            analyses = normalized["analyses"]
+            feedback = normalized["feedback"]
             
             return {
                 "status": "success",
                 "result": {
-                    "total_score": total_score,
-                    "content_score": content_score,
-                    "language_score": language_score,
-                    "structure_score": structure_score,
-                    "writing_score": writing_score,
-                    "overall_assessment": overall_assessment,
-                    "content_analysis": content_analysis,
-                    "language_analysis": language_analysis,
-                    "structure_analysis": structure_analysis,
-                    "improvement_suggestions": improvement_suggestions,
+                    "total_score": scores.get("total", 0),
+                    "content_score": dimensions.get("content", 0),
+                    "language_score": dimensions.get("language", 0),
+                    "structure_score": dimensions.get("structure", 0),
+                    "writing_score": dimensions.get("grammar", 0),
+                    "overall_assessment": analyses.get("summary", ""),
+                    "content_analysis": analyses.get("content", ""),
+                    "language_analysis": analyses.get("language", ""),
+                    "structure_analysis": analyses.get("structure", ""),
+                    "improvement_suggestions": "\n".join(feedback.get("improvements", [])),
                     "spelling_errors": {
-                        "错别字": spelling_errors
+                        "错别字": feedback.get("corrections", [])
                     }
                 }
             }
@@ -4,53 +4,94 @@
 """
 API调用监控模块
 用于记录和监控API调用的情况
+
+调用记录先进入有界环形缓冲区（满时丢弃最旧的记录并计数），由后台线程按批次（N条或T毫秒）
+写入按天、按大小轮转的NDJSON文件（可选gzip压缩）；summarize_api_logs 从这些文件汇总各提供商的延迟与错误率
 """
 
 import os
+import re
+import gzip
 import json
 import time
+import atexit
 import logging
 import traceback
+from collections import deque, OrderedDict
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Union, Iterator
 import threading
-import queue
+
+from app.utils.log_policy import log_policy, sampling_key, truncate
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+FORMAT_NDJSON = 'ndjson'
+FORMAT_NDJSON_GZ = 'ndjson.gz'
+
+DEFAULT_LOG_DIR = os.path.join(os.getcwd(), 'logs', 'api')
+
+# api_20250101.log / api_20250101.2.log / api_20250101.ndjson.gz / api_20250101.1.ndjson.gz
+_LOG_FILE_PATTERN = re.compile(r'^api_(\d{8})(?:\.(\d+))?\.(log|ndjson\.gz)$')
+
+# 错误记录中的堆栈只保留末尾（最内层调用和异常信息）
+MAX_TRACEBACK_CHARS = 2000
+
+# 汇总时等待结束记录的请求数上限（开始记录的提供商按请求ID暂存）
+MAX_PENDING_REQUESTS = 10000
+
+
 class APIMonitor:
     """API调用监控器"""
     
-    def __init__(self):
-        """初始化API监控器"""
-        self.log_queue = queue.Queue()
-        self.log_thread = None
-        self.running = False
-        
-        # 配置日志记录器
-        self.logger = logging.getLogger('api_monitor')
-        self.logger.setLevel(logging.INFO)
-        
-        # 创建文件处理器
-        log_dir = os.path.join(os.getcwd(), 'logs', 'api')
-        os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, f'api_{datetime.now().strftime("%Y%m%d")}.log')
+    def __init__(self,
+                 log_dir: Optional[str] = None,
+                 buffer_size: int = 10000,
+                 batch_size: int = 200,
+                 flush_interval: float = 0.5,
+                 max_bytes: int = 50 * 1024 * 1024,
+                 file_format: str = FORMAT_NDJSON):
+        """
+        初始化API监控器
         
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(logging.INFO)
+        Args:
+            log_dir: 日志目录，默认为 logs/api
+            buffer_size: 缓冲区容量，写入跟不上时丢弃最旧的记录
+            batch_size: 攒够多少条立即写入
+            flush_interval: 最长攒批时间（秒）
+            max_bytes: 单个文件的大小上限，超过后在当天内轮转到下一个序号
+            file_format: ndjson（api_YYYYMMDD.log）或 ndjson.gz（api_YYYYMMDD.ndjson.gz）
+        """
+        if file_format not in (FORMAT_NDJSON, FORMAT_NDJSON_GZ):
+            raise ValueError(f"不支持的API监控日志格式: {file_format}")
+        self.log_dir = log_dir or DEFAULT_LOG_DIR
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.file_format = file_format
         
-        # 设置格式化器
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', '%Y-%m-%d %H:%M:%S')
-        file_handler.setFormatter(formatter)
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._batches = 0
+        self._write_errors = 0
+        self._flush_requested = False
+        self._file_date = None
+        self._file_index = 0
+        self._current_file = None
+        self.log_thread = None
+        self.running = False
         
-        # 添加处理器
-        self.logger.addHandler(file_handler)
+        os.makedirs(self.log_dir, exist_ok=True)
         
         # 启动日志处理线程
         self.start()
         
-        logger.info(f"API监控器初始化完成，日志保存在：{log_file}")
+        logger.info(f"API监控器初始化完成，日志目录：{self.log_dir}，格式：{self.file_format}")
     
     def start(self):
         """启动日志处理线程"""
@@ -58,38 +99,102 @@ class APIMonitor:
             self.running = True
             self.log_thread = threading.Thread(target=self._process_log_queue, daemon=True)
             self.log_thread.start()
+            atexit.register(self.stop)
+    
+    def stop(self, timeout: float = 5.0):
+        """停止日志处理线程，写出缓冲区中剩余的记录"""
+        with self._cond:
+            if not self.running:
+                return
+            self.running = False
+            self._cond.notify_all()
+        if self.log_thread is not None:
+            self.log_thread.join(timeout)
+    
+    def _enqueue(self, log_entry: Dict[str, Any]):
+        """放入环形缓冲区，满时丢弃最旧的记录"""
+        with self._cond:
+            if len(self._buffer) >= self.buffer_size:
+                self._buffer.popleft()
+                self._dropped += 1
+                if self._dropped == 1 or self._dropped % 1000 == 0:
+                    logger.warning(f"API监控缓冲区已满，累计丢弃 {self._dropped} 条记录")
+            self._buffer.append(log_entry)
+            self._enqueued += 1
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
     
     def _process_log_queue(self):
-        """处理异步日志队列"""
-        while self.running:
+        """后台线程：攒批后写入文件"""
+        while True:
+            with self._cond:
+                if self.running and not self._flush_requested and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                batch = list(self._buffer)
+                self._buffer.clear()
+                self._flush_requested = False
+                running = self.running
+            
+            if batch:
+                self._write_batch(batch)
+            
+            with self._cond:
+                self._written += len(batch)
+                if batch:
+                    self._batches += 1
+                self._cond.notify_all()
+            
+            if not running and not batch:
+                return
+    
+    def _path_for(self, date: str, index: int) -> str:
+        suffix = 'log' if self.file_format == FORMAT_NDJSON else 'ndjson.gz'
+        name = f"api_{date}.{suffix}" if index == 0 else f"api_{date}.{index}.{suffix}"
+        return os.path.join(self.log_dir, name)
+    
+    def _current_path(self) -> str:
+        """当前应写入的文件：日期变化时换新文件，超过大小上限时序号递增"""
+        date = datetime.now().strftime("%Y%m%d")
+        if date != self._file_date:
+            self._file_date = date
+            self._file_index = 0
+        while True:
+            path = self._path_for(date, self._file_index)
             try:
-                # 从队列获取日志条目
-                log_entry = self.log_queue.get()
-                
-                # 写入日志
-                self._write_log(log_entry)
-                
-                # 标记任务完成
-                self.log_queue.task_done()
-                
-            except Exception as e:
-                logger.error(f"处理API监控日志队列时出错: {str(e)}")
-                time.sleep(1)  # 避免错误时CPU使用率过高
+                size = os.path.getsize(path)
+            except OSError:
+                return path
+            if size < self.max_bytes:
+                return path
+            self._file_index += 1
     
-    def _write_log(self, log_entry: Dict[str, Any]):
+    def _write_batch(self, batch: List[Dict[str, Any]]):
         """
-        写入日志
+        批量写入日志
         
         Args:
-            log_entry: 日志条目
+            batch: 日志条目列表
         """
         try:
-            # 写入日志
-            self.logger.info(json.dumps(log_entry, ensure_ascii=False))
+            lines = []
+            for log_entry in batch:
+                lines.append(json.dumps(log_entry, ensure_ascii=False, default=str))
+            data = '\n'.join(lines) + '\n'
+            
+            path = self._current_path()
+            self._current_file = path
+            if self.file_format == FORMAT_NDJSON_GZ:
+                # 每批写成一个gzip成员，追加后整个文件仍可顺序解压
+                with gzip.open(path, 'at', encoding='utf-8') as f:
+                    f.write(data)
+            else:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(data)
             
         except Exception as e:
+            self._write_errors += 1
             logger.error(f"写入API监控日志时出错: {str(e)}")
-    
+
     def log_api_call(self, 
                     provider: str, 
                     model: str, 
@@ -115,7 +220,7 @@ class APIMonitor:
         if not request_id:
             request_id = f"{int(time.time() * 1000)}-{threading.get_ident() % 10000}"
         
-        # 创建日志条目
+        # 创建日志条目；请求参数按日志策略抽样记录，出错时由 log_api_response 补记
         log_entry = {
             "request_id": request_id,
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
@@ -123,12 +228,13 @@ class APIMonitor:
             "provider": provider,
             "model": model,
             "endpoint": endpoint,
-            "params": self._sanitize_params(request_params),
             **kwargs
         }
+        if log_policy.sample(sampling_key(request_id)):
+            log_entry["params"] = self._sanitize_params(request_params)
         
-        # 添加到日志队列
-        self.log_queue.put(log_entry)
+        # 放入缓冲区，由后台线程批量写入
+        self._enqueue(log_entry)
         
         return request_id
     
@@ -138,6 +244,7 @@ class APIMonitor:
                        response_time: float,
                        response: Any = None,
                        error: str = None,
+                       request_params: Dict[str, Any] = None,
                        **kwargs):
         """
         记录API调用结束
@@ -148,6 +255,7 @@ class APIMonitor:
             response_time: 响应时间（秒）
             response: 响应内容
             error: 错误信息
+            request_params: 请求参数，出错时记录（开始时未被抽样记录的也能在这里看到）
             **kwargs: 其他参数
         """
         # 创建日志条目
@@ -164,11 +272,17 @@ class APIMonitor:
         if status == "success" and response:
             log_entry["response_summary"] = self._summarize_response(response)
         
+        traceback_text = log_entry.get("traceback")
+        if isinstance(traceback_text, str) and len(traceback_text) > MAX_TRACEBACK_CHARS:
+            log_entry["traceback"] = f"...(共{len(traceback_text)}字符)\n" + traceback_text[-MAX_TRACEBACK_CHARS:]
+        
         if status == "error" and error:
-            log_entry["error"] = error
+            log_entry["error"] = truncate(error, log_policy.max_chars)
+            if request_params:
+                log_entry["params"] = self._sanitize_params(request_params)
         
-        # 添加到日志队列
-        self.log_queue.put(log_entry)
+        # 放入缓冲区，由后台线程批量写入
+        self._enqueue(log_entry)
     
     def _sanitize_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -183,7 +297,7 @@ class APIMonitor:
         if not params:
             return {}
             
-        # 创建一个副本
+        # 创建一个副本（消息列表也复制，避免截断调用方正在发送的消息）
         sanitized = params.copy()
         
         # 敏感字段列表
@@ -197,9 +311,13 @@ class APIMonitor:
         # 处理消息内容
         if 'messages' in sanitized and isinstance(sanitized['messages'], list):
             # 保留消息结构，但限制内容长度
-            for i, msg in enumerate(sanitized['messages']):
-                if 'content' in msg and isinstance(msg['content'], str) and len(msg['content']) > 100:
-                    sanitized['messages'][i]['content'] = msg['content'][:100] + "..."
+            limit = log_policy.message_chars
+            messages = []
+            for msg in sanitized['messages']:
+                if isinstance(msg, dict) and isinstance(msg.get('content'), str) and len(msg['content']) > limit:
+                    msg = dict(msg, content=msg['content'][:limit] + "...")
+                messages.append(msg)
+            sanitized['messages'] = messages
         
         return sanitized
     
@@ -226,8 +344,8 @@ class APIMonitor:
                     if response['choices'] and len(response['choices']) > 0:
                         first_choice = response['choices'][0]
                         if 'message' in first_choice and 'content' in first_choice['message']:
-                            content = first_choice['message']['content']
-                            summary['first_choice_content'] = content[:100] + "..." if len(content) > 100 else content
+                            summary['first_choice_content'] = truncate(first_choice['message']['content'],
+                                                                       log_policy.message_chars)
                 
                 # 获取token使用情况
                 if 'usage' in response:
@@ -239,7 +357,7 @@ class APIMonitor:
                         summary[field] = response[field]
             
             elif isinstance(response, str):
-                summary['content'] = response[:100] + "..." if len(response) > 100 else response
+                summary['content'] = truncate(response, log_policy.message_chars)
             
             else:
                 summary['type'] = str(type(response))
@@ -250,16 +368,166 @@ class APIMonitor:
             logger.error(f"总结响应内容时出错: {str(e)}")
             return {"error": "无法总结响应内容"}
     
-    def flush(self):
-        """刷新日志队列"""
+    def flush(self, timeout: float = 10.0):
+        """
+        刷新日志缓冲区，等待此前记录的条目全部写入（或被丢弃）
+        
+        Args:
+            timeout: 最长等待时间（秒）
+        """
         try:
-            # 等待队列处理完成
-            self.log_queue.join()
+            deadline = time.monotonic() + timeout
+            with self._cond:
+                target = self._enqueued
+                self._flush_requested = True
+                self._cond.notify_all()
+                while self._written + self._dropped < target and self.log_thread and self.log_thread.is_alive():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
         except Exception as e:
             logger.error(f"刷新API监控日志队列时出错: {str(e)}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓冲区与写入统计"""
+        with self._cond:
+            return {
+                'buffered': len(self._buffer),
+                'buffer_size': self.buffer_size,
+                'enqueued': self._enqueued,
+                'written': self._written,
+                'dropped': self._dropped,
+                'batches': self._batches,
+                'write_errors': self._write_errors,
+                'current_file': self._current_file,
+                'format': self.file_format,
+            }
+
+
+def create_monitor_from_env() -> APIMonitor:
+    """
+    根据环境变量创建监控器
+    
+    环境变量:
+        API_MONITOR_LOG_DIR: 日志目录，默认 logs/api
+        API_MONITOR_BUFFER_SIZE: 缓冲区容量，默认10000
+        API_MONITOR_BATCH_SIZE: 批量写入条数，默认200
+        API_MONITOR_FLUSH_MS: 最长攒批时间（毫秒），默认500
+        API_MONITOR_MAX_MB: 单个文件大小上限（MB），默认50
+        API_MONITOR_FORMAT: ndjson 或 ndjson.gz，默认 ndjson
+    """
+    return APIMonitor(
+        log_dir=os.environ.get('API_MONITOR_LOG_DIR') or None,
+        buffer_size=int(os.environ.get('API_MONITOR_BUFFER_SIZE', 10000)),
+        batch_size=int(os.environ.get('API_MONITOR_BATCH_SIZE', 200)),
+        flush_interval=int(os.environ.get('API_MONITOR_FLUSH_MS', 500)) / 1000.0,
+        max_bytes=int(float(os.environ.get('API_MONITOR_MAX_MB', 50)) * 1024 * 1024),
+        file_format=os.environ.get('API_MONITOR_FORMAT', FORMAT_NDJSON),
+    )
+
+
+def iter_log_entries(log_dir: Optional[str] = None, since: Optional[str] = None,
+                     until: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    按文件名中的日期和序号顺序读取监控日志条目
+    
+    兼容旧格式（"时间 - INFO - {json}"）与NDJSON/NDJSON.gz格式
+    
+    Args:
+        log_dir: 日志目录
+        since: 起始日期（YYYYMMDD，含）
+        until: 结束日期（YYYYMMDD，含）
+    """
+    log_dir = log_dir or DEFAULT_LOG_DIR
+    if not os.path.isdir(log_dir):
+        return
+    files = []
+    for name in os.listdir(log_dir):
+        match = _LOG_FILE_PATTERN.match(name)
+        if not match:
+            continue
+        date = match.group(1)
+        if (since and date < since) or (until and date > until):
+            continue
+        files.append((date, int(match.group(2) or 0), name))
+    for _, _, name in sorted(files):
+        path = os.path.join(log_dir, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        try:
+            with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    start = line.find('{')
+                    if start < 0:
+                        continue
+                    try:
+                        entry = json.loads(line[start:])
+                    except ValueError:
+                        continue
+                    if isinstance(entry, dict):
+                        yield entry
+        except (OSError, EOFError) as e:
+            # 进程被强制结束时最后一个gzip成员可能不完整
+            logger.warning(f"读取API监控日志 {name} 时出错: {str(e)}")
+
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def summarize_api_logs(log_dir: Optional[str] = None, since: Optional[str] = None,
+                       until: Optional[str] = None, provider: Optional[str] = None,
+                       max_pending: int = MAX_PENDING_REQUESTS) -> Dict[str, Dict[str, Any]]:
+    """
+    汇总各提供商的调用次数、错误率和延迟分位数
+    
+    Args:
+        log_dir: 日志目录
+        since: 起始日期（YYYYMMDD，含）
+        until: 结束日期（YYYYMMDD，含）
+        provider: 只统计指定提供商
+        max_pending: 暂存的未结束请求数上限，超过时丢弃最早的（其结束记录按 unknown 统计）
+        
+    Returns:
+        Dict: 提供商 -> {calls, errors, error_rate, avg, p50, p95, max}（延迟单位秒）
+    """
+    providers_by_request = OrderedDict()
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for entry in iter_log_entries(log_dir, since, until):
+        event = entry.get('event')
+        if event == 'api_call_start':
+            providers_by_request[entry.get('request_id')] = entry.get('provider', 'unknown')
+            if len(providers_by_request) > max_pending:
+                providers_by_request.popitem(last=False)
+        elif event == 'api_call_end':
+            started = providers_by_request.pop(entry.get('request_id'), 'unknown')
+            name = entry.get('provider') or started
+            if provider and name != provider:
+                continue
+            latencies.setdefault(name, []).append(float(entry.get('response_time') or 0.0))
+            if entry.get('status') != 'success':
+                errors[name] = errors.get(name, 0) + 1
+    
+    summary = {}
+    for name, values in latencies.items():
+        values.sort()
+        calls = len(values)
+        summary[name] = {
+            'calls': calls,
+            'errors': errors.get(name, 0),
+            'error_rate': round(errors.get(name, 0) / calls, 4),
+            'avg': round(sum(values) / calls, 3),
+            'p50': round(_percentile(values, 0.5), 3),
+            'p95': round(_percentile(values, 0.95), 3),
+            'max': round(values[-1], 3),
+        }
+    return summary
 
 # 创建全局监控实例
-api_monitor = APIMonitor()
+api_monitor = create_monitor_from_env()
 
 def log_api_call(func):
     """
@@ -308,7 +576,8 @@ def log_api_call(func):
                 request_id=request_id,
                 status="success",
                 response_time=response_time,
-                response=result
+                response=result,
+                provider=provider
             )
             
             return result
@@ -323,6 +592,8 @@ def log_api_call(func):
                 status="error",
                 response_time=response_time,
                 error=str(e),
+                request_params=request_params,
+                provider=provider,
                 traceback=traceback.format_exc()
             )
             
@@ -380,6 +651,7 @@ def log_api_call_async(func):
                 status="success",
                 response_time=response_time,
                 response=result,
+                provider=provider,
                 is_async=True
             )
             
@@ -395,6 +667,8 @@ def log_api_call_async(func):
                 status="error",
                 response_time=response_time,
                 error=str(e),
+                request_params=request_params,
+                provider=provider,
                 traceback=traceback.format_exc(),
                 is_async=True
             )
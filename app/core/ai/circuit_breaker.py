@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+AI提供商熔断器模块
+按提供商/端点维护熔断状态，状态保存在Redis中供所有worker共享；
+错误率或慢调用比例超过阈值时熔断，熔断期间快速失败，冷却后放行少量探测请求
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+# 熔断器状态
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+KEY_PREFIX = 'circuit'
+NAMES_KEY = f'{KEY_PREFIX}:names'
+
+# 滑动窗口由若干个时间桶组成
+BUCKET_SECONDS = 10
+
+# 状态哈希的 changed_at 仍为读取时的值才写入新状态，并同时清零探测计数
+_TRANSITION_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'changed_at') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('DEL', KEYS[2])
+redis.call('HSET', KEYS[2], 'admitted', 0, 'succeeded', 0)
+return 1
+"""
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被拒绝"""
+
+    def __init__(self, name: str, retry_after: float = 0):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"AI服务 {name} 已熔断，{retry_after:.0f}秒后重试")
+
+
+class _LocalStore:
+    """进程内状态存储，Redis不可用时使用"""
+
+    def __init__(self):
+        self._hashes: Dict[str, Dict[str, Any]] = {}
+        self._expiry: Dict[str, float] = {}
+        self._names = set()
+        self._lock = threading.Lock()
+
+    def _alive(self, key):
+        expires = self._expiry.get(key)
+        if expires is not None and expires < time.time():
+            self._hashes.pop(key, None)
+            self._expiry.pop(key, None)
+        return self._hashes.get(key)
+
+    def add_name(self, name):
+        self._names.add(name)
+
+    def names(self):
+        return sorted(self._names)
+
+    def incr_fields(self, key, fields, ttl):
+        with self._lock:
+            data = self._alive(key) or self._hashes.setdefault(key, {})
+            for field, amount in fields.items():
+                data[field] = int(data.get(field, 0)) + amount
+            self._expiry[key] = time.time() + ttl
+            return dict(data)
+
+    def get_hashes(self, keys):
+        with self._lock:
+            return [dict(self._alive(key) or {}) for key in keys]
+
+    def set_hash(self, key, mapping):
+        with self._lock:
+            self._hashes[key] = dict(mapping)
+            self._expiry.pop(key, None)
+
+    def transition_if(self, state_key, changed_at, mapping, probe_key):
+        with self._lock:
+            if (self._alive(state_key) or {}).get('changed_at') != changed_at:
+                return False
+            self._hashes[state_key] = dict(mapping)
+            self._expiry.pop(state_key, None)
+            self._hashes[probe_key] = {'admitted': 0, 'succeeded': 0}
+            self._expiry.pop(probe_key, None)
+            return True
+
+
+class _RedisStore:
+    """Redis状态存储，多个worker共享熔断状态"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def add_name(self, name):
+        self.client.sadd(NAMES_KEY, name)
+
+    def names(self):
+        return sorted(self.client.smembers(NAMES_KEY))
+
+    def incr_fields(self, key, fields, ttl):
+        pipe = self.client.pipeline()
+        for field, amount in fields.items():
+            pipe.hincrby(key, field, amount)
+        pipe.expire(key, ttl)
+        pipe.hgetall(key)
+        return pipe.execute()[-1]
+
+    def get_hashes(self, keys):
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.hgetall(key)
+        return pipe.execute()
+
+    def set_hash(self, key, mapping):
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.execute()
+
+    def transition_if(self, state_key, changed_at, mapping, probe_key):
+        args = [item for field, value in mapping.items() for item in (field, value)]
+        return bool(self.client.eval(_TRANSITION_SCRIPT, 2, state_key, probe_key, changed_at, *args))
+
+
+_local_store = _LocalStore()
+_store = None
+_store_lock = threading.Lock()
+
+
+def _get_store():
+    """获取状态存储：优先使用Redis，不可用时退回进程内存储"""
+    global _store
+    if _store is not None:
+        return _store
+    with _store_lock:
+        if _store is None:
+            try:
+                import redis
+                from app.core.services.redis_service import RedisService
+                client = RedisService().client
+                if isinstance(client, redis.Redis):
+                    _store = _RedisStore(client)
+                    logger.info("熔断器状态使用Redis共享存储")
+            except Exception as e:
+                logger.warning(f"熔断器无法使用Redis，退回进程内状态: {str(e)}")
+            if _store is None:
+                _store = _local_store
+    return _store
+
+
+def _to_int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    状态机:
+        closed    -> open       窗口内请求数达到min_calls且错误率或慢调用比例超过阈值
+        open      -> half_open  打开超过open_seconds后
+        half_open -> closed     连续half_open_max_calls个探测请求成功
+        half_open -> open       任一探测请求失败
+    """
+
+    def __init__(self, name: str,
+                 failure_rate_threshold: float = 0.5,
+                 slow_call_seconds: float = 45.0,
+                 slow_rate_threshold: float = 0.8,
+                 min_calls: int = 5,
+                 window_seconds: int = 60,
+                 open_seconds: float = 30.0,
+                 half_open_max_calls: int = 2,
+                 store=None):
+        """
+        初始化熔断器
+
+        Args:
+            name: 熔断器名称（提供商/模型或端点）
+            failure_rate_threshold: 错误率阈值
+            slow_call_seconds: 超过该耗时视为慢调用
+            slow_rate_threshold: 慢调用比例阈值
+            min_calls: 窗口内最少请求数，不足时不熔断
+            window_seconds: 统计窗口长度（秒）
+            open_seconds: 打开状态持续时间（秒）
+            half_open_max_calls: 半开状态放行的探测请求数
+            store: 状态存储，默认自动选择
+        """
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._store = store
+        self._state_key = f'{KEY_PREFIX}:{name}:state'
+        self._probe_key = f'{KEY_PREFIX}:{name}:probe'
+        try:
+            self.store.add_name(name)
+        except Exception as e:
+            logger.warning(f"注册熔断器 {name} 失败: {str(e)}")
+
+    @property
+    def store(self):
+        return self._store or _get_store()
+
+    def _bucket_keys(self, now: float) -> List[str]:
+        current = int(now // BUCKET_SECONDS)
+        count = max(1, self.window_seconds // BUCKET_SECONDS)
+        return [f'{KEY_PREFIX}:{self.name}:w:{bucket}' for bucket in range(current - count + 1, current + 1)]
+
+    def _read_state(self) -> Dict[str, Any]:
+        state = self.store.get_hashes([self._state_key])[0] or {}
+        return {
+            'state': state.get('state', STATE_CLOSED),
+            'opened_at': float(state.get('opened_at', 0) or 0),
+            # 原样保留，作为状态转换的比较值
+            'changed_at': state.get('changed_at'),
+        }
+
+    def _transition(self, state: str, now: float) -> None:
+        mapping = {'state': state, 'opened_at': now if state == STATE_OPEN else 0, 'changed_at': now}
+        self.store.set_hash(self._state_key, mapping)
+        if state == STATE_HALF_OPEN:
+            self.store.set_hash(self._probe_key, {'admitted': 0, 'succeeded': 0})
+        logger.warning(f"熔断器 {self.name} 状态变更为 {state}")
+
+    @property
+    def state(self) -> str:
+        """当前状态（打开超过冷却时间时视为半开）"""
+        current = self._read_state()
+        if current['state'] == STATE_OPEN and time.time() - current['opened_at'] >= self.open_seconds:
+            return STATE_HALF_OPEN
+        return current['state']
+
+    def allow_request(self) -> bool:
+        """
+        判断是否放行请求
+
+        Returns:
+            bool: 是否放行；半开状态下仅放行有限的探测请求
+        """
+        try:
+            now = time.time()
+            current = self._read_state()
+            if current['state'] == STATE_CLOSED:
+                return True
+            if current['state'] == STATE_OPEN:
+                if now - current['opened_at'] < self.open_seconds:
+                    return False
+                # 多个worker同时冷却完成时只有一个完成转换并清零探测计数，其余按最新状态判断
+                mapping = {'state': STATE_HALF_OPEN, 'opened_at': 0, 'changed_at': now}
+                if self.store.transition_if(self._state_key, current['changed_at'], mapping, self._probe_key):
+                    logger.warning(f"熔断器 {self.name} 状态变更为 {STATE_HALF_OPEN}")
+                else:
+                    current = self._read_state()
+                    if current['state'] != STATE_HALF_OPEN:
+                        return current['state'] == STATE_CLOSED
+            probes = self.store.incr_fields(self._probe_key, {'admitted': 1}, ttl=int(self.open_seconds * 4) + 1)
+            return _to_int(probes.get('admitted')) <= self.half_open_max_calls
+        except Exception as e:
+            # 状态存储故障时不阻断业务请求
+            logger.warning(f"读取熔断器 {self.name} 状态失败: {str(e)}")
+            return True
+
+    def retry_after(self) -> float:
+        """距离下次允许探测的秒数"""
+        current = self._read_state()
+        if current['state'] != STATE_OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.time() - current['opened_at']))
+
+    def record(self, success: bool, latency: float = 0.0) -> None:
+        """
+        记录一次请求结果
+
+        Args:
+            success: 是否成功
+            latency: 耗时（秒）
+        """
+        try:
+            now = time.time()
+            slow = latency >= self.slow_call_seconds
+            self.store.incr_fields(
+                self._bucket_keys(now)[-1],
+                {'calls': 1, 'failures': 0 if success else 1, 'slow': 1 if slow else 0},
+                ttl=self.window_seconds + BUCKET_SECONDS
+            )
+
+            current = self._read_state()['state']
+            if current == STATE_HALF_OPEN:
+                if not success or slow:
+                    self._transition(STATE_OPEN, now)
+                    return
+                probes = self.store.incr_fields(self._probe_key, {'succeeded': 1}, ttl=int(self.open_seconds * 4) + 1)
+                if _to_int(probes.get('succeeded')) >= self.half_open_max_calls:
+                    self._transition(STATE_CLOSED, now)
+                return
+
+            if current == STATE_CLOSED and self._should_trip(now):
+                self._transition(STATE_OPEN, now)
+        except Exception as e:
+            logger.warning(f"记录熔断器 {self.name} 结果失败: {str(e)}")
+
+    def record_success(self, latency: float = 0.0) -> None:
+        self.record(True, latency)
+
+    def record_failure(self, latency: float = 0.0) -> None:
+        self.record(False, latency)
+
+    def window_stats(self, now: Optional[float] = None) -> Dict[str, int]:
+        """统计窗口内的请求数、失败数和慢调用数"""
+        totals = {'calls': 0, 'failures': 0, 'slow': 0}
+        for bucket in self.store.get_hashes(self._bucket_keys(now or time.time())):
+            for field in totals:
+                totals[field] += _to_int((bucket or {}).get(field))
+        return totals
+
+    def _should_trip(self, now: float) -> bool:
+        stats = self.window_stats(now)
+        if stats['calls'] < self.min_calls:
+            return False
+        return (stats['failures'] / stats['calls'] >= self.failure_rate_threshold or
+                stats['slow'] / stats['calls'] >= self.slow_rate_threshold)
+
+    def call(self, func: Callable, *args,
+             is_failure: Optional[Callable[[Any], bool]] = None, **kwargs) -> Any:
+        """
+        通过熔断器执行调用
+
+        Args:
+            func: 被调用的函数
+            is_failure: 判断返回值是否为失败，默认 status == 'error' 视为失败
+
+        Returns:
+            Any: 函数返回值
+
+        Raises:
+            CircuitOpenError: 熔断器打开时
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+        is_failure = is_failure or (lambda result: isinstance(result, dict) and result.get('status') == 'error')
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure(time.perf_counter() - start)
+            raise
+        self.record(not is_failure(result), time.perf_counter() - start)
+        return result
+
+    def reset(self) -> None:
+        """手动重置为关闭状态"""
+        self._transition(STATE_CLOSED, time.time())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """导出熔断器状态，供监控接口使用"""
+        stats = self.window_stats()
+        return {
+            'name': self.name,
+            'state': self.state,
+            'retry_after': round(self.retry_after(), 1),
+            'window_seconds': self.window_seconds,
+            'calls': stats['calls'],
+            'failures': stats['failures'],
+            'slow_calls': stats['slow'],
+            'failure_rate': round(stats['failures'] / stats['calls'], 4) if stats['calls'] else 0.0,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def _breaker_config_from_env() -> Dict[str, Any]:
+    return {
+        'failure_rate_threshold': float(os.environ.get('AI_BREAKER_FAILURE_RATE', 0.5)),
+        'slow_call_seconds': float(os.environ.get('AI_BREAKER_SLOW_SECONDS', 45)),
+        'slow_rate_threshold': float(os.environ.get('AI_BREAKER_SLOW_RATE', 0.8)),
+        'min_calls': int(os.environ.get('AI_BREAKER_MIN_CALLS', 5)),
+        'window_seconds': int(os.environ.get('AI_BREAKER_WINDOW_SECONDS', 60)),
+        'open_seconds': float(os.environ.get('AI_BREAKER_OPEN_SECONDS', 30)),
+        'half_open_max_calls': int(os.environ.get('AI_BREAKER_HALF_OPEN_CALLS', 2)),
+    }
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    获取（或创建）指定名称的熔断器
+
+    Args:
+        name: 熔断器名称
+
+    Returns:
+        CircuitBreaker: 熔断器实例
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, **_breaker_config_from_env())
+                _breakers[name] = breaker
+    return breaker
+
+
+def breaker_name_for(client: Any) -> str:
+    """根据客户端的提供商和模型生成熔断器名称"""
+    provider = getattr(client, 'provider_name', None) or type(client).__name__
+    model = getattr(client, 'model', '') or ''
+    return f"{provider}/{model}" if model else str(provider)
+
+
+def get_client_breaker(client: Any) -> CircuitBreaker:
+    """获取客户端对应的熔断器"""
+    return get_breaker(breaker_name_for(client))
+
+
+def circuit_open_result(breaker: CircuitBreaker, essay_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    熔断器打开时批改服务返回的快速失败结果
+
+    Args:
+        breaker: 熔断器
+        essay_id: 作文ID
+
+    Returns:
+        Dict: 错误结果
+    """
+    retry_after = breaker.retry_after()
+    logger.warning(f"AI服务 {breaker.name} 已熔断，快速失败，essay_id={essay_id}，{retry_after:.0f}秒后重试")
+    return {
+        "status": "error",
+        "message": f"AI服务暂时不可用（{breaker.name} 已熔断），请稍后重试",
+        "circuit_open": True,
+        "retry_after": retry_after
+    }
+
+
+def get_all_breaker_states() -> List[Dict[str, Any]]:
+    """
+    获取所有熔断器的状态（包括其他worker注册的熔断器）
+
+    Returns:
+        List[Dict]: 熔断器状态列表
+    """
+    try:
+        names = set(_get_store().names()) | set(_breakers)
+    except Exception as e:
+        logger.warning(f"读取熔断器列表失败: {str(e)}")
+        names = set(_breakers)
+    return [get_breaker(name).snapshot() for name in sorted(names)]
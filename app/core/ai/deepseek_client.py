@@ -11,6 +11,7 @@ import json
 import logging
 import traceback
 import time
+import uuid
 from typing import Dict, Any, List, Optional, Union, Tuple
 import re
 import asyncio
@@ -27,8 +28,16 @@ import pkg_resources
 
 from app.core.ai.api_client import BaseAPIClient, APIError
 from app.core.ai.api_monitor import log_api_call, log_api_call_async, api_monitor
+from app.core.ai.circuit_breaker import get_client_breaker, STATE_OPEN
+from app.core.ai.prompt_templates import (
+    get_template, prompt_metrics, CORRECTION_TEMPLATE, ESSAY_TYPE_GUIDES
+)
+from app.core.ai.generation_policy import generation_policy
+from app.core.ai.json_extract import parse_json_object, extract_json_text
 from config.ai_config import AI_CONFIG
-from app.utils.field_mapper import FieldMapper
+from app.utils.field_mapper import get_field_mapper
+from app.core.monitoring.tracing import span
+from app.utils.log_policy import log_policy, sampling_key
 
 # 检查OpenAI版本
 try:
@@ -92,9 +101,8 @@ class DeepseekClient(BaseAPIClient):
         self.logger = logging.getLogger(f"{__name__}.{self.__class__.__name__}")
         self.debug_mode = bool(os.environ.get('DEBUG_MODE', False))
         
-        # 初始化字段映射器
-        from app.utils.field_mapper import FieldMapper
-        self.field_mapper = FieldMapper()
+        # 字段映射器在进程内共享，映射只编译一次
+        self.field_mapper = get_field_mapper()
         self.logger.info("初始化DeepSeek客户端和字段映射器")
         
         # 调用父类初始化方法 - 该方法会调用_load_config_from_env
@@ -173,7 +181,7 @@ class DeepseekClient(BaseAPIClient):
     
     def safe_parse_json(self, response_text: Union[str, Dict, None]) -> Optional[Dict]:
         """
-        安全解析JSON响应，处理各种JSON格式问题
+        安全解析JSON响应，处理各种JSON格式问题（代码块、尾随逗号、未转义引号、被截断的结尾等）
         
         Args:
             response_text: 可能包含JSON的文本或已是字典的响应
@@ -190,57 +198,14 @@ class DeepseekClient(BaseAPIClient):
         if isinstance(response_text, dict):
             return response_text
             
-        # 清理JSON字符串并尝试解析
-        try:
-            # 去除可能导致问题的字符
-            cleaned_text = self._clean_json(response_text)
-            
-            # 尝试直接解析
-            try:
-                return json.loads(cleaned_text)
-            except json.JSONDecodeError as e:
-                logger.debug(f"直接JSON解析失败: {str(e)}")
-            
-            # 尝试提取最外层的JSON对象
-            json_pattern = r'({[\s\S]*?})'
-            matches = re.findall(json_pattern, cleaned_text)
-            
-            if matches:
-                for potential_json in matches:
-                    try:
-                        # 尝试解析每个匹配项
-                        result = json.loads(potential_json)
-                        if isinstance(result, dict):
-                            logger.debug("成功从文本中提取JSON对象")
-                            return result
-                    except json.JSONDecodeError:
-                        continue
-                        
-            # 最后尝试使用eval (确保只包含有效的JSON字符)
-            if all(c in '{}[](),:."\'0123456789truefalsenullabcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_- \n\t\r' for c in cleaned_text):
-                try:
-                    # 将json关键字转换为Python兼容形式
-                    cleaned_text = cleaned_text.replace('null', 'None')
-                    cleaned_text = cleaned_text.replace('true', 'True')
-                    cleaned_text = cleaned_text.replace('false', 'False')
-                    
-                    result = eval(cleaned_text)
-                    if isinstance(result, dict):
-                        logger.warning("使用eval解析JSON成功，但这不是推荐的方法")
-                        return result
-                except Exception as e:
-                    logger.warning(f"使用eval解析失败: {str(e)}")
-            
-            logger.warning(f"所有JSON解析方法均失败，返回None。原始文本: {response_text[:100]}...")
-            return None
-            
-        except Exception as e:
-            logger.error(f"安全解析JSON时出错: {str(e)}")
-            return None
+        result = parse_json_object(response_text)
+        if result is None:
+            logger.warning(f"所有JSON解析方法均失败，返回None。原始文本: {str(response_text)[:100]}...")
+        return result
     
     def _clean_json(self, text: str) -> str:
         """
-        清理JSON字符串，提取代码块并移除不相关字符
+        清理JSON字符串，提取代码块或第一个完整的JSON对象
         
         Args:
             text: 包含JSON的文本
@@ -248,29 +213,8 @@ class DeepseekClient(BaseAPIClient):
         Returns:
             str: 清理后的JSON字符串
         """
-        # 移除Unicode字符BOM和其他不可见字符
         text = text.strip()
-        
-        # 尝试从markdown代码块中提取
-        code_block_pattern = r'```(?:json)?(.*?)```'
-        matches = re.findall(code_block_pattern, text, re.DOTALL)
-        if matches:
-            # 提取最后一个代码块(如果存在多个)
-            extracted_text = matches[-1].strip()
-            logger.debug("从代码块中提取到潜在的JSON文本")
-            return extracted_text
-            
-        # 如果没有代码块，尝试查找JSON块
-        json_block_start = text.find('{')
-        json_block_end = text.rfind('}')
-        
-        if json_block_start >= 0 and json_block_end > json_block_start:
-            extracted_text = text[json_block_start:json_block_end+1]
-            logger.debug("提取了可能的JSON块")
-            return extracted_text
-            
-        # 如果没有找到明确的JSON标记，返回原始文本
-        return text
+        return extract_json_text(text) or text
     
     def _extract_result(self, response_text: str) -> Dict[str, Any]:
         """
@@ -284,7 +228,7 @@ class DeepseekClient(BaseAPIClient):
         """
         try:
             # 从响应中提取JSON字符串
-            self.logger.debug(f"提取结果 - 响应长度: {len(response_text)}")
+            self.logger.debug("提取结果 - 响应长度: %d", len(response_text))
             
             # 保留原始响应用于调试
             original_response = None
@@ -292,14 +236,18 @@ class DeepseekClient(BaseAPIClient):
                 original_response = response_text
             
             # 解析JSON响应
-            parsed_json = self.safe_parse_json(response_text)
+            with span('json_parse') as parse_span:
+                parsed_json = self.safe_parse_json(response_text)
+                if not parsed_json:
+                    parse_span['outcome'] = 'error'
             if not parsed_json:
                 self.logger.error("无法解析响应JSON")
                 return {}
                 
             # 使用字段映射器标准化结果
-            self.logger.debug(f"开始字段标准化，原始字段: {list(parsed_json.keys())}")
-            normalized = self.field_mapper.normalize_result(parsed_json, "deepseek")
+            self.logger.debug("开始字段标准化，原始字段: %s", parsed_json.keys())
+            with span('field_mapping'):
+                normalized = self.field_mapper.normalize_result(parsed_json, "deepseek")
             
             # 保留原始响应以便调试
             if original_response:
@@ -308,7 +256,7 @@ class DeepseekClient(BaseAPIClient):
             # 保留原始解析结果供参考
             normalized["_raw_data"] = parsed_json
                 
-            self.logger.debug(f"标准化结果完成: {normalized.keys()}")
+            self.logger.debug("标准化结果完成: %s", normalized.keys())
             
             # 返回标准化结果
             return normalized
@@ -327,7 +275,7 @@ class DeepseekClient(BaseAPIClient):
         Returns:
             Dict: 格式化后的响应
         """
-        self.logger.debug(f"格式化API响应，keys: {list(response.keys())}")
+        self.logger.debug("格式化API响应，keys: %s", response.keys())
         
         # 检查是否有 scores 字段和 total 值
         if "scores" in response and "total" in response["scores"]:
@@ -376,7 +324,8 @@ class DeepseekClient(BaseAPIClient):
             
         return response
     
-    def correct_essay(self, essay_content: str, title: str = None, essay_type: str = None, prompt: str = None) -> Dict:
+    def correct_essay(self, essay_content: str, title: str = None, essay_type: str = None, prompt: str = None,
+                      grade: str = None, membership_level: str = None) -> Dict:
         """
         批改作文并返回详细评分和建议
         
@@ -385,6 +334,8 @@ class DeepseekClient(BaseAPIClient):
             title: 作文标题，可选
             essay_type: 作文类型，可选，如"记叙文"、"议论文"等
             prompt: 写作提示，可选
+            grade: 学段，可选，用于确定生成参数和模型档位
+            membership_level: 会员等级，可选，用于确定生成参数和模型档位
             
         Returns:
             Dict: 包含评分和建议的字典
@@ -403,47 +354,71 @@ class DeepseekClient(BaseAPIClient):
         # 准备消息
         messages = self._prepare_correction_messages(essay_content, title, essay_type, prompt)
         
+        # 按作文长度、学段和会员等级确定生成参数
+        plan = generation_policy.plan(essay_content, grade=grade, membership_level=membership_level,
+                                      provider=self.provider_name, model=self.model)
+        model = plan['model'] or self.model
+        logger.info(f"生成参数: 模型={model}, max_tokens={plan['max_tokens']}, 超时={plan['timeout']}秒, "
+                    f"估算输入token={plan['input_tokens']}")
+        
         # 调用API，包含重试机制
         max_retries = 3
         retry_delay = 2  # 初始延迟2秒
+        breaker = get_client_breaker(self)
         
         for attempt in range(max_retries):
+            # 其他worker已触发熔断时不再继续重试和等待
+            if breaker.state == STATE_OPEN:
+                error_msg = f"AI服务 {breaker.name} 已熔断，停止重试"
+                logger.warning(error_msg)
+                return {
+                    "status": "error",
+                    "message": error_msg,
+                    "circuit_open": True,
+                    "result": self._create_default_result(error_msg)
+                }
+            
             try:
                 logger.info(f"正在发送API请求（尝试 {attempt+1}/{max_retries}）")
                 
                 # 使用字典传递参数，根据模型决定是否添加response_format参数
                 api_params = {
-                    "model": self.model,
+                    "model": model,
                     "messages": messages,
                     "temperature": 0.3,  # 使用较低的温度以获得更一致的结果
-                    "max_tokens": 4000,  # 为详细的批改结果提供足够的token
-                    "timeout": 60,  # 设置60秒超时
+                    "max_tokens": plan['max_tokens'],
+                    "timeout": plan['timeout'],
                 }
                 
                 # 只有当SDK版本支持且模型不是reasoner时，才添加response_format参数
                 global supports_response_format, openai_version
-                can_use_json_format = supports_response_format and "reasoner" not in self.model.lower()
+                can_use_json_format = supports_response_format and "reasoner" not in model.lower()
                 
                 if can_use_json_format:
-                    logger.info(f"SDK版本{openai_version}支持JSON输出，当前模型{self.model}也支持，添加response_format参数")
+                    logger.info(f"SDK版本{openai_version}支持JSON输出，当前模型{model}也支持，添加response_format参数")
                     api_params["response_format"] = {"type": "json_object"}
                 else:
-                    if "reasoner" in self.model.lower():
-                        logger.info(f"当前模型{self.model}不支持JSON输出格式，使用普通输出")
+                    if "reasoner" in model.lower():
+                        logger.info(f"当前模型{model}不支持JSON输出格式，使用普通输出")
                     elif not supports_response_format:
                         logger.info(f"当前SDK版本{openai_version}不支持response_format参数，使用普通输出")
                 
-                response = self.openai_client.chat.completions.create(**api_params)
+                request_start = time.time()
+                with span('llm_call', provider=self.provider_name, model=model, attempt=attempt + 1):
+                    response = self.openai_client.chat.completions.create(**api_params)
                 
                 # 提取结果前做防御性检查
                 api_response = response.model_dump()
-                logger.debug(f"API响应类型: {type(api_response)}")
+                logger.debug("API响应类型: %s", type(api_response))
+                if isinstance(api_response, dict):
+                    prompt_metrics.record(get_template(CORRECTION_TEMPLATE).key, api_response.get("usage"))
+                    self._observe_generation(plan, api_response, time.time() - request_start)
                 
                 # 从API响应中安全地提取内容
                 if isinstance(api_response, dict) and "choices" in api_response and api_response["choices"]:
                     try:
                         content = api_response["choices"][0]["message"]["content"]
-                        logger.debug(f"从API响应中提取到内容: {content[:100]}...")
+                        log_policy.log_payload(logger, "从API响应中提取到内容", content, level=logging.DEBUG)
                         correction_result = self._extract_result(content)
                     except (KeyError, TypeError, IndexError) as e:
                         logger.warning(f"从API响应中提取内容失败: {str(e)}，尝试使用完整响应")
@@ -543,6 +518,16 @@ class DeepseekClient(BaseAPIClient):
             "result": self._create_default_result("达到最大重试次数后仍无法获取有效结果")
         }
 
+    def _observe_generation(self, plan: Dict[str, Any], api_response: Dict[str, Any], elapsed: float) -> None:
+        """将实际输出长度与结束原因反馈给生成参数策略"""
+        try:
+            usage = api_response.get("usage") or {}
+            choices = api_response.get("choices") or [{}]
+            generation_policy.observe(plan, usage.get("completion_tokens"),
+                                      finish_reason=choices[0].get("finish_reason"), elapsed=elapsed)
+        except Exception as e:
+            logger.debug(f"记录生成统计失败: {str(e)}")
+    
     def _handle_long_content(self, content: str, max_length: int) -> Tuple[str, Optional[str]]:
         """
         处理过长的文本内容
@@ -578,92 +563,25 @@ class DeepseekClient(BaseAPIClient):
         Returns:
             List[Dict]: 准备好的消息列表
         """
-        # 修改系统提示词，强调JSON格式输出
-        system_prompt = """你是专业的中文作文批改老师，擅长分析文章结构、内容、语言和表达，能够提供详尽的评价和建议。
-请对以下作文进行详细批改。
-
-【作文评分标准】
-总分50分
-字数要求600字以上
-
-【评分等级划分】
-A级（43-50分）：内容立意明确，中心突出，材料具体生动，有真情实感；语言得体、流畅；结构严谨，注意照应，详略得当；卷面整洁，书写优美。
-B级（35-42分）：内容立意明确，中心突出，材料具体；语言规范、通顺；结构完整，条理清楚；卷面整洁，书写工整。
-C级（27-34分）：内容立意明确，材料能表现中心；语言基本通顺，有少数错别字；结构基本完整，有条理；卷面较为整洁，书写清楚。
-D级（0-26分）：内容立意不明确，材料难以表现中心；语言不通顺，错别字较多；结构不完整，条理不清楚；卷面脏乱，字迹潦草。
-
-【评分维度权重】
-各项分数必须为整数，且必须严格按照以下权重范围分配：
-1. 内容主旨：占总分的30%-40%（最高20分，最低视作文质量定）
-2. 语言文采：占总分的20%-30%（最高15分，最低视作文质量定）
-3. 文章结构：占总分的10%-20%（最高10分，最低视作文质量定）
-4. 文面书写：占总分的0%-10%（最高5分，最低视作文质量定）
-
-【具体扣分项】
-1. 无标题扣2分
-2. 字数不足：低于600字，每少50字扣1分
-3. 错别字：每个错别字扣1分
-4. 标点符号使用不规范：根据严重程度1-3分
-
-错别字扣分是从四项得分总和中直接扣除的，而非从某个分项中扣除。
-
-请严格按照以下JSON格式输出评分结果，不要包含任何额外的文字或解释：
-
-{
-    "总得分": 45,
-    "分项得分": {
-        "内容主旨": 18,
-        "语言文采": 14,
-        "文章结构": 9,
-        "文面书写": 4
-    },
-    "总体评价": "这是一篇内容充实的文章，请在这里提供200字左右的总体评价。",
-    "内容分析": "文章主题明确，论述有力，请在这里提供200字左右的内容分析。",
-    "语言分析": "语言表达流畅，用词准确，请在这里提供200字左右的语言分析。",
-    "结构分析": "文章结构合理，层次分明，请在这里提供200字左右的结构分析。",
-    "写作建议": "建议在论述方面更加深入，请在这里提供200字左右的写作建议。",
-    "错别字": ["错误1->正确1", "错误2->正确2"]
-}
-
-你的回复必须是一个有效的JSON对象，只输出JSON内容，不要有任何其他文字。请确保所有键名使用双引号，数值不使用引号，并确保总分和分项得分都是数字。"""
-
-        # 如果有作文类型，添加相应的指导
+        template = get_template(CORRECTION_TEMPLATE)
+        
+        # 作文类型指导放在user消息中，保持system前缀逐字节不变以命中提供商的前缀缓存
+        essay_type_guide = None
         if essay_type:
-            essay_type_guides = {
-                "记叙文": "记叙文批改要注重情节发展、人物刻画、环境描写和情感表达的真实性和感染力。",
-                "议论文": "议论文批改要注重论点是否明确，论据是否充分，论证是否有力，语言是否严谨。",
-                "说明文": "说明文批改要注重说明对象是否明确，说明方法是否得当，语言是否准确简明。",
-                "应用文": "应用文批改要注重格式是否规范，内容是否符合应用场景，语言是否得体。",
-                "散文": "散文批改要注重抒情性、形象性、语言的优美性以及思想内涵的深度。"
-            }
-            
-            if essay_type in essay_type_guides:
-                # 将类型指导加到修改后的 Prompt 之前
-                system_prompt = essay_type_guides[essay_type] + "\n\n" + system_prompt
-            else:
+            essay_type_guide = ESSAY_TYPE_GUIDES.get(essay_type)
+            if not essay_type_guide:
                 logger.warning(f"未识别的作文类型: {essay_type}")
         
-        # 构造用户消息
-        user_message = ""
-        if title:
-            user_message += f"标题：{title}\n\n"
-        
-        if prompt:
-            user_message += f"写作提示：{prompt}\n\n"
-        
-        user_message += f"作文内容：\n{content}"
-        
-        # 添加字数信息
-        text_length = len(content)
-        user_message += f"\n\n字数：{text_length}字"
-        
-        # 构造消息列表
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
-        ]
+        messages = template.render(
+            content=content,
+            title=title,
+            prompt=prompt,
+            essay_type_guide=essay_type_guide,
+            length=len(content)
+        )
         
-        logger.debug(f"已准备批改消息 (JSON格式优化Prompt)，系统提示词长度: {len(system_prompt)}字，用户消息长度: {len(user_message)}字")
+        logger.debug("已准备批改消息 (模板 %s，前缀 %s)，用户消息长度: %d字",
+                     template.key, template.prefix_hash, len(messages[1]['content']))
         
         return messages
         
@@ -783,7 +701,8 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
         return self.correct_essay(content)
 
     @log_api_call_async
-    async def correct_essay_async(self, essay_content: str, title: str = None, essay_type: str = None, prompt: str = None) -> Dict[str, Any]:
+    async def correct_essay_async(self, essay_content: str, title: str = None, essay_type: str = None, prompt: str = None,
+                                  grade: str = None, membership_level: str = None) -> Dict[str, Any]:
         """
         异步批改作文
         
@@ -792,6 +711,8 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
             title: 作文标题，可选
             essay_type: 作文类型，可选
             prompt: 自定义提示词，可选
+            grade: 学段，可选
+            membership_level: 会员等级，可选
             
         Returns:
             Dict: 批改结果
@@ -807,6 +728,8 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
             
             # 准备发送到API的提示词
             messages = self._prepare_correction_messages(essay_content, title, essay_type, prompt)
+            plan = generation_policy.plan(essay_content, grade=grade, membership_level=membership_level,
+                                          provider=self.provider_name, model=self.model)
             
             # 记录API请求信息
             logger.info(f"准备异步调用DeepSeek API进行批改，内容长度:{len(essay_content)}字，标题:{title}")
@@ -829,9 +752,14 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
                     response = await self._call_api_async(
                         messages=messages,
                         temperature=0.3,  # 使用较低的温度以获得更一致的结果
-                        max_tokens=4000  # 为详细的批改结果提供足够的token
+                        max_tokens=plan['max_tokens'],
+                        model=plan['model'] or self.model,
+                        timeout=plan['timeout']
                     )
                     elapsed_time = time.time() - start_time
+                    if isinstance(response, dict):
+                        prompt_metrics.record(get_template(CORRECTION_TEMPLATE).key, response.get("usage"))
+                        self._observe_generation(plan, response, elapsed_time)
                     
                     # 提取并处理结果
                     result = self._extract_result(response)
@@ -846,7 +774,7 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
                     # 添加API响应元数据
                     result["_meta"] = {
                         "api_response_time": elapsed_time,
-                        "model": self.model,
+                        "model": plan['model'] or self.model,
                         "timestamp": datetime.now().isoformat(),
                         "async": True
                     }
@@ -986,7 +914,7 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
                 "message": f"异步处理长文本失败: {str(e)}"
             }
 
-    async def _call_api_async(self, messages, temperature=0.7, max_tokens=4000, **kwargs):
+    async def _call_api_async(self, messages, temperature=0.7, max_tokens=4000, model=None, timeout=60, **kwargs):
         """
         异步调用DeepSeek API
         
@@ -994,6 +922,8 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
             messages: 消息列表
             temperature: 温度参数
             max_tokens: 最大token数
+            model: 模型名称，默认使用客户端配置的模型
+            timeout: 请求超时（秒）
             **kwargs: 其他参数
             
         Returns:
@@ -1009,8 +939,9 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
         }
         
         # 构建请求参数
+        model = model or self.model
         data = {
-            "model": self.model,
+            "model": model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens
@@ -1018,14 +949,14 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
         
         # 只有当SDK版本支持且模型不是reasoner时，才添加response_format参数
         global supports_response_format, openai_version
-        can_use_json_format = supports_response_format and "reasoner" not in self.model.lower()
+        can_use_json_format = supports_response_format and "reasoner" not in model.lower()
         
         if can_use_json_format:
-            logger.info(f"异步调用 - SDK版本{openai_version}支持JSON输出，当前模型{self.model}也支持，添加response_format参数")
+            logger.info(f"异步调用 - SDK版本{openai_version}支持JSON输出，当前模型{model}也支持，添加response_format参数")
             data["response_format"] = {"type": "json_object"}
         else:
-            if "reasoner" in self.model.lower():
-                logger.info(f"异步调用 - 当前模型{self.model}不支持JSON输出格式，使用普通输出")
+            if "reasoner" in model.lower():
+                logger.info(f"异步调用 - 当前模型{model}不支持JSON输出格式，使用普通输出")
             elif not supports_response_format:
                 logger.info(f"异步调用 - 当前SDK版本{openai_version}不支持response_format参数，使用普通输出")
         
@@ -1035,10 +966,12 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
                 data[key] = value
         
         logger.info(f"异步调用DeepSeek API: {url}")
-        logger.debug(f"请求参数: {json.dumps(data)[:500]}...")
+        # 同一次调用的请求和响应使用同一个抽样结果
+        sample_key = sampling_key(uuid.uuid4().hex)
+        log_policy.log_payload(logger, "请求参数", data, level=logging.DEBUG, key=sample_key)
         
         # 使用httpx进行异步请求
-        async with httpx.AsyncClient(verify=self.verify_ssl, timeout=60) as client:
+        async with httpx.AsyncClient(verify=self.verify_ssl, timeout=timeout) as client:
             try:
                 response = await client.post(
                     url,
@@ -1053,9 +986,8 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
                 result = response.json()
                 logger.debug("API调用成功")
                 
-                # 记录完整响应以便调试
-                if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f"异步API完整响应: {json.dumps(result, ensure_ascii=False)[:500]}...")
+                # 按日志策略抽样记录响应
+                log_policy.log_payload(logger, "异步API响应", result, level=logging.DEBUG, key=sample_key)
                 
                 return result
                 
@@ -1070,6 +1002,7 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
                     error_msg = f"HTTP错误: {e.response.status_code}, 内容: {e.response.text[:200]}"
                 
                 logger.error(f"API调用失败: {error_msg}")
+                log_policy.log_payload(logger, "失败请求的参数", data, is_error=True)
                 raise openai.APIError(error_msg)
                 
             except httpx.RequestError as e:
@@ -1082,6 +1015,7 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
                 # 其他错误
                 error_msg = f"API调用异常: {str(e)}"
                 logger.error(f"API调用失败: {error_msg}")
+                log_policy.log_payload(logger, "失败请求的参数", data, is_error=True)
                 raise openai.APIError(error_msg) 
 
     def _create_default_result(self, error_message: str = None) -> Dict[str, Any]:
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+生成参数策略模块
+根据作文长度、学段和会员等级为每次批改确定 max_tokens、超时时间和模型档位，
+并记录实际的输出长度与耗时，按长度分档自动调整上限：短作文不再预留4000个token，
+长作文在出现截断（finish_reason=length）后自动放宽上限
+"""
+
+import os
+import math
+import inspect
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+
+from app.core.ai.prompt_templates import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 模型档位
+TIER_CHAT = 'chat'
+TIER_REASONER = 'reasoner'
+
+# 各提供商的档位 -> 模型名称
+DEFAULT_MODEL_TIERS = {
+    'deepseek': {TIER_CHAT: 'deepseek-chat', TIER_REASONER: 'deepseek-reasoner'},
+}
+
+# 输入长度分档（估算的作文token数上限）
+LENGTH_BUCKETS = (300, 800, 1600, 3000)
+
+# 首次使用某档位时的输出token估算：固定的JSON评语部分 + 与作文长度相关的错别字等部分
+BASE_COMPLETION_TOKENS = {TIER_CHAT: 900, TIER_REASONER: 2500}
+COMPLETION_PER_INPUT_TOKEN = {TIER_CHAT: 0.3, TIER_REASONER: 0.8}
+
+# 高级会员在高年级或长作文上使用推理模型
+REASONER_MEMBERSHIP_LEVELS = ('premium',)
+REASONER_MIN_INPUT_TOKENS = 900
+REASONER_GRADES = ('senior', 'college')
+
+
+def grade_stage(grade: Optional[str]) -> Optional[str]:
+    """
+    将学段描述规范化为 primary/junior/senior/college
+
+    Args:
+        grade: 学段（英文代号或"初二"、"高一"、"大学"等中文描述）
+
+    Returns:
+        Optional[str]: 规范化的学段，无法识别时返回None
+    """
+    if not grade:
+        return None
+    grade = str(grade).strip().lower()
+    if grade in ('primary', 'junior', 'senior', 'college'):
+        return grade
+    if '小' in grade:
+        return 'primary'
+    if '初' in grade:
+        return 'junior'
+    if '高' in grade:
+        return 'senior'
+    if '大' in grade:
+        return 'college'
+    return None
+
+
+class GenerationPolicy:
+    """
+    批改生成参数策略
+
+    每个 (档位, 长度分档) 维护最近的输出token数样本；样本足够后 max_tokens 取样本p95乘以余量，
+    出现截断时该分档的下限提高一半。超时时间按 max_tokens 与观测到的生成速度估算。
+    """
+
+    def __init__(self,
+                 min_tokens: int = 600,
+                 max_tokens: int = 8000,
+                 headroom: float = 1.3,
+                 min_samples: int = 20,
+                 window_size: int = 200,
+                 base_timeout: float = 15.0,
+                 seconds_per_token: float = 0.04,
+                 max_timeout: float = 180.0,
+                 model_tiers: Optional[Dict[str, Dict[str, str]]] = None,
+                 select_tier: bool = True):
+        """
+        初始化策略
+
+        Args:
+            min_tokens: max_tokens下限
+            max_tokens: max_tokens上限
+            headroom: 在观测到的p95输出长度上预留的余量倍数
+            min_samples: 使用观测值所需的最少样本数
+            window_size: 每个分档保留的样本数
+            base_timeout: 超时时间的固定部分（秒）
+            seconds_per_token: 初始的每token生成耗时（秒），之后按观测值更新
+            max_timeout: 超时时间上限（秒）
+            model_tiers: 提供商 -> {档位: 模型名称}
+            select_tier: 是否根据策略切换模型档位
+        """
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.window_size = window_size
+        self.base_timeout = base_timeout
+        self.max_timeout = max_timeout
+        self.model_tiers = model_tiers if model_tiers is not None else DEFAULT_MODEL_TIERS
+        self.select_tier = select_tier
+        self._seconds_per_token = {TIER_CHAT: seconds_per_token, TIER_REASONER: seconds_per_token}
+        self._samples: Dict[Tuple[str, int], deque] = {}
+        self._floors: Dict[Tuple[str, int], int] = {}
+        self._truncations: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def bucket_for(input_tokens: int) -> int:
+        """输入长度所在的分档序号"""
+        for index, limit in enumerate(LENGTH_BUCKETS):
+            if input_tokens <= limit:
+                return index
+        return len(LENGTH_BUCKETS)
+
+    @staticmethod
+    def tier_for_model(model: Optional[str]) -> str:
+        return TIER_REASONER if model and 'reasoner' in model.lower() else TIER_CHAT
+
+    def choose_tier(self, input_tokens: int, grade: Optional[str] = None,
+                    membership_level: Optional[str] = None) -> str:
+        """
+        选择模型档位：高级会员的高年级作文或长作文使用推理模型，其余使用对话模型
+        """
+        if membership_level in REASONER_MEMBERSHIP_LEVELS and (
+                grade_stage(grade) in REASONER_GRADES or input_tokens >= REASONER_MIN_INPUT_TOKENS):
+            return TIER_REASONER
+        return TIER_CHAT
+
+    def _initial_estimate(self, tier: str, input_tokens: int) -> int:
+        return int(BASE_COMPLETION_TOKENS[tier] + COMPLETION_PER_INPUT_TOKEN[tier] * input_tokens)
+
+    def _limit_for(self, key: Tuple[str, int], input_tokens: int) -> int:
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+            floor = self._floors.get(key, 0)
+        if len(samples) >= self.min_samples:
+            samples.sort()
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            limit = int(p95 * self.headroom)
+        else:
+            limit = int(self._initial_estimate(key[0], input_tokens) * self.headroom)
+        return max(self.min_tokens, min(self.max_tokens, max(limit, floor)))
+
+    def plan(self, content: str, grade: Optional[str] = None, membership_level: Optional[str] = None,
+             provider: Optional[str] = None, model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        计算一次批改的生成参数
+
+        Args:
+            content: 作文内容
+            grade: 学段
+            membership_level: 会员等级
+            provider: 提供商名称，用于查找档位对应的模型
+            model: 客户端当前配置的模型
+
+        Returns:
+            Dict: max_tokens、timeout、model、tier、input_tokens、bucket
+        """
+        input_tokens = estimate_tokens(content)
+        tiers = self.model_tiers.get(provider or '', {})
+
+        tier = self.tier_for_model(model)
+        if self.select_tier and tiers:
+            tier = self.choose_tier(input_tokens, grade, membership_level)
+        selected_model = tiers.get(tier) if self.select_tier and tiers.get(tier) else model
+
+        bucket = self.bucket_for(input_tokens)
+        max_tokens = self._limit_for((tier, bucket), input_tokens)
+        timeout = min(self.max_timeout, self.base_timeout + max_tokens * self._seconds_per_token[tier])
+
+        return {
+            'max_tokens': max_tokens,
+            'timeout': math.ceil(timeout),
+            'model': selected_model,
+            'tier': tier,
+            'input_tokens': input_tokens,
+            'bucket': bucket,
+        }
+
+    def observe(self, plan: Dict[str, Any], completion_tokens: Optional[int],
+                finish_reason: Optional[str] = None, elapsed: Optional[float] = None) -> None:
+        """
+        记录实际输出，用于调整后续请求的上限
+
+        Args:
+            plan: plan() 返回的参数
+            completion_tokens: 实际输出token数
+            finish_reason: 结束原因，length表示被max_tokens截断
+            elapsed: 请求耗时（秒）
+        """
+        if not completion_tokens:
+            return
+        key = (plan['tier'], plan['bucket'])
+        with self._lock:
+            samples = self._samples.setdefault(key, deque(maxlen=self.window_size))
+            samples.append(int(completion_tokens))
+            if finish_reason == 'length':
+                self._truncations[key] = self._truncations.get(key, 0) + 1
+                self._floors[key] = min(self.max_tokens, int(plan['max_tokens'] * 1.5))
+                logger.warning(f"批改输出被截断（{plan['tier']} 档位，长度分档 {plan['bucket']}），"
+                               f"上限调整为 {self._floors[key]}")
+            if elapsed and completion_tokens >= 100:
+                observed = elapsed / completion_tokens
+                self._seconds_per_token[plan['tier']] = 0.9 * self._seconds_per_token[plan['tier']] + 0.1 * observed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """按档位和长度分档导出观测统计"""
+        with self._lock:
+            keys = set(self._samples) | set(self._floors)
+            stats = {}
+            for tier, bucket in sorted(keys):
+                samples = sorted(self._samples.get((tier, bucket), ()))
+                stats[f"{tier}/{bucket}"] = {
+                    'samples': len(samples),
+                    'p50': samples[len(samples) // 2] if samples else None,
+                    'max': samples[-1] if samples else None,
+                    'floor': self._floors.get((tier, bucket), 0),
+                    'truncations': self._truncations.get((tier, bucket), 0),
+                }
+            seconds_per_token = dict(self._seconds_per_token)
+        return {'buckets': stats, 'seconds_per_token': seconds_per_token}
+
+
+def accepts_generation_hints(client: Any) -> bool:
+    """判断客户端的correct_essay是否接受grade/membership_level参数"""
+    method = getattr(client, 'correct_essay', None)
+    if method is None:
+        return False
+    try:
+        params = inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return False
+    return 'membership_level' in params or any(p.kind == p.VAR_KEYWORD for p in params.values())
+
+
+def create_policy_from_env() -> GenerationPolicy:
+    """
+    根据环境变量创建策略
+
+    环境变量:
+        AI_MAX_TOKENS_MIN / AI_MAX_TOKENS_MAX: max_tokens上下限
+        AI_MODEL_TIER_SELECTION: 是否按会员等级与作文长度切换模型档位，默认 true
+    """
+    return GenerationPolicy(
+        min_tokens=int(os.environ.get('AI_MAX_TOKENS_MIN', 600)),
+        max_tokens=int(os.environ.get('AI_MAX_TOKENS_MAX', 8000)),
+        max_timeout=float(os.environ.get('AI_MAX_TIMEOUT', 180)),
+        select_tier=os.environ.get('AI_MODEL_TIER_SELECTION', 'true').lower() == 'true',
+    )
+
+
+generation_policy = create_policy_from_env()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+LLM输出JSON提取与修复模块
+各AI提供商共用：先用单次线性扫描定位代码块和括号平衡的顶层JSON对象，
+解析失败时再做一遍容错修复（尾随逗号、字符串内未转义的引号和换行、单引号、
+Python字面量、缺失的逗号、被截断的结尾），整个过程对输入长度保持线性
+"""
+
+import re
+import json
+import logging
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 括号扫描只关心这几类字符，其余字符由正则引擎整段跳过
+_SIGNIFICANT = re.compile(r'[{}\[\]"\\]')
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?$')
+_LITERALS = {'true': 'true', 'false': 'false', 'null': 'null',
+             'True': 'true', 'False': 'false', 'None': 'null'}
+_VALID_ESCAPES = '"\\/bfnrtu'
+_STRING_CONTROL = {'\n': '\\n', '\r': '\\r', '\t': '\\t'}
+_TOKEN_END = ',:]}"\'{[ \t\r\n'
+_WHITESPACE = ' \t\r\n'
+_CLOSERS = {'{': '}', '[': ']'}
+_FENCE = '```'
+
+
+def _last_code_block(text: str) -> Optional[str]:
+    """返回最后一个markdown代码块的内容（去掉语言标记），没有时返回None"""
+    blocks = []
+    pos = 0
+    while True:
+        start = text.find(_FENCE, pos)
+        if start < 0:
+            break
+        end = text.find(_FENCE, start + 3)
+        if end < 0:
+            # 未闭合的代码块（输出被截断）
+            blocks.append(text[start + 3:])
+            break
+        blocks.append(text[start + 3:end])
+        pos = end + 3
+    if not blocks:
+        return None
+    block = blocks[-1]
+    newline = block.find('\n')
+    header = block[:newline] if newline >= 0 else ''
+    if header.strip().isalpha():
+        block = block[newline + 1:]
+    elif block.startswith('json'):
+        block = block[4:]
+    return block.strip()
+
+
+def iter_json_spans(text: str) -> Iterator[Tuple[int, int, bool]]:
+    """
+    单次线性扫描，依次产出顶层JSON对象的位置
+
+    Args:
+        text: 文本
+
+    Yields:
+        Tuple[int, int, bool]: (起始位置, 结束位置, 是否完整)；文本在对象内部结束时
+        最后一项的完整标记为False
+    """
+    depth = 0
+    begin = -1
+    in_string = False
+    skip_until = -1
+    for match in _SIGNIFICANT.finditer(text):
+        pos = match.start()
+        if pos < skip_until:
+            continue
+        ch = match.group()
+        if in_string:
+            if ch == '\\':
+                skip_until = pos + 2
+            elif ch == '"':
+                in_string = False
+            continue
+        if depth == 0:
+            if ch == '{':
+                begin = pos
+                depth = 1
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+            if depth == 0:
+                yield begin, pos + 1, True
+    if depth > 0:
+        yield begin, len(text), False
+
+
+def _next_significant(text: str) -> List[int]:
+    """预先计算每个位置之后第一个非空白字符的位置，供引号判断使用"""
+    n = len(text)
+    result = [n] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        result[i] = result[i + 1] if text[i] in _WHITESPACE else i
+    return result
+
+
+def _closes_string(text: str, nxt: List[int], pos: int, is_key: bool, container: str) -> bool:
+    """
+    判断字符串内的引号是结束引号还是应被转义的内容引号
+
+    结束引号之后应是冒号（键）或逗号/右括号（值）；值后面是逗号时，
+    再看逗号后面是否像下一个键或值的开头。
+    """
+    n = len(text)
+    follow_pos = nxt[pos + 1]
+    follow = text[follow_pos] if follow_pos < n else ''
+    if is_key:
+        return follow in (':', '')
+    if follow in ('', ']', '}', '"', "'"):
+        return True
+    if follow != ',':
+        return False
+    after_pos = nxt[follow_pos + 1]
+    after = text[after_pos] if after_pos < n else ''
+    if container == '{':
+        return after in ('', '"', "'", '}')
+    return after == '' or after in '"\'{[]-0123456789tfnTFN'
+
+
+def _strip_trailing_comma(out: List[str]) -> None:
+    while out and (out[-1] in _WHITESPACE or out[-1] == ','):
+        out.pop()
+
+
+def repair_json(text: str) -> str:
+    """
+    容错修复一个JSON对象片段（单次扫描）
+
+    处理：尾随逗号、重复逗号、缺失的逗号、字符串内未转义的双引号和换行、
+    非法转义、单引号字符串、未加引号的键和值、Python字面量（True/False/None），
+    以及被截断的结尾（补全字符串和括号，丢弃不完整的键）。
+
+    Args:
+        text: 以 { 或 [ 开头的JSON片段
+
+    Returns:
+        str: 修复后的JSON文本（不保证一定可解析）
+    """
+    n = len(text)
+    nxt = _next_significant(text)
+    out: List[str] = []
+    stack: List[str] = []
+    # 每层容器期望的下一个记号：key / colon / value / comma
+    states: List[str] = ['value']
+    last_safe = 0
+    quote = None
+    is_key = False
+    # 跳过对象之前的说明文字
+    starts = [pos for pos in (text.find('{'), text.find('[')) if pos >= 0]
+    i = min(starts) if starts else n
+
+    def complete_value():
+        nonlocal last_safe
+        states[-1] = 'comma'
+        last_safe = len(out)
+
+    def before_value():
+        # 两个值之间缺少逗号时补上
+        if states[-1] == 'comma' and stack:
+            out.append(',')
+            states[-1] = 'key' if stack[-1] == '{' else 'value'
+
+    while i < n:
+        ch = text[i]
+
+        if quote is not None:
+            if ch == '\\':
+                if i + 1 < n and text[i + 1] in _VALID_ESCAPES:
+                    out.append(text[i:i + 2])
+                    i += 2
+                    continue
+                out.append('\\\\')
+            elif ch == quote:
+                if _closes_string(text, nxt, i, is_key, stack[-1] if stack else ''):
+                    out.append('"')
+                    quote = None
+                    if is_key:
+                        states[-1] = 'colon'
+                    else:
+                        complete_value()
+                else:
+                    out.append('\\"')
+            elif ch == '"':
+                out.append('\\"')
+            elif ch in _STRING_CONTROL:
+                out.append(_STRING_CONTROL[ch])
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in _WHITESPACE:
+            out.append(ch)
+        elif ch in '"\'':
+            before_value()
+            is_key = bool(stack) and stack[-1] == '{' and states[-1] == 'key'
+            quote = ch
+            out.append('"')
+        elif ch in '{[':
+            before_value()
+            stack.append(ch)
+            states.append('key' if ch == '{' else 'value')
+            out.append(ch)
+            last_safe = len(out)
+        elif ch in '}]':
+            if not stack:
+                break
+            if states[-1] == 'colon' or (states[-1] == 'value' and stack[-1] == '{'):
+                # 键后面没有值，丢弃这个键
+                del out[last_safe:]
+            _strip_trailing_comma(out)
+            out.append(_CLOSERS[stack.pop()])
+            states.pop()
+            complete_value()
+            if not stack:
+                break
+        elif ch == ',':
+            if states[-1] == 'comma':
+                out.append(',')
+                states[-1] = 'key' if stack and stack[-1] == '{' else 'value'
+            # 重复逗号或开头的逗号直接丢弃
+        elif ch == ':':
+            if states[-1] == 'colon':
+                out.append(':')
+                states[-1] = 'value'
+        else:
+            end = i
+            while end < n and text[end] not in _TOKEN_END:
+                end += 1
+            token = text[i:end]
+            truncated = end >= n
+            before_value()
+            if states[-1] == 'key':
+                out.append(json.dumps(token, ensure_ascii=False))
+                states[-1] = 'colon'
+            elif token in _LITERALS:
+                out.append(_LITERALS[token])
+                complete_value()
+            elif _NUMBER.match(token) and not truncated:
+                out.append(token)
+                complete_value()
+            elif not truncated:
+                out.append(json.dumps(token, ensure_ascii=False))
+                complete_value()
+            i = end
+            continue
+        i += 1
+
+    # 处理被截断的结尾
+    if quote is not None:
+        if is_key:
+            del out[last_safe:]
+        else:
+            out.append('"')
+            complete_value()
+    elif stack and states[-1] in ('colon', 'value') and (stack[-1] == '{' or states[-1] == 'colon'):
+        del out[last_safe:]
+    _strip_trailing_comma(out)
+    while stack:
+        out.append(_CLOSERS[stack.pop()])
+    return ''.join(out)
+
+
+def _loads_object(fragment: str, repair: bool) -> Optional[Dict[str, Any]]:
+    try:
+        result = json.loads(fragment)
+        if isinstance(result, dict):
+            return result
+    except ValueError:
+        pass
+    if not repair:
+        return None
+    try:
+        result = json.loads(repair_json(fragment))
+        if isinstance(result, dict):
+            return result
+    except ValueError:
+        pass
+    return None
+
+
+def extract_json_text(text: str) -> Optional[str]:
+    """
+    提取文本中第一个完整的顶层JSON对象文本（优先最后一个代码块）
+
+    Args:
+        text: LLM输出
+
+    Returns:
+        Optional[str]: JSON文本，找不到时返回None
+    """
+    if not text:
+        return None
+    block = _last_code_block(text)
+    for source in ((block, text) if block else (text,)):
+        for begin, end, _ in iter_json_spans(source):
+            return source[begin:end]
+    return None
+
+
+def parse_json_object(response: Union[str, Dict, None], repair: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    从LLM输出中解析JSON对象
+
+    依次尝试：整体解析、最后一个代码块、文本中各个括号平衡的顶层对象，
+    每个候选先按标准JSON解析，失败后修复再解析。不使用eval。
+
+    Args:
+        response: LLM输出文本或已解析的字典
+        repair: 是否尝试容错修复
+
+    Returns:
+        Optional[Dict]: 解析结果，失败时返回None
+    """
+    if not response:
+        return None
+    if isinstance(response, dict):
+        return response
+    if not isinstance(response, str):
+        return None
+
+    text = response.strip().lstrip('\ufeff')
+    if text.startswith('{'):
+        try:
+            result = json.loads(text)
+            if isinstance(result, dict):
+                return result
+        except ValueError:
+            pass
+
+    block = _last_code_block(text)
+    sources = (block, text) if block else (text,)
+    for source in sources:
+        for begin, end, _ in iter_json_spans(source):
+            result = _loads_object(source[begin:end], repair)
+            if result is not None:
+                return result
+
+    # 括号扫描被字符串内未转义的引号打乱时，退回到首个 { 开始整体修复
+    if repair:
+        start = text.find('{')
+        if start >= 0:
+            return _loads_object(text[start:], repair)
+    return None
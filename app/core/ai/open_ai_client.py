@@ -15,6 +15,8 @@ import re
 from typing import Dict, Any, List, Optional, Union
 
 from app.core.ai.api_client import BaseAPIClient, APIError
+from app.core.ai.json_extract import parse_json_object
+from app.utils.field_mapper import get_field_mapper
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -139,7 +141,9 @@ class OpenAIClient(BaseAPIClient):
                     raise APIError("OpenAI响应没有包含有效的内容")
                 
                 content = response_data["choices"][0]["message"]["content"]
-                result_json = json.loads(content)
+                result_json = parse_json_object(content)
+                if result_json is None:
+                    raise APIError("OpenAI返回的内容不是有效的JSON")
                 
                 # 解析分析结果
                 return self.format_response(self._parse_correction_result(result_json))
@@ -202,11 +206,7 @@ class OpenAIClient(BaseAPIClient):
             result_data = None
             if content:
                 try:
-                    # 提取JSON字符串
-                    json_match = re.search(r'```json\n(.*?)\n```', content, re.DOTALL)
-                    if json_match:
-                        json_str = json_match.group(1)
-                        result_data = json.loads(json_str)
+                    result_data = parse_json_object(content)
                 except Exception as e:
                     logger.warning(f"从content解析JSON失败: {str(e)}")
                     
@@ -252,23 +252,27 @@ class OpenAIClient(BaseAPIClient):
                     "message": "无法解析批改结果"
                 }
                 
-            # 转换为标准格式
+            # 使用共享的字段映射计划（openai）转换为标准格式
+            normalized = get_field_mapper().normalize_result(result_data, "openai")
+            dimensions = normalized["scores"].get("dimensions", {})
+            analyses = normalized["analyses"]
+            feedback = normalized["feedback"]
             return {
                 "status": "success",
                 "result": {
-                    "score": result_data.get("总得分", 0),
+                    "score": normalized["scores"].get("total", 0),
                     "corrected_content": "",  # 暂不支持
-                    "comments": result_data.get("总体评价", ""),
-                    "error_analysis": result_data.get("错别字", []),
-                    "improvement_suggestions": result_data.get("写作建议", ""),
+                    "comments": analyses.get("summary", ""),
+                    "error_analysis": feedback.get("corrections", []),
+                    "improvement_suggestions": "\n".join(feedback.get("improvements", [])),
                     "details": {
-                        "content_score": result_data.get("分项得分", {}).get("内容主旨", 0),
-                        "language_score": result_data.get("分项得分", {}).get("语言文采", 0),
-                        "structure_score": result_data.get("分项得分", {}).get("文章结构", 0),
-                        "writing_score": result_data.get("分项得分", {}).get("文面书写", 0),
-                        "content_analysis": result_data.get("内容分析", ""),
-                        "language_analysis": result_data.get("语言分析", ""),
-                        "structure_analysis": result_data.get("结构分析", "")
+                        "content_score": dimensions.get("content", 0),
+                        "language_score": dimensions.get("language", 0),
+                        "structure_score": dimensions.get("structure", 0),
+                        "writing_score": dimensions.get("grammar", 0),
+                        "content_analysis": analyses.get("content", ""),
+                        "language_analysis": analyses.get("language", ""),
+                        "structure_analysis": analyses.get("structure", "")
                     }
                 }
             }
@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+提示词模板注册模块
+集中管理带版本号的批改提示词，模板在导入时编译一次；
+静态的评分标准放在system消息中作为逐字节相同的前缀，随作文变化的内容只出现在其后的user消息中，
+使提供商侧的上下文缓存（DeepSeek/OpenAI前缀缓存）能够命中。同时按模板版本统计提示词token数和缓存命中率
+"""
+
+import re
+import string
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 批改模板名称
+CORRECTION_TEMPLATE = 'essay_correction'
+GRADED_CORRECTION_TEMPLATE = 'essay_correction_graded'
+
+_CJK_PATTERN = re.compile(r'[\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本token数（中文约0.6 token/字，其他字符约0.3 token/字符）
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的token数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3) + 1
+
+
+class PromptTemplate:
+    """
+    预编译的提示词模板
+
+    system: 静态前缀，按原文发送（不做格式化），所有请求逐字节相同
+    sections: user消息的片段列表 [(字段名, 格式串)]，字段名为None的片段总是输出，
+              否则仅在该字段有值时输出
+    """
+
+    def __init__(self, name: str, version: str, system: str, sections: List[Tuple[Optional[str], str]]):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.prefix_hash = hashlib.sha256(system.encode('utf-8')).hexdigest()[:12]
+        self.prefix_tokens = estimate_tokens(system)
+        self._sections = [(field, self._compile(fmt)) for field, fmt in sections]
+
+    @staticmethod
+    def _compile(fmt: str) -> List[Tuple[str, Optional[str]]]:
+        """将格式串预先解析为 [(字面量, 字段名)]，渲染时只做拼接"""
+        return [(literal, field) for literal, field, _, _ in string.Formatter().parse(fmt)]
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    def render_user(self, **fields) -> str:
+        """渲染user消息"""
+        parts = []
+        for condition, compiled in self._sections:
+            if condition is not None and not fields.get(condition):
+                continue
+            for literal, field in compiled:
+                parts.append(literal)
+                if field is not None:
+                    parts.append(str(fields[field]))
+        return ''.join(parts)
+
+    def render(self, **fields) -> List[Dict[str, str]]:
+        """
+        渲染消息列表，静态system前缀在前
+
+        Returns:
+            List[Dict]: chat消息列表
+        """
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.render_user(**fields)}
+        ]
+
+
+class PromptRegistry:
+    """带版本号的提示词模板注册表"""
+
+    def __init__(self):
+        self._templates: Dict[str, Dict[str, PromptTemplate]] = {}
+        self._active: Dict[str, str] = {}
+
+    def register(self, template: PromptTemplate, activate: bool = True) -> PromptTemplate:
+        """注册模板，默认设为该名称的当前版本"""
+        self._templates.setdefault(template.name, {})[template.version] = template
+        if activate or template.name not in self._active:
+            self._active[template.name] = template.version
+        return template
+
+    def get(self, name: str, version: Optional[str] = None) -> PromptTemplate:
+        """
+        获取模板
+
+        Args:
+            name: 模板名称
+            version: 版本号，默认为当前版本
+
+        Raises:
+            KeyError: 模板不存在
+        """
+        versions = self._templates.get(name)
+        if not versions:
+            raise KeyError(f"未注册的提示词模板: {name}")
+        version = version or self._active[name]
+        if version not in versions:
+            raise KeyError(f"提示词模板 {name} 不存在版本 {version}")
+        return versions[version]
+
+    def activate(self, name: str, version: str) -> None:
+        """切换模板的当前版本"""
+        self.get(name, version)
+        self._active[name] = version
+
+    def list_templates(self) -> List[Dict[str, Any]]:
+        """列出所有模板及其前缀信息"""
+        return [
+            {
+                'key': template.key,
+                'active': self._active.get(template.name) == template.version,
+                'prefix_hash': template.prefix_hash,
+                'prefix_tokens': template.prefix_tokens,
+            }
+            for versions in self._templates.values() for template in versions.values()
+        ]
+
+
+class PromptMetrics:
+    """按模板版本统计提示词token与前缀缓存命中"""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cached_tokens(usage: Dict[str, Any]) -> int:
+        """从API用量中提取命中缓存的提示词token数（兼容DeepSeek与OpenAI字段）"""
+        if 'prompt_cache_hit_tokens' in usage:
+            return int(usage.get('prompt_cache_hit_tokens') or 0)
+        details = usage.get('prompt_tokens_details') or {}
+        return int(details.get('cached_tokens') or 0)
+
+    def record(self, template_key: str, usage: Optional[Dict[str, Any]]) -> None:
+        """
+        记录一次请求的用量
+
+        Args:
+            template_key: 模板键（名称@版本）
+            usage: API返回的usage字段
+        """
+        if not isinstance(usage, dict):
+            return
+        prompt_tokens = int(usage.get('prompt_tokens') or 0)
+        cached = self.cached_tokens(usage)
+        with self._lock:
+            stats = self._stats.setdefault(template_key, {
+                'requests': 0, 'prompt_tokens': 0, 'cached_tokens': 0,
+                'cache_hit_requests': 0, 'completion_tokens': 0
+            })
+            stats['requests'] += 1
+            stats['prompt_tokens'] += prompt_tokens
+            stats['cached_tokens'] += cached
+            stats['completion_tokens'] += int(usage.get('completion_tokens') or 0)
+            if cached:
+                stats['cache_hit_requests'] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取统计结果，包括平均提示词token数和缓存命中率"""
+        with self._lock:
+            snapshot = {key: dict(stats) for key, stats in self._stats.items()}
+        for stats in snapshot.values():
+            requests = stats['requests'] or 1
+            stats['avg_prompt_tokens'] = round(stats['prompt_tokens'] / requests, 1)
+            stats['cache_hit_rate'] = round(stats['cache_hit_requests'] / requests, 4)
+            stats['cached_token_ratio'] = round(stats['cached_tokens'] / stats['prompt_tokens'], 4) \
+                if stats['prompt_tokens'] else 0.0
+        return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+# 评分标准（两个批改模板共用）
+_RUBRIC = """【作文评分标准】
+总分50分
+字数要求600字以上
+
+【评分等级划分】
+A级（43-50分）：内容立意明确，中心突出，材料具体生动，有真情实感；语言得体、流畅；结构严谨，注意照应，详略得当；卷面整洁，书写优美。
+B级（35-42分）：内容立意明确，中心突出，材料具体；语言规范、通顺；结构完整，条理清楚；卷面整洁，书写工整。
+C级（27-34分）：内容立意明确，材料能表现中心；语言基本通顺，有少数错别字；结构基本完整，有条理；卷面较为整洁，书写清楚。
+D级（0-26分）：内容立意不明确，材料难以表现中心；语言不通顺，错别字较多；结构不完整，条理不清楚；卷面脏乱，字迹潦草。
+
+【评分维度权重】
+各项分数必须为整数，且必须严格按照以下权重范围分配：
+1. 内容主旨：占总分的30%-40%（最高20分，最低视作文质量定）
+2. 语言文采：占总分的20%-30%（最高15分，最低视作文质量定）
+3. 文章结构：占总分的10%-20%（最高10分，最低视作文质量定）
+4. 文面书写：占总分的0%-10%（最高5分，最低视作文质量定）
+
+【具体扣分项】
+1. 无标题扣2分
+2. 字数不足：低于600字，每少50字扣1分
+3. 错别字：每个错别字扣1分
+4. 标点符号使用不规范：根据严重程度1-3分
+
+错别字扣分是从四项得分总和中直接扣除的，而非从某个分项中扣除。"""
+
+# 各作文类型的批改侧重点，放在user消息中以保持system前缀不变
+ESSAY_TYPE_GUIDES = {
+    "记叙文": "记叙文批改要注重情节发展、人物刻画、环境描写和情感表达的真实性和感染力。",
+    "议论文": "议论文批改要注重论点是否明确，论据是否充分，论证是否有力，语言是否严谨。",
+    "说明文": "说明文批改要注重说明对象是否明确，说明方法是否得当，语言是否准确简明。",
+    "应用文": "应用文批改要注重格式是否规范，内容是否符合应用场景，语言是否得体。",
+    "散文": "散文批改要注重抒情性、形象性、语言的优美性以及思想内涵的深度。"
+}
+
+_CORRECTION_SYSTEM = """你是专业的中文作文批改老师，擅长分析文章结构、内容、语言和表达，能够提供详尽的评价和建议。
+请对用户提供的作文进行详细批改。
+
+""" + _RUBRIC + """
+
+请严格按照以下JSON格式输出评分结果，不要包含任何额外的文字或解释：
+
+{
+    "总得分": 45,
+    "分项得分": {
+        "内容主旨": 18,
+        "语言文采": 14,
+        "文章结构": 9,
+        "文面书写": 4
+    },
+    "总体评价": "这是一篇内容充实的文章，请在这里提供200字左右的总体评价。",
+    "内容分析": "文章主题明确，论述有力，请在这里提供200字左右的内容分析。",
+    "语言分析": "语言表达流畅，用词准确，请在这里提供200字左右的语言分析。",
+    "结构分析": "文章结构合理，层次分明，请在这里提供200字左右的结构分析。",
+    "写作建议": "建议在论述方面更加深入，请在这里提供200字左右的写作建议。",
+    "错别字": ["错误1->正确1", "错误2->正确2"]
+}
+
+你的回复必须是一个有效的JSON对象，只输出JSON内容，不要有任何其他文字。请确保所有键名使用双引号，数值不使用引号，并确保总分和分项得分都是数字。"""
+
+GRADED_JSON_TEMPLATE = """
+```json
+{
+    "总得分": 45,
+    "等级评定": "A-优秀",
+    "分项得分": {
+        "内容主旨": 18,
+        "语言文采": 14,
+        "文章结构": 9,
+        "文面书写": 4
+    },
+    "错别字": [
+        "错别字1->正确写法1",
+        "错别字2->正确写法2"
+    ],
+    "总体评价": "这篇作文...(详细评价)",
+    "内容分析": "文章主题...(详细分析)",
+    "语言分析": "本文语言流畅，使用了多种修辞手法，词汇丰富...(详细分析)",
+    "结构分析": "文章结构...(详细分析)",
+    "写作建议": "建议作者...(具体建议)"
+}
+```
+"""
+
+_GRADED_SYSTEM = """你是一位专业的中文作文批改老师，擅长评价学生作文并给出详细反馈。
+请作为广东语文阅卷老师，按照以下标准对用户提供的作文进行全面评分和详细分析：
+
+""" + _RUBRIC + """
+
+必须以JSON格式返回结果，结构如下：
+""" + GRADED_JSON_TEMPLATE
+
+prompt_registry = PromptRegistry()
+prompt_metrics = PromptMetrics()
+
+prompt_registry.register(PromptTemplate(
+    CORRECTION_TEMPLATE, 'v2', _CORRECTION_SYSTEM,
+    [
+        ('essay_type_guide', "{essay_type_guide}\n\n"),
+        ('title', "标题：{title}\n\n"),
+        ('prompt', "写作提示：{prompt}\n\n"),
+        (None, "作文内容：\n{content}\n\n字数：{length}字"),
+    ]
+))
+
+prompt_registry.register(PromptTemplate(
+    GRADED_CORRECTION_TEMPLATE, 'v2', _GRADED_SYSTEM,
+    [
+        (None, "请按{grade}语文的评分要求批改以下作文。\n\n作文标题：{title}\n作文内容：{content}\n字数：{length}字"),
+    ]
+))
+
+
+def get_template(name: str, version: Optional[str] = None) -> PromptTemplate:
+    """获取已注册的提示词模板"""
+    return prompt_registry.get(name, version)
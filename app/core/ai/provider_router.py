@@ -0,0 +1,436 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+AI提供商路由模块
+在多个AI客户端（DeepSeek、阿里云千问、OpenAI）之间按实时延迟和错误率选择提供商，
+主请求超过其p90延迟预算时向第二个提供商发送对冲请求，采用先返回的有效结果
+"""
+
+import os
+import time
+import logging
+import threading
+import concurrent.futures
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.core.ai.circuit_breaker import get_client_breaker, STATE_OPEN
+from app.core.ai.generation_policy import accepts_generation_hints
+
+logger = logging.getLogger(__name__)
+
+# 默认配置
+DEFAULT_HEDGE_PERCENTILE = 0.9       # 对冲触发的延迟分位数
+DEFAULT_MAX_HEDGE_RATIO = 0.1        # 对冲请求占总请求的最大比例
+DEFAULT_HEDGE_BURST = 5              # 对冲令牌桶容量
+DEFAULT_BUDGET_SECONDS = 30.0        # 样本不足时的延迟预算
+DEFAULT_MIN_SAMPLES = 20             # 使用分位数预算所需的最少样本数
+DEFAULT_EWMA_ALPHA = 0.2
+DEFAULT_ERROR_THRESHOLD = 0.5        # 错误率EWMA超过该值的提供商不作为主提供商
+LATENCY_WINDOW_SIZE = 200
+
+# 路由结果的统一字段：各提供商的候选字段路径，按顺序取第一个非空值
+_SCORE_PATHS = (('score',), ('total_score',), ('scores', 'total'), ('scores', 'total_score'), ('总得分',))
+_FEEDBACK_PATHS = (('feedback',), ('comments',), ('overall_assessment',), ('analyses', 'overall_comment'),
+                   ('analyses', 'summary'), ('总体评价',))
+_DETAIL_PATHS = {
+    'content_score': (('details', 'content_score'), ('content_score',), ('scores', 'dimensions', 'content'),
+                      ('分项得分', '内容主旨')),
+    'language_score': (('details', 'language_score'), ('language_score',), ('scores', 'dimensions', 'language'),
+                       ('分项得分', '语言文采')),
+    'structure_score': (('details', 'structure_score'), ('structure_score',), ('scores', 'dimensions', 'structure'),
+                        ('分项得分', '文章结构')),
+    'writing_score': (('details', 'writing_score'), ('writing_score',), ('scores', 'dimensions', 'writing'),
+                      ('scores', 'dimensions', 'grammar'), ('分项得分', '文面书写')),
+}
+
+
+def _first_value(data: Dict[str, Any], paths) -> Any:
+    for path in paths:
+        value = data
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def normalize_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将不同提供商的批改结果统一为同一结构，调用方不需要关心实际提供商
+
+    在 result['result'] 上补齐以下字段（保留提供商原有字段）：
+        score / total_score / scores.total: 总分
+        feedback / comments: 总体评价
+        details: content_score、language_score、structure_score、writing_score 分项得分
+
+    Args:
+        result: 提供商返回的成功结果
+
+    Returns:
+        Dict: 复制后的统一结果
+    """
+    result = dict(result)
+    data = result.get('result')
+    if not isinstance(data, dict):
+        return result
+    data = dict(data)
+
+    score = _first_value(data, _SCORE_PATHS)
+    if score is not None:
+        data['score'] = data['total_score'] = score
+        scores = dict(data['scores']) if isinstance(data.get('scores'), dict) else {}
+        scores['total'] = score
+        data['scores'] = scores
+
+    feedback = _first_value(data, _FEEDBACK_PATHS)
+    if feedback is not None:
+        data['feedback'] = data['comments'] = feedback
+
+    details = dict(data['details']) if isinstance(data.get('details'), dict) else {}
+    for key, paths in _DETAIL_PATHS.items():
+        value = _first_value(data, paths)
+        details[key] = value if value is not None else 0
+    data['details'] = details
+
+    result['result'] = data
+    return result
+
+
+class ProviderStats:
+    """
+    单个提供商/模型的实时统计
+
+    维护延迟与错误率的指数加权移动平均（EWMA），以及最近若干次成功请求的
+    延迟窗口，用于估算分位数延迟预算。
+    """
+
+    def __init__(self, alpha: float = DEFAULT_EWMA_ALPHA, window_size: int = LATENCY_WINDOW_SIZE):
+        self.alpha = alpha
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.requests = 0
+        self.failures = 0
+        self._latencies = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, success: bool) -> None:
+        """记录一次请求的耗时和结果"""
+        with self._lock:
+            self.requests += 1
+            self.error_ewma = self.alpha * (0.0 if success else 1.0) + (1 - self.alpha) * self.error_ewma
+            if success:
+                self._latencies.append(latency)
+                if self.latency_ewma is None:
+                    self.latency_ewma = latency
+                else:
+                    self.latency_ewma = self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+            else:
+                self.failures += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """最近成功请求的延迟分位数，无样本时返回None"""
+        with self._lock:
+            if not self._latencies:
+                return None
+            values = sorted(self._latencies)
+        return values[min(len(values) - 1, int(len(values) * pct))]
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    def score(self) -> float:
+        """路由评分，越小越优先；没有延迟数据的提供商排在有数据的健康提供商之后"""
+        latency = self.latency_ewma if self.latency_ewma is not None else DEFAULT_BUDGET_SECONDS
+        return latency * (1.0 + 4.0 * self.error_ewma)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'latency_ewma': self.latency_ewma,
+            'error_ewma': round(self.error_ewma, 4),
+            'p90': self.percentile(0.9),
+        }
+
+
+class HedgeBudget:
+    """
+    对冲令牌桶：每个主请求补充 max_ratio 个令牌，每次对冲消耗一个，
+    保证长期对冲比例不超过 max_ratio，同时允许少量突发
+    """
+
+    def __init__(self, max_ratio: float = DEFAULT_MAX_HEDGE_RATIO, burst: int = DEFAULT_HEDGE_BURST):
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self._tokens = float(burst)
+        self._lock = threading.Lock()
+
+    def on_request(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.max_ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class ProviderRouter:
+    """
+    多提供商对冲路由
+
+    对外提供与AI客户端相同的 analyze_essay / correct_essay 接口，可直接替换单一客户端使用。
+
+    使用示例:
+        router = ProviderRouter({'deepseek': DeepseekClient(), 'aliyun_qianwen': AliyunQianwenClient()})
+        result = router.correct_essay(content)
+        result['provider']  # 实际返回结果的提供商
+        result['result']['score']  # 各提供商的结果统一为同一结构，见 normalize_result
+    """
+
+    def __init__(self, clients: Dict[str, Any],
+                 hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+                 max_hedge_ratio: float = DEFAULT_MAX_HEDGE_RATIO,
+                 default_budget: float = DEFAULT_BUDGET_SECONDS,
+                 min_samples: int = DEFAULT_MIN_SAMPLES,
+                 error_threshold: float = DEFAULT_ERROR_THRESHOLD,
+                 max_workers: int = 16):
+        """
+        初始化路由
+
+        Args:
+            clients: 提供商名称 -> 客户端实例
+            hedge_percentile: 对冲触发的延迟分位数
+            max_hedge_ratio: 对冲请求占比上限
+            default_budget: 样本不足时的延迟预算（秒）
+            min_samples: 使用分位数预算所需的最少样本数
+            error_threshold: 错误率EWMA超过该值时降级
+            max_workers: 执行请求的线程数
+        """
+        if not clients:
+            raise ValueError("ProviderRouter至少需要一个AI客户端")
+
+        self.clients = dict(clients)
+        self.hedge_percentile = hedge_percentile
+        self.default_budget = default_budget
+        self.min_samples = min_samples
+        self.error_threshold = error_threshold
+        self.hedge_budget = HedgeBudget(max_ratio=max_hedge_ratio)
+        self.stats: Dict[str, ProviderStats] = {self._stats_key(name): ProviderStats() for name in self.clients}
+        self.counters = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'hedge_denied': 0, 'failovers': 0}
+        self._counters_lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix='ai-router')
+        logger.info(f"初始化AI提供商路由: {', '.join(self.clients)}, 对冲比例上限: {max_hedge_ratio}")
+
+    @property
+    def provider_name(self) -> str:
+        return 'router'
+
+    def _count(self, name: str) -> None:
+        """计数器加一（对冲请求在多个线程中并发路由）"""
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def _stats_key(self, name: str) -> str:
+        """统计键：提供商/模型"""
+        model = getattr(self.clients[name], 'model', '') or ''
+        return f"{name}/{model}" if model else name
+
+    def _stats_for(self, name: str) -> ProviderStats:
+        return self.stats[self._stats_key(name)]
+
+    def rank_providers(self) -> List[str]:
+        """
+        按实时评分排序提供商，已熔断或错误率过高的提供商排在最后
+
+        Returns:
+            List[str]: 提供商名称列表
+        """
+        def sort_key(name):
+            stats = self._stats_for(name)
+            circuit_open = get_client_breaker(self.clients[name]).state == STATE_OPEN
+            return (circuit_open, stats.error_ewma > self.error_threshold, stats.score())
+        return sorted(self.clients, key=sort_key)
+
+    def _next_provider(self, candidates: List[str]) -> Optional[str]:
+        """从候选列表中取出下一个熔断器放行的提供商"""
+        while candidates:
+            name = candidates.pop(0)
+            if get_client_breaker(self.clients[name]).allow_request():
+                return name
+            logger.info(f"提供商 {name} 已熔断，跳过")
+        return None
+
+    def latency_budget(self, name: str) -> float:
+        """提供商的对冲延迟预算（秒）"""
+        stats = self._stats_for(name)
+        if stats.samples < self.min_samples:
+            return self.default_budget
+        return stats.percentile(self.hedge_percentile) or self.default_budget
+
+    @staticmethod
+    def _is_valid(result: Any) -> bool:
+        return isinstance(result, dict) and result.get('status') == 'success' and bool(result.get('result'))
+
+    def _call(self, name: str, method: str, args: Tuple, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """在工作线程中调用提供商并记录统计"""
+        client = self.clients[name]
+        start = time.perf_counter()
+        success = False
+        try:
+            if method == 'correct_essay' and hasattr(client, 'correct_essay'):
+                if not accepts_generation_hints(client):
+                    kwargs = {key: value for key, value in kwargs.items()
+                              if key not in ('grade', 'membership_level')}
+                result = client.correct_essay(*args, **kwargs)
+            else:
+                result = client.analyze_essay(args[0])
+            success = self._is_valid(result)
+            return result
+        finally:
+            latency = time.perf_counter() - start
+            self._stats_for(name).record(latency, success)
+            get_client_breaker(client).record(success, latency)
+
+    def _submit(self, name: str, method: str, args: Tuple, kwargs: Dict[str, Any]):
+        future = self._executor.submit(self._call, name, method, args, kwargs)
+        future.provider = name
+        return future
+
+    @staticmethod
+    def _abandon(futures) -> None:
+        """取消落后的请求；已在执行的HTTP调用无法中断，其结果只用于更新统计"""
+        for future in futures:
+            future.cancel()
+
+    def _route(self, method: str, *args, **kwargs) -> Dict[str, Any]:
+        self._count('requests')
+        self.hedge_budget.on_request()
+
+        backups = self.rank_providers()
+        primary = self._next_provider(backups)
+        if primary is None:
+            return {'status': 'error', 'message': '所有AI提供商均已熔断', 'circuit_open': True}
+        budget = self.latency_budget(primary)
+
+        pending = {self._submit(primary, method, args, kwargs)}
+        hedged = False
+        last_result = None
+
+        done, _ = concurrent.futures.wait(pending, timeout=budget)
+        if not done and backups:
+            if self.hedge_budget.try_acquire():
+                backup = self._next_provider(backups)
+                if backup:
+                    hedged = True
+                    self._count('hedged')
+                    logger.info(f"{primary} 超过延迟预算 {budget:.1f}s，向 {backup} 发送对冲请求")
+                    pending.add(self._submit(backup, method, args, kwargs))
+            else:
+                self._count('hedge_denied')
+
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"提供商 {future.provider} 请求异常: {str(e)}")
+                    result = {'status': 'error', 'message': str(e)}
+
+                if self._is_valid(result):
+                    self._abandon(pending)
+                    if hedged and future.provider != primary:
+                        self._count('hedge_wins')
+                    result = normalize_result(result)
+                    result['provider'] = future.provider
+                    result['hedged'] = hedged
+                    return result
+
+                last_result = result
+                logger.warning(f"提供商 {future.provider} 返回无效结果: {result.get('message', '') if isinstance(result, dict) else result}")
+
+            # 仍在等待的请求都失败后，按排序故障转移到下一个提供商
+            if not pending:
+                backup = self._next_provider(backups)
+                if backup:
+                    self._count('failovers')
+                    pending.add(self._submit(backup, method, args, kwargs))
+
+        if isinstance(last_result, dict):
+            return last_result
+        return {'status': 'error', 'message': '所有AI提供商均未返回有效结果'}
+
+    def correct_essay(self, essay_content: str, title: str = None, essay_type: str = None,
+                      prompt: str = None, **hints) -> Dict[str, Any]:
+        """
+        批改作文，返回结果中附带实际提供商名称
+
+        Args:
+            essay_content: 作文内容
+            title: 作文标题
+            essay_type: 作文类型
+            prompt: 写作提示
+            **hints: 生成参数提示（grade、membership_level），仅传给支持的客户端
+
+        Returns:
+            Dict: 批改结果
+        """
+        return self._route('correct_essay', essay_content,
+                           title=title, essay_type=essay_type, prompt=prompt, **hints)
+
+    def analyze_essay(self, content: str) -> Dict[str, Any]:
+        """分析作文（BaseAPIClient接口）"""
+        return self._route('analyze_essay', content)
+
+    def _counters_snapshot(self) -> Dict[str, int]:
+        with self._counters_lock:
+            return dict(self.counters)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取路由统计信息"""
+        return {
+            'counters': self._counters_snapshot(),
+            'providers': {key: stats.to_dict() for key, stats in self.stats.items()},
+            'circuit_breakers': [get_client_breaker(client).snapshot() for client in self.clients.values()],
+        }
+
+
+def create_router_from_env(factory=None) -> ProviderRouter:
+    """
+    根据环境变量创建路由
+
+    环境变量:
+        AI_ROUTER_PROVIDERS: 逗号分隔的提供商列表，默认 deepseek,aliyun_qianwen
+        AI_HEDGE_MAX_RATIO: 对冲请求占比上限，默认 0.1
+        AI_HEDGE_DEFAULT_BUDGET: 样本不足时的延迟预算（秒），默认 30
+
+    Args:
+        factory: AIClientFactory实例，用于复用缓存的客户端
+
+    Returns:
+        ProviderRouter: 路由实例
+    """
+    if factory is None:
+        from app.core.ai import ai_client_factory as factory
+
+    names = [name.strip() for name in
+             os.environ.get('AI_ROUTER_PROVIDERS', 'deepseek,aliyun_qianwen').split(',') if name.strip()]
+    clients = {}
+    for name in names:
+        try:
+            clients[name] = factory.get_client(name)
+        except Exception as e:
+            logger.error(f"创建AI客户端 {name} 失败，已从路由中排除: {str(e)}")
+
+    return ProviderRouter(
+        clients,
+        max_hedge_ratio=float(os.environ.get('AI_HEDGE_MAX_RATIO', DEFAULT_MAX_HEDGE_RATIO)),
+        default_budget=float(os.environ.get('AI_HEDGE_DEFAULT_BUDGET', DEFAULT_BUDGET_SECONDS)),
+    )
@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+会员流失、续订与转化的集合式统计
+每个报表只执行一次按计划（及月份/日期）分组的聚合查询，用条件聚合同时得到分母和分子；
+用户最近一次付费订阅先在子查询中按用户聚合，再与会员表外连接，不逐行执行关联子查询。
+分组后的结果只有 计划数 x 月份数 行，比率和汇总在Python中计算；
+报表结果按天缓存（Redis，不可用时退回进程内存储）
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime, date, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import func, case, and_, or_, not_
+
+from app.models.db import db
+from app.models.user import User
+from app.models.essay import Essay
+from app.models.membership import Membership, MembershipPlan
+from app.models.subscription import Subscription, SubscriptionStatus
+
+logger = logging.getLogger(__name__)
+
+# 已付费的订阅状态（到期的订阅同样计为付费过）
+PAID_STATUSES = (SubscriptionStatus.ACTIVE.value, SubscriptionStatus.EXPIRED.value)
+REPORT_KEY_PREFIX = 'analytics:report'
+
+
+def _rate(part: int, whole: int) -> float:
+    return round(part / whole * 100, 2) if whole else 0
+
+
+def period_expr(column, unit: str):
+    """按月（'month'）或按天（'day'）格式化日期列，兼容SQLite/PostgreSQL/MySQL"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return func.strftime('%Y-%m' if unit == 'month' else '%Y-%m-%d', column)
+    if dialect == 'postgresql':
+        return func.to_char(column, 'YYYY-MM' if unit == 'month' else 'YYYY-MM-DD')
+    return func.date_format(column, '%Y-%m' if unit == 'month' else '%Y-%m-%d')
+
+
+def _last_paid_subquery():
+    """每个用户最近一次付费订阅的创建时间"""
+    return db.session.query(
+        Subscription.user_id.label('user_id'),
+        func.max(Subscription.created_at).label('last_paid_at')
+    ).filter(
+        Subscription.status.in_(PAID_STATUSES)
+    ).group_by(Subscription.user_id).subquery('last_paid')
+
+
+def _renewed(paid):
+    """
+    会员开始之后有过付费订阅即视为续订（包括到期前提前续订）；
+    开通本次会员的订阅创建于会员开始之前或同时，不计入
+    """
+    return paid.c.last_paid_at > func.coalesce(Membership.start_date, Membership.created_at)
+
+
+def _plan_names() -> Dict[int, Any]:
+    return {plan_id: (code, name) for plan_id, code, name in
+            db.session.query(MembershipPlan.id, MembershipPlan.code, MembershipPlan.name)}
+
+
+# ----------------------------------------------------------------------
+# 报表
+# ----------------------------------------------------------------------
+
+def churn_report(now: Optional[datetime] = None, window_days: int = 30) -> Dict[str, Any]:
+    """
+    流失率：窗口开始时仍有效的会员中，在窗口内到期且没有付费续订的比例（续订的判定见 _renewed）
+
+    Returns:
+        Dict: active_members、churned_members、churn_rate、plans（按计划，含无会员的计划）
+    """
+    now = now or datetime.utcnow()
+    window_start = now - timedelta(days=window_days)
+    paid = _last_paid_subquery()
+    churned = and_(
+        Membership.end_date <= now,
+        or_(paid.c.last_paid_at.is_(None), not_(_renewed(paid)))
+    )
+    rows = db.session.query(
+        Membership.plan_id,
+        func.count(Membership.id),
+        func.sum(case((churned, 1), else_=0))
+    ).outerjoin(
+        paid, paid.c.user_id == Membership.user_id
+    ).filter(
+        Membership.created_at < window_start,
+        Membership.end_date > window_start
+    ).group_by(Membership.plan_id).all()
+
+    counts = {plan_id: (members, int(lost or 0)) for plan_id, members, lost in rows}
+    plans = []
+    for plan_id, (code, name) in _plan_names().items():
+        members, lost = counts.get(plan_id, (0, 0))
+        plans.append({
+            "plan_id": plan_id,
+            "plan_code": code,
+            "plan_name": name,
+            "members_count": members,
+            "churned_count": lost,
+            "churn_rate": _rate(lost, members)
+        })
+
+    active = sum(members for members, _ in counts.values())
+    churned_total = sum(lost for _, lost in counts.values())
+    return {
+        "active_members": active,
+        "churned_members": churned_total,
+        "churn_rate": _rate(churned_total, active),
+        "plans": plans
+    }
+
+
+def renewal_report(period_days: int = 90, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    续订率：统计周期内到期的会员中，会员开始后有付费订阅（含提前续订）的比例，按计划和到期月份分组
+
+    Returns:
+        Dict: expired、renewed、renewal_rate、plans、months
+    """
+    now = now or datetime.utcnow()
+    start_date = now - timedelta(days=period_days)
+    paid = _last_paid_subquery()
+    month = period_expr(Membership.end_date, 'month').label('month')
+    rows = db.session.query(
+        Membership.plan_id,
+        month,
+        func.count(Membership.id),
+        func.sum(case((_renewed(paid), 1), else_=0))
+    ).outerjoin(
+        paid, paid.c.user_id == Membership.user_id
+    ).filter(
+        Membership.end_date >= start_date,
+        Membership.end_date <= now
+    ).group_by(Membership.plan_id, month).all()
+
+    by_plan: Dict[int, List[int]] = {}
+    by_month: Dict[str, List[int]] = {}
+    for plan_id, month_value, expired, renewed in rows:
+        renewed = int(renewed or 0)
+        for bucket in (by_plan.setdefault(plan_id, [0, 0]), by_month.setdefault(month_value, [0, 0])):
+            bucket[0] += expired
+            bucket[1] += renewed
+
+    names = _plan_names()
+    plans = []
+    for plan_id, (expired, renewed) in by_plan.items():
+        code, name = names.get(plan_id, (None, None))
+        plans.append({
+            "plan_code": code,
+            "plan_name": name,
+            "expired": expired,
+            "renewed": renewed,
+            "renewal_rate": _rate(renewed, expired)
+        })
+    months = [{
+        "month": month_value,
+        "expired": expired,
+        "renewed": renewed,
+        "renewal_rate": _rate(renewed, expired)
+    } for month_value, (expired, renewed) in sorted(by_month.items())]
+
+    expired_total = sum(expired for expired, _ in by_plan.values())
+    renewed_total = sum(renewed for _, renewed in by_plan.values())
+    return {
+        "expired": expired_total,
+        "renewed": renewed_total,
+        "renewal_rate": _rate(renewed_total, expired_total),
+        "plans": plans,
+        "months": months
+    }
+
+
+def conversion_report(period_days: int = 30, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    转化率：统计周期内新注册用户中开通付费会员的比例，按计划和开通日期分组
+
+    Returns:
+        Dict: new_users、paid_memberships、conversion_rate、plans、days（周期内每天一项）
+    """
+    now = now or datetime.utcnow()
+    start_date = now - timedelta(days=period_days)
+    new_users = db.session.query(func.count(User.id)).filter(User.created_at >= start_date).scalar() or 0
+
+    paid = _last_paid_subquery()
+    day = period_expr(Membership.created_at, 'day').label('day')
+    rows = db.session.query(
+        Membership.plan_id,
+        day,
+        func.count(Membership.id)
+    ).join(
+        paid, paid.c.user_id == Membership.user_id
+    ).filter(
+        Membership.created_at >= start_date
+    ).group_by(Membership.plan_id, day).all()
+
+    by_plan: Dict[int, int] = {}
+    by_day: Dict[str, int] = {}
+    for plan_id, day_value, count in rows:
+        by_plan[plan_id] = by_plan.get(plan_id, 0) + count
+        by_day[day_value] = by_day.get(day_value, 0) + count
+    paid_total = sum(by_plan.values())
+
+    names = _plan_names()
+    plans = []
+    for plan_id, count in by_plan.items():
+        code, name = names.get(plan_id, (None, None))
+        plans.append({
+            "plan_code": code,
+            "plan_name": name,
+            "subscriptions": count,
+            "percentage": _rate(count, paid_total)
+        })
+
+    days = []
+    current, end = start_date.date(), now.date()
+    while current <= end:
+        date_str = current.strftime('%Y-%m-%d')
+        days.append({"date": date_str, "new_memberships": by_day.get(date_str, 0)})
+        current += timedelta(days=1)
+
+    return {
+        "new_users": new_users,
+        "paid_memberships": paid_total,
+        "conversion_rate": _rate(paid_total, new_users),
+        "plans": plans,
+        "days": days
+    }
+
+
+def iter_expiring_members(now: Optional[datetime] = None, days: int = 30,
+                          batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    即将到期且未开启自动续费的会员，连同用户、计划、近两个30天周期的作文数和最近一次付费时间，
+    一次联表查询分批读取
+
+    Yields:
+        Dict: 会员及用量信息
+    """
+    now = now or datetime.utcnow()
+    recent_start = now - timedelta(days=30)
+    essay_counts = db.session.query(
+        Essay.user_id.label('user_id'),
+        func.sum(case((Essay.created_at >= recent_start, 1), else_=0)).label('recent'),
+        func.sum(case((Essay.created_at < recent_start, 1), else_=0)).label('previous')
+    ).filter(
+        Essay.created_at >= now - timedelta(days=60),
+        Essay.created_at <= now
+    ).group_by(Essay.user_id).subquery('essay_counts')
+    paid = _last_paid_subquery()
+
+    rows = db.session.query(
+        Membership.id, Membership.user_id, Membership.start_date, Membership.end_date,
+        Membership.is_auto_renew, User.username, User.email, MembershipPlan.name,
+        essay_counts.c.recent, essay_counts.c.previous, paid.c.last_paid_at
+    ).join(
+        User, User.id == Membership.user_id
+    ).join(
+        MembershipPlan, MembershipPlan.id == Membership.plan_id
+    ).outerjoin(
+        essay_counts, essay_counts.c.user_id == Membership.user_id
+    ).outerjoin(
+        paid, paid.c.user_id == Membership.user_id
+    ).filter(
+        Membership.is_active == True,
+        Membership.end_date.between(now, now + timedelta(days=days)),
+        Membership.is_auto_renew == False
+    ).order_by(Membership.id).execution_options(yield_per=batch_size)
+
+    for (membership_id, user_id, start_date, end_date, is_auto_renew, username, email,
+         plan_name, recent, previous, last_paid_at) in rows:
+        yield {
+            "membership_id": membership_id,
+            "user_id": user_id,
+            "username": username,
+            "email": email,
+            "plan_name": plan_name,
+            "start_date": start_date,
+            "end_date": end_date,
+            "is_auto_renew": bool(is_auto_renew),
+            "recent_usage": int(recent or 0),
+            "previous_usage": int(previous or 0),
+            "last_paid_at": last_paid_at,
+        }
+
+
+# ----------------------------------------------------------------------
+# 按天缓存
+# ----------------------------------------------------------------------
+
+class DailyReportCache:
+    """
+    报表结果按天缓存：键由报表名、参数和日期组成，次日自然换键；
+    只缓存成功的结果，Redis不可用时退回进程内存储
+    """
+
+    def __init__(self, enabled: bool = True, store: str = 'redis', ttl: int = 86400):
+        """
+        初始化缓存
+
+        Args:
+            enabled: 是否启用缓存
+            store: 'redis' 或 'local'
+            ttl: Redis键的过期时间（秒）
+        """
+        self.enabled = enabled
+        self.store = store
+        self.ttl = ttl
+        self._client = None
+        self._client_checked = False
+        self._local: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _redis(self):
+        if self._client_checked:
+            return self._client
+        self._client_checked = True
+        if self.store == 'redis':
+            try:
+                import redis
+                from app.core.services.redis_service import RedisService
+                client = RedisService().client
+                if isinstance(client, redis.Redis):
+                    self._client = client
+            except Exception as e:
+                logger.warning(f"报表缓存无法使用Redis，退回进程内存储: {str(e)}")
+        return self._client
+
+    @staticmethod
+    def make_key(name: str, params: Dict[str, Any], day: date) -> str:
+        suffix = ','.join(f'{key}={params[key]}' for key in sorted(params))
+        return f"{REPORT_KEY_PREFIX}:{name}:{suffix}:{day.isoformat()}"
+
+    def get_or_compute(self, name: str, params: Dict[str, Any], compute: Callable[[], Dict[str, Any]],
+                       day: Optional[date] = None) -> Dict[str, Any]:
+        """
+        读取当天的缓存结果，未命中时计算并写入
+
+        Args:
+            name: 报表名
+            params: 报表参数
+            compute: 计算函数，返回 status 为 success 的结果才会缓存
+            day: 缓存所属日期，默认UTC当天（与报表统计窗口使用的 utcnow 一致）
+        """
+        if not self.enabled:
+            return compute()
+        day = day or datetime.utcnow().date()
+        key = self.make_key(name, params, day)
+        client = self._redis()
+
+        try:
+            if client is not None:
+                cached = client.get(key)
+                if cached is not None:
+                    return json.loads(cached)
+            else:
+                with self._lock:
+                    if key in self._local:
+                        return self._local[key]
+        except Exception as e:
+            logger.warning(f"读取报表缓存失败，直接计算: {str(e)}")
+
+        result = compute()
+        if result.get('status') != 'success':
+            return result
+        try:
+            if client is not None:
+                client.setex(key, self.ttl, json.dumps(result, ensure_ascii=False, default=str))
+            else:
+                suffix = f":{day.isoformat()}"
+                with self._lock:
+                    # 进程内只保留当天的结果
+                    self._local = {k: v for k, v in self._local.items() if k.endswith(suffix)}
+                    self._local[key] = result
+        except Exception as e:
+            logger.warning(f"写入报表缓存失败: {str(e)}")
+        return result
+
+    def clear(self):
+        """清空进程内缓存（Redis中的键按TTL过期）"""
+        with self._lock:
+            self._local = {}
+
+
+def create_report_cache_from_env() -> DailyReportCache:
+    """
+    根据环境变量创建报表缓存
+
+    环境变量:
+        ANALYTICS_REPORT_CACHE: 'redis'（默认）、'local' 或 'off'
+        ANALYTICS_REPORT_CACHE_TTL: Redis键的过期时间（秒），默认86400
+    """
+    store = os.environ.get('ANALYTICS_REPORT_CACHE', 'redis').lower()
+    return DailyReportCache(
+        enabled=store != 'off',
+        store=store,
+        ttl=int(os.environ.get('ANALYTICS_REPORT_CACHE_TTL', 86400)),
+    )
+
+
+report_cache = create_report_cache_from_env()
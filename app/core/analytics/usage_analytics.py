@@ -6,6 +6,7 @@
 负责收集、分析和展示会员使用情况的详细统计
 """
 
+import time
 import logging
 import datetime
 from typing import Dict, Any, List, Optional, Tuple
@@ -21,12 +22,29 @@ from app.models.essay import Essay
 from app.models.usage_log import UsageLog
 from app.models.membership import Membership, MembershipPlan
 from app.models.subscription import Subscription
+from app.core.user.activity_buffer import user_activity_buffer
 
 logger = logging.getLogger(__name__)
 
+# 已确认有会员信息的用户 -> 过期时间（monotonic），避免每个事件都查询会员表
+_MEMBERSHIP_CACHE_TTL = 300
+_membership_users: Dict[int, float] = {}
+
+
 class UsageAnalytics:
     """会员使用统计服务类"""
     
+    @staticmethod
+    def _has_membership(user_id: int) -> bool:
+        """用户是否有会员信息（只缓存存在的结果）"""
+        expires = _membership_users.get(user_id)
+        if expires and expires > time.monotonic():
+            return True
+        if Membership.query.filter_by(user_id=user_id).first() is None:
+            return False
+        _membership_users[user_id] = time.monotonic() + _MEMBERSHIP_CACHE_TTL
+        return True
+    
     @staticmethod
     def log_usage_event(user_id: int, event_type: str, resource_id: Optional[int] = None,
                        metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -43,43 +61,36 @@ class UsageAnalytics:
             Dict: 记录结果
         """
         try:
-            # 获取用户会员信息
-            membership = Membership.query.filter_by(user_id=user_id).first()
-            if not membership:
+            if not UsageAnalytics._has_membership(user_id):
                 return {
                     "status": "error",
                     "message": "未找到会员信息"
                 }
             
-            # 创建使用记录
-            usage_log = UsageLog(
+            # 使用记录和会员用量进入写回缓冲，由后台线程批量写入，请求路径上不写数据库
+            user_activity_buffer.add_row(
+                UsageLog,
                 user_id=user_id,
-                membership_id=membership.id,
-                event_type=event_type,
+                type=event_type,
                 resource_id=resource_id,
-                metadata=metadata or {},
-                created_at=datetime.datetime.utcnow().timestamp()
+                extra_data=metadata or {},
+                created_at=datetime.datetime.now(),
+                updated_at=datetime.datetime.now()
             )
             
-            # 保存到数据库
-            db.session.add(usage_log)
-            db.session.commit()
-            
             # 如果是作文提交事件，增加会员使用计数
             if event_type == 'essay_submit':
-                membership.increment_usage()
+                user_activity_buffer.increment_membership_usage(user_id)
             
-            logger.info(f"用户 {user_id} 使用事件 {event_type} 已记录")
+            logger.debug(f"用户 {user_id} 使用事件 {event_type} 已进入写回缓冲")
             
             return {
                 "status": "success",
-                "message": "使用事件已记录",
-                "usage_log_id": usage_log.id
+                "message": "使用事件已记录"
             }
             
         except Exception as e:
             logger.error(f"记录使用事件时出错: {str(e)}", exc_info=True)
-            db.session.rollback()
             return {
                 "status": "error",
                 "message": f"记录使用事件失败: {str(e)}"
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+会员用量建模
+每批会员的作文数只执行一次按 (用户, 日期) 分组的聚合查询，结果展开为 用户 x 天 的NumPy矩阵，
+日均、7天滚动均值、线性趋势和剩余会员期内的用量预测都按整批向量化计算；
+夜间任务为全部有效会员批量计算并写入 usage_predictions，预测接口直接读取
+"""
+
+import os
+import time
+import logging
+from datetime import datetime, date, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, insert, delete
+
+from app.models.db import db
+from app.models.essay import Essay
+from app.models.membership import Membership, MembershipPlan
+from app.models.usage_prediction import UsagePrediction
+from app.core.analytics.subscription_metrics import period_expr
+
+logger = logging.getLogger(__name__)
+
+MEMBER_COLUMNS = ['user_id', 'membership_id', 'end_date', 'essays_used_total', 'max_essays_total', 'plan_name']
+
+
+def load_members(user_ids: Optional[Sequence[int]] = None, active_only: bool = True) -> pd.DataFrame:
+    """一次联表查询读取会员、用量和计划额度"""
+    query = db.session.query(
+        Membership.user_id, Membership.id, Membership.end_date, Membership.essays_used_total,
+        MembershipPlan.max_essays_total, MembershipPlan.name
+    ).join(MembershipPlan, MembershipPlan.id == Membership.plan_id)
+    if user_ids is not None:
+        query = query.filter(Membership.user_id.in_(list(user_ids)))
+    if active_only:
+        query = query.filter(Membership.is_active == True)
+    return pd.DataFrame(query.order_by(Membership.user_id).all(), columns=MEMBER_COLUMNS)
+
+
+def daily_usage_matrix(user_ids: Sequence[int], start_day: date, days: int) -> np.ndarray:
+    """
+    读取一批用户每天的作文数
+
+    Args:
+        user_ids: 用户ID（矩阵行顺序）
+        start_day: 第一天（矩阵第0列）
+        days: 天数
+
+    Returns:
+        np.ndarray: 形状为 (用户数, 天数) 的用量矩阵
+    """
+    matrix = np.zeros((len(user_ids), days), dtype=np.float64)
+    if not len(user_ids):
+        return matrix
+    start = datetime.combine(start_day, datetime.min.time())
+    day = period_expr(Essay.created_at, 'day').label('day')
+    rows = db.session.query(
+        Essay.user_id, day, func.count(Essay.id)
+    ).filter(
+        Essay.user_id.in_(list(user_ids)),
+        Essay.created_at >= start,
+        Essay.created_at < start + timedelta(days=days)
+    ).group_by(Essay.user_id, day).all()
+    if not rows:
+        return matrix
+
+    counts = pd.DataFrame(rows, columns=['user_id', 'day', 'count'])
+    row_index = pd.Index(user_ids).get_indexer(counts['user_id'])
+    col_index = (pd.to_datetime(counts['day']) - pd.Timestamp(start_day)).dt.days.to_numpy()
+    matrix[row_index, col_index] = counts['count'].to_numpy()
+    return matrix
+
+
+def rolling_mean(matrix: np.ndarray, window: int) -> np.ndarray:
+    """按行计算滚动均值（窗口不足时按已有天数平均）"""
+    cumulative = np.cumsum(matrix, axis=1)
+    shifted = np.zeros_like(cumulative)
+    shifted[:, window:] = cumulative[:, :-window]
+    lengths = np.minimum(np.arange(1, matrix.shape[1] + 1), window)
+    return (cumulative - shifted) / lengths
+
+
+def usage_features(matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    按行计算用量特征
+
+    Returns:
+        Dict: mean（窗口日均）、rolling_7（最近7天日均）、slope（最小二乘线性趋势，每天变化量）
+    """
+    days = matrix.shape[1]
+    mean = matrix.mean(axis=1)
+    centered = np.arange(days) - (days - 1) / 2
+    denominator = float(centered @ centered) or 1.0
+    slope = (matrix - mean[:, None]) @ centered / denominator
+    return {
+        'mean': mean,
+        'rolling_7': rolling_mean(matrix, 7)[:, -1] if days else mean,
+        'slope': slope,
+    }
+
+
+def project_usage(features: Dict[str, np.ndarray], days_remaining: np.ndarray,
+                  remaining_quota: np.ndarray, window_days: int) -> Dict[str, np.ndarray]:
+    """
+    按趋势外推剩余会员期内的用量
+
+    剩余期内的日均用量取趋势线在未来各天的平均值（外推最多一个统计窗口的长度，之后保持水平），
+    不低于0；剩余额度为NaN表示无限制
+
+    Returns:
+        Dict: projected_daily、predicted_total、will_exceed、days_until_exhausted（不会用完为-1）
+    """
+    horizon = np.minimum(days_remaining, window_days)
+    projected_daily = np.clip(features['mean'] + features['slope'] * ((window_days - 1) / 2 + (horizon + 1) / 2),
+                              0, None)
+    predicted_total = np.floor(projected_daily * np.maximum(days_remaining, 0)).astype(np.int64)
+    limited = ~np.isnan(remaining_quota)
+    will_exceed = limited & (predicted_total > np.nan_to_num(remaining_quota))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_until = np.where(will_exceed & (projected_daily > 0),
+                              np.floor(np.nan_to_num(remaining_quota) / projected_daily), -1)
+    return {
+        'projected_daily': projected_daily,
+        'predicted_total': predicted_total,
+        'will_exceed': will_exceed,
+        'days_until_exhausted': days_until.astype(np.int64),
+    }
+
+
+class UsageModel:
+    """会员用量预测"""
+
+    def __init__(self, window_days: int = 30, batch_size: int = 2000, max_age_hours: float = 36.0):
+        """
+        初始化用量预测
+
+        Args:
+            window_days: 统计窗口天数（以今天为最后一天）
+            batch_size: 夜间任务每批处理的会员数
+            max_age_hours: 预先计算的预测超过该时长视为过期，接口改为即时计算
+        """
+        self.window_days = window_days
+        self.batch_size = batch_size
+        self.max_age_hours = max_age_hours
+
+    def predict(self, members: pd.DataFrame, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """为一批会员计算预测，返回可直接写入 usage_predictions 的行"""
+        if members.empty:
+            return []
+        now = now or datetime.utcnow()
+        today = now.date()
+        start_day = today - timedelta(days=self.window_days - 1)
+        user_ids = members['user_id'].tolist()
+        matrix = daily_usage_matrix(user_ids, start_day, self.window_days)
+        features = usage_features(matrix)
+
+        end_days = pd.to_datetime(members['end_date']).dt.normalize()
+        days_remaining = (end_days - pd.Timestamp(today)).dt.days.to_numpy()
+        limits = members['max_essays_total'].fillna(0).to_numpy(dtype=np.float64)
+        used = members['essays_used_total'].fillna(0).to_numpy(dtype=np.float64)
+        remaining_quota = np.where(limits > 0, limits - used, np.nan)
+        projection = project_usage(features, days_remaining, remaining_quota, self.window_days)
+
+        history_days = [(start_day + timedelta(days=offset)).isoformat() for offset in range(self.window_days)]
+        rows = []
+        for index, (user_id, membership_id) in enumerate(zip(user_ids, members['membership_id'].tolist())):
+            exhausted = int(projection['days_until_exhausted'][index])
+            quota = remaining_quota[index]
+            rows.append({
+                'user_id': int(user_id),
+                'membership_id': int(membership_id),
+                'computed_at': now,
+                'window_days': self.window_days,
+                'daily_average_usage': round(float(features['mean'][index]), 4),
+                'rolling_7_day_average': round(float(features['rolling_7'][index]), 4),
+                'trend_per_day': round(float(features['slope'][index]), 4),
+                'projected_daily_usage': round(float(projection['projected_daily'][index]), 4),
+                'days_remaining': int(days_remaining[index]),
+                'predicted_total_usage': int(projection['predicted_total'][index]),
+                'remaining_quota': None if np.isnan(quota) else int(quota),
+                'will_exceed_limit': bool(projection['will_exceed'][index]),
+                'quota_completion_date': today + timedelta(days=exhausted) if exhausted >= 0 else None,
+                'usage_history': [{'date': day_str, 'count': int(count)}
+                                  for day_str, count in zip(history_days, matrix[index])],
+            })
+        return rows
+
+    def run_nightly(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        为全部有效会员批量计算预测并覆盖写入 usage_predictions（每批一个事务）
+
+        Returns:
+            Dict: status、members、batches、seconds
+        """
+        started = time.perf_counter()
+        now = now or datetime.utcnow()
+        members = load_members()
+        members = members[pd.to_datetime(members['end_date']) > pd.Timestamp(now)]
+        batches = 0
+        for offset in range(0, len(members), self.batch_size):
+            batch = members.iloc[offset:offset + self.batch_size]
+            rows = self.predict(batch, now)
+            try:
+                db.session.execute(delete(UsagePrediction).where(UsagePrediction.user_id.in_(batch['user_id'].tolist())))
+                db.session.execute(insert(UsagePrediction).execution_options(render_nulls=True), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            batches += 1
+        seconds = time.perf_counter() - started
+        logger.info(f"会员用量预测完成：{len(members)} 个会员，{batches} 批，耗时 {seconds:.2f} 秒")
+        return {'status': 'success', 'members': len(members), 'batches': batches, 'seconds': round(seconds, 2)}
+
+    def get_prediction(self, user_id: int, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取用户的预测：优先使用未过期的预先计算结果，否则即时计算（不写入）
+
+        Returns:
+            Dict: 预测行（含 plan_name），用户没有会员时返回None
+        """
+        now = now or datetime.utcnow()
+        stored = db.session.query(UsagePrediction, MembershipPlan.name).join(
+            Membership, Membership.id == UsagePrediction.membership_id
+        ).join(
+            MembershipPlan, MembershipPlan.id == Membership.plan_id
+        ).filter(UsagePrediction.user_id == user_id).first()
+        if stored is not None and now - stored[0].computed_at <= timedelta(hours=self.max_age_hours):
+            prediction, plan_name = stored
+            row = {column.name: getattr(prediction, column.name) for column in UsagePrediction.__table__.columns}
+            row['plan_name'] = plan_name
+            return row
+        members = load_members([user_id], active_only=False)
+        rows = self.predict(members, now)
+        if not rows:
+            return None
+        rows[0]['plan_name'] = members['plan_name'].iloc[0]
+        return rows[0]
+
+    def get_usage_history(self, user_id: int, days: int, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """用户最近 days 天（含今天）的每日用量"""
+        today = (now or datetime.utcnow()).date()
+        start_day = today - timedelta(days=days - 1)
+        matrix = daily_usage_matrix([user_id], start_day, days)
+        return [{'date': (start_day + timedelta(days=offset)).isoformat(), 'count': int(count)}
+                for offset, count in enumerate(matrix[0])]
+
+
+def create_usage_model_from_env() -> UsageModel:
+    """
+    根据环境变量创建用量预测
+
+    环境变量:
+        USAGE_PREDICTION_WINDOW_DAYS: 统计窗口天数，默认30
+        USAGE_PREDICTION_BATCH_SIZE: 夜间任务每批会员数，默认2000
+        USAGE_PREDICTION_MAX_AGE_HOURS: 预先计算结果的有效时长（小时），默认36
+    """
+    return UsageModel(
+        window_days=int(os.environ.get('USAGE_PREDICTION_WINDOW_DAYS', 30)),
+        batch_size=int(os.environ.get('USAGE_PREDICTION_BATCH_SIZE', 2000)),
+        max_age_hours=float(os.environ.get('USAGE_PREDICTION_MAX_AGE_HOURS', 36)),
+    )
+
+
+usage_model = create_usage_model_from_env()
@@ -11,9 +11,14 @@ import random
 import logging
 import traceback
 import os
+import time
 from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
 
+from app.core.ai.circuit_breaker import get_client_breaker, circuit_open_result
+from app.core.ai.generation_policy import accepts_generation_hints
+from app.utils.log_policy import log_policy
+
 logger = logging.getLogger(__name__)
 
 class AICorrectionService:
@@ -52,13 +57,16 @@ class AICorrectionService:
             
         logger.info(f"初始化AI批改服务，使用{ai_service}引擎，调试模式: {self.debug_mode}")
     
-    def correct_essay(self, content: str, essay_id: Optional[str] = None) -> Dict[str, Any]:
+    def correct_essay(self, content: str, essay_id: Optional[str] = None,
+                      grade: Optional[str] = None, membership_level: Optional[str] = None) -> Dict[str, Any]:
         """
         分析作文内容并返回批改结果
         
         Args:
             content: 作文内容
             essay_id: 作文ID（可选，用于跟踪）
+            grade: 学段（可选，用于确定生成参数）
+            membership_level: 会员等级（可选，用于确定生成参数和模型档位）
             
         Returns:
             Dict: 批改结果
@@ -76,14 +84,25 @@ class AICorrectionService:
             # 尝试调用AI客户端进行批改
             max_retries = 2
             last_error = None
+            breaker = get_client_breaker(self.ai_client)
+            hints = {}
+            if accepts_generation_hints(self.ai_client):
+                hints = {'grade': grade, 'membership_level': membership_level}
             
             for attempt in range(max_retries + 1):
+                # 熔断器打开时快速失败，不再消耗重试次数，也不回退到模拟结果
+                if not breaker.allow_request():
+                    return circuit_open_result(breaker, essay_id)
+                
+                start = time.perf_counter()
                 try:
                     if attempt > 0:
                         logger.warning(f"AI批改重试 {attempt}/{max_retries}，essay_id={essay_id}")
                     
                     # 调用AI客户端进行批改
-                    result = self.ai_client.correct_essay(content)
+                    result = self.ai_client.correct_essay(content, **hints)
+                    breaker.record(not (isinstance(result, dict) and result.get("status") == "error"),
+                                   time.perf_counter() - start)
                     
                     # 验证结果有效性
                     if self._is_valid_result(result):
@@ -93,11 +112,12 @@ class AICorrectionService:
                             "result": result
                         }
                     else:
-                        logger.warning(f"AI返回无效结果，essay_id={essay_id}，结果: {result}")
+                        logger.warning("AI返回无效结果，essay_id=%s，结果: %s", essay_id, log_policy.payload(result))
                         last_error = "AI返回无效结果结构"
                         # 继续重试
                         
                 except Exception as e:
+                    breaker.record_failure(time.perf_counter() - start)
                     last_error = str(e)
                     logger.error(f"AI批改尝试 {attempt+1}/{max_retries+1} 失败: {last_error}")
                     logger.error(traceback.format_exc())
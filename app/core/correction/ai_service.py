@@ -17,6 +17,10 @@ from datetime import datetime
 
 from app.utils.exceptions import AIServiceError, ValidationError
 from app.config import config
+from app.core.ai.json_extract import parse_json_object
+from app.core.ai.prompt_templates import (
+    get_template, prompt_metrics, GRADED_CORRECTION_TEMPLATE, GRADED_JSON_TEMPLATE
+)
 
 # 配置日志记录器
 logger = logging.getLogger('app.core.correction.ai')
@@ -77,12 +81,13 @@ class AIService:
         if not self.api_key:
             raise AIServiceError("AI服务API密钥未配置")
             
-        # 准备提示词
-        prompt = self._prepare_correction_prompt(content, grade, title)
+        # 准备消息（静态评分标准在system前缀中，可命中提供商的前缀缓存）
+        messages = self._prepare_correction_prompt(content, grade, title)
         
         try:
             # 调用AI API
-            response = self._call_ai_api(prompt)
+            response = self._call_ai_api(messages)
+            prompt_metrics.record(get_template(GRADED_CORRECTION_TEMPLATE).key, response.get('usage'))
             
             # 解析响应
             ai_result = self._parse_ai_response(response)
@@ -102,12 +107,12 @@ class AIService:
             logger.error(f"AI批改未知异常: {str(e)}", exc_info=True)
             raise AIServiceError(f"AI批改错误: {str(e)}")
     
-    def _call_ai_api(self, prompt: str) -> Dict[str, Any]:
+    def _call_ai_api(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
         """
         调用AI API
         
         Args:
-            prompt: 提示词
+            messages: 消息列表
             
         Returns:
             Dict: API响应
@@ -122,10 +127,7 @@ class AIService:
         
         data = {
             "model": self.model,
-            "messages": [
-                {"role": "system", "content": "你是一位专业的中文作文批改老师，擅长评价学生作文并给出详细反馈。"},
-                {"role": "user", "content": prompt}
-            ],
+            "messages": messages,
             "temperature": self.temperature,
             "max_tokens": self.max_tokens
         }
@@ -165,21 +167,12 @@ class AIService:
             if not content:
                 raise ValueError("API响应中没有找到content字段")
             
-            # 提取JSON代码块
-            json_start = content.find('```json')
-            json_end = content.find('```', json_start + 7)
-            
-            if json_start == -1 or json_end == -1:
-                raise ValueError("未找到JSON代码块")
-            
-            # 提取并解析JSON
-            json_text = content[json_start + 7:json_end].strip()
-            try:
-                return json.loads(json_text)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON解析失败: {str(e)}")
-                logger.debug(f"JSON文本: {json_text}")
-                raise
+            # 提取代码块或文本中的JSON对象，必要时容错修复
+            result = parse_json_object(content)
+            if result is None:
+                logger.debug(f"JSON文本: {content[:500]}")
+                raise ValueError("未找到有效的JSON内容")
+            return result
                 
         except Exception as e:
             logger.error(f"解析AI响应失败: {str(e)}")
@@ -188,9 +181,9 @@ class AIService:
                 raise
             raise json.JSONDecodeError(f"解析AI响应时发生错误: {str(e)}", doc="", pos=0)
     
-    def _prepare_correction_prompt(self, content: str, grade: str, title: str = None) -> str:
+    def _prepare_correction_prompt(self, content: str, grade: str, title: str = None) -> List[Dict[str, str]]:
         """
-        准备AI批改提示词，使用评分规则
+        使用预编译的评分模板准备批改消息
         
         Args:
             content: 作文内容
@@ -198,7 +191,7 @@ class AIService:
             title: 作文标题
             
         Returns:
-            str: 完整的提示词
+            List[Dict]: 消息列表，评分标准为静态system前缀
         """
         grade_levels = {
             'primary': '小学',
@@ -210,43 +203,13 @@ class AIService:
         chinese_grade = grade_levels.get(grade, '未知')
         text_length = len(content)
         
-        # 基于原有评分规则构建提示词
-        prompt = f"""<请你作为广东{chinese_grade}语文阅卷老师，按照以下标准对作文进行全面评分和详细分析：
-
-作文标题：{title if title else "无标题"}
-作文内容：{content[:3000]}{"..." if len(content) > 3000 else ""}
-字数：{text_length}字
-
-【作文评分标准】
-总分50分
-字数要求600字以上
-
-【评分等级划分】
-A级（43-50分）：内容立意明确，中心突出，材料具体生动，有真情实感；语言得体、流畅；结构严谨，注意照应，详略得当；卷面整洁，书写优美。
-B级（35-42分）：内容立意明确，中心突出，材料具体；语言规范、通顺；结构完整，条理清楚；卷面整洁，书写工整。
-C级（27-34分）：内容立意明确，材料能表现中心；语言基本通顺，有少数错别字；结构基本完整，有条理；卷面较为整洁，书写清楚。
-D级（0-26分）：内容立意不明确，材料难以表现中心；语言不通顺，错别字较多；结构不完整，条理不清楚；卷面脏乱，字迹潦草。
-
-【评分维度权重】
-各项分数必须为整数，且必须严格按照以下权重范围分配：
-1. 内容主旨：占总分的30%-40%（最高20分，最低视作文质量定）
-2. 语言文采：占总分的20%-30%（最高15分，最低视作文质量定）
-3. 文章结构：占总分的10%-20%（最高10分，最低视作文质量定）
-4. 文面书写：占总分的0%-10%（最高5分，最低视作文质量定）
-
-【具体扣分项】
-1. 无标题扣2分
-2. 字数不足：低于600字，每少50字扣1分
-3. 错别字：每个错别字扣1分
-4. 标点符号使用不规范：根据严重程度1-3分
-
-错别字扣分是从四项得分总和中直接扣除的，而非从某个分项中扣除。
-
-必须以JSON格式返回结果，结构如下：
-{self.get_json_template()}
-"""
-        
-        return prompt
+        template = get_template(GRADED_CORRECTION_TEMPLATE)
+        return template.render(
+            grade=chinese_grade,
+            title=title if title else "无标题",
+            content=content[:3000] + ("..." if len(content) > 3000 else ""),
+            length=text_length
+        )
     
     def get_json_template(self) -> str:
         """
@@ -255,29 +218,7 @@ D级（0-26分）：内容立意不明确，材料难以表现中心；语言不
         Returns:
             str: JSON模板字符串
         """
-        return """
-```json
-{
-    "总得分": 45,
-    "等级评定": "A-优秀",
-    "分项得分": {
-        "内容主旨": 18,
-        "语言文采": 14,
-        "文章结构": 9,
-        "文面书写": 4
-    },
-    "错别字": [
-        "错别字1->正确写法1",
-        "错别字2->正确写法2"
-    ],
-    "总体评价": "这篇作文...(详细评价)",
-    "内容分析": "文章主题...(详细分析)",
-    "语言分析": "本文语言流畅，使用了多种修辞手法，词汇丰富...(详细分析)",
-    "结构分析": "文章结构...(详细分析)",
-    "写作建议": "建议作者...(具体建议)"
-}
-```
-"""
+        return GRADED_JSON_TEMPLATE
     
     def _format_correction_result(self, ai_result: Dict[str, Any]) -> Dict[str, Any]:
         """
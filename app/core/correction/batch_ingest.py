@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+作文批量导入
+上传的文件（或ZIP压缩包）在请求内只流式写入批次目录并登记批次，立即返回批次ID；
+Celery任务在线程池中并行提取文本，按块用批量INSERT写入作文和批改记录（每块一个事务），
+超出用户剩余批改次数的文件不入库，再以chord提交批改任务。批次和每个文件的进度记录在 TaskStatus（related_type='batch'）中，
+文件的批改状态从作文状态缓存读取
+"""
+
+import os
+import time
+import shutil
+import logging
+import zipfile
+from uuid import uuid4
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, func
+
+from app.models.db import db
+from app.models.user import User, UserProfile
+from app.models.essay import Essay, EssayStatus, EssaySourceType
+from app.models.correction import Correction, CorrectionType, CorrectionStatus
+from app.models.task_status import TaskStatus, TaskState
+from app.utils.document_processor import ALLOWED_EXTENSIONS, extract_document
+
+logger = logging.getLogger(__name__)
+
+BATCH_TASK_NAME = 'batch_ingest'
+# 结果后端不支持chord时，finalize_batch 轮询批改进度的间隔（秒）和最多轮询次数
+FINALIZE_POLL_SECONDS = 30
+FINALIZE_POLL_MAX_RETRIES = 2880
+UNFINISHED_STATUSES = (EssayStatus.PENDING.value, EssayStatus.PROCESSING.value, EssayStatus.CORRECTING.value)
+ARCHIVE_EXTENSIONS = ('zip',)
+
+
+def _extension(filename: str) -> str:
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def _member_filename(info: zipfile.ZipInfo) -> str:
+    """ZIP成员文件名：未声明UTF-8时按GBK还原（Windows中文压缩包）"""
+    name = info.filename
+    if not info.flag_bits & 0x800:
+        try:
+            name = name.encode('cp437').decode('gbk')
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            pass
+    return os.path.basename(name.rstrip('/'))
+
+
+class BatchIngestService:
+    """作文批量导入服务"""
+
+    def __init__(self, storage_root: Optional[str] = None, max_files: int = 500,
+                 max_file_size: int = 5 * 1024 * 1024, max_archive_size: int = 200 * 1024 * 1024,
+                 workers: int = 8, insert_chunk_size: int = 200):
+        self.storage_root = storage_root
+        self.max_files = max_files
+        self.max_file_size = max_file_size
+        self.max_archive_size = max_archive_size
+        self.workers = workers
+        self.insert_chunk_size = insert_chunk_size
+
+    def _batch_dir(self, batch_id: str) -> str:
+        root = self.storage_root
+        if not root:
+            from flask import current_app
+            root = os.path.join(current_app.config.get('UPLOAD_FOLDER', 'uploads'), 'batches')
+        return os.path.join(os.path.abspath(root), batch_id)
+
+    @staticmethod
+    def _remaining_quota(user_id: int) -> Optional[int]:
+        """
+        用户剩余批改次数，规则与单篇上传相同
+
+        Returns:
+            Optional[int]: 剩余次数，管理员和订阅用户不限制时返回None
+        """
+        user = db.session.get(User, user_id)
+        if user is None:
+            return 0
+        if user.is_admin:
+            return None
+        if user.get_daily_remaining_corrections() <= 0:
+            return 0
+        remaining = user.get_remaining_corrections()
+        return None if remaining == float('inf') else int(remaining)
+
+    # ------------------------------------------------------------------
+    # 请求内：保存文件并登记批次
+    # ------------------------------------------------------------------
+
+    def create_batch(self, user_id: int, files: List[Any], author_name: Optional[str] = None,
+                     enqueue: bool = True) -> Dict[str, Any]:
+        """
+        保存上传文件并登记批次，提取和入库在后台任务中完成
+
+        Args:
+            user_id: 用户ID
+            files: 上传的文件对象（FileStorage）列表，可包含ZIP压缩包
+            author_name: 作者名
+            enqueue: 是否提交后台导入任务
+
+        Returns:
+            Dict: status、batch_id、accepted（已接收文件数）、rejected（被拒绝的文件及原因）
+        """
+        files = [f for f in files if f and f.filename]
+        if not files:
+            return {'status': 'error', 'message': '请至少选择一个文件上传'}
+        if len(files) > self.max_files:
+            return {'status': 'error', 'message': f'一次最多只能上传{self.max_files}个文件'}
+        if self._remaining_quota(user_id) == 0:
+            return {'status': 'error', 'message': '您的批改次数已用完，请升级会员或等待次月刷新'}
+
+        batch_id = str(uuid4())
+        batch_dir = self._batch_dir(batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+
+        entries = []
+        for index, file in enumerate(files):
+            entry = {'index': index, 'filename': file.filename, 'status': 'uploaded'}
+            ext = _extension(file.filename)
+            if ext not in ALLOWED_EXTENSIONS and ext not in ARCHIVE_EXTENSIONS:
+                entry.update(status='rejected', error=f'不支持的文件格式: .{ext}')
+                entries.append(entry)
+                continue
+
+            # 按序号命名，原始文件名只记录在元数据中；FileStorage.save 分块写盘
+            path = os.path.join(batch_dir, f'{index:04d}.{ext}')
+            file.save(path)
+            limit = self.max_archive_size if ext in ARCHIVE_EXTENSIONS else self.max_file_size
+            if os.path.getsize(path) > limit:
+                os.remove(path)
+                entry.update(status='rejected', error=f'文件超过大小限制（{limit // (1024 * 1024)}MB）')
+            else:
+                entry['path'] = path
+            entries.append(entry)
+
+        accepted = sum(1 for entry in entries if entry['status'] == 'uploaded')
+        rejected = [{'filename': e['filename'], 'error': e['error']} for e in entries if e['status'] == 'rejected']
+        if not accepted:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return {'status': 'error', 'message': '没有可处理的文件', 'rejected': rejected}
+
+        task_status = TaskStatus(
+            task_id=batch_id,
+            task_name=BATCH_TASK_NAME,
+            related_type='batch',
+            related_id=str(user_id),
+            status=TaskState.PENDING,
+            task_metadata={
+                'user_id': user_id,
+                'author_name': author_name,
+                'batch_dir': batch_dir,
+                'files': entries,
+                'progress': {'phase': 'uploaded', 'done': 0, 'total': accepted},
+            }
+        )
+        db.session.add(task_status)
+        db.session.commit()
+
+        if enqueue:
+            from app.tasks.batch_ingest_tasks import ingest_batch
+            ingest_batch.apply_async(args=[batch_id])
+        logger.info(f"批次已登记: {batch_id}, 用户: {user_id}, 文件: {accepted}, 拒绝: {len(rejected)}")
+        return {'status': 'success', 'batch_id': batch_id, 'accepted': accepted, 'rejected': rejected}
+
+    # ------------------------------------------------------------------
+    # 后台任务：展开压缩包、并行提取、批量入库、提交批改
+    # ------------------------------------------------------------------
+
+    def _expand(self, batch_dir: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """展开ZIP压缩包，返回待提取的文件条目（压缩包成员作为新条目追加）"""
+        items = []
+        for entry in list(entries):
+            if entry['status'] != 'uploaded':
+                continue
+            if _extension(entry['filename']) not in ARCHIVE_EXTENSIONS:
+                items.append(entry)
+                continue
+            try:
+                with zipfile.ZipFile(entry['path']) as archive:
+                    members = [info for info in archive.infolist()
+                               if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+                               and _extension(info.filename) in ALLOWED_EXTENSIONS]
+                    entry['status'] = 'expanded'
+                    entry['members'] = len(members)
+                    for number, info in enumerate(members):
+                        member = {'index': f"{entry['index']}.{number}", 'filename': _member_filename(info),
+                                  'archive': entry['filename'], 'status': 'uploaded'}
+                        if len(items) >= self.max_files:
+                            member.update(status='rejected', error=f'超过单批{self.max_files}个文件的上限')
+                        elif info.file_size > self.max_file_size:
+                            member.update(status='rejected', error='文件超过大小限制')
+                        else:
+                            path = os.path.join(batch_dir, f"{entry['index']:04d}_{number:04d}.{_extension(info.filename)}")
+                            with archive.open(info) as source, open(path, 'wb') as target:
+                                shutil.copyfileobj(source, target, 64 * 1024)
+                            member['path'] = path
+                            items.append(member)
+                        entries.append(member)
+            except (zipfile.BadZipFile, OSError) as e:
+                entry.update(status='failed', error=f'无法读取压缩包: {str(e)}')
+        return items
+
+    def _extract_all(self, items: List[Dict[str, Any]], progress_callback=None) -> None:
+        """在线程池中并行提取文本，结果写回条目（content/title 或 error）"""
+        done = 0
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            futures = {executor.submit(extract_document, item['path'], item['filename']): item for item in items}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    item['content'], item['title'] = future.result()
+                    item['status'] = 'extracted'
+                except Exception as e:
+                    item.update(status='failed', error=str(e))
+                done += 1
+                if progress_callback:
+                    progress_callback(done, len(items))
+
+    def _insert_chunk(self, user_id: int, author_name: Optional[str], chunk: List[Dict[str, Any]],
+                      charge_quota: bool = False) -> List[int]:
+        """
+        一个事务内批量插入一块作文和对应的批改记录，返回作文ID（与chunk顺序一致）
+
+        批改记录的 task_id 预先生成并写回条目，提交批改任务时使用同一ID；
+        charge_quota 为True时在同一事务中扣减用户的月度批改次数
+        """
+        now = datetime.utcnow()
+        for item in chunk:
+            item['task_id'] = str(uuid4())
+        essay_rows = [{
+            'title': (item['title'] or os.path.splitext(item['filename'])[0])[:200],
+            'content': item['content'],
+            'preview': Essay.make_preview(item['content']),
+            'word_count': len(item['content']),
+            'user_id': user_id,
+            'author_name': author_name,
+            'status': EssayStatus.PENDING.value,
+            'source_type': EssaySourceType.upload.value,
+            'created_at': now,
+            'updated_at': now,
+        } for item in chunk]
+        try:
+            result = db.session.execute(
+                insert(Essay).returning(Essay.id, sort_by_parameter_order=True), essay_rows)
+            essay_ids = [row.id for row in result]
+            db.session.execute(insert(Correction), [{
+                'essay_id': essay_id,
+                'type': CorrectionType.AI.value,
+                'status': CorrectionStatus.PENDING.value,
+                'task_id': item['task_id'],
+                'created_at': now,
+                'updated_at': now,
+            } for item, essay_id in zip(chunk, essay_ids)])
+            if charge_quota:
+                db.session.query(UserProfile).filter(UserProfile.user_id == user_id).update(
+                    {UserProfile.essay_monthly_used: UserProfile.essay_monthly_used + len(chunk)},
+                    synchronize_session=False)
+            db.session.commit()
+            return essay_ids
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _enqueue(self, batch_id: str, items: List[Dict[str, Any]], finalizer_id: str) -> None:
+        """
+        以chord提交批改任务（任务ID与批改记录的task_id一致），全部结束后回调 finalize_batch；
+        结果后端不支持chord时退回group，另行提交轮询模式的 finalize_batch 等待批改结束
+
+        Args:
+            batch_id: 批次ID
+            items: 已入库的条目（essay_id、task_id）
+            finalizer_id: finalize_batch 的任务ID（预先记录在批次元数据中）
+        """
+        from celery import chord, group
+        from app.tasks.correction_tasks import process_essay_correction
+        from app.tasks.batch_ingest_tasks import finalize_batch
+
+        header = [process_essay_correction.si(item['essay_id']).set(task_id=item['task_id']) for item in items]
+        callback = finalize_batch.si(batch_id).set(task_id=finalizer_id)
+        # 任一批改任务失败时chord不会调用回调，由错误回调照常汇总，批次不会停留在批改阶段
+        callback.link_error(finalize_batch.si(batch_id))
+        try:
+            chord(header)(callback)
+        except NotImplementedError as e:
+            logger.warning(f"结果后端不支持chord，改用group提交并轮询汇总: {str(e)}")
+            group(header).apply_async()
+            finalize_batch.apply_async(args=[batch_id], kwargs={'poll': True}, task_id=finalizer_id,
+                                       countdown=FINALIZE_POLL_SECONDS)
+
+    def ingest(self, batch_id: str, enqueue: bool = True) -> Dict[str, Any]:
+        """
+        执行批次导入：展开压缩包、并行提取、批量入库并提交批改任务
+
+        Returns:
+            Dict: status、inserted、failed
+        """
+        task_status = TaskStatus.query.filter_by(task_id=batch_id).first()
+        if not task_status:
+            return {'status': 'error', 'message': f'批次不存在: {batch_id}'}
+        metadata = dict(task_status.task_metadata or {})
+        entries = [dict(entry) for entry in metadata.get('files', [])]
+        start_time = time.time()
+
+        def save(phase, done=0, total=0, state=TaskState.RUNNING, result=None):
+            task_status.status = state
+            task_status.task_metadata = dict(metadata, files=entries, progress={
+                'phase': phase, 'done': done, 'total': total, 'updated_at': datetime.utcnow().isoformat()})
+            if result is not None:
+                task_status.result = result
+                task_status.completed_at = datetime.utcnow()
+            db.session.commit()
+
+        task_status.started_at = datetime.utcnow()
+        save('extracting')
+        items = self._expand(metadata['batch_dir'], entries)
+
+        last_saved = {'time': 0.0}
+
+        def extraction_progress(done, total):
+            if time.time() - last_saved['time'] >= 2.0 or done == total:
+                last_saved['time'] = time.time()
+                save('extracting', done, total)
+
+        self._extract_all(items, extraction_progress)
+
+        extracted = [item for item in items if item['status'] == 'extracted']
+        # 入库前检查剩余批改次数，超出部分不入库
+        quota = self._remaining_quota(metadata['user_id'])
+        if quota is not None and len(extracted) > quota:
+            for item in extracted[quota:]:
+                item.update(status='rejected', error='超出剩余批改次数')
+            extracted = extracted[:quota]
+        essay_ids = []
+        queued = []
+        for offset in range(0, len(extracted), self.insert_chunk_size):
+            chunk = extracted[offset:offset + self.insert_chunk_size]
+            try:
+                ids = self._insert_chunk(metadata['user_id'], metadata.get('author_name'), chunk,
+                                         charge_quota=quota is not None)
+            except Exception as e:
+                logger.error(f"批次 {batch_id} 写入作文失败: {str(e)}")
+                for item in chunk:
+                    item.pop('task_id', None)
+                    item.update(status='failed', error='保存作文失败')
+                continue
+            for item, essay_id in zip(chunk, ids):
+                item.update(status='queued', essay_id=essay_id)
+            essay_ids.extend(ids)
+            queued.extend(chunk)
+            save('saving', len(essay_ids), len(extracted))
+
+        # 正文已入库，批次目录随后删除，不再保留在元数据中
+        for entry in entries:
+            entry.pop('content', None)
+            entry.pop('title', None)
+            entry.pop('path', None)
+        shutil.rmtree(metadata['batch_dir'], ignore_errors=True)
+
+        failed = sum(1 for entry in entries if entry['status'] in ('failed', 'rejected'))
+        summary = {'inserted': len(essay_ids), 'failed': failed,
+                   'extraction_seconds': round(time.time() - start_time, 3)}
+        if not essay_ids:
+            save('finished', 0, 0, state=TaskState.FAILED, result=dict(summary, status='error'))
+            return dict(summary, status='error', message='没有成功提取的文件')
+
+        # 先提交批改阶段的状态再提交任务：回调可能在本函数返回前就已完成汇总，不能再被覆盖
+        finalizer_id = str(uuid4()) if enqueue else None
+        metadata['finalizer_id'] = finalizer_id
+        save('correcting', 0, len(essay_ids))
+        if enqueue:
+            self._enqueue(batch_id, queued, finalizer_id)
+        logger.info(f"批次 {batch_id} 已入库 {len(essay_ids)} 篇作文，失败 {failed} 个文件")
+        return dict(summary, status='success')
+
+    def finalize(self, batch_id: str, wait_for_pending: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        批改任务全部结束后汇总批次结果
+
+        Args:
+            batch_id: 批次ID
+            wait_for_pending: 为True时若仍有作文未批改完成则不汇总（轮询模式）
+
+        Returns:
+            Optional[Dict]: 汇总结果；轮询模式下仍有未完成的作文时返回None
+        """
+        task_status = TaskStatus.query.filter_by(task_id=batch_id).first()
+        if not task_status:
+            return {'status': 'error', 'message': f'批次不存在: {batch_id}'}
+        metadata = task_status.task_metadata or {}
+        essay_ids = [entry['essay_id'] for entry in metadata.get('files', []) if entry.get('essay_id')]
+        counts = dict(db.session.query(Essay.status, func.count(Essay.id))
+                      .filter(Essay.id.in_(essay_ids)).group_by(Essay.status).all()) if essay_ids else {}
+        if wait_for_pending and any(status in counts for status in UNFINISHED_STATUSES):
+            return None
+        result = {'status': 'success', 'essays': len(essay_ids), 'statuses': counts}
+        task_status.status = TaskState.SUCCESS
+        task_status.completed_at = datetime.utcnow()
+        task_status.result = result
+        task_status.task_metadata = dict(metadata, progress={
+            'phase': 'finished', 'done': len(essay_ids), 'total': len(essay_ids),
+            'updated_at': datetime.utcnow().isoformat()})
+        db.session.commit()
+        return result
+
+    # ------------------------------------------------------------------
+    # 进度查询
+    # ------------------------------------------------------------------
+
+    def get_batch_status(self, batch_id: str, user_id: int, is_admin: bool = False) -> Dict[str, Any]:
+        """
+        获取批次进度，每个文件的批改状态从作文状态缓存读取
+
+        Returns:
+            Dict: status、batch（phase、progress、files、counts）
+        """
+        from app.core.correction.status_cache import essay_status_cache
+
+        task_status = TaskStatus.query.filter_by(task_id=batch_id, task_name=BATCH_TASK_NAME).first()
+        if not task_status:
+            return {'status': 'error', 'message': f'批次不存在: {batch_id}', 'code': 404}
+        metadata = task_status.task_metadata or {}
+        if metadata.get('user_id') != user_id and not is_admin:
+            return {'status': 'error', 'message': '没有权限查看此批次', 'code': 403}
+
+        files = []
+        counts: Dict[str, int] = {}
+        for entry in metadata.get('files', []):
+            if entry['status'] == 'expanded':
+                continue
+            item = {key: entry.get(key) for key in ('index', 'filename', 'archive', 'status', 'error', 'essay_id')}
+            if entry.get('essay_id'):
+                record = essay_status_cache.get_status(entry['essay_id'])
+                if record:
+                    item['status'] = record.get('status')
+            counts[item['status']] = counts.get(item['status'], 0) + 1
+            files.append(item)
+
+        return {
+            'status': 'success',
+            'batch': {
+                'batch_id': batch_id,
+                'state': task_status.status,
+                'progress': metadata.get('progress'),
+                'counts': counts,
+                'files': files,
+                'created_at': task_status.created_at.isoformat() if task_status.created_at else None,
+                'completed_at': task_status.completed_at.isoformat() if task_status.completed_at else None,
+            }
+        }
+
+
+def create_batch_ingest_service_from_env() -> BatchIngestService:
+    """根据环境变量创建批量导入服务"""
+    return BatchIngestService(
+        storage_root=os.environ.get('BATCH_UPLOAD_DIR') or None,
+        max_files=int(os.environ.get('BATCH_UPLOAD_MAX_FILES', 500)),
+        max_file_size=int(os.environ.get('BATCH_UPLOAD_MAX_FILE_SIZE', 5 * 1024 * 1024)),
+        max_archive_size=int(os.environ.get('BATCH_UPLOAD_MAX_ARCHIVE_SIZE', 200 * 1024 * 1024)),
+        workers=int(os.environ.get('BATCH_INGEST_WORKERS', 8)),
+        insert_chunk_size=int(os.environ.get('BATCH_INGEST_CHUNK_SIZE', 200)),
+    )
+
+
+batch_ingest_service = create_batch_ingest_service_from_env()
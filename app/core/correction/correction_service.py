@@ -18,6 +18,7 @@ import re
 import random
 import signal
 
+from sqlalchemy import or_
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm.exc import NoResultFound
 from dependency_injector.wiring import inject, Provide
@@ -29,17 +30,25 @@ from app.models.essay import Essay, EssayStatus
 from app.models.user import User, MembershipLevel
 from app.models.db import db
 from app.models.correction import Correction, CorrectionStatus, CorrectionType
+from app.core.db.query_profiles import (
+    essay_listing_options, essay_listing_columns, essay_detail_options, correction_detail_options,
+    encode_keyset_cursor, decode_keyset_cursor, keyset_before
+)
+from app.core.db.json_types import unwrap_json_value
+from app.core.search import fulltext_index
+from app.core.analytics.usage_analytics import UsageAnalytics
 from app.core.correction.ai_corrector import AICorrectionService
 from app.core.ai.open_ai_client import OpenAIClient
 from app.core.correction.report_generator import ReportGenerator
 from app.core.correction.correction_logger import correction_logger
+from app.core.monitoring.tracing import span, traced, bind_essay, trace_headers
 from app.extensions import db
 from app.utils.exceptions import (
     ResourceNotFoundError, ValidationError, 
     LimitExceededError, ServiceUnavailableError, PermissionDeniedError, BusinessError
 )
 # 导入接口定义
-from app.core.correction.interface import ICorrectionService
+from app.core.correction.interface import ICorrectionService, CorrectionResult
 
 logger = logging.getLogger(__name__)
 
@@ -225,6 +234,7 @@ class CorrectionService(ICorrectionService):
         
         return correction
     
+    @traced('submit')
     def submit_essay(self, user_id: int, title: str, content: str, grade: str = 'junior') -> Dict[str, Any]:
         """
         提交作文进行批改
@@ -277,6 +287,7 @@ class CorrectionService(ICorrectionService):
                 db.session.flush()  # 获取ID但不提交事务
                 
                 essay_id = essay.id
+                bind_essay(essay_id)
                 logger.info(f"创建作文记录，ID: {essay_id}")
                 
                 # 验证记录是否成功创建
@@ -287,7 +298,8 @@ class CorrectionService(ICorrectionService):
                 correction = self._get_or_create_correction(essay_id)
                 
                 # 提交事务以保证数据持久化
-                db.session.commit()
+                with span('db_write', operation='create_essay'):
+                    db.session.commit()
                 logger.info(f"已提交数据库事务，再次检查Essay ID: {essay_id}是否存在")
                 
                 # 验证记录是否成功保存
@@ -314,7 +326,11 @@ class CorrectionService(ICorrectionService):
                 task_result = None
                 try:
                     # 显式指定队列为 'correction'，确保发送到正确的队列
-                    task_result = process_essay_correction.apply_async(args=[essay_id], queue='correction')
+                    # 链路上下文和入队时间随任务头传给worker
+                    with span('enqueue'):
+                        task_result = process_essay_correction.apply_async(
+                            args=[essay_id], queue='correction', headers=trace_headers()
+                        )
                     task_id = task_result.id
                     logger.info(f"process_essay_correction.apply_async 调用成功，task_id: {task_id}")
                 except Exception as task_send_error:
@@ -344,6 +360,9 @@ class CorrectionService(ICorrectionService):
                 
                 logger.info(f"成功提交作文批改任务，essay_id: {essay_id}, task_id: {task_id}")
                 
+                # 记录使用事件并累加会员用量（进入写回缓冲）
+                UsageAnalytics.log_usage_event(user_id, 'essay_submit', resource_id=essay_id)
+                
             except SQLAlchemyError as db_error:
                 db.session.rollback()
                 logger.error(f"数据库操作失败: {str(db_error)}", exc_info=True)
@@ -373,6 +392,7 @@ class CorrectionService(ICorrectionService):
                 'message': f'提交作文时发生错误: {str(e)}'
             }
     
+    @traced('submit')
     def submit_essay_file(self, user_id: int, title: str, file_data, filename: str) -> Dict[str, Any]:
         """
         上传文件提交作文进行批改
@@ -406,7 +426,8 @@ class CorrectionService(ICorrectionService):
                 }
             
             # 处理文件
-            file_result = self.file_handler.process_file(file_data, filename)
+            with span('extraction', filename=filename):
+                file_result = self.file_handler.process_file(file_data, filename)
             if not file_result:
                 return {'status': 'error', 'message': '不支持的文件类型或处理文件时出错'}
             
@@ -428,10 +449,12 @@ class CorrectionService(ICorrectionService):
             )
             
             db.session.add(essay)
-            db.session.commit()
+            with span('db_write', operation='create_essay'):
+                db.session.commit()
             
             # 验证记录是否成功保存
             essay_id = essay.id
+            bind_essay(essay_id)
             check_essay = Essay.query.filter_by(id=essay_id).first()
             if not check_essay:
                 logger.error(f"严重错误：数据库提交后无法找到Essay ID: {essay_id}")
@@ -456,14 +479,17 @@ class CorrectionService(ICorrectionService):
             # 添加延迟，确保数据完全写入数据库
             time.sleep(0.5)
             
-            # 异步处理批改任务
-            process_essay_correction.delay(essay.id)
+            # 异步处理批改任务，链路上下文和入队时间随任务头传给worker
+            with span('enqueue'):
+                process_essay_correction.apply_async(args=[essay.id], headers=trace_headers())
             
             # 返回结果
             result = self._create_success_result(essay, None)
             
             # 记录提交成功
             logger.info(f"用户 {user_id} 以文件上传方式提交作文成功，ID: {essay.id}")
+            UsageAnalytics.log_usage_event(user_id, 'essay_submit', resource_id=essay.id,
+                                           metadata={'source': 'upload'})
             
             return result
         
@@ -507,14 +533,18 @@ class CorrectionService(ICorrectionService):
                 'updated_at': essay.updated_at.isoformat() if essay.updated_at else None
             }
             
-            # 如果已批改完成，添加批改结果
+            # 如果已批改完成，添加批改结果（以Correction.results为准）
             if essay.status == EssayStatus.COMPLETED.value:
+                correction = Correction.query.options(*correction_detail_options()) \
+                    .filter_by(essay_id=essay.id, is_deleted=False) \
+                    .order_by(Correction.created_at.desc()).first()
+                result_view = CorrectionResult.from_correction(correction, essay)
                 essay_data.update({
-                    'score': essay.score,
-                    'corrected_content': essay.corrected_content,
-                    'comments': essay.comments,
-                    'error_analysis': essay.error_analysis,
-                    'improvement_suggestions': essay.improvement_suggestions
+                    'score': result_view.score,
+                    'corrected_content': result_view.content.get('corrected_content'),
+                    'comments': result_view.comments,
+                    'error_analysis': result_view.error_analysis,
+                    'improvement_suggestions': result_view.improvement_suggestions
                 })
             
             return {
@@ -542,7 +572,7 @@ class CorrectionService(ICorrectionService):
         """
         try:
             # 构建查询
-            query = Essay.query.filter(Essay.user_id == user_id)
+            query = Essay.query.options(*essay_listing_options()).filter(Essay.user_id == user_id)
             
             # 根据状态过滤
             if status:
@@ -583,6 +613,84 @@ class CorrectionService(ICorrectionService):
             logger.error(f"获取用户作文列表时发生错误: {str(e)}", exc_info=True)
             return {'status': 'error', 'message': f'获取用户作文列表时发生错误: {str(e)}'}
     
+    def get_user_essay_history(self, user_id: int, cursor: Optional[str] = None, limit: int = 20,
+                               status: Optional[str] = None, keyword: Optional[str] = None) -> Dict[str, Any]:
+        """
+        按创建时间倒序键集分页获取用户作文历史，只查询列表列（含预览），不加载正文
+        
+        指定 keyword 时在用户自己的作文中全文检索（标题、正文、批改反馈），按相关度排序，
+        游标为结果偏移量，每篇作文附带高亮的标题和片段
+        
+        Args:
+            user_id: 用户ID
+            cursor: 上一页返回的 next_cursor，为空时从最新一篇（或最相关的一篇）开始
+            limit: 每页数量（1-100）
+            status: 作文状态过滤
+            keyword: 检索关键词
+        
+        Returns:
+            Dict: essays 列表、next_cursor（没有更多时为None）
+        """
+        try:
+            limit = max(1, min(int(limit), 100))
+            query = db.session.query(*essay_listing_columns()).filter(
+                Essay.user_id == user_id, Essay.created_at.isnot(None))
+            if status:
+                query = query.filter(Essay.status == status)
+            
+            matches = fulltext_index.essay_matches(keyword, user_id=user_id) if keyword else None
+            if matches is not None:
+                offset = 0
+                if cursor:
+                    if not cursor.isdigit():
+                        return {'status': 'error', 'message': '无效的分页游标'}
+                    offset = int(cursor)
+                rows = query.join(matches, matches.c.essay_id == Essay.id).order_by(
+                    matches.c.rank, Essay.id.desc()).offset(offset).limit(limit + 1).all()
+                next_cursor = str(offset + limit) if len(rows) > limit else None
+            else:
+                if keyword:
+                    query = query.filter(or_(Essay.title.like(f'%{keyword}%'), Essay.content.like(f'%{keyword}%')))
+                if cursor:
+                    position = decode_keyset_cursor(cursor)
+                    if position is None:
+                        return {'status': 'error', 'message': '无效的分页游标'}
+                    query = query.filter(keyset_before(Essay.created_at, Essay.id, position))
+                
+                # 多取一行判断是否还有下一页
+                rows = query.order_by(Essay.created_at.desc(), Essay.id.desc()).limit(limit + 1).all()
+                next_cursor = encode_keyset_cursor(rows[limit - 1].created_at, rows[limit - 1].id) \
+                    if len(rows) > limit else None
+            rows = rows[:limit]
+            highlights = fulltext_index.highlights([row.id for row in rows], keyword) if keyword else {}
+            
+            essays = [{
+                'id': row.id,
+                'title': row.title,
+                'author_name': row.author_name,
+                'status': row.status,
+                'score': row.score,
+                'word_count': row.word_count or 0,
+                'source_type': row.source_type,
+                'correction_count': row.correction_count or 0,
+                'preview': row.preview or '',
+                'created_at': row.created_at.isoformat() if row.created_at else None,
+                'created_at_display': row.created_at.strftime('%Y-%m-%d %H:%M') if row.created_at else '',
+            } for row in rows]
+            for essay in essays:
+                if essay['id'] in highlights:
+                    essay['highlight'] = highlights[essay['id']]
+            
+            return {
+                'status': 'success',
+                'essays': essays,
+                'next_cursor': next_cursor
+            }
+        
+        except Exception as e:
+            logger.error(f"获取用户作文历史时发生错误: {str(e)}", exc_info=True)
+            return {'status': 'error', 'message': f'获取用户作文历史时发生错误: {str(e)}'}
+    
     def delete_essay(self, essay_id: int, user_id: int) -> Dict[str, Any]:
         """
         删除作文
@@ -641,8 +749,8 @@ class CorrectionService(ICorrectionService):
             Dict: 包含作文和批改信息的字典
         """
         try:
-            # 1. 获取 Essay 对象
-            essay = Essay.query.get(essay_id)
+            # 1. 获取 Essay 对象（详情需要加载正文）
+            essay = Essay.query.options(*essay_detail_options(with_user=False)).get(essay_id)
             if not essay:
                 raise ResourceNotFoundError(f"未找到作文 ID: {essay_id}")
             
@@ -667,7 +775,9 @@ class CorrectionService(ICorrectionService):
             }
 
             # 4. 获取 Correction 对象
-            correction = Correction.query.filter_by(essay_id=essay_id, is_deleted=False).order_by(Correction.created_at.desc()).first()
+            correction = Correction.query.options(*correction_detail_options()) \
+                .filter_by(essay_id=essay_id, is_deleted=False) \
+                .order_by(Correction.created_at.desc()).first()
             
             # 5. 合并 Correction 信息
             if correction:
@@ -679,33 +789,15 @@ class CorrectionService(ICorrectionService):
                 # 添加批改结果（如果已完成且存在）
                 if correction.status == CorrectionStatus.COMPLETED.value and correction.results:
                     try:
-                        # 尝试解析JSON，兼容直接存储字典的情况
-                        if isinstance(correction.results, str):
-                            detailed_results = json.loads(correction.results)
-                        elif isinstance(correction.results, dict):
-                            detailed_results = correction.results
-                        else:
-                            detailed_results = {}
-                            logger.warning(f"批改结果类型未知: {type(correction.results)}, 作文ID: {essay_id}")
-
-                        # 更新 essay_data 中的批改信息字段
+                        # Correction.results 是批改结果的唯一来源（存储层已完成解码）
+                        result_view = CorrectionResult.from_correction(correction, essay)
                         essay_data.update({
-                            'score': correction.score,
-                            'comments': correction.comments,
-                            'error_analysis': correction.error_analysis, # 可能是JSON字符串
-                            'improvement_suggestions': correction.improvement_suggestions,
-                            'detailed_results': detailed_results # 添加解析后的详细结果
+                            'score': result_view.score,
+                            'comments': result_view.comments,
+                            'error_analysis': result_view.error_analysis,
+                            'improvement_suggestions': result_view.improvement_suggestions,
+                            'detailed_results': result_view.content
                         })
-                        
-                        # 确保 Essay 模型中的字段也被填充 (虽然批改任务应该已经做了，这里再检查一遍)
-                        if essay.score is None and correction.score is not None:
-                             essay_data['score'] = correction.score # 使用Correction的分数（如果Essay没有）
-                        # 可以根据需要添加对 comments, error_analysis, improvement_suggestions 的类似检查
-
-                    except json.JSONDecodeError:
-                        logger.warning(f"解析批改结果JSON失败，作文ID: {essay_id}")
-                        essay_data['detailed_results'] = {} # 返回空字典
-                        essay_data['results_parsing_error'] = True
                     except Exception as e:
                         logger.error(f"处理批改结果时出错: {str(e)}", exc_info=True)
                         essay_data['detailed_results'] = {} # 返回空字典
@@ -740,6 +832,7 @@ class CorrectionService(ICorrectionService):
             return {'status': 'error', 'message': f'获取详细作文信息时发生内部错误'}
 
     @correction_logger.monitor_correction
+    @traced('perform_correction')
     def perform_correction(self, essay_id: Union[int, Essay]) -> Dict[str, Any]:
         """
         执行作文批改
@@ -810,7 +903,10 @@ class CorrectionService(ICorrectionService):
                 # signal.alarm(correction_timeout)
                 
                 # 调用AI批改
-                correction_data = self._perform_ai_correction(essay.content)
+                with span('ai_correction') as ai_span:
+                    correction_data = self._perform_ai_correction(essay.content, **self._generation_hints(essay))
+                    if correction_data.get("status") != "success":
+                        ai_span['outcome'] = 'error'
                 
                 # 批改完成，取消超时警报
                 # signal.alarm(0)
@@ -861,90 +957,83 @@ class CorrectionService(ICorrectionService):
                 }
             
             # 更新作文和批改记录
-            try:
-                # 基本信息
-                essay.score = result_data.get("score", 0)
-                essay.corrected_content = essay.content  # 保持原文不变
-                essay.comments = result_data.get("feedback", "")
+            with span('save_result') as save_span:
+                try:
+                    # 基本信息（作文表只保留列表展示需要的摘要字段）
+                    essay.score = result_data.get("score", 0)
+                    essay.comments = result_data.get("feedback", "")
                 
-                # 错误分析
-                error_analysis = {}
-                if isinstance(result_data.get("error_analysis"), str):
-                    try:
-                        error_analysis = json.loads(result_data.get("error_analysis", "{}"))
-                    except json.JSONDecodeError:
+                    # 错误分析：统一为原生JSON对象，避免二次编码
+                    error_analysis = unwrap_json_value(result_data.get("error_analysis")) or {}
+                    if not isinstance(error_analysis, dict):
                         logger.warning(f"解析错误分析JSON失败，使用空对象")
                         error_analysis = {}
-                else:
-                    error_analysis = result_data.get("error_analysis", {})
+                    result_data["error_analysis"] = error_analysis
                 
-                essay.error_analysis = json.dumps(error_analysis, ensure_ascii=False)
+                    # 处理improvement_suggestions字段，确保格式一致性
+                    improvement_suggestions = result_data.get("improvement_suggestions", "")
+                    if not improvement_suggestions and isinstance(result_data.get("raw_result"), dict):
+                        # 尝试从原始结果中提取
+                        raw_result = result_data.get("raw_result", {})
+                        improvement_suggestions = raw_result.get("improvement_suggestions", raw_result.get("写作建议", ""))
+                        logger.info(f"从原始结果中提取improvement_suggestions")
                 
-                # 处理improvement_suggestions字段，确保格式一致性
-                improvement_suggestions = result_data.get("improvement_suggestions", "")
-                if not improvement_suggestions and isinstance(result_data.get("raw_result"), dict):
-                    # 尝试从原始结果中提取
-                    raw_result = result_data.get("raw_result", {})
-                    improvement_suggestions = raw_result.get("improvement_suggestions", raw_result.get("写作建议", ""))
-                    logger.info(f"从原始结果中提取improvement_suggestions")
+                    # 确保是字符串格式
+                    if isinstance(improvement_suggestions, (list, dict)):
+                        try:
+                            improvement_suggestions = json.dumps(improvement_suggestions, ensure_ascii=False)
+                            logger.info(f"将improvement_suggestions从复杂结构转换为JSON字符串")
+                        except Exception as e:
+                            logger.warning(f"转换improvement_suggestions格式失败: {str(e)}，使用空字符串")
+                            improvement_suggestions = ""
                 
-                # 确保是字符串格式
-                if isinstance(improvement_suggestions, (list, dict)):
-                    try:
-                        improvement_suggestions = json.dumps(improvement_suggestions, ensure_ascii=False)
-                        logger.info(f"将improvement_suggestions从复杂结构转换为JSON字符串")
-                    except Exception as e:
-                        logger.warning(f"转换improvement_suggestions格式失败: {str(e)}，使用空字符串")
-                        improvement_suggestions = ""
+                    result_data["improvement_suggestions"] = improvement_suggestions
                 
-                essay.improvement_suggestions = improvement_suggestions
+                    # 分项得分
+                    details = result_data.get("details", {})
+                    essay.content_score = details.get("content_score", 0)
+                    essay.language_score = details.get("language_score", 0)
+                    essay.structure_score = details.get("structure_score", 0)
+                    essay.writing_score = details.get("writing_score", 0)
                 
-                # 分项得分
-                details = result_data.get("details", {})
-                essay.content_score = details.get("content_score", 0)
-                essay.language_score = details.get("language_score", 0)
-                essay.structure_score = details.get("structure_score", 0)
-                essay.writing_score = details.get("writing_score", 0)
+                    # 批改记录保存完整结果（原生JSON，大结果由存储层压缩）
+                    correction.results = result_data
+                    correction.score = essay.score
+                    correction.completed_at = datetime.datetime.now()
                 
-                # 同步更新批改记录
-                correction.results = json.dumps(result_data, ensure_ascii=False)
-                correction.score = essay.score
-                correction.comments = essay.comments
-                correction.error_analysis = essay.error_analysis
-                correction.improvement_suggestions = essay.improvement_suggestions
-                correction.completed_at = datetime.datetime.now()
+                    # 使用安全的状态转换机制将状态更新为已完成
+                    success = self.transition_essay_state(
+                        essay.id,
+                        EssayStatus.CORRECTING.value,
+                        EssayStatus.COMPLETED.value
+                    )
                 
-                # 使用安全的状态转换机制将状态更新为已完成
-                success = self.transition_essay_state(
-                    essay.id,
-                    EssayStatus.CORRECTING.value,
-                    EssayStatus.COMPLETED.value
-                )
+                    if not success:
+                        logger.error(f"无法将作文状态转换为已完成: {essay_id}")
+                        save_span['outcome'] = 'error'
+                        return {
+                            "status": "error",
+                            "message": "无法更新作文状态为已完成"
+                        }
                 
-                if not success:
-                    logger.error(f"无法将作文状态转换为已完成: {essay_id}")
+                    logger.info(f"AI批改完成，作文ID: {essay.id}, 得分: {essay.score}, 耗时: {time.time() - start_time:.2f}秒")
                     return {
-                        "status": "error",
-                        "message": "无法更新作文状态为已完成"
+                        "status": "success",
+                        "message": "批改成功",
+                        "essay_id": essay.id,
+                        "score": essay.score
                     }
+                except Exception as update_err:
+                    logger.error(f"更新作文信息失败 [ID: {essay.id}]: {str(update_err)}")
+                    logger.error(traceback.format_exc())
                 
-                logger.info(f"AI批改完成，作文ID: {essay.id}, 得分: {essay.score}, 耗时: {time.time() - start_time:.2f}秒")
-                return {
-                    "status": "success",
-                    "message": "批改成功",
-                    "essay_id": essay.id,
-                    "score": essay.score
-                }
-            except Exception as update_err:
-                logger.error(f"更新作文信息失败 [ID: {essay.id}]: {str(update_err)}")
-                logger.error(traceback.format_exc())
-                
-                # 尝试记录错误状态
-                self._set_error_status(essay, correction, f"更新作文信息失败: {str(update_err)}")
-                return {
-                    "status": "error",
-                    "message": f"更新作文信息失败: {str(update_err)}"
-                }
+                    # 尝试记录错误状态
+                    save_span['outcome'] = 'error'
+                    self._set_error_status(essay, correction, f"更新作文信息失败: {str(update_err)}")
+                    return {
+                        "status": "error",
+                        "message": f"更新作文信息失败: {str(update_err)}"
+                    }
         except Exception as e:
             correction_time = time.time() - start_time
             logger.error(f"批改过程中发生异常 [ID: {essay_id}]: {str(e)}, 耗时: {correction_time:.2f}秒")
@@ -1046,7 +1135,9 @@ class CorrectionService(ICorrectionService):
             
             # 返回批改结果
             try:
-                results = json.loads(correction.results) if isinstance(correction.results, str) else correction.results
+                results = unwrap_json_value(correction.results)
+                if not isinstance(results, dict):
+                    raise json.JSONDecodeError("批改结果不是JSON对象", str(results)[:50], 0)
                 return {
                     "status": "success",
                     "essay_id": essay_id,
@@ -1087,34 +1178,34 @@ class CorrectionService(ICorrectionService):
             "updated_at": essay.updated_at.isoformat() if essay.updated_at else None
         }
         
-        # 如果作文状态为已完成，添加批改结果
-        if essay.status == EssayStatus.COMPLETED.value:
-            essay_data.update({
-                "score": essay.score,
-                "corrected_text": essay.corrected_content,  # 保持与前端兼容
-                "feedback": essay.comments,  # 保持与前端兼容
-                "errors": essay.error_analysis,  # 保持与前端兼容
-                "improvement_suggestions": essay.improvement_suggestions
-            })
-        
         # 获取最新的批改记录
-        correction = Correction.query.filter_by(
+        correction = Correction.query.options(*correction_detail_options()).filter_by(
             essay_id=essay.id,
             is_deleted=False
         ).order_by(Correction.created_at.desc()).first()
         
+        # 如果作文状态为已完成，添加批改结果
+        if essay.status == EssayStatus.COMPLETED.value:
+            result_view = CorrectionResult.from_correction(correction, essay)
+            essay_data.update({
+                "score": result_view.score,
+                "corrected_text": result_view.content.get("corrected_content"),  # 保持与前端兼容
+                "feedback": result_view.comments,  # 保持与前端兼容
+                "errors": result_view.error_analysis,  # 保持与前端兼容
+                "improvement_suggestions": result_view.improvement_suggestions
+            })
+        
         if correction:
             essay_data["correction_id"] = correction.id
             essay_data["correction_status"] = correction.status
             
             # 如果批改完成，添加详细结果
             if correction.status == 'completed':
-                try:
-                    detailed_results = json.loads(correction.results) if correction.results else {}
-                    essay_data["detailed_results"] = detailed_results
-                except json.JSONDecodeError:
+                detailed_results = unwrap_json_value(correction.results) if correction.results else {}
+                if not isinstance(detailed_results, dict):
                     logger.warning(f"无法解析批改详细结果 JSON，作文ID: {essay.id}")
-                    essay_data["detailed_results"] = {}
+                    detailed_results = {}
+                essay_data["detailed_results"] = detailed_results
         
         return {
             "status": "success",
@@ -1218,12 +1309,37 @@ class CorrectionService(ICorrectionService):
                 "essay_id": essay_id
             }
 
-    def _perform_ai_correction(self, essay_content: str) -> Dict[str, Any]:
+    def _generation_hints(self, essay: Essay) -> Dict[str, Any]:
+        """
+        获取作者的会员等级和学段，用于确定生成参数和模型档位
+        
+        Args:
+            essay: 作文对象
+            
+        Returns:
+            Dict: grade、membership_level
+        """
+        try:
+            from app.models.user import UserProfile
+            row = db.session.query(User.membership_level, UserProfile.grade) \
+                .outerjoin(UserProfile, UserProfile.user_id == User.id) \
+                .filter(User.id == essay.user_id) \
+                .first()
+            if row:
+                return {'membership_level': row[0], 'grade': row[1]}
+        except Exception as e:
+            logger.warning(f"获取作者会员信息失败，使用默认生成参数: {str(e)}")
+        return {}
+
+    def _perform_ai_correction(self, essay_content: str, grade: Optional[str] = None,
+                               membership_level: Optional[str] = None) -> Dict[str, Any]:
         """
         执行AI批改逻辑
         
         Args:
             essay_content: 作文内容
+            grade: 学段
+            membership_level: 会员等级
             
         Returns:
             Dict: 批改结果，使用标准化字段结构
@@ -1232,7 +1348,9 @@ class CorrectionService(ICorrectionService):
             logger.info(f"开始批改作文，内容长度: {len(essay_content)} 字符")
             
             # 调用AI批改服务
-            correction_results = self.ai_corrector.correct_essay(essay_content)
+            correction_results = self.ai_corrector.correct_essay(
+                essay_content, grade=grade, membership_level=membership_level
+            )
             
             # 检查AI返回结果的整体状态
             if not isinstance(correction_results, dict):
@@ -1322,6 +1440,7 @@ class CorrectionService(ICorrectionService):
                 "message": error_msg
             }
 
+    @traced('transition_state')
     def transition_essay_state(self, essay_id, from_state, to_state, error_msg=None):
         """
         安全地转换作文状态，包含事务保护和冗余检查
@@ -1394,7 +1513,10 @@ class CorrectionService(ICorrectionService):
 
     def sync_correction_results(self, correction_id, essay=None, correction=None):
         """
-        将批改结果同步到Essay
+        用批改结果刷新作文上的列表摘要（总分、总体评价）和批改时间
+
+        完整结果（修改后内容、错误分析、改进建议等）只保存在 Correction.results，
+        通过 CorrectionResult.from_correction 读取，不再复制到Essay
         
         Args:
             correction_id (int): 批改记录ID
@@ -1410,7 +1532,7 @@ class CorrectionService(ICorrectionService):
                 correction = Correction.query.get(correction_id)
                 
             if correction is None:
-                self.logger.error(f"找不到批改记录: {correction_id}")
+                logger.error(f"找不到批改记录: {correction_id}")
                 return False
                 
             # 获取作文记录
@@ -1418,117 +1540,40 @@ class CorrectionService(ICorrectionService):
                 essay = Essay.query.get(correction.essay_id)
                 
             if essay is None:
-                self.logger.error(f"找不到作文记录: {correction.essay_id}")
+                logger.error(f"找不到作文记录: {correction.essay_id}")
                 return False
             
-            # 解析results字段，确保处理字符串或字典
-            results = {}
-            if isinstance(correction.results, str):
-                try:
-                    results = json.loads(correction.results)
-                    self.logger.info(f"成功解析correction.results JSON字符串")
-                except json.JSONDecodeError:
-                    self.logger.warning(f"解析correction.results JSON失败，使用空字典")
-            elif isinstance(correction.results, dict):
-                results = correction.results
-            
-            # 使用标准化字段结构同步数据
-            # 1. 从scores中获取总分
-            if "scores" in results and "total" in results["scores"]:
-                essay.score = results["scores"]["total"]
-                essay.ai_score = results["scores"]["total"]
-                self.logger.debug(f"从标准化字段structures.scores.total获取到分数: {essay.score}")
-            else:
-                # 向后兼容，查找旧字段
-                essay.score = results.get('score') or results.get('total_score')
-                essay.ai_score = essay.score
-                self.logger.debug(f"从向后兼容字段获取到分数: {essay.score}")
-            
-            # 2. 保持corrected_content字段
-            essay.corrected_content = results.get('corrected_content')
-            
-            # 3. 从analyses中获取总体评价
-            if "analyses" in results and "summary" in results["analyses"]:
-                essay.comments = results["analyses"]["summary"]
-                essay.ai_comments = results["analyses"]["summary"]
-                self.logger.debug(f"从标准化字段analyses.summary获取到总体评价")
+            result_view = CorrectionResult.from_correction(correction)
+            results = result_view.content
+            
+            # 总分：标准化字段 scores.total，向后兼容 score/total_score
+            scores = results.get('scores')
+            if isinstance(scores, dict) and 'total' in scores:
+                essay.score = scores['total']
             else:
-                # 向后兼容
-                essay.comments = results.get('comments')
-                essay.ai_comments = essay.comments
-            
-            # 4. 处理error_analysis，使用完整的analyses和dimensions
-            error_analysis = {}
-            
-            # 添加维度分数
-            if "scores" in results and "dimensions" in results["scores"]:
-                error_analysis["dimensions"] = results["scores"]["dimensions"]
-            
-            # 添加分析内容
-            if "analyses" in results:
-                error_analysis["analyses"] = results["analyses"]
-            
-            # 添加反馈
-            if "feedback" in results:
-                error_analysis["feedback"] = results["feedback"]
-            
-            # 保存error_analysis (将字典转换为JSON字符串)
-            essay.error_analysis = json.dumps(error_analysis, ensure_ascii=False)
-            essay.ai_analysis = essay.error_analysis
-            
-            # 5. 处理improvement_suggestions (从feedback.improvements获取)
-            if "feedback" in results and "improvements" in results["feedback"]:
-                improvements = results["feedback"]["improvements"]
-                if isinstance(improvements, list):
-                    essay.improvement_suggestions = "\n".join(improvements)
-                else:
-                    essay.improvement_suggestions = str(improvements)
-                self.logger.debug(f"从标准化字段feedback.improvements获取到改进建议")
+                essay.score = result_view.score
+            
+            # 总体评价：标准化字段 analyses.summary，向后兼容 comments/feedback
+            analyses = results.get('analyses')
+            if isinstance(analyses, dict) and analyses.get('summary'):
+                essay.comments = analyses['summary']
             else:
-                # 向后兼容
-                if 'improvement_suggestions' in results:
-                    if isinstance(results['improvement_suggestions'], (list, dict)):
-                        # 如果是复杂结构，转换为字符串
-                        essay.improvement_suggestions = json.dumps(results['improvement_suggestions'], ensure_ascii=False)
-                    else:
-                        # 保持字符串格式
-                        essay.improvement_suggestions = results['improvement_suggestions']
-                else:
-                    # 尝试从其他可能的字段中提取
-                    suggestion_fields = ['suggestions', '写作建议', 'writing_suggestions']
-                    for field in suggestion_fields:
-                        if field in results:
-                            value = results[field]
-                            if isinstance(value, (list, dict)):
-                                essay.improvement_suggestions = json.dumps(value, ensure_ascii=False)
-                            else:
-                                essay.improvement_suggestions = value
-                            self.logger.debug(f"从兼容字段{field}提取到improvement_suggestions")
-                            break
+                essay.comments = result_view.comments or None
             
             # 更新批改时间和次数
-            essay.corrected_at = datetime.utcnow()
+            essay.corrected_at = datetime.datetime.utcnow()
             essay.correction_count = (essay.correction_count or 0) + 1
             
             # 更新字数统计如果之前没有
             if not essay.word_count and 'word_count' in results:
                 essay.word_count = results.get('word_count')
-                
-            # 确保所有必要字段都有值，避免空字段
-            if not essay.improvement_suggestions:
-                essay.improvement_suggestions = "建议多阅读范文，注意语法和词汇使用，加强文章结构的逻辑性。"
-                self.logger.warning(f"缺少improvement_suggestions字段，使用默认值")
-            
-            if not essay.comments:
-                essay.comments = "作文已批改完成，请查看详细评分和建议。"
-                self.logger.warning(f"缺少comments字段，使用默认值")
             
             # 提交更改
             db.session.commit()
-            self.logger.info(f"已同步批改结果到作文: {correction_id} -> {correction.essay_id}，使用标准化字段结构")
+            logger.info(f"已同步批改摘要到作文: {correction_id} -> {correction.essay_id}")
             return True
             
         except Exception as e:
-            self.logger.error(f"同步批改结果时出错: {str(e)}", exc_info=True)
+            logger.error(f"同步批改结果时出错: {str(e)}", exc_info=True)
             db.session.rollback()
             return False 
\ No newline at end of file
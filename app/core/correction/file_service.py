@@ -17,6 +17,7 @@ from typing import Dict, Any, Optional, Tuple, Union
 from werkzeug.utils import secure_filename
 
 from app.utils.exceptions import FileProcessError
+from app.core.monitoring.tracing import span
 from app.config import config
 
 # 配置日志记录器
@@ -88,10 +89,12 @@ class FileService:
             
             # 保存文件
             file_path = os.path.join(self.upload_folder, filename)
-            file.save(file_path)
+            with span('upload', filename=filename):
+                file.save(file_path)
             
             # 提取内容
-            content = self.extract_text_from_file(file_path)
+            with span('extraction', file_type=os.path.splitext(filename)[1].lower()):
+                content = self.extract_text_from_file(file_path)
             
             # 生成标题（如果未提供）
             if not title:
@@ -205,7 +208,8 @@ class FileService:
                     raise FileProcessError("系统未配置图片识别功能，请上传文本格式文件")
                 
                 # 调用千问API进行图片内容识别
-                content = self._extract_text_from_image(file_path)
+                with span('ocr', model=self.qwen_model):
+                    content = self._extract_text_from_image(file_path)
                 if not content:
                     raise FileProcessError("无法从图片中提取文本内容")
                 
@@ -123,6 +123,62 @@ class CorrectionResult:
                 pass
         return result
     
+    @classmethod
+    def from_correction(cls, correction, essay=None) -> 'CorrectionResult':
+        """
+        从批改记录创建实例
+
+        Correction.results 是批改结果的唯一来源；仅当历史记录没有 results 时，
+        才回退读取 Essay 上的冗余字段。
+
+        Args:
+            correction: Correction对象（可为None）
+            essay: Essay对象（可选，用于回退）
+
+        Returns:
+            CorrectionResult: 批改结果对象
+        """
+        from app.core.db.json_types import unwrap_json_value
+
+        content = unwrap_json_value(correction.results) if correction is not None else None
+        if not isinstance(content, dict):
+            content = {}
+
+        if not content and essay is not None:
+            content = {
+                'feedback': essay.comments,
+                'error_analysis': unwrap_json_value(essay.error_analysis) or {},
+                'improvement_suggestions': essay.improvement_suggestions,
+                'corrected_content': essay.corrected_content,
+            }
+
+        score = correction.score if correction is not None else None
+        if score is None:
+            score = content.get('score', content.get('total_score'))
+        if score is None and essay is not None:
+            score = essay.score
+
+        essay_id = correction.essay_id if correction is not None else (essay.id if essay is not None else None)
+        status = correction.status if correction is not None else (essay.status if essay is not None else None)
+        return cls(essay_id=essay_id, status=status, score=score, content=content)
+
+    @property
+    def comments(self) -> str:
+        """总体评价"""
+        return self.content.get('feedback') or self.content.get('comments') or ''
+
+    @property
+    def error_analysis(self) -> Dict[str, Any]:
+        """错误分析"""
+        from app.core.db.json_types import unwrap_json_value
+        value = unwrap_json_value(self.content.get('error_analysis'))
+        return value if isinstance(value, dict) else {}
+
+    @property
+    def improvement_suggestions(self) -> Any:
+        """改进建议"""
+        return self.content.get('improvement_suggestions', '')
+
     def get_feedback(self) -> Dict[str, Any]:
         """获取反馈内容"""
         return {
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+滞留作文状态修复模块
+按主键分块扫描长时间处于批改中的作文，同一查询中关联批改记录，
+批量获取Celery任务状态，并以批量UPDATE写回修复后的状态
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, update, func, and_
+
+from app.core.correction.status_cache import essay_status_cache
+
+logger = logging.getLogger(__name__)
+
+# 每块扫描的作文数量
+DEFAULT_CHUNK_SIZE = 500
+
+# 任务状态 -> (作文状态, 批改状态, 是否清除任务ID)
+_IN_FLIGHT_STATES = ('PENDING', 'STARTED', 'RETRY')
+_FAILED_STATES = ('FAILURE', 'REVOKED')
+_RESET = ('pending', 'pending', True)
+
+
+def resolve_stale_status(task_id: Optional[str], task_state: Optional[str]) -> Tuple[str, str, bool]:
+    """
+    根据任务状态决定滞留作文与批改记录的修复状态
+
+    Args:
+        task_id: 批改记录上的任务ID
+        task_state: Celery任务状态
+
+    Returns:
+        Tuple[str, str, bool]: (作文状态, 批改状态, 是否清除任务ID)
+    """
+    if not task_id:
+        return ('pending', 'pending', False)
+    if task_state == 'SUCCESS':
+        return ('completed', 'completed', False)
+    if task_state in _FAILED_STATES:
+        return ('failed', 'failed', False)
+    # 仍在运行但超时、或未知状态，均重置为待处理
+    return _RESET
+
+
+def fetch_task_states(task_ids: Iterable[str], celery_app=None) -> Dict[str, str]:
+    """
+    批量获取Celery任务状态
+
+    结果后端为键值存储（如Redis）时通过一次MGET取回所有任务的结果元数据，
+    否则逐个回退到AsyncResult查询。
+
+    Args:
+        task_ids: 任务ID列表
+        celery_app: Celery应用，默认使用项目的celery_app
+
+    Returns:
+        Dict[str, str]: 任务ID -> 状态，后端中不存在的任务为PENDING
+    """
+    task_ids = [task_id for task_id in dict.fromkeys(task_ids) if task_id]
+    if not task_ids:
+        return {}
+
+    if celery_app is None:
+        from app.tasks.celery_app import celery_app
+
+    backend = celery_app.backend
+    if hasattr(backend, 'mget') and hasattr(backend, 'get_key_for_task'):
+        try:
+            keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+            values = backend.mget(keys)
+            states = {}
+            for task_id, value in zip(task_ids, values):
+                if value is None:
+                    states[task_id] = 'PENDING'
+                    continue
+                meta = backend.decode_result(value)
+                states[task_id] = meta.get('status', 'PENDING')
+            return states
+        except Exception as e:
+            logger.warning(f"批量获取任务状态失败，回退到逐个查询: {str(e)}")
+
+    from celery.result import AsyncResult
+    return {task_id: AsyncResult(task_id, app=celery_app).state for task_id in task_ids}
+
+
+def _latest_correction_id():
+    """每篇作文最新批改记录ID的关联子查询"""
+    from app.models.essay import Essay
+    from app.models.correction import Correction
+    return (
+        select(func.max(Correction.id))
+        .where(Correction.essay_id == Essay.id)
+        .correlate(Essay)
+        .scalar_subquery()
+    )
+
+
+def _fetch_stale_chunk(session, stale_before: datetime, last_id: int, chunk_size: int):
+    """按主键取一块滞留作文，同时带出最新批改记录的ID和任务ID"""
+    from app.models.essay import Essay
+    from app.models.correction import Correction
+    stmt = (
+        select(Essay.id, Correction.id, Correction.task_id)
+        .outerjoin(Correction, Correction.id == _latest_correction_id())
+        .where(
+            Essay.status == 'correcting',
+            Essay.updated_at < stale_before,
+            Essay.id > last_id
+        )
+        .order_by(Essay.id)
+        .limit(chunk_size)
+    )
+    return session.execute(stmt).all()
+
+
+def _apply_updates(session, essay_groups: Dict[str, List[int]],
+                   correction_groups: Dict[Tuple[str, bool], List[int]]) -> Dict[str, List[int]]:
+    """
+    按目标状态分组执行批量UPDATE
+
+    Returns:
+        Dict[str, List[int]]: 目标状态 -> 实际被更新的作文ID
+    """
+    from app.models.essay import Essay
+    from app.models.correction import Correction
+    now = datetime.utcnow()
+
+    updated: Dict[str, List[int]] = {}
+    for status, essay_ids in essay_groups.items():
+        # 仅更新仍处于批改中的作文，避免覆盖扫描期间已完成的任务
+        result = session.execute(
+            update(Essay)
+            .where(and_(Essay.id.in_(essay_ids), Essay.status == 'correcting'))
+            .values(status=status, updated_at=now, version=Essay.version + 1)
+            .returning(Essay.id)
+            .execution_options(synchronize_session=False)
+        )
+        updated[status] = list(result.scalars())
+
+    # 批改记录只随实际被修复的作文一起更新，扫描期间已完成的作文的批改记录保持不变
+    matched = [essay_id for essay_ids in updated.values() for essay_id in essay_ids]
+    if not matched:
+        return updated
+    for (status, clear_task), correction_ids in correction_groups.items():
+        values = {'status': status, 'updated_at': now, 'version': Correction.version + 1}
+        if clear_task:
+            values['task_id'] = None
+        if status == 'failed':
+            values['error_message'] = '任务执行失败或被撤销'
+        session.execute(
+            update(Correction)
+            .where(and_(Correction.id.in_(correction_ids), Correction.essay_id.in_(matched)))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+    return updated
+
+
+def reconcile_stale_essays(stale_before: datetime, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                           session=None, celery_app=None) -> Dict[str, Any]:
+    """
+    修复长时间处于批改中状态的作文
+
+    Args:
+        stale_before: 更新时间早于该时间的作文视为滞留
+        chunk_size: 每块处理的作文数量
+        session: 数据库会话，默认使用db.session
+        celery_app: Celery应用
+
+    Returns:
+        Dict[str, Any]: 处理统计，包括总数和各目标状态的数量
+    """
+    if session is None:
+        from app.models.db import db
+        session = db.session
+
+    stats = {'processed_count': 0, 'chunks': 0, 'pending': 0, 'completed': 0, 'failed': 0,
+             'missing_correction': 0}
+    last_id = 0
+
+    while True:
+        rows = _fetch_stale_chunk(session, stale_before, last_id, chunk_size)
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        task_states = fetch_task_states((task_id for _, _, task_id in rows), celery_app=celery_app)
+
+        essay_groups: Dict[str, List[int]] = {}
+        correction_groups: Dict[Tuple[str, bool], List[int]] = {}
+        for essay_id, correction_id, task_id in rows:
+            if correction_id is None:
+                essay_groups.setdefault('pending', []).append(essay_id)
+                stats['missing_correction'] += 1
+                stats['pending'] += 1
+                continue
+
+            essay_status, correction_status, clear_task = resolve_stale_status(
+                task_id, task_states.get(task_id)
+            )
+            essay_groups.setdefault(essay_status, []).append(essay_id)
+            correction_groups.setdefault((correction_status, clear_task), []).append(correction_id)
+            stats[essay_status] += 1
+
+        try:
+            updated = _apply_updates(session, essay_groups, correction_groups)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        # 批量UPDATE不触发会话事件，提交后直接写入状态缓存
+        for status, essay_ids in updated.items():
+            essay_status_cache.publish_many(essay_ids, status)
+
+        stats['processed_count'] += len(rows)
+        stats['chunks'] += 1
+        logger.info(f"已修复第 {stats['chunks']} 块滞留作文: {len(rows)} 篇, "
+                    f"分组: { {status: len(ids) for status, ids in essay_groups.items()} }")
+
+    return stats
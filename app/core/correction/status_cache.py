@@ -0,0 +1,566 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+作文状态缓存与推送
+作文状态变化在事务提交后写入Redis哈希（essay:status:<id>）并发布到 essay:status:<id> 频道，
+状态查询只读缓存；Web进程内一个订阅线程把变化转发给Socket.IO房间 essay_<id>
+以及等待中的长轮询/SSE请求。Redis不可用时退回进程内存储，单进程部署下行为一致
+
+长轮询/SSE请求在等待期间占用一个Web worker（同步worker下是一个进程或线程），
+单次最长等待 ESSAY_STATUS_MAX_WAIT 秒（默认5秒，设为0关闭等待、立即返回304）；
+同时打开状态页的用户数较多时，需要相应增加worker数或使用gevent/eventlet worker，
+或改用Socket.IO推送
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+STATUS_KEY_PREFIX = 'essay:status'
+STATUS_CHANNEL_PATTERN = f'{STATUS_KEY_PREFIX}:*'
+SOCKET_EVENT = 'essay_status'
+FINAL_STATUSES = ('completed', 'failed', 'archived')
+
+
+def _status_value(status) -> Optional[str]:
+    """状态可能是枚举或字符串，统一为字符串"""
+    if status is None:
+        return None
+    return getattr(status, 'value', status)
+
+
+def make_etag(record: Dict[str, Any]) -> str:
+    """根据作文ID和状态版本号生成ETag"""
+    return f'"{record["essay_id"]}-{record.get("version", 0)}"'
+
+
+def status_payload(record: Dict[str, Any]) -> Dict[str, Any]:
+    """状态接口的响应体"""
+    return {
+        'success': True,
+        'essay_id': record['essay_id'],
+        'status': record.get('status'),
+        'is_active': record.get('status') not in FINAL_STATUSES,
+        'correction_id': record.get('correction_id'),
+        'error_message': record.get('error_message') or None,
+        'version': record.get('version', 0),
+    }
+
+
+class StatusHub:
+    """
+    进程内状态通知：长轮询和SSE请求在这里等待版本号变化
+
+    只保存有请求正在等待的作文的最新状态，最后一个等待者离开时删除，
+    订阅线程收到的其他作文的状态变化直接丢弃
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._latest: Dict[int, Dict[str, Any]] = {}
+        self._waiters: Dict[int, int] = {}
+
+    def notify(self, record: Dict[str, Any]) -> None:
+        with self._condition:
+            essay_id = record['essay_id']
+            if essay_id not in self._waiters:
+                return
+            current = self._latest.get(essay_id)
+            if current is None or record.get('version', 0) >= current.get('version', 0):
+                self._latest[essay_id] = record
+            self._condition.notify_all()
+
+    def forget(self, essay_id: int) -> None:
+        with self._condition:
+            self._latest.pop(essay_id, None)
+
+    def wait(self, essay_id: int, version: int, timeout: float,
+             current: Optional[Callable[[], Optional[Dict[str, Any]]]] = None) -> Optional[Dict[str, Any]]:
+        """
+        等待作文状态版本号超过 version
+
+        Args:
+            current: 登记等待后读取一次当前状态，避免错过登记之前到达的变化
+
+        Returns:
+            Dict: 新的状态记录，超时返回None
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._waiters[essay_id] = self._waiters.get(essay_id, 0) + 1
+        try:
+            record = current() if current is not None else None
+            if record is not None and record.get('version', 0) > version:
+                return record
+            with self._condition:
+                while True:
+                    record = self._latest.get(essay_id)
+                    if record is not None and record.get('version', 0) > version:
+                        return record
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._condition.wait(remaining)
+        finally:
+            with self._condition:
+                self._waiters[essay_id] -= 1
+                if not self._waiters[essay_id]:
+                    del self._waiters[essay_id]
+                    self._latest.pop(essay_id, None)
+
+    def tracked(self) -> int:
+        """当前保存的作文状态数量"""
+        with self._condition:
+            return len(self._latest)
+
+
+class _LocalStatusBackend:
+    """进程内状态存储"""
+
+    def __init__(self):
+        self._data: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def write(self, essay_id, fields, bump=True):
+        with self._lock:
+            record = dict(self._data.get(essay_id, {}))
+            record.update({key: value for key, value in fields.items() if value is not None})
+            record['essay_id'] = essay_id
+            record['version'] = record.get('version', 0) + (1 if bump else 0)
+            self._data[essay_id] = record
+            return dict(record)
+
+    def write_many(self, essay_ids, fields):
+        return [self.write(essay_id, fields) for essay_id in essay_ids]
+
+    def read(self, essay_id):
+        with self._lock:
+            record = self._data.get(essay_id)
+            return dict(record) if record else None
+
+    def delete(self, essay_id):
+        with self._lock:
+            self._data.pop(essay_id, None)
+
+
+class _RedisStatusBackend:
+    """Redis状态存储：哈希保存当前状态，version字段用HINCRBY递增，变化发布到频道"""
+
+    def __init__(self, client, ttl: int):
+        self.client = client
+        self.ttl = ttl
+
+    def write(self, essay_id, fields, bump=True):
+        key = f"{STATUS_KEY_PREFIX}:{essay_id}"
+        mapping = {name: value for name, value in fields.items() if value is not None}
+        mapping['essay_id'] = essay_id
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping=mapping)
+        pipe.hincrby(key, 'version', 1 if bump else 0)
+        pipe.expire(key, self.ttl)
+        pipe.hgetall(key)
+        record = _decode(pipe.execute()[-1])
+        if bump:
+            self.client.publish(key, json.dumps(record, ensure_ascii=False))
+        return record
+
+    def write_many(self, essay_ids, fields):
+        """批量写入同一状态：一次流水线写入，再一次流水线发布"""
+        mapping = {name: value for name, value in fields.items() if value is not None}
+        pipe = self.client.pipeline(transaction=False)
+        for essay_id in essay_ids:
+            key = f"{STATUS_KEY_PREFIX}:{essay_id}"
+            pipe.hset(key, mapping=dict(mapping, essay_id=essay_id))
+            pipe.hincrby(key, 'version', 1)
+            pipe.expire(key, self.ttl)
+            pipe.hgetall(key)
+        results = pipe.execute()
+        records = [_decode(raw) for raw in results[3::4]]
+        pipe = self.client.pipeline(transaction=False)
+        for record in records:
+            pipe.publish(f"{STATUS_KEY_PREFIX}:{record['essay_id']}", json.dumps(record, ensure_ascii=False))
+        pipe.execute()
+        return records
+
+    def read(self, essay_id):
+        return _decode(self.client.hgetall(f"{STATUS_KEY_PREFIX}:{essay_id}")) or None
+
+    def delete(self, essay_id):
+        self.client.delete(f"{STATUS_KEY_PREFIX}:{essay_id}")
+
+
+def _decode(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """把Redis哈希中的字符串还原为记录"""
+    record = dict(raw or {})
+    for name in ('essay_id', 'user_id', 'correction_id', 'version'):
+        if record.get(name) not in (None, ''):
+            record[name] = int(record[name])
+    if 'updated_at' in record:
+        record['updated_at'] = float(record['updated_at'])
+    return record
+
+
+class EssayStatusCache:
+    """
+    作文状态缓存
+
+    写入：publish() 由会话事件在事务提交后调用；不经过ORM的批量UPDATE（Core语句）
+    提交后调用 publish_many()
+    读取：get_status() 只读缓存，缓存未命中时用一次窄查询加载并回填
+    """
+
+    def __init__(self, backend=None, ttl: int = 7 * 86400, max_wait: float = 5.0):
+        self._backend = backend
+        self.ttl = ttl
+        self.max_wait = max_wait
+        self.hub = StatusHub()
+        self._socketio = None
+        self._relay = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._create_backend()
+        return self._backend
+
+    def _create_backend(self):
+        if os.environ.get('ESSAY_STATUS_STORE', 'redis').lower() == 'redis':
+            try:
+                import redis
+                from app.core.services.redis_service import RedisService
+                client = RedisService().client
+                if isinstance(client, redis.Redis):
+                    return _RedisStatusBackend(client, self.ttl)
+            except Exception as e:
+                logger.warning(f"作文状态缓存无法使用Redis，退回进程内存储: {str(e)}")
+        return _LocalStatusBackend()
+
+    @property
+    def is_shared(self) -> bool:
+        """状态是否经Redis跨进程共享"""
+        return isinstance(self.backend, _RedisStatusBackend)
+
+    def publish(self, essay_id: int, status, user_id: Optional[int] = None,
+                error_message: Optional[str] = None, correction_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        写入作文新状态并通知订阅者
+
+        Returns:
+            Dict: 写入后的状态记录，失败返回None
+        """
+        fields = {
+            'status': _status_value(status),
+            'user_id': user_id,
+            'correction_id': correction_id,
+            'error_message': error_message[:500] if error_message else '',
+            'updated_at': time.time(),
+        }
+        try:
+            record = self.backend.write(essay_id, fields)
+        except Exception as e:
+            logger.warning(f"写入作文状态缓存失败，essay_id: {essay_id}: {str(e)}")
+            return None
+        if not self.is_shared:
+            # 进程内存储没有频道，直接分发
+            self.dispatch(record)
+        return record
+
+    def publish_many(self, essay_ids: Iterable[int], status, error_message: Optional[str] = None) -> int:
+        """
+        批量写入同一新状态（不经过ORM的批量UPDATE提交后调用）
+
+        只更新状态相关字段；缓存中原来没有的作文只有部分字段，读取时按未命中从数据库补全
+
+        Returns:
+            int: 写入的作文数
+        """
+        essay_ids = list(dict.fromkeys(essay_ids))
+        if not essay_ids:
+            return 0
+        fields = {
+            'status': _status_value(status),
+            'error_message': error_message[:500] if error_message else '',
+            'updated_at': time.time(),
+        }
+        try:
+            records = self.backend.write_many(essay_ids, fields)
+        except Exception as e:
+            logger.warning(f"批量写入作文状态缓存失败，改为删除 {len(essay_ids)} 条缓存: {str(e)}")
+            for essay_id in essay_ids:
+                self.invalidate(essay_id)
+            return 0
+        if not self.is_shared:
+            for record in records:
+                self.dispatch(record)
+        return len(records)
+
+    def invalidate(self, essay_id: int) -> None:
+        """删除缓存的作文状态（作文被删除时）"""
+        try:
+            self.backend.delete(essay_id)
+        except Exception as e:
+            logger.warning(f"删除作文状态缓存失败，essay_id: {essay_id}: {str(e)}")
+        self.hub.forget(essay_id)
+
+    def get_status(self, essay_id: int) -> Optional[Dict[str, Any]]:
+        """
+        获取作文状态
+
+        Returns:
+            Dict: essay_id、user_id、status、version等，作文不存在返回None
+        """
+        try:
+            record = self.backend.read(essay_id)
+        except Exception as e:
+            logger.warning(f"读取作文状态缓存失败，essay_id: {essay_id}: {str(e)}")
+            record = None
+        # 批量写入的记录可能缺少user_id，按未命中处理
+        if record and record.get('status') and record.get('user_id') is not None:
+            if record['status'] == 'completed' and not record.get('correction_id'):
+                record = self._fill_correction_id(record)
+            return record
+        return self._load(essay_id)
+
+    def _load(self, essay_id: int) -> Optional[Dict[str, Any]]:
+        """缓存未命中：只查询状态所需的列并回填缓存（不增加版本号）"""
+        from app.models.db import db
+        from app.models.essay import Essay
+        from app.models.correction import Correction
+
+        row = db.session.query(Essay.id, Essay.user_id, Essay.status, Essay.error_message, Correction.id) \
+            .outerjoin(Correction, Correction.essay_id == Essay.id) \
+            .filter(Essay.id == essay_id).first()
+        if row is None:
+            return None
+        fields = {
+            'status': _status_value(row[2]),
+            'user_id': row[1],
+            'error_message': row[3][:500] if row[3] else None,
+            'correction_id': row[4],
+            'updated_at': time.time(),
+        }
+        try:
+            return self.backend.write(essay_id, fields, bump=False)
+        except Exception as e:
+            logger.warning(f"回填作文状态缓存失败，essay_id: {essay_id}: {str(e)}")
+            return dict(fields, essay_id=essay_id, version=0)
+
+    def _fill_correction_id(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """批改完成后首次查询时补充批改记录ID"""
+        from app.models.db import db
+        from app.models.correction import Correction
+
+        row = db.session.query(Correction.id).filter(Correction.essay_id == record['essay_id']).first()
+        if row is None:
+            return record
+        try:
+            return self.backend.write(record['essay_id'], {'correction_id': row[0]}, bump=False)
+        except Exception:
+            return dict(record, correction_id=row[0])
+
+    def wait_if_unchanged(self, record: Dict[str, Any], if_none_match: Optional[str],
+                          wait: float = 0) -> Tuple[Dict[str, Any], bool]:
+        """
+        处理条件请求：客户端ETag与当前状态一致时，按 wait 秒长轮询等待变化
+
+        Returns:
+            Tuple: (状态记录, 是否未变化)，未变化时应返回304
+        """
+        if not if_none_match or make_etag(record) not in if_none_match:
+            return record, False
+        if wait > 0:
+            changed = self.wait_for_change(record['essay_id'], record.get('version', 0), wait)
+            if changed is not None:
+                return changed, False
+        return record, True
+
+    def ensure_relay(self) -> None:
+        """
+        首次有订阅者时启动Redis订阅线程（每进程一个），只有等待推送的Web进程才会启动，
+        Celery worker只发布不订阅
+        """
+        if self._relay is not None or not self.is_shared:
+            return
+        with self._lock:
+            if self._relay is None:
+                self._relay = threading.Thread(target=_relay_loop, args=(self,),
+                                               name='essay-status-relay', daemon=True)
+                self._relay.start()
+                logger.info("作文状态订阅线程已启动")
+
+    def _read_cached(self, essay_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            return self.backend.read(essay_id)
+        except Exception:
+            return None
+
+    def wait_for_change(self, essay_id: int, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """长轮询：等待作文状态版本号超过 version，最长 max_wait 秒"""
+        timeout = min(max(timeout, 0), self.max_wait)
+        if timeout <= 0:
+            return None
+        self.ensure_relay()
+        return self.hub.wait(essay_id, version, timeout, current=lambda: self._read_cached(essay_id))
+
+    def stream(self, essay_id: int, record: Dict[str, Any], timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        生成SSE事件：先发送当前状态，之后每次变化发送一次，到达最终状态或超时后结束
+        """
+        self.ensure_relay()
+        deadline = time.monotonic() + (timeout or self.max_wait)
+        while True:
+            yield f"id: {record.get('version', 0)}\nevent: {SOCKET_EVENT}\ndata: {json.dumps(record, ensure_ascii=False)}\n\n"
+            if record.get('status') in FINAL_STATUSES:
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            changed = self.hub.wait(essay_id, record.get('version', 0), min(remaining, 15),
+                                    current=lambda: self._read_cached(essay_id))
+            if changed is None:
+                # 注释行作为心跳，防止代理断开空闲连接
+                yield ": keep-alive\n\n"
+            else:
+                record = changed
+
+    def dispatch(self, record: Dict[str, Any]) -> None:
+        """把状态变化分发给本进程的等待者和Socket.IO房间"""
+        self.hub.notify(record)
+        if self._socketio is not None:
+            try:
+                self._socketio.emit(SOCKET_EVENT, record, room=f"essay_{record['essay_id']}")
+            except Exception as e:
+                logger.debug("推送作文状态失败: %s", e)
+
+
+def create_status_cache_from_env() -> EssayStatusCache:
+    """根据环境变量创建作文状态缓存"""
+    return EssayStatusCache(
+        ttl=int(os.environ.get('ESSAY_STATUS_TTL', 7 * 86400)),
+        max_wait=float(os.environ.get('ESSAY_STATUS_MAX_WAIT', 5)),
+    )
+
+
+essay_status_cache = create_status_cache_from_env()
+
+
+# ---------------------------------------------------------------------------
+# 会话事件：所有修改 Essay.status 的写入路径在提交后发布状态
+# ---------------------------------------------------------------------------
+
+_PENDING_KEY = 'essay_status_changes'
+_listeners_installed = False
+
+
+def _collect_status_changes(session, flush_context):
+    from app.models.essay import Essay
+
+    changes = session.info.setdefault(_PENDING_KEY, {})
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Essay) or obj.id is None:
+            continue
+        if obj in session.new or inspect(obj).attrs.status.history.has_changes():
+            changes[obj.id] = (obj.status, obj.user_id, obj.error_message)
+    for obj in session.deleted:
+        if isinstance(obj, Essay) and obj.id is not None:
+            changes[obj.id] = None
+
+
+def _publish_status_changes(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if not changes:
+        return
+    for essay_id, change in changes.items():
+        if change is None:
+            essay_status_cache.invalidate(essay_id)
+        else:
+            status, user_id, error_message = change
+            essay_status_cache.publish(essay_id, status, user_id=user_id, error_message=error_message)
+
+
+def _discard_status_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def install_status_listeners() -> None:
+    """注册会话事件（幂等）"""
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    event.listen(Session, 'after_flush', _collect_status_changes)
+    event.listen(Session, 'after_commit', _publish_status_changes)
+    event.listen(Session, 'after_rollback', _discard_status_changes)
+    _listeners_installed = True
+
+
+# ---------------------------------------------------------------------------
+# Web进程：Redis订阅转发与Socket.IO订阅
+# ---------------------------------------------------------------------------
+
+def _relay_loop(cache: EssayStatusCache) -> None:
+    """订阅所有作文状态频道，断线后重连"""
+    while True:
+        try:
+            pubsub = cache.backend.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(STATUS_CHANNEL_PATTERN)
+            for message in pubsub.listen():
+                if message.get('type') != 'pmessage':
+                    continue
+                try:
+                    cache.dispatch(json.loads(message['data']))
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.debug("忽略无法解析的作文状态消息: %s", e)
+        except Exception as e:
+            logger.warning(f"作文状态订阅中断，5秒后重连: {str(e)}")
+            time.sleep(5)
+
+
+def init_status_push(app, socketio, cache: EssayStatusCache = essay_status_cache) -> None:
+    """
+    启用状态推送：注册会话事件和Socket.IO订阅事件，Redis订阅线程在首个订阅者出现时启动
+
+    客户端发送 subscribe_essay {essay_id} 加入房间 essay_<id>，立即收到当前状态，
+    之后每次状态变化收到 essay_status 事件
+    """
+    install_status_listeners()
+    cache._socketio = socketio
+
+    def subscribe_essay(data):
+        from flask_login import current_user
+        from flask_socketio import join_room, emit
+
+        essay_id = (data or {}).get('essay_id')
+        if not essay_id or not current_user.is_authenticated:
+            return {'success': False, 'message': '未登录或缺少作文ID'}
+        record = cache.get_status(int(essay_id))
+        if record is None:
+            return {'success': False, 'message': f'作文不存在，ID: {essay_id}'}
+        if record.get('user_id') != current_user.id and not current_user.is_admin:
+            return {'success': False, 'message': '没有权限查看此作文'}
+        cache.ensure_relay()
+        join_room(f"essay_{record['essay_id']}")
+        emit(SOCKET_EVENT, record)
+        return {'success': True}
+
+    def unsubscribe_essay(data):
+        from flask_socketio import leave_room
+
+        essay_id = (data or {}).get('essay_id')
+        if essay_id:
+            leave_room(f"essay_{essay_id}")
+        return {'success': True}
+
+    socketio.on_event('subscribe_essay', subscribe_essay)
+    socketio.on_event('unsubscribe_essay', unsubscribe_essay)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+JSON字段存储类型模块
+提供单次编码、超过阈值自动压缩的JSON列类型，并兼容历史上被二次编码的数据
+
+压缩算法由环境变量 JSON_COMPRESSION 选择：默认 zlib（标准库）；设为 zstd 时需要安装
+zstandard（见 requirements.txt），未安装时启动即报错，不会静默回退。
+解码按数据前缀识别算法，两种格式可以并存。
+"""
+
+import os
+import json
+import zlib
+import logging
+from typing import Any, Optional
+
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+logger = logging.getLogger(__name__)
+
+# zstandard只在 JSON_COMPRESSION=zstd 或读取zstd压缩的数据时需要
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+COMPRESSION_ALGORITHMS = ('zlib', 'zstd')
+
+# 压缩数据的前缀标记，未压缩数据直接以JSON文本开头（'{'、'['等），不会与其冲突
+ZLIB_PREFIX = b'\x00zl1'
+ZSTD_PREFIX = b'\x00zs1'
+
+# 默认超过4KB才压缩，小结果压缩收益低于CPU开销
+DEFAULT_COMPRESS_THRESHOLD = 4096
+
+
+def check_compression(algorithm: str) -> str:
+    """
+    校验压缩算法配置
+
+    Args:
+        algorithm: 'zlib' 或 'zstd'
+
+    Returns:
+        str: 规范化后的算法名
+
+    Raises:
+        ValueError: 未知算法
+        RuntimeError: 选择了zstd但未安装zstandard
+    """
+    algorithm = (algorithm or 'zlib').strip().lower()
+    if algorithm not in COMPRESSION_ALGORITHMS:
+        raise ValueError(f"未知的JSON压缩算法: {algorithm}，可选 {', '.join(COMPRESSION_ALGORITHMS)}")
+    if algorithm == 'zstd' and not ZSTD_AVAILABLE:
+        raise RuntimeError("JSON_COMPRESSION=zstd 需要安装zstandard（pip install -r requirements.txt）")
+    return algorithm
+
+
+JSON_COMPRESSION = check_compression(os.environ.get('JSON_COMPRESSION', 'zlib'))
+
+
+def encode_json_payload(value: Any, threshold: int = DEFAULT_COMPRESS_THRESHOLD,
+                        level: int = 6, algorithm: Optional[str] = None) -> Optional[bytes]:
+    """
+    将Python对象编码为存储字节（单次JSON编码，超过阈值时压缩）
+
+    Args:
+        value: 要存储的对象；传入JSON字符串时会先解析，避免二次编码
+        threshold: 压缩阈值（字节）
+        level: 压缩级别
+        algorithm: 压缩算法，默认使用 JSON_COMPRESSION 配置
+
+    Returns:
+        Optional[bytes]: 存储字节
+    """
+    if value is None:
+        return None
+
+    value = unwrap_json_value(value)
+    raw = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if threshold is None or len(raw) < threshold:
+        return raw
+
+    if check_compression(algorithm or JSON_COMPRESSION) == 'zstd':
+        return ZSTD_PREFIX + zstandard.ZstdCompressor(level=level).compress(raw)
+    return ZLIB_PREFIX + zlib.compress(raw, level)
+
+
+def decode_json_payload(data: Any) -> Any:
+    """
+    将存储字节解码为Python对象
+
+    兼容以下历史格式：
+    - SQLite中JSON列直接存储的文本
+    - 被json.dumps二次编码的字符串
+
+    Args:
+        data: 数据库中读取的原始值
+
+    Returns:
+        Any: 解码后的对象
+    """
+    if data is None:
+        return None
+
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+
+    if isinstance(data, bytes):
+        if data.startswith(ZSTD_PREFIX):
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError("数据使用zstd压缩，但未安装zstandard库")
+            data = zstandard.ZstdDecompressor().decompress(data[len(ZSTD_PREFIX):])
+        elif data.startswith(ZLIB_PREFIX):
+            data = zlib.decompress(data[len(ZLIB_PREFIX):])
+        data = data.decode('utf-8')
+
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except json.JSONDecodeError:
+            logger.warning("无法解析存储的JSON数据，按原始字符串返回")
+            return data
+
+    return unwrap_json_value(data)
+
+
+def unwrap_json_value(value: Any) -> Any:
+    """
+    展开被二次编码的JSON字符串
+
+    Args:
+        value: 可能是JSON字符串的值
+
+    Returns:
+        Any: 解析后的对象；不是JSON对象/数组字符串时原样返回
+    """
+    while isinstance(value, str):
+        stripped = value.strip()
+        if not stripped or stripped[0] not in '{[':
+            break
+        try:
+            value = json.loads(stripped)
+        except json.JSONDecodeError:
+            break
+    return value
+
+
+class CompressedJSON(TypeDecorator):
+    """
+    单次编码的JSON列类型，超过阈值时自动压缩
+
+    使用示例:
+        results = Column(CompressedJSON(threshold=4096))
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, threshold: int = DEFAULT_COMPRESS_THRESHOLD, level: int = 6,
+                 algorithm: Optional[str] = None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threshold = threshold
+        self.level = level
+        self.algorithm = algorithm
+
+    def process_bind_param(self, value, dialect):
+        return encode_json_payload(value, threshold=self.threshold, level=self.level, algorithm=self.algorithm)
+
+    def process_result_value(self, value, dialect):
+        return decode_json_payload(value)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+查询配置模块
+为Essay、Correction和User提供统一的加载策略（列表、扫描、详情）以及列表的键集分页游标
+
+Essay与Correction上的大文本/JSON字段默认延迟加载（见模型中的deferred分组），
+列表和维护扫描只需要元数据列，详情页再显式加载正文和批改结果。
+"""
+
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only, undefer_group, joinedload, lazyload, selectinload, contains_eager
+
+# 延迟加载分组名称（与模型中的deferred(group=...)保持一致）
+ESSAY_TEXT_GROUP = 'essay_text'              # content, corrected_content
+ESSAY_RESULT_GROUP = 'essay_result'          # comments, error_analysis, improvement_suggestions, ai_analysis
+CORRECTION_PAYLOAD_GROUP = 'correction_payload'  # content, results, extra_data
+
+
+def essay_listing_options(with_user=False):
+    """
+    作文列表查询配置：只加载列表展示所需的列，不加载正文和批改结果
+
+    Args:
+        with_user: 是否随主查询加载作者（只取id和用户名），查询需要先 outerjoin(Essay.user)
+
+    Returns:
+        tuple: 可传给 query.options() 的加载选项
+    """
+    from app.models.essay import Essay
+    from app.models.user import User
+    return (
+        load_only(
+            Essay.id, Essay.title, Essay.user_id, Essay.author_name,
+            Essay.status, Essay.score, Essay.word_count, Essay.source_type,
+            Essay.correction_count, Essay.corrected_at, Essay.preview,
+            Essay.created_at, Essay.updated_at
+        ),
+        contains_eager(Essay.user).load_only(User.id, User.username) if with_user else lazyload(Essay.user),
+    )
+
+
+def essay_listing_columns():
+    """
+    作文列表投影列：直接查询这些列得到行元组，不构造Essay实体
+
+    Returns:
+        tuple: 可传给 session.query() 的列
+    """
+    from app.models.essay import Essay
+    return (
+        Essay.id, Essay.title, Essay.author_name, Essay.status, Essay.score,
+        Essay.word_count, Essay.source_type, Essay.correction_count,
+        Essay.preview, Essay.created_at,
+    )
+
+
+def user_listing_options(with_profile=False, with_membership=False):
+    """
+    用户列表查询配置：只加载列表展示所需的列
+
+    Args:
+        with_profile: 是否按页批量加载用户资料（一次IN查询，避免逐行懒加载）
+        with_membership: 是否按页批量加载会员信息及会员计划
+
+    Returns:
+        tuple: 可传给 query.options() 的加载选项
+    """
+    from app.models.user import User
+    from app.models.membership import Membership
+    options = [
+        load_only(
+            User.id, User.username, User.email, User.name, User._is_admin, User._is_active,
+            User.membership_level, User.created_at, User.last_login_at
+        ),
+    ]
+    if with_profile:
+        options.append(selectinload(User.profile))
+    if with_membership:
+        options.append(selectinload(User.membership).joinedload(Membership.plan))
+    return tuple(options)
+
+
+def user_detail_options():
+    """
+    用户详情查询配置：资料和会员（含计划）随主查询JOIN，订阅（含计划）批量加载
+
+    Returns:
+        tuple: 可传给 query.options() 的加载选项
+    """
+    from app.models.user import User
+    from app.models.membership import Membership
+    from app.models.subscription import Subscription
+    return (
+        joinedload(User.profile),
+        joinedload(User.membership).joinedload(Membership.plan),
+        selectinload(User.subscriptions).joinedload(Subscription.plan),
+    )
+
+
+def encode_keyset_cursor(created_at, row_id):
+    """把 (created_at, id) 编码为不透明的分页游标"""
+    raw = f"{created_at.isoformat() if created_at else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_keyset_cursor(cursor):
+    """
+    解析分页游标
+
+    Returns:
+        tuple: (created_at, id)，游标无效时返回None
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+def keyset_before(created_column, id_column, cursor):
+    """
+    按 (created_at, id) 倒序翻页的过滤条件：只取游标之前（更早）的行
+
+    Args:
+        created_column: 创建时间列
+        id_column: 主键列
+        cursor: decode_keyset_cursor 的结果
+
+    Returns:
+        过滤条件表达式
+    """
+    created_at, row_id = cursor
+    return or_(created_column < created_at, and_(created_column == created_at, id_column < row_id))
+
+
+def essay_scan_options():
+    """
+    维护扫描查询配置：只加载状态修复所需的列
+
+    Returns:
+        tuple: 可传给 query.options() 的加载选项
+    """
+    from app.models.essay import Essay
+    return (
+        load_only(Essay.id, Essay.user_id, Essay.status, Essay.version, Essay.updated_at),
+        lazyload(Essay.user),
+    )
+
+
+def essay_detail_options(with_user=True):
+    """
+    作文详情查询配置：一次性加载正文与批改结果
+
+    Args:
+        with_user: 是否同时加载作者信息
+
+    Returns:
+        tuple: 可传给 query.options() 的加载选项
+    """
+    from app.models.essay import Essay
+    options = [undefer_group(ESSAY_TEXT_GROUP), undefer_group(ESSAY_RESULT_GROUP)]
+    if with_user:
+        options.append(joinedload(Essay.user))
+    return tuple(options)
+
+
+def correction_scan_options():
+    """
+    批改记录扫描查询配置：只加载状态与任务相关的列
+
+    Returns:
+        tuple: 可传给 query.options() 的加载选项
+    """
+    from app.models.correction import Correction
+    return (
+        load_only(
+            Correction.id, Correction.essay_id, Correction.status,
+            Correction.task_id, Correction.version, Correction.retry_count,
+            Correction.updated_at, Correction.is_deleted
+        ),
+        lazyload(Correction.essay),
+        lazyload(Correction.corrector),
+    )
+
+
+def correction_detail_options():
+    """
+    批改记录详情查询配置：加载完整的批改结果
+
+    Returns:
+        tuple: 可传给 query.options() 的加载选项
+    """
+    return (undefer_group(CORRECTION_PAYLOAD_GROUP),)
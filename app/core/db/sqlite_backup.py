@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SQLite在线备份模块
+使用sqlite3在线备份API分步复制数据库页，得到一致的快照而不会长时间阻塞写入；
+备份API只能写入数据库文件，因此压缩备份先在备份目录写出完整的未压缩快照，校验后再分块gzip压缩，
+开始前检查备份目录的可用空间。恢复时同样通过备份API写回，避免覆盖正在使用的数据库文件
+"""
+
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+# 每步复制的页数（默认页大小4KB时约4MB）
+DEFAULT_STEP_PAGES = 1024
+# 每步之间让出写锁的时间（秒）
+DEFAULT_STEP_SLEEP = 0.005
+# 分块压缩的块大小
+STREAM_CHUNK_SIZE = 1024 * 1024
+# 分步备份期间源库被其他连接写入会导致备份从头开始，超过该次数后改为单步复制
+MAX_BACKUP_RESTARTS = 3
+
+
+class BackupError(Exception):
+    """备份或恢复失败"""
+    pass
+
+
+class _BackupRestarted(Exception):
+    """分步备份因源库被写入而反复重新开始"""
+    pass
+
+
+def _copy_pages(source: sqlite3.Connection, target: sqlite3.Connection,
+                step_pages: int, step_sleep: float,
+                progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    按页分步执行在线备份，返回总页数
+
+    分步复制之间会释放源库的读锁，如果期间有其他连接写入，SQLite会让备份从头开始；
+    写入频繁时分步备份可能永远无法完成，因此重启超过MAX_BACKUP_RESTARTS次后
+    改为单步复制（WAL模式下单步复制只持有读快照，不会阻塞写入）。
+    """
+    state = {'total': 0, 'remaining': None, 'restarts': 0}
+
+    def _progress(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > MAX_BACKUP_RESTARTS:
+                raise _BackupRestarted()
+        state['total'] = total
+        state['remaining'] = remaining
+        if progress:
+            progress(total - remaining, total)
+
+    if step_pages > 0:
+        try:
+            source.backup(target, pages=step_pages, progress=_progress, sleep=step_sleep)
+            return state['total']
+        except _BackupRestarted:
+            logger.info(f"分步备份重启{state['restarts']}次，改为单步复制")
+
+    source.backup(target, pages=-1)
+    return source.execute("PRAGMA page_count;").fetchone()[0]
+
+
+def check_integrity(db_path: str, quick: bool = False) -> str:
+    """
+    执行完整性检查
+
+    Args:
+        db_path: 数据库文件路径
+        quick: 是否使用quick_check（跳过索引内容校验，速度更快）
+
+    Returns:
+        str: 检查结果，'ok'表示通过
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        pragma = 'quick_check' if quick else 'integrity_check'
+        return conn.execute(f"PRAGMA {pragma};").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def required_backup_space(db_path: str, compress: bool = True) -> int:
+    """
+    估算备份所需的磁盘空间（字节）
+
+    快照大小按数据库文件加WAL文件计算；压缩时临时快照与压缩文件同时存在，
+    按压缩文件不大于快照估算为两倍
+
+    Args:
+        db_path: 源数据库路径
+        compress: 是否压缩输出
+
+    Returns:
+        int: 所需字节数
+    """
+    snapshot = os.path.getsize(db_path)
+    wal_path = f'{db_path}-wal'
+    if os.path.exists(wal_path):
+        snapshot += os.path.getsize(wal_path)
+    return snapshot * 2 if compress else snapshot
+
+
+def _stream_compress(src_path: str, dest_path: str) -> None:
+    """分块gzip压缩文件"""
+    with open(src_path, 'rb') as src, gzip.open(dest_path, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+
+
+def _stream_decompress(src_path: str, dest_path: str) -> None:
+    """流式gzip解压文件"""
+    with gzip.open(src_path, 'rb') as src, open(dest_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+
+
+def online_backup(db_path: str, backup_path: str, compress: bool = True,
+                  step_pages: int = DEFAULT_STEP_PAGES, step_sleep: float = DEFAULT_STEP_SLEEP,
+                  verify: bool = True,
+                  progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    在线备份SQLite数据库
+
+    压缩时先在备份目录写出完整的未压缩快照并校验，再压缩为 backup_path 并删除快照，
+    备份目录需要约两倍于数据库的可用空间
+
+    Args:
+        db_path: 源数据库路径
+        backup_path: 备份文件路径（compress为True时写入gzip格式）
+        compress: 是否压缩输出
+        step_pages: 每步复制的页数
+        step_sleep: 每步之间的休眠时间（秒）
+        verify: 是否对快照执行完整性检查
+        progress: 进度回调 progress(已复制页数, 总页数)
+
+    Returns:
+        Dict: 备份统计信息
+
+    Raises:
+        BackupError: 源数据库不存在、备份目录空间不足或快照校验失败
+    """
+    if not os.path.exists(db_path):
+        raise BackupError(f"数据库文件不存在: {db_path}")
+
+    backup_path = str(backup_path)
+    Path(backup_path).parent.mkdir(parents=True, exist_ok=True)
+    required = required_backup_space(db_path, compress)
+    free = shutil.disk_usage(os.path.dirname(os.path.abspath(backup_path))).free
+    if free < required:
+        raise BackupError(f"备份目录可用空间不足: 需要约{required}字节，可用{free}字节")
+    start_time = time.time()
+
+    # 压缩时先备份到同目录临时文件，校验后再压缩
+    snapshot_path = backup_path
+    if compress:
+        fd, snapshot_path = tempfile.mkstemp(suffix='.db', dir=os.path.dirname(backup_path) or None)
+        os.close(fd)
+
+    try:
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(snapshot_path)
+        try:
+            pages = _copy_pages(source, target, step_pages, step_sleep, progress)
+        finally:
+            target.close()
+            source.close()
+        copy_time = time.time() - start_time
+
+        if verify:
+            integrity_result = check_integrity(snapshot_path)
+            if integrity_result != 'ok':
+                raise BackupError(f"备份快照完整性检查失败: {integrity_result}")
+
+        if compress:
+            _stream_compress(snapshot_path, backup_path)
+    except Exception:
+        # 不保留不完整或未通过校验的备份
+        if os.path.exists(backup_path):
+            os.remove(backup_path)
+        raise
+    finally:
+        if compress and os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+    return {
+        'backup_file': backup_path,
+        'pages': pages,
+        'source_size': os.path.getsize(db_path),
+        'backup_size': os.path.getsize(backup_path),
+        'compressed': compress,
+        'copy_time': copy_time,
+        'total_time': time.time() - start_time
+    }
+
+
+def verify_backup(backup_path: str, quick: bool = False) -> str:
+    """
+    校验备份文件（支持gzip压缩格式）
+
+    Args:
+        backup_path: 备份文件路径
+        quick: 是否使用quick_check
+
+    Returns:
+        str: 检查结果，'ok'表示通过
+    """
+    backup_path = str(backup_path)
+    if not backup_path.endswith('.gz'):
+        return check_integrity(backup_path, quick=quick)
+
+    fd, temp_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        _stream_decompress(backup_path, temp_path)
+        return check_integrity(temp_path, quick=quick)
+    finally:
+        os.remove(temp_path)
+
+
+def online_restore(backup_path: str, db_path: str,
+                   step_pages: int = DEFAULT_STEP_PAGES, step_sleep: float = DEFAULT_STEP_SLEEP,
+                   progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    通过在线备份API将备份写回目标数据库
+
+    与直接覆盖文件不同，此方式在WAL模式下也能保证其他连接看到一致的数据。
+
+    Args:
+        backup_path: 备份文件路径（支持gzip压缩格式）
+        db_path: 目标数据库路径
+        step_pages: 每步复制的页数
+        step_sleep: 每步之间的休眠时间（秒）
+        progress: 进度回调
+
+    Returns:
+        Dict: 恢复统计信息
+
+    Raises:
+        BackupError: 备份文件不存在或校验失败
+    """
+    backup_path = str(backup_path)
+    if not os.path.exists(backup_path):
+        raise BackupError(f"备份文件不存在: {backup_path}")
+
+    start_time = time.time()
+    source_path = backup_path
+    if backup_path.endswith('.gz'):
+        fd, source_path = tempfile.mkstemp(suffix='.db', dir=os.path.dirname(os.path.abspath(db_path)))
+        os.close(fd)
+        _stream_decompress(backup_path, source_path)
+
+    try:
+        integrity_result = check_integrity(source_path)
+        if integrity_result != 'ok':
+            raise BackupError(f"备份文件完整性检查失败: {integrity_result}")
+
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(db_path)
+        try:
+            pages = _copy_pages(source, target, step_pages, step_sleep, progress)
+        finally:
+            target.close()
+            source.close()
+    finally:
+        if source_path != backup_path and os.path.exists(source_path):
+            os.remove(source_path)
+
+    return {
+        'restored_to': db_path,
+        'pages': pages,
+        'total_time': time.time() - start_time
+    }
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SQLite部署配置模块
+在每个新连接上应用生产模式PRAGMA（WAL、synchronous、mmap、缓存、忙等待超时）
+"""
+
+import logging
+from typing import Dict, Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# 生产模式默认PRAGMA
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',          # 读写不互相阻塞
+    'synchronous': 'NORMAL',        # WAL模式下NORMAL已能保证一致性
+    'mmap_size': 268435456,         # 256MB内存映射读取
+    'cache_size': -65536,           # 负数表示KB，即64MB页缓存
+    'busy_timeout': 5000,           # 写锁冲突时等待5秒而不是立即报错
+    'temp_store': 'MEMORY',
+}
+
+# journal_mode是数据库级设置，其余为连接级设置
+_DATABASE_LEVEL_PRAGMAS = ('journal_mode',)
+
+
+def is_file_sqlite(engine: Engine) -> bool:
+    """
+    判断引擎是否为文件型SQLite数据库
+
+    Args:
+        engine: SQLAlchemy引擎
+
+    Returns:
+        bool: 是否为文件型SQLite
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+    database = engine.url.database
+    return bool(database) and database != ':memory:' and not database.startswith('file::memory:')
+
+
+def build_pragma_statements(pragmas: Optional[Dict[str, Any]] = None):
+    """
+    生成PRAGMA语句列表，数据库级设置排在前面
+
+    Args:
+        pragmas: PRAGMA配置，为None时使用默认配置
+
+    Returns:
+        list: PRAGMA语句
+    """
+    pragmas = dict(DEFAULT_SQLITE_PRAGMAS if pragmas is None else pragmas)
+    ordered = [name for name in _DATABASE_LEVEL_PRAGMAS if name in pragmas]
+    ordered += [name for name in pragmas if name not in _DATABASE_LEVEL_PRAGMAS]
+    return [f"PRAGMA {name}={pragmas[name]}" for name in ordered if pragmas[name] is not None]
+
+
+def configure_sqlite_engine(engine: Engine, pragmas: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    为SQLite引擎注册连接事件，在每个新连接上应用PRAGMA
+
+    非SQLite引擎或内存数据库会被忽略。
+
+    Args:
+        engine: SQLAlchemy引擎
+        pragmas: PRAGMA配置，为None时使用默认配置
+
+    Returns:
+        bool: 是否已应用配置
+    """
+    if not is_file_sqlite(engine):
+        return False
+
+    if getattr(engine, '_sqlite_profile_applied', False):
+        return True
+
+    statements = build_pragma_statements(pragmas)
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        except Exception as e:
+            logger.warning(f"应用SQLite PRAGMA失败: {str(e)}")
+        finally:
+            cursor.close()
+
+    engine._sqlite_profile_applied = True
+    logger.info(f"已启用SQLite生产模式配置: {'; '.join(statements)}")
+    return True
@@ -7,6 +7,7 @@ from .monitor_service import (
     MetricsStore, AlertManager, metrics_store, alert_manager,
     init_monitoring, start_monitoring_service, stop_monitoring_service
 )
+from .tracing import span, traced, record_span, start_trace, get_essay_timeline, configure_otel_exporter
 
 def setup_monitoring(app):
     """
@@ -17,9 +18,11 @@ def setup_monitoring(app):
     """
     monitoring = init_monitoring()
     app.monitoring = monitoring
+    configure_otel_exporter()
     return monitoring
 
 __all__ = [
     'MetricsStore', 'AlertManager', 'metrics_store', 'alert_manager',
-    'setup_monitoring', 'start_monitoring_service', 'stop_monitoring_service'
+    'setup_monitoring', 'start_monitoring_service', 'stop_monitoring_service',
+    'span', 'traced', 'record_span', 'start_trace', 'get_essay_timeline'
 ] 
\ No newline at end of file
@@ -0,0 +1,467 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批改流水线链路追踪模块
+轻量的span接口：每个阶段的耗时写入Prometheus直方图（correction_stage_seconds），
+同时按作文ID追加到时间线（优先保存在Redis中，Flask进程和Celery worker共享），
+安装了OpenTelemetry时可选地导出为OTel span。
+链路上下文以W3C traceparent格式从HTTP提交传递到Celery任务头中。
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import functools
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+from prometheus_client import Histogram
+
+logger = logging.getLogger(__name__)
+
+# 批改各阶段耗时直方图，桶覆盖毫秒级的数据库操作到分钟级的LLM调用
+STAGE_SECONDS = Histogram(
+    'correction_stage_seconds',
+    '批改流水线各阶段耗时（秒）',
+    ['stage', 'outcome'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+)
+
+TRACEPARENT_HEADER = 'traceparent'
+ENQUEUED_AT_HEADER = 'x-enqueued-at'
+TIMELINE_KEY_PREFIX = 'trace:essay'
+
+_current = contextvars.ContextVar('correction_trace', default=None)
+
+
+class TraceContext:
+    """一条链路的上下文：trace_id、当前span_id以及绑定的作文ID（同一链路的各层span共享）"""
+
+    __slots__ = ('trace_id', 'span_id', '_shared')
+
+    def __init__(self, trace_id: str, span_id: Optional[str] = None, essay_id: Optional[int] = None):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        # pending: 作文ID确定之前（如上传和文本提取阶段）完成的span
+        self._shared = {'essay_id': essay_id, 'pending': []}
+
+    @property
+    def essay_id(self) -> Optional[int]:
+        return self._shared['essay_id']
+
+    @essay_id.setter
+    def essay_id(self, value: Optional[int]) -> None:
+        self._shared['essay_id'] = value
+
+    @property
+    def pending(self) -> List[Dict[str, Any]]:
+        return self._shared['pending']
+
+    def child(self, span_id: str) -> 'TraceContext':
+        ctx = TraceContext(self.trace_id, span_id)
+        ctx._shared = self._shared
+        return ctx
+
+
+def _new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _new_span_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def format_traceparent(ctx: Optional[TraceContext] = None) -> Optional[str]:
+    """生成W3C traceparent头，没有上下文时返回None"""
+    ctx = ctx or _current.get()
+    if ctx is None:
+        return None
+    return f"00-{ctx.trace_id}-{ctx.span_id or '0' * 16}-01"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[TraceContext]:
+    """解析traceparent头，格式不正确时返回None"""
+    if not value or not isinstance(value, str):
+        return None
+    parts = value.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return TraceContext(parts[1], parts[2])
+
+
+def current_context() -> Optional[TraceContext]:
+    """当前链路上下文"""
+    return _current.get()
+
+
+@contextmanager
+def start_trace(essay_id: Optional[int] = None, traceparent: Optional[str] = None):
+    """
+    开始或延续一条链路
+
+    Args:
+        essay_id: 作文ID，已知时直接绑定
+        traceparent: 上游传入的traceparent；为空且已有上下文时沿用当前链路
+
+    Yields:
+        TraceContext: 链路上下文
+    """
+    parent = parse_traceparent(traceparent)
+    current = _current.get()
+    if parent is None and current is not None:
+        if essay_id is not None:
+            bind_essay(essay_id)
+        yield current
+        return
+    ctx = parent or TraceContext(_new_trace_id())
+    token = _current.set(ctx)
+    try:
+        if essay_id is not None:
+            bind_essay(essay_id)
+        yield ctx
+    finally:
+        _current.reset(token)
+
+
+def bind_essay(essay_id: int) -> None:
+    """将当前链路绑定到作文，并把之前暂存的span写入该作文的时间线"""
+    ctx = _current.get()
+    if ctx is None or essay_id is None:
+        return
+    ctx.essay_id = essay_id
+    if ctx.pending:
+        pending = list(ctx.pending)
+        del ctx.pending[:]
+        for entry in pending:
+            entry['essay_id'] = essay_id
+        _get_store().append(essay_id, pending)
+
+
+def trace_headers() -> Dict[str, str]:
+    """
+    提交Celery任务时附带的消息头
+
+    Returns:
+        Dict: traceparent和入队时间戳，没有链路上下文时只有入队时间戳
+    """
+    headers = {ENQUEUED_AT_HEADER: repr(time.time())}
+    traceparent = format_traceparent()
+    if traceparent:
+        headers[TRACEPARENT_HEADER] = traceparent
+    return headers
+
+
+def headers_from_task_request(request) -> Dict[str, Any]:
+    """从Celery任务请求中读取链路相关的消息头（兼容自定义头在request属性或request.headers中的情况）"""
+    headers = getattr(request, 'headers', None) or {}
+    result = {}
+    for name in (TRACEPARENT_HEADER, ENQUEUED_AT_HEADER):
+        value = getattr(request, name, None) or headers.get(name)
+        if value is not None:
+            result[name] = value
+    return result
+
+
+def _finish(stage: str, started_at: float, duration: float, outcome: str,
+            span_id: str, parent_id: Optional[str], ctx: Optional[TraceContext],
+            attributes: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        STAGE_SECONDS.labels(stage=stage, outcome=outcome).observe(duration)
+    except Exception as e:
+        logger.debug("记录阶段耗时失败: %s", e)
+
+    entry = {
+        'stage': stage,
+        'trace_id': ctx.trace_id if ctx else None,
+        'span_id': span_id,
+        'parent_id': parent_id,
+        'start': round(started_at, 6),
+        'duration_ms': round(duration * 1000, 3),
+        'outcome': outcome,
+    }
+    if attributes:
+        entry['attributes'] = {key: value for key, value in attributes.items() if value is not None}
+    if ctx is not None:
+        if ctx.essay_id is not None:
+            entry['essay_id'] = ctx.essay_id
+            _get_store().append(ctx.essay_id, [entry])
+        else:
+            ctx.pending.append(entry)
+    _export_otel(entry)
+    return entry
+
+
+@contextmanager
+def span(stage: str, essay_id: Optional[int] = None, **attributes):
+    """
+    记录一个阶段的耗时
+
+    用法:
+        with span('llm_call', model=model) as current:
+            ...
+            current['outcome'] = 'error'  # 未抛异常但需要标记失败时
+
+    Args:
+        stage: 阶段名称
+        essay_id: 作文ID，为空时使用当前链路绑定的作文
+        **attributes: 附加属性，写入时间线
+
+    Yields:
+        Dict: 可修改的 outcome 和 attributes
+    """
+    with start_trace(essay_id=essay_id) as ctx:
+        span_id = _new_span_id()
+        parent_id = ctx.span_id
+        token = _current.set(ctx.child(span_id))
+        state = {'outcome': 'ok', 'attributes': attributes}
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield state
+        except BaseException:
+            state['outcome'] = 'error'
+            raise
+        finally:
+            _current.reset(token)
+            _finish(stage, started_at, time.perf_counter() - start, state['outcome'],
+                    span_id, parent_id, ctx, state['attributes'])
+
+
+def record_span(stage: str, started_at: float, ended_at: float, essay_id: Optional[int] = None,
+                outcome: str = 'ok', **attributes) -> Optional[Dict[str, Any]]:
+    """
+    记录一个已知起止时间的阶段（如任务排队等待）
+
+    Args:
+        stage: 阶段名称
+        started_at: 开始时间（time.time()）
+        ended_at: 结束时间（time.time()）
+        essay_id: 作文ID，为空时使用当前链路绑定的作文
+        outcome: 结果
+    """
+    if started_at is None or ended_at is None or ended_at < started_at:
+        return None
+    with start_trace(essay_id=essay_id) as ctx:
+        return _finish(stage, started_at, ended_at - started_at, outcome,
+                       _new_span_id(), ctx.span_id, ctx, attributes)
+
+
+def traced(stage: str):
+    """
+    为函数记录阶段耗时的装饰器，返回 False 或 {'status': 'error'} 的结果同样记为失败
+
+    Args:
+        stage: 阶段名称
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage) as current:
+                result = func(*args, **kwargs)
+                if result is False or (isinstance(result, dict) and result.get('status') == 'error'):
+                    current['outcome'] = 'error'
+                return result
+        return wrapper
+    return decorator
+
+
+class _LocalTimelineStore:
+    """进程内时间线存储，Redis不可用时使用（只能看到本进程记录的阶段）"""
+
+    def __init__(self, max_essays: int = 500, max_spans: int = 200):
+        self.max_essays = max_essays
+        self.max_spans = max_spans
+        self._timelines: 'OrderedDict[int, List[Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append(self, essay_id, entries):
+        with self._lock:
+            timeline = self._timelines.pop(essay_id, [])
+            timeline.extend(entries)
+            self._timelines[essay_id] = timeline[-self.max_spans:]
+            while len(self._timelines) > self.max_essays:
+                self._timelines.popitem(last=False)
+
+    def get(self, essay_id):
+        with self._lock:
+            return list(self._timelines.get(essay_id, []))
+
+
+class _RedisTimelineStore:
+    """Redis时间线存储，每篇作文一个列表，设置过期时间"""
+
+    def __init__(self, client, ttl: int = 86400, max_spans: int = 200):
+        self.client = client
+        self.ttl = ttl
+        self.max_spans = max_spans
+
+    def append(self, essay_id, entries):
+        key = f"{TIMELINE_KEY_PREFIX}:{essay_id}"
+        try:
+            pipe = self.client.pipeline()
+            pipe.rpush(key, *[json.dumps(entry, ensure_ascii=False, default=str) for entry in entries])
+            pipe.ltrim(key, -self.max_spans, -1)
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.debug("写入作文时间线失败: %s", e)
+
+    def get(self, essay_id):
+        try:
+            raw = self.client.lrange(f"{TIMELINE_KEY_PREFIX}:{essay_id}", 0, -1)
+        except Exception as e:
+            logger.warning(f"读取作文时间线失败: {str(e)}")
+            return []
+        return [json.loads(item) for item in raw]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _get_store():
+    """获取时间线存储：优先使用Redis，不可用时退回进程内存储"""
+    global _store
+    if _store is not None:
+        return _store
+    with _store_lock:
+        if _store is None:
+            ttl = int(os.environ.get('TRACE_TIMELINE_TTL', 86400))
+            max_spans = int(os.environ.get('TRACE_TIMELINE_MAX_SPANS', 200))
+            if os.environ.get('TRACE_TIMELINE_STORE', 'redis').lower() == 'redis':
+                try:
+                    import redis
+                    from app.core.services.redis_service import RedisService
+                    client = RedisService().client
+                    if isinstance(client, redis.Redis):
+                        _store = _RedisTimelineStore(client, ttl=ttl, max_spans=max_spans)
+                except Exception as e:
+                    logger.warning(f"链路时间线无法使用Redis，退回进程内存储: {str(e)}")
+            if _store is None:
+                _store = _LocalTimelineStore(max_spans=max_spans)
+    return _store
+
+
+def get_essay_timeline(essay_id: int) -> Dict[str, Any]:
+    """
+    获取作文的阶段时间线
+
+    Args:
+        essay_id: 作文ID
+
+    Returns:
+        Dict: spans按开始时间排序并带相对第一个阶段的偏移（毫秒），
+        stages为各阶段累计耗时，total_ms为首个阶段开始到最后一个阶段结束的时长
+    """
+    spans = sorted(_get_store().get(essay_id), key=lambda entry: entry.get('start', 0))
+    if not spans:
+        return {'essay_id': essay_id, 'trace_ids': [], 'spans': [], 'stages': {}, 'total_ms': 0}
+    origin = spans[0]['start']
+    end = origin
+    stages: Dict[str, float] = {}
+    trace_ids = []
+    for entry in spans:
+        entry['offset_ms'] = round((entry['start'] - origin) * 1000, 3)
+        end = max(end, entry['start'] + entry['duration_ms'] / 1000)
+        stages[entry['stage']] = round(stages.get(entry['stage'], 0) + entry['duration_ms'], 3)
+        if entry.get('trace_id') and entry['trace_id'] not in trace_ids:
+            trace_ids.append(entry['trace_id'])
+    return {
+        'essay_id': essay_id,
+        'trace_ids': trace_ids,
+        'spans': spans,
+        'stages': stages,
+        'total_ms': round((end - origin) * 1000, 3),
+    }
+
+
+# OpenTelemetry导出（可选依赖）
+_otel_tracer = None
+_otel_checked = False
+_otel_configured = False
+
+
+def _get_otel_tracer():
+    global _otel_tracer, _otel_checked
+    if _otel_checked:
+        return _otel_tracer
+    _otel_checked = True
+    if os.environ.get('TRACING_OTEL_ENABLED', 'false').lower() != 'true':
+        return None
+    try:
+        from opentelemetry import trace as otel_trace
+        _otel_tracer = otel_trace.get_tracer('app.correction')
+        logger.info("批改链路追踪已启用OpenTelemetry导出")
+    except ImportError:
+        logger.warning("未安装opentelemetry，跳过OTel导出")
+    return _otel_tracer
+
+
+def _export_otel(entry: Dict[str, Any]) -> None:
+    """
+    以记录的起止时间导出一个OTel span
+
+    OTel span使用SDK生成的span_id，父级统一挂在本链路的trace_id下（远端父span），
+    因此在OTel后端中同一篇作文的各阶段属于同一条trace，但层级被展平。
+    """
+    tracer = _get_otel_tracer()
+    if tracer is None or not entry.get('trace_id'):
+        return
+    try:
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.trace import SpanContext, TraceFlags, NonRecordingSpan, Status, StatusCode
+        parent = SpanContext(trace_id=int(entry['trace_id'], 16), span_id=int(entry['parent_id'] or entry['span_id'], 16),
+                             is_remote=True, trace_flags=TraceFlags(TraceFlags.SAMPLED))
+        context = otel_trace.set_span_in_context(NonRecordingSpan(parent))
+        start_ns = int(entry['start'] * 1e9)
+        otel_span = tracer.start_span(entry['stage'], context=context, start_time=start_ns)
+        for key, value in (entry.get('attributes') or {}).items():
+            otel_span.set_attribute(key, value if isinstance(value, (str, bool, int, float)) else str(value))
+        if entry.get('essay_id') is not None:
+            otel_span.set_attribute('essay.id', entry['essay_id'])
+        if entry['outcome'] != 'ok':
+            otel_span.set_status(Status(StatusCode.ERROR))
+        otel_span.end(end_time=start_ns + int(entry['duration_ms'] * 1e6))
+    except Exception as e:
+        logger.debug("导出OTel span失败: %s", e)
+
+
+def configure_otel_exporter(service_name: str = 'essay-correction') -> bool:
+    """
+    配置OTLP导出器（需要 opentelemetry-sdk 和 opentelemetry-exporter-otlp）
+
+    端点等参数使用OpenTelemetry标准环境变量（OTEL_EXPORTER_OTLP_ENDPOINT等）。
+
+    Returns:
+        bool: 是否配置成功
+    """
+    global _otel_configured
+    if _otel_configured:
+        return True
+    if os.environ.get('TRACING_OTEL_ENABLED', 'false').lower() != 'true':
+        return False
+    try:
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        logger.warning("未安装opentelemetry-sdk或OTLP导出器，链路只记录到Prometheus和时间线")
+        return False
+    provider = TracerProvider(resource=Resource.create({'service.name': service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    otel_trace.set_tracer_provider(provider)
+    _otel_configured = True
+    logger.info("已配置OpenTelemetry OTLP导出器")
+    return True
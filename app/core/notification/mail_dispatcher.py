@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量邮件分发
+主题和正文模板每批只编译一次，按收件人渲染后经进程内SMTP连接池发送；
+发送速率按令牌桶限制，逐收件人记录发送结果
+"""
+
+import os
+import time
+import logging
+import smtplib
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from jinja2 import Environment
+
+from app.utils.email_sender import smtp_pool, build_message, get_mail_settings
+
+logger = logging.getLogger(__name__)
+
+# 纯文本模板不转义，HTML模板转义
+_text_env = Environment(autoescape=False)
+_html_env = Environment(autoescape=True)
+
+
+def iter_chunks(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """按固定大小切分可迭代对象（不预先载入全部元素）"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class MailDispatcher:
+    """批量邮件分发器"""
+
+    def __init__(self, pool=None, rate_per_second: float = 10.0, burst: int = 10):
+        """
+        初始化分发器
+
+        Args:
+            pool: SMTP连接池，默认使用进程内的 smtp_pool
+            rate_per_second: 每秒最多发送的邮件数（0表示不限速）
+            burst: 令牌桶容量，允许的瞬时突发数
+        """
+        self.pool = pool or smtp_pool
+        self.rate_per_second = rate_per_second
+        self.burst = max(1, burst)
+
+    def _throttle(self, bucket: Dict[str, float]):
+        """令牌桶限速：没有令牌时等待补充"""
+        if not self.rate_per_second:
+            return
+        now = time.monotonic()
+        bucket['tokens'] = min(self.burst, bucket['tokens'] + (now - bucket['at']) * self.rate_per_second)
+        bucket['at'] = now
+        if bucket['tokens'] < 1:
+            wait = (1 - bucket['tokens']) / self.rate_per_second
+            time.sleep(wait)
+            bucket['tokens'] = 1
+            bucket['at'] = time.monotonic()
+        bucket['tokens'] -= 1
+
+    def send_batch(self, recipients: Iterable[Dict[str, Any]], subject_template: str,
+                   text_template: Optional[str] = None, html_template: Optional[str] = None,
+                   context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        向一批收件人发送同一模板的邮件
+
+        Args:
+            recipients: 收件人字典，须包含 email，其余字段（如 user_id、username）作为模板变量
+            subject_template: 主题模板（Jinja2）
+            text_template: 纯文本正文模板（可选）
+            html_template: HTML正文模板（可选）
+            context: 所有收件人共用的模板变量
+
+        Returns:
+            Dict: status、sent、failed、results（逐收件人的 email、user_id、status、error、smtp_code）
+        """
+        if not text_template and not html_template:
+            return {'status': 'error', 'message': '未提供邮件内容', 'sent': 0, 'failed': 0, 'results': []}
+
+        subject_tpl = _text_env.from_string(subject_template)
+        text_tpl = _text_env.from_string(text_template) if text_template else None
+        html_tpl = _html_env.from_string(html_template) if html_template else None
+        settings = get_mail_settings()
+        bucket = {'tokens': float(self.burst), 'at': time.monotonic()}
+
+        results = []
+        sent = failed = 0
+        for recipient in recipients:
+            email = recipient.get('email')
+            result = {'email': email, 'user_id': recipient.get('user_id'), 'status': 'sent', 'error': None,
+                      'smtp_code': None}
+            if not email:
+                result.update(status='failed', error='缺少邮箱地址')
+                failed += 1
+                results.append(result)
+                continue
+            try:
+                variables = dict(context or {}, **recipient)
+                message = build_message(
+                    email,
+                    subject_tpl.render(**variables).strip(),
+                    html_tpl.render(**variables) if html_tpl else None,
+                    text_tpl.render(**variables) if text_tpl else None,
+                    settings=settings
+                )
+                self._throttle(bucket)
+                self.pool.sendmail(settings['sender_email'], [email], message.as_string())
+                sent += 1
+            except smtplib.SMTPRecipientsRefused as e:
+                code, reason = next(iter(e.recipients.values()), (None, b''))
+                reason = reason.decode('utf-8', 'replace') if isinstance(reason, bytes) else str(reason)
+                result.update(status='failed', error=f'{code} {reason}'.strip(),
+                              smtp_code=code if isinstance(code, int) else None)
+                failed += 1
+            except Exception as e:
+                # SMTPResponseException（发件人被拒、DATA失败等）带有服务器返回码
+                code = getattr(e, 'smtp_code', None)
+                result.update(status='failed', error=str(e), smtp_code=code if isinstance(code, int) else None)
+                failed += 1
+            results.append(result)
+
+        if failed:
+            logger.warning(f"批量邮件发送完成：成功 {sent} 封，失败 {failed} 封")
+        else:
+            logger.info(f"批量邮件发送完成：成功 {sent} 封")
+        return {'status': 'success' if sent or not failed else 'error',
+                'sent': sent, 'failed': failed, 'results': results}
+
+
+def create_mail_dispatcher_from_env() -> MailDispatcher:
+    """
+    根据环境变量创建分发器
+
+    环境变量:
+        MAIL_RATE_PER_SECOND: 每个worker每秒最多发送的邮件数，默认10（0表示不限速）
+        MAIL_RATE_BURST: 允许的瞬时突发数，默认10
+    """
+    return MailDispatcher(
+        rate_per_second=float(os.environ.get('MAIL_RATE_PER_SECOND', 10)),
+        burst=int(os.environ.get('MAIL_RATE_BURST', 10)),
+    )
+
+
+mail_dispatcher = create_mail_dispatcher_from_env()
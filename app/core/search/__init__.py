@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+全文检索模块
+作文标题/正文/批改反馈的中文二元分词全文索引，以及用户名/邮箱的三元组索引
+"""
+
+from app.core.search.tokenizer import tokenize_text, build_match_query, highlight, make_snippet, has_match
+from app.core.search.fulltext import FullTextIndex, fulltext_index, create_fulltext_index_from_env
+
+__all__ = [
+    'tokenize_text', 'build_match_query', 'highlight', 'make_snippet', 'has_match',
+    'FullTextIndex', 'fulltext_index', 'create_fulltext_index_from_env',
+]
@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SQLite FTS5全文索引
+
+作文索引 essay_search：标题、正文、批改反馈（作文上的总体评价 comments + 最新完成批改 Correction.results
+中的总体评价和改进建议）按中文二元分词
+（见 tokenizer.py）写入，owner列存放 "u<用户ID>" 令牌，按用户检索时在索引内求交集；
+单字查询按前缀匹配二元组和汉字串结尾的单字，prefix='1' 的前缀索引使其只读取一个索引项而不是展开所有以该字开头的二元组。
+分词规则变化后需要执行 flask rebuild-search-index 重建索引。
+分词在Python中完成，因此同步采用发件箱：essays表上的触发器在插入/更新/删除时、corrections表上的触发器
+在带结果的批改写入、变化或删除时把作文ID写入 essay_search_outbox（原生SQL和批量插入同样会触发），sync_pending 分批读取发件箱并重建对应的索引行，
+由周期任务 sync_search_index（每分钟）消费；检索只读索引，不在请求中写入或提交。
+
+用户索引 user_search：用户名、邮箱、姓名使用FTS5 trigram分词器（外部内容表指向users），
+由触发器直接同步，LIKE '%关键词%' 在关键词>=3个字符时走三元组索引。
+
+非SQLite数据库或SQLite未编译FTS5时 available 为False，调用方回退到原来的LIKE过滤。
+"""
+
+import os
+import logging
+import weakref
+from typing import Dict, Iterable, Optional, Sequence
+
+from sqlalchemy import text, bindparam, Integer, Float
+from sqlalchemy.exc import OperationalError
+
+from app.models.db import db
+from app.core.search.tokenizer import tokenize_text, build_match_query, highlight, make_snippet, has_match
+
+logger = logging.getLogger(__name__)
+
+# 可检索的作文列（owner列只用于按用户过滤）
+ESSAY_SEARCH_COLUMNS = ('title', 'content', 'feedback')
+
+ESSAY_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS essay_search USING fts5("
+    "owner, title, content, feedback, tokenize='unicode61', prefix='1')",
+    "CREATE TABLE IF NOT EXISTS essay_search_outbox ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, essay_id INTEGER NOT NULL)",
+    "CREATE TRIGGER IF NOT EXISTS essays_search_ai AFTER INSERT ON essays BEGIN "
+    "INSERT INTO essay_search_outbox (essay_id) VALUES (new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS essays_search_au AFTER UPDATE OF "
+    "title, content, comments, improvement_suggestions, user_id, is_deleted ON essays BEGIN "
+    "INSERT INTO essay_search_outbox (essay_id) VALUES (new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS essays_search_ad AFTER DELETE ON essays BEGIN "
+    "INSERT INTO essay_search_outbox (essay_id) VALUES (old.id); END",
+    "CREATE TRIGGER IF NOT EXISTS corrections_search_ai AFTER INSERT ON corrections "
+    "WHEN new.results IS NOT NULL BEGIN "
+    "INSERT INTO essay_search_outbox (essay_id) VALUES (new.essay_id); END",
+    "CREATE TRIGGER IF NOT EXISTS corrections_search_au AFTER UPDATE OF "
+    "results, status, is_deleted, essay_id ON corrections BEGIN "
+    "INSERT INTO essay_search_outbox (essay_id) VALUES (new.essay_id); END",
+    "CREATE TRIGGER IF NOT EXISTS corrections_search_ad AFTER DELETE ON corrections "
+    "WHEN old.results IS NOT NULL BEGIN "
+    "INSERT INTO essay_search_outbox (essay_id) VALUES (old.essay_id); END",
+]
+
+USER_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5("
+    "username, email, name, content='users', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO user_search (rowid, username, email, name) VALUES (new.id, new.username, new.email, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO user_search (user_search, rowid, username, email, name) "
+    "VALUES ('delete', old.id, old.username, old.email, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF username, email, name ON users BEGIN "
+    "INSERT INTO user_search (user_search, rowid, username, email, name) "
+    "VALUES ('delete', old.id, old.username, old.email, old.name); "
+    "INSERT INTO user_search (rowid, username, email, name) VALUES (new.id, new.username, new.email, new.name); END",
+]
+
+
+def _table_exists(name: str) -> bool:
+    return db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': name}
+    ).first() is not None
+
+
+def _flatten_text(value) -> str:
+    """把批改结果中的字符串/列表/字典展开为按行拼接的文本"""
+    if value is None:
+        return ''
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return '\n'.join(filter(None, (_flatten_text(item) for item in value)))
+    return str(value)
+
+
+def _essay_feedback(essays) -> Dict[int, str]:
+    """
+    批改反馈文本：作文上的总体评价摘要，加上最新一次完成批改的 Correction.results 中的总体评价和改进建议
+
+    改进建议只保存在 Correction.results；没有批改结果的历史作文回退到 Essay.improvement_suggestions
+
+    Args:
+        essays: 含 id、comments、improvement_suggestions 的作文行
+
+    Returns:
+        Dict: 作文ID -> 反馈文本
+    """
+    from app.models.correction import Correction, CorrectionStatus
+    from app.core.correction.interface import CorrectionResult
+    from app.core.db.json_types import unwrap_json_value
+
+    essays = list(essays)
+    latest = {}
+    if essays:
+        rows = db.session.query(Correction.id, Correction.essay_id, Correction.results).filter(
+            Correction.essay_id.in_([essay.id for essay in essays]),
+            Correction.status == CorrectionStatus.COMPLETED.value,
+            Correction.is_deleted.isnot(True),
+        ).order_by(Correction.id).all()
+        for row in rows:
+            content = unwrap_json_value(row.results)
+            if isinstance(content, dict) and content:
+                latest[row.essay_id] = content
+    feedback = {}
+    for essay in essays:
+        parts = [essay.comments]
+        if essay.id in latest:
+            result = CorrectionResult(essay.id, CorrectionStatus.COMPLETED.value, content=latest[essay.id])
+            analyses = result.content.get('analyses')
+            if isinstance(analyses, dict):
+                parts.append(_flatten_text(analyses.get('summary')))
+            parts.append(result.comments)
+            parts.append(_flatten_text(result.improvement_suggestions))
+        else:
+            parts.append(essay.improvement_suggestions)
+        unique = []
+        for part in parts:
+            if part and part not in unique:
+                unique.append(part)
+        feedback[essay.id] = '\n'.join(unique)
+    return feedback
+
+
+class FullTextIndex:
+    """作文和用户的全文索引"""
+
+    def __init__(self, batch_size: int = 500, max_matches: int = 10000,
+                 title_weight: float = 10.0, content_weight: float = 1.0, feedback_weight: float = 2.0):
+        """
+        初始化全文索引
+
+        Args:
+            batch_size: sync_pending 每批处理的发件箱记录数
+            max_matches: 单次检索最多参与排序的命中数（取最新的作文）
+            title_weight: 标题命中的bm25权重
+            content_weight: 正文命中的bm25权重
+            feedback_weight: 批改反馈命中的bm25权重
+        """
+        self.batch_size = batch_size
+        self.max_matches = max_matches
+        self.weights = (title_weight, content_weight, feedback_weight)
+        self._available = weakref.WeakKeyDictionary()
+
+    def available(self) -> bool:
+        """当前数据库是否可以使用全文索引（SQLite且已建好索引表）"""
+        bind = db.session.get_bind()
+        if bind not in self._available:
+            self._available[bind] = bind.dialect.name == 'sqlite' and _table_exists('essay_search')
+        return self._available[bind]
+
+    def ensure_schema(self) -> bool:
+        """
+        创建索引表、发件箱和触发器（幂等）；首次创建时把已有作文写入发件箱、从users重建用户索引
+
+        Returns:
+            bool: 是否可用
+        """
+        bind = db.session.get_bind()
+        if bind.dialect.name != 'sqlite':
+            self._available[bind] = False
+            return False
+        if not (_table_exists('essays') and _table_exists('users') and _table_exists('corrections')):
+            return False
+        try:
+            new_essay_index = not _table_exists('essay_search')
+            new_user_index = not _table_exists('user_search')
+            for statement in ESSAY_SCHEMA + USER_SCHEMA:
+                db.session.execute(text(statement))
+            if new_essay_index:
+                db.session.execute(text("INSERT INTO essay_search_outbox (essay_id) SELECT id FROM essays ORDER BY id"))
+            if new_user_index:
+                db.session.execute(text("INSERT INTO user_search (user_search) VALUES ('rebuild')"))
+            db.session.commit()
+        except OperationalError as e:
+            db.session.rollback()
+            logger.warning(f"无法创建全文索引，检索将回退到LIKE: {str(e)}")
+            self._available[bind] = False
+            return False
+        self._available[bind] = True
+        return True
+
+    def pending(self) -> int:
+        """发件箱中等待同步的记录数"""
+        return db.session.execute(text("SELECT COUNT(*) FROM essay_search_outbox")).scalar()
+
+    def sync_pending(self, limit: Optional[int] = None) -> int:
+        """
+        消费发件箱：重新生成涉及作文的索引行（已删除的作文从索引中移除），一个事务
+
+        Args:
+            limit: 本次最多处理的发件箱记录数，默认为 batch_size
+
+        Returns:
+            int: 处理的发件箱记录数
+        """
+        from app.models.essay import Essay
+
+        rows = db.session.execute(
+            text("SELECT id, essay_id FROM essay_search_outbox ORDER BY id LIMIT :limit"),
+            {'limit': limit or self.batch_size}
+        ).all()
+        if not rows:
+            return 0
+        essay_ids = sorted({row.essay_id for row in rows})
+        try:
+            essays = db.session.query(
+                Essay.id, Essay.user_id, Essay.title, Essay.content,
+                Essay.comments, Essay.improvement_suggestions
+            ).filter(Essay.id.in_(essay_ids), Essay.is_deleted.isnot(True)).all()
+            db.session.execute(
+                text("DELETE FROM essay_search WHERE rowid IN :ids").bindparams(bindparam('ids', expanding=True)),
+                {'ids': essay_ids}
+            )
+            if essays:
+                feedback = _essay_feedback(essays)
+                db.session.execute(
+                    text("INSERT INTO essay_search (rowid, owner, title, content, feedback) "
+                         "VALUES (:id, :owner, :title, :content, :feedback)"),
+                    [{
+                        'id': essay.id,
+                        'owner': f'u{essay.user_id}',
+                        'title': tokenize_text(essay.title),
+                        'content': tokenize_text(essay.content),
+                        'feedback': tokenize_text(feedback[essay.id]),
+                    } for essay in essays]
+                )
+            db.session.execute(text("DELETE FROM essay_search_outbox WHERE id <= :last"), {'last': rows[-1].id})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(rows)
+
+    def sync_all(self, max_batches: Optional[int] = None) -> int:
+        """循环消费发件箱直到为空（或达到批数上限），返回处理的记录数"""
+        processed, batches = 0, 0
+        while max_batches is None or batches < max_batches:
+            count = self.sync_pending()
+            if not count:
+                break
+            processed += count
+            batches += 1
+        return processed
+
+    def rebuild(self) -> int:
+        """清空作文索引并重新索引全部作文，同时重建用户索引"""
+        db.session.execute(text("DELETE FROM essay_search"))
+        db.session.execute(text("DELETE FROM essay_search_outbox"))
+        db.session.execute(text("INSERT INTO essay_search_outbox (essay_id) SELECT id FROM essays ORDER BY id"))
+        db.session.execute(text("INSERT INTO user_search (user_search) VALUES ('rebuild')"))
+        db.session.commit()
+        return self.sync_all()
+
+    def essay_matches(self, query: Optional[str], user_id: Optional[int] = None,
+                      columns: Sequence[str] = ESSAY_SEARCH_COLUMNS, name: str = 'essay_matches'):
+        """
+        作文检索子查询，列为 essay_id 和 rank（bm25，越小越相关），可与Essay联表后继续过滤和分页
+
+        命中超过 max_matches 的宽泛查询只对最新的 max_matches 篇（索引按rowid倒序遍历后截断）
+        计算bm25和联表，避免对几乎全部作文排序
+
+        Args:
+            query: 用户输入
+            user_id: 只检索该用户的作文
+            columns: 检索的列（title/content/feedback）
+            name: 子查询名称（同一查询中联接多个检索子查询时需要不同的名称）
+
+        Returns:
+            子查询；索引不可用或输入中没有可检索的词时返回None，由调用方回退
+        """
+        match = build_match_query(query)
+        if match is None or not self.available():
+            return None
+        expression = f"{{{' '.join(columns)}}} : ({match})"
+        if user_id is not None:
+            expression = f'owner : "u{int(user_id)}" AND {expression}'
+        title_weight, content_weight, feedback_weight = self.weights
+        return text(
+            f"SELECT rowid AS essay_id, "
+            f"bm25(essay_search, 0.0, {title_weight:f}, {content_weight:f}, {feedback_weight:f}) AS rank "
+            f"FROM essay_search WHERE essay_search MATCH :{name}_match ORDER BY rowid DESC LIMIT :{name}_limit"
+        ).bindparams(**{f'{name}_match': expression, f'{name}_limit': self.max_matches}).columns(
+            essay_id=Integer, rank=Float).subquery(name)
+
+    def highlights(self, essay_ids: Iterable[int], query: Optional[str]) -> Dict[int, Dict[str, str]]:
+        """
+        为一页检索结果生成高亮（作文和批改结果各一次查询）：标题，以及正文或批改反馈中第一个命中处的片段
+
+        Returns:
+            Dict: 作文ID -> {'title': 高亮标题HTML, 'snippet': 高亮片段HTML}
+        """
+        from app.models.essay import Essay
+
+        essay_ids = list(essay_ids)
+        if not essay_ids:
+            return {}
+        rows = db.session.query(
+            Essay.id, Essay.title, Essay.content, Essay.comments, Essay.improvement_suggestions
+        ).filter(Essay.id.in_(essay_ids)).all()
+        feedbacks = _essay_feedback(rows)
+        result = {}
+        for row in rows:
+            feedback = feedbacks[row.id]
+            body = feedback if has_match(feedback, query) and not has_match(row.content, query) else row.content
+            result[row.id] = {'title': highlight(row.title, query), 'snippet': make_snippet(body, query)}
+        return result
+
+    def user_matches(self, username: Optional[str] = None, email: Optional[str] = None,
+                     keyword: Optional[str] = None):
+        """
+        用户检索子查询（列为 user_id），按子串匹配用户名/邮箱，keyword 同时匹配用户名、邮箱和姓名
+
+        以 User.id.in_(...) 使用：SQLite先执行一次索引查询再按主键取用户，
+        直接联接时会对每个用户重复执行虚拟表查询
+
+        Returns:
+            子查询；索引不可用或没有条件时返回None
+        """
+        conditions, params = [], {}
+        for field, value in (('username', username), ('email', email)):
+            if value:
+                conditions.append(f"{field} LIKE :user_{field}")
+                params[f'user_{field}'] = f'%{value}%'
+        if keyword:
+            conditions.append("(username LIKE :user_keyword OR email LIKE :user_keyword OR name LIKE :user_keyword)")
+            params['user_keyword'] = f'%{keyword}%'
+        if not conditions or not self.available():
+            return None
+        return text(
+            f"SELECT rowid AS user_id FROM user_search WHERE {' AND '.join(conditions)}"
+        ).bindparams(**params).columns(user_id=Integer)
+
+
+def create_fulltext_index_from_env() -> FullTextIndex:
+    """
+    根据环境变量创建全文索引
+
+    环境变量:
+        SEARCH_INDEX_BATCH_SIZE: 每批同步的发件箱记录数，默认500
+        SEARCH_MAX_MATCHES: 单次检索最多参与排序的命中数，默认10000
+    """
+    return FullTextIndex(
+        batch_size=int(os.environ.get('SEARCH_INDEX_BATCH_SIZE', 500)),
+        max_matches=int(os.environ.get('SEARCH_MAX_MATCHES', 10000)),
+    )
+
+
+fulltext_index = create_fulltext_index_from_env()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+中文二元分词
+连续的汉字切分为重叠的二元组，并以汉字串的最后一个字作为单字词结尾
+（"批改作文" -> "批改 改作 作文 文"），其他文字按单词小写，
+索引文本以空格分隔后交给FTS5的unicode61分词器；查询按同样的规则切分，
+汉字串转换为相邻二元组组成的短语，因此任意长度>=2的汉字子串都能命中；
+单个汉字按前缀匹配，汉字串中的每个字都是某个二元组的首字或结尾的单字词，因此同样能命中
+"""
+
+import re
+import html
+from typing import List, Optional, Tuple
+
+_CJK = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_SEGMENT_RE = re.compile(f'([{_CJK}]+)|([^\\W_{_CJK}]+)')
+
+# 单次查询最多使用的词数，避免超长输入生成过大的MATCH表达式
+MAX_QUERY_TERMS = 16
+
+
+def segments(text: Optional[str]) -> List[Tuple[bool, str]]:
+    """
+    把文本切分为汉字串和单词
+
+    Returns:
+        list: (是否汉字串, 小写文本) 列表
+    """
+    if not text:
+        return []
+    return [(bool(cjk), (cjk or word).lower()) for cjk, word in _SEGMENT_RE.findall(text)]
+
+
+def _bigrams(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def _index_tokens(run: str) -> List[str]:
+    """汉字串的索引词：二元组加上最后一个字（单字串只有它本身）"""
+    tokens = _bigrams(run)
+    if len(run) > 1:
+        tokens.append(run[-1])
+    return tokens
+
+
+def tokenize_text(text: Optional[str]) -> str:
+    """生成写入FTS5的索引文本（空格分隔的二元组、汉字串结尾的单字和单词）"""
+    tokens = []
+    for is_cjk, segment in segments(text):
+        tokens.extend(_index_tokens(segment) if is_cjk else [segment])
+    return ' '.join(tokens)
+
+
+def build_match_query(query: Optional[str]) -> Optional[str]:
+    """
+    把用户输入转换为FTS5 MATCH表达式（各词之间为AND）
+
+    汉字串转换为二元组短语，单个汉字和单词按前缀匹配
+
+    Returns:
+        str: MATCH表达式，输入中没有可检索的词时返回None
+    """
+    terms = []
+    for is_cjk, segment in segments(query)[:MAX_QUERY_TERMS]:
+        if is_cjk and len(segment) > 1:
+            terms.append('"' + ' '.join(_bigrams(segment)) + '"')
+        else:
+            terms.append(f'"{segment}"*')
+    return ' AND '.join(terms) or None
+
+
+def _highlight_pattern(query: Optional[str]):
+    words = sorted({segment for _, segment in segments(query)[:MAX_QUERY_TERMS]}, key=len, reverse=True)
+    if not words:
+        return None
+    return re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+
+
+def highlight(text: Optional[str], query: Optional[str], tag: str = 'mark') -> str:
+    """转义HTML并用 <mark> 标出命中的词"""
+    text = text or ''
+    pattern = _highlight_pattern(query)
+    if pattern is None:
+        return html.escape(text)
+    parts, last = [], 0
+    for match in pattern.finditer(text):
+        parts.append(html.escape(text[last:match.start()]))
+        parts.append(f'<{tag}>{html.escape(match.group())}</{tag}>')
+        last = match.end()
+    parts.append(html.escape(text[last:]))
+    return ''.join(parts)
+
+
+def make_snippet(text: Optional[str], query: Optional[str], width: int = 80) -> str:
+    """
+    截取第一个命中词附近的片段并高亮
+
+    Args:
+        text: 原文
+        query: 用户输入
+        width: 片段长度（字符）
+
+    Returns:
+        str: 已转义并高亮的HTML片段，没有命中时返回开头部分
+    """
+    text = ' '.join((text or '').split())
+    pattern = _highlight_pattern(query)
+    match = pattern.search(text) if pattern else None
+    start = max(0, match.start() - width // 3) if match else 0
+    end = min(len(text), start + width)
+    snippet = highlight(text[start:end], query)
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(text) else '')
+
+
+def has_match(text: Optional[str], query: Optional[str]) -> bool:
+    """文本中是否出现查询中的任意一个词"""
+    pattern = _highlight_pattern(query)
+    return bool(text and pattern and pattern.search(text))
@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+用户活动写回缓冲
+登录时间/IP等用户状态更新在内存中按用户合并，活动记录和使用事件行在有界队列中排队，
+计数（作文数、会员用量）在内存中累加，后台线程按固定间隔在共享引擎上批量UPDATE/INSERT，
+请求路径上不再访问数据库
+
+事件丢失上限：队列满时丢弃最旧的记录（计入 dropped）；数据库暂时不可用时写回失败的数据放回缓冲重试；
+因数据本身出错（约束冲突等）时逐条重写，出错的单条记录丢弃（计入 rejected），不阻塞其他数据；
+进程退出时写回剩余数据，进程被强制终止时最多丢失一个写回间隔内的数据
+"""
+
+import os
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime, date
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import update, insert, bindparam, case, func
+from sqlalchemy.exc import IntegrityError, DataError
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.models.db import db
+
+logger = logging.getLogger(__name__)
+
+# 由单条数据引起、重试也不会成功的错误：逐条重写并丢弃出错的记录
+ROW_ERRORS = (IntegrityError, DataError, StaleDataError)
+
+
+class UserActivityBuffer:
+    """用户活动写回缓冲"""
+
+    def __init__(self, flush_interval: float = 5.0, max_rows: int = 10000, batch_size: int = 500):
+        """
+        初始化缓冲
+
+        Args:
+            flush_interval: 写回间隔（秒）
+            max_rows: 排队的活动记录上限，超出时丢弃最旧的记录（用户状态更新按用户合并，不受此限制）
+            batch_size: 攒够多少条活动记录立即写回
+        """
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+
+        self._cond = threading.Condition()
+        self._user_updates: Dict[int, Dict[str, Any]] = {}
+        self._rows = deque()
+        self._increments: Dict[Any, Dict[str, int]] = {}
+        self._membership_usage: Dict[int, int] = {}
+        self._recorded = 0
+        self._dropped = 0
+        self._rejected = 0
+        self._flushes = 0
+        self._flush_errors = 0
+        self._app = None
+        self._thread = None
+        self.running = False
+
+    def init_app(self, app):
+        """绑定应用（后台线程在应用上下文中写回），进程退出时写回剩余数据"""
+        first = self._app is None
+        self._app = app
+        if first:
+            atexit.register(self.stop)
+
+    # ------------------------------------------------------------------
+    # 记录
+    # ------------------------------------------------------------------
+
+    def update_user(self, user_id: int, **values):
+        """合并一次用户字段更新，同一用户多次更新只保留最新值"""
+        with self._cond:
+            self._user_updates.setdefault(user_id, {}).update(values)
+            self._recorded += 1
+        self._ensure_thread()
+
+    def add_row(self, model, **values):
+        """排队一条待插入的记录，如 UserActivity"""
+        with self._cond:
+            if len(self._rows) >= self.max_rows:
+                self._rows.popleft()
+                self._dropped += 1
+                if self._dropped == 1 or self._dropped % 1000 == 0:
+                    logger.warning(f"用户活动缓冲区已满，累计丢弃 {self._dropped} 条记录")
+            self._rows.append((model, values))
+            self._recorded += 1
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify_all()
+        self._ensure_thread()
+
+    def increment(self, model, key, key_column: str = 'id', **deltas):
+        """累加计数字段，写回时对每个模型执行一条 SET col = col + :n 的批量UPDATE"""
+        with self._cond:
+            pending = self._increments.setdefault((model, key_column, key), {})
+            for column, delta in deltas.items():
+                pending[column] = pending.get(column, 0) + delta
+            self._recorded += 1
+        self._ensure_thread()
+
+    def increment_membership_usage(self, user_id: int, count: int = 1):
+        """累加会员用量（今日用量跨天时从零开始计）"""
+        with self._cond:
+            self._membership_usage[user_id] = self._membership_usage.get(user_id, 0) + count
+            self._recorded += 1
+        self._ensure_thread()
+
+    def record_login(self, user_id: int, login_time, login_ip: Optional[str] = None,
+                     user_agent: Optional[str] = None):
+        """记录一次登录：更新最后登录时间/IP，并写入一条登录活动（登录次数按活动记录统计）"""
+        from app.models.user_activity import UserActivity
+
+        with self._cond:
+            current = self._user_updates.get(user_id, {}).get('last_login_at')
+        if current is None or login_time >= current:
+            self.update_user(user_id, last_login_at=login_time, last_login_ip=login_ip)
+        self.add_row(UserActivity, user_id=user_id, type='login', ip_address=login_ip,
+                     user_agent=(user_agent or '')[:200] or None,
+                     created_at=login_time, updated_at=login_time)
+
+    # ------------------------------------------------------------------
+    # 写回
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _pending(user_updates=None, rows=None, increments=None, membership_usage=None) -> Dict[str, Any]:
+        return {
+            'user_updates': user_updates or {},
+            'rows': rows or [],
+            'increments': increments or {},
+            'membership_usage': membership_usage or {},
+        }
+
+    def _take(self):
+        with self._cond:
+            pending = self._pending(self._user_updates, list(self._rows), self._increments, self._membership_usage)
+            self._user_updates, self._rows, self._increments, self._membership_usage = {}, deque(), {}, {}
+        return pending
+
+    def _split(self, pending: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """把一批数据拆成单条（一个用户更新、一条记录或一个计数）"""
+        units = [self._pending(user_updates={user_id: values}) for user_id, values in pending['user_updates'].items()]
+        units.extend(self._pending(rows=[row]) for row in pending['rows'])
+        units.extend(self._pending(increments={key: deltas}) for key, deltas in pending['increments'].items())
+        units.extend(self._pending(membership_usage={user_id: count})
+                     for user_id, count in pending['membership_usage'].items())
+        return units
+
+    def _restore(self, pending: Dict[str, Any]):
+        """写回失败时放回缓冲，较新的更新优先，计数重新累加"""
+        with self._cond:
+            for user_id, values in pending['user_updates'].items():
+                merged = dict(values)
+                merged.update(self._user_updates.get(user_id, {}))
+                self._user_updates[user_id] = merged
+            self._rows = deque((pending['rows'] + list(self._rows))[-self.max_rows:])
+            for key, deltas in pending['increments'].items():
+                current = self._increments.setdefault(key, {})
+                for column, delta in deltas.items():
+                    current[column] = current.get(column, 0) + delta
+            for user_id, count in pending['membership_usage'].items():
+                self._membership_usage[user_id] = self._membership_usage.get(user_id, 0) + count
+
+    @staticmethod
+    def _flush_user_updates(user_updates: Dict[int, Dict[str, Any]]):
+        """
+        按更新的字段分组，每组一条executemany的UPDATE
+
+        使用Core语句而不是ORM批量UPDATE：ORM按主键更新时会校验匹配行数，
+        缓冲期间被删除的用户会让整批写回失败；这里匹配不到的行直接忽略
+        """
+        from app.models.user import User
+
+        table = User.__table__
+        columns = User.__mapper__.columns
+        groups: Dict[Any, List[Dict[str, Any]]] = {}
+        for user_id, values in user_updates.items():
+            params = {columns[attr].name: value for attr, value in values.items()}
+            params['_id'] = user_id
+            groups.setdefault(tuple(sorted(params)), []).append(params)
+        for params in groups.values():
+            db.session.execute(update(table).where(table.c.id == bindparam('_id')), params)
+
+    @staticmethod
+    def _flush_increments(increments: Dict[Any, Dict[str, int]]):
+        """按 (模型, 键列, 计数列) 分组，每组一条executemany的UPDATE"""
+        groups: Dict[Any, List[Dict[str, Any]]] = {}
+        for (model, key_column, key), deltas in increments.items():
+            columns = tuple(sorted(deltas))
+            params = {'_key': key}
+            params.update({f'_d_{column}': deltas[column] for column in columns})
+            groups.setdefault((model, key_column, columns), []).append(params)
+        for (model, key_column, columns), params in groups.items():
+            table = model.__table__
+            stmt = (update(table)
+                    .where(table.c[key_column] == bindparam('_key'))
+                    .values({column: func.coalesce(table.c[column], 0) + bindparam(f'_d_{column}')
+                             for column in columns}))
+            db.session.execute(stmt, params)
+
+    @staticmethod
+    def _flush_membership_usage(usage: Dict[int, int]):
+        """一条executemany的UPDATE累加会员用量，上次用量不在今天时今日用量从本批开始计"""
+        from app.models.membership import Membership
+
+        table = Membership.__table__
+        today = datetime.combine(date.today(), datetime.min.time())
+        stmt = (update(table)
+                .where(table.c.user_id == bindparam('_user_id'))
+                .values(
+                    essays_used_total=func.coalesce(table.c.essays_used_total, 0) + bindparam('_count'),
+                    essays_used_today=case(
+                        (table.c.last_essay_date >= bindparam('_today'),
+                         func.coalesce(table.c.essays_used_today, 0) + bindparam('_count')),
+                        else_=bindparam('_count')),
+                    last_essay_date=bindparam('_now')))
+        now = datetime.now()
+        db.session.execute(stmt, [{'_user_id': user_id, '_count': count, '_today': today, '_now': now}
+                                  for user_id, count in usage.items()])
+
+    def _write(self, pending: Dict[str, Any]):
+        """在当前事务中写入一批数据（不提交）"""
+        if pending['user_updates']:
+            self._flush_user_updates(pending['user_updates'])
+        by_model: Dict[Any, List[Dict[str, Any]]] = {}
+        for model, values in pending['rows']:
+            by_model.setdefault(model, []).append(values)
+        for model, values in by_model.items():
+            # render_nulls 让含None的行与其他行合并为同一条executemany
+            db.session.execute(insert(model).execution_options(render_nulls=True), values)
+        if pending['increments']:
+            self._flush_increments(pending['increments'])
+        if pending['membership_usage']:
+            self._flush_membership_usage(pending['membership_usage'])
+
+    def _write_isolated(self, pending: Dict[str, Any]):
+        """
+        整批写回因某条数据出错时逐条写入：出错的单条丢弃，其余照常提交
+
+        逐条写入时遇到非数据错误（如数据库不可用），剩余数据放回缓冲，异常继续抛出
+        """
+        units = self._split(pending)
+        for index, unit in enumerate(units):
+            try:
+                self._write(unit)
+                db.session.commit()
+            except ROW_ERRORS as e:
+                db.session.rollback()
+                with self._cond:
+                    self._rejected += 1
+                logger.warning(f"丢弃无法写入的用户活动数据: {str(e)}")
+            except Exception:
+                db.session.rollback()
+                rest = self._pending()
+                for remaining in units[index:]:
+                    for name in ('user_updates', 'increments', 'membership_usage'):
+                        rest[name].update(remaining[name])
+                    rest['rows'].extend(remaining['rows'])
+                self._restore(rest)
+                raise
+
+    def flush(self) -> Dict[str, Any]:
+        """
+        立即写回缓冲中的数据，一个事务提交：用户字段按主键批量UPDATE，记录按模型批量INSERT，
+        计数按模型批量累加；整批因某条数据出错时改为逐条写入并丢弃出错的记录
+
+        Returns:
+            Dict: status、users、rows、counters
+        """
+        pending = self._take()
+        user_updates, rows = pending['user_updates'], pending['rows']
+        counters = len(pending['increments']) + len(pending['membership_usage'])
+        if not user_updates and not rows and not counters:
+            return {'status': 'success', 'users': 0, 'rows': 0, 'counters': 0}
+
+        isolated = False
+        try:
+            try:
+                self._write(pending)
+                db.session.commit()
+            except ROW_ERRORS as e:
+                db.session.rollback()
+                logger.warning(f"批量写回用户活动出错，改为逐条写入: {str(e)}")
+                isolated = True
+                self._write_isolated(pending)
+        except Exception as e:
+            db.session.rollback()
+            # 逐条写入中途失败时，剩余数据已由 _write_isolated 放回缓冲
+            if not isolated:
+                self._restore(pending)
+            with self._cond:
+                self._flush_errors += 1
+            logger.error(f"写回用户活动失败，{len(user_updates)} 个用户更新、{len(rows)} 条记录和 "
+                         f"{counters} 个计数将在下次重试: {str(e)}")
+            return {'status': 'error', 'message': str(e)}
+
+        with self._cond:
+            self._flushes += 1
+        logger.debug(f"已写回用户活动：{len(user_updates)} 个用户更新，{len(rows)} 条记录，{counters} 个计数")
+        return {'status': 'success', 'users': len(user_updates), 'rows': len(rows), 'counters': counters}
+
+    def _flush_in_context(self):
+        from flask import has_app_context
+        if has_app_context():
+            return self.flush()
+        if self._app is None:
+            # Celery worker 中没有应用上下文，与批改任务一样创建应用
+            from app import create_app
+            self.init_app(create_app())
+        with self._app.app_context():
+            try:
+                return self.flush()
+            finally:
+                db.session.remove()
+
+    def _ensure_thread(self):
+        if self.running:
+            return
+        if self._app is None:
+            from flask import has_app_context, current_app
+            if has_app_context():
+                self.init_app(current_app._get_current_object())
+        with self._cond:
+            if self.running:
+                return
+            self.running = True
+            self._thread = threading.Thread(target=self._run, name='user-activity-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """后台线程：按间隔（或记录攒够一批时）写回"""
+        while True:
+            with self._cond:
+                if self.running and len(self._rows) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                running = self.running
+            try:
+                self._flush_in_context()
+            except Exception as e:
+                logger.error(f"用户活动写回线程出错: {str(e)}")
+            if not running:
+                return
+
+    def stop(self, timeout: float = 5.0):
+        """停止后台线程并写回剩余数据"""
+        with self._cond:
+            if not self.running:
+                return
+            self.running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓冲统计"""
+        with self._cond:
+            return {
+                'pending_users': len(self._user_updates),
+                'pending_rows': len(self._rows),
+                'pending_counters': len(self._increments) + len(self._membership_usage),
+                'recorded': self._recorded,
+                'dropped': self._dropped,
+                'rejected': self._rejected,
+                'flushes': self._flushes,
+                'flush_errors': self._flush_errors,
+            }
+
+
+def create_activity_buffer_from_env() -> UserActivityBuffer:
+    """
+    根据环境变量创建用户活动缓冲
+
+    环境变量:
+        USER_ACTIVITY_FLUSH_SECONDS: 写回间隔（秒），默认5
+        USER_ACTIVITY_MAX_ROWS: 排队记录上限，默认10000
+        USER_ACTIVITY_BATCH_SIZE: 攒够多少条记录立即写回，默认500
+    """
+    return UserActivityBuffer(
+        flush_interval=float(os.environ.get('USER_ACTIVITY_FLUSH_SECONDS', 5)),
+        max_rows=int(os.environ.get('USER_ACTIVITY_MAX_ROWS', 10000)),
+        batch_size=int(os.environ.get('USER_ACTIVITY_BATCH_SIZE', 500)),
+    )
+
+
+user_activity_buffer = create_activity_buffer_from_env()
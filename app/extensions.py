@@ -94,6 +94,12 @@ def init_extensions(app, skip_db=False):
             db.init_app(app)
             # 初始化 Flask-Migrate
             migrate.init_app(app, db)
+            
+            # SQLite 生产模式：在每个新连接上应用WAL等PRAGMA
+            if app.config.get('SQLITE_PRODUCTION_MODE'):
+                from app.core.db.sqlite_profile import configure_sqlite_engine
+                with app.app_context():
+                    configure_sqlite_engine(db.engine, app.config.get('SQLITE_PRAGMAS'))
             logger.info("数据库扩展初始化成功")
         
         # 初始化 LoginManager
@@ -23,6 +23,7 @@ from app.models.subscription import Subscription
 from app.models.user_activity import UserActivity
 from app.models.notification import Notification, NotificationType
 from app.models.usage_log import UsageLog
+from app.models.usage_prediction import UsagePrediction
 from app.models.task_status import TaskStatus, TaskState
 
 # 导出所有模型
@@ -50,6 +51,7 @@ __all__ = [
     'Notification',
     'NotificationType',
     'UsageLog',
+    'UsagePrediction',
     'TaskStatus',
     'TaskState'
 ] 
\ No newline at end of file
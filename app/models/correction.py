@@ -8,7 +8,7 @@
 import enum
 from datetime import datetime
 from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, JSON, Enum
-from sqlalchemy.orm import relationship, validates
+from sqlalchemy.orm import relationship, validates, deferred
 from sqlalchemy.ext.hybrid import hybrid_property
 import logging
 from sqlalchemy.exc import SQLAlchemyError
@@ -17,6 +17,7 @@ from sqlalchemy.exc import SQLAlchemyError
 logger = logging.getLogger(__name__)
 
 from app.models.db import db, BaseModel
+from app.core.db.json_types import CompressedJSON
 from app.utils.input_sanitizer import sanitize_input
 
 class CorrectionStatus(str, enum.Enum):
@@ -84,14 +85,14 @@ class Correction(BaseModel):
     essay_id = Column(Integer, ForeignKey('essays.id', ondelete='CASCADE'), nullable=False)
     corrector_id = Column(Integer, ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
     type = Column(String(20), nullable=False, default=CorrectionType.AI.value)
-    content = Column(Text, nullable=True)
+    content = deferred(Column(Text, nullable=True), group='correction_payload')
     score = Column(Float, nullable=True)
     comments = Column(Text, nullable=True)
     error_analysis = Column(JSON, nullable=True)
     improvement_suggestions = Column(Text, nullable=True)
-    extra_data = Column(JSON, nullable=True)
+    extra_data = deferred(Column(CompressedJSON, nullable=True), group='correction_payload')
     status = Column(String(20), nullable=False, default=CorrectionStatus.PENDING.value)
-    results = Column(JSON, nullable=True)
+    results = deferred(Column(CompressedJSON, nullable=True), group='correction_payload')  # 批改结果的唯一来源
     task_id = Column(String(36), nullable=True, unique=True)  # Celery任务ID
     error_message = Column(Text, nullable=True)  # 错误信息
     retry_count = Column(Integer, default=0)  # 重试次数
@@ -101,8 +102,8 @@ class Correction(BaseModel):
     is_deleted = Column(Boolean, nullable=False, default=False)  # 添加默认值
     
     # 关系
-    essay = relationship('Essay', back_populates='corrections', lazy='joined')
-    corrector = relationship('User', back_populates='corrections', lazy='joined')
+    essay = relationship('Essay', back_populates='corrections', lazy='select')
+    corrector = relationship('User', back_populates='corrections', lazy='select')
     
     @validates('type')
     def validate_type(self, key, value):
@@ -202,26 +203,18 @@ class Correction(BaseModel):
             return False
     
     def sync_results_to_essay(self):
-        """将批改结果同步到Essay"""
+        """用批改结果刷新Essay的列表摘要（总分、总体评价）和批改次数，完整结果只保存在 self.results"""
         if not self.results or not self.essay:
             return False
             
         try:
             results = self.results if isinstance(self.results, dict) else {}
             
-            # 同步基本字段
+            # 只同步列表展示需要的摘要字段，完整结果以 self.results 为准
             self.essay.score = results.get('score') or results.get('total_score')
-            self.essay.corrected_content = results.get('corrected_content')
             self.essay.comments = results.get('comments')
-            self.essay.error_analysis = results.get('error_analysis')
-            self.essay.improvement_suggestions = results.get('improvement_suggestions')
             self.essay.corrected_at = datetime.utcnow()
             
-            # AI结果字段
-            self.essay.ai_score = results.get('score') or results.get('total_score')
-            self.essay.ai_comments = results.get('comments')
-            self.essay.ai_analysis = results.get('error_analysis')
-            
             # 更新批改次数
             self.essay.correction_count = (self.essay.correction_count or 0) + 1
             
@@ -8,7 +8,7 @@
 import enum
 from datetime import datetime
 from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Float, ForeignKey, JSON, Enum, event
-from sqlalchemy.orm import relationship, validates
+from sqlalchemy.orm import relationship, validates, deferred
 import logging
 
 # 创建logger实例
@@ -84,14 +84,20 @@ class Essay(BaseModel):
             "status IN ('draft', 'pending', 'processing', 'correcting', 'completed', 'failed', 'archived')",
             name='valid_status'
         ),
+        # 历史记录按 (created_at, id) 键集分页
+        db.Index('ix_essays_user_created', 'user_id', 'created_at', 'id'),
     )
     
+    # 列表预览长度（字符）
+    PREVIEW_LENGTH = 200
+    
     # 添加版本控制字段
     version = Column(Integer, default=0, nullable=False)
     
     # 基本信息
     title = Column(String(200), nullable=False)
-    content = Column(Text, nullable=False)
+    content = deferred(Column(Text, nullable=False), group='essay_text')
+    preview = Column(String(PREVIEW_LENGTH + 3))  # 正文前200字，写入content时同步更新，列表页不加载正文
     word_count = Column(Integer, default=0)
     
     # 作者信息
@@ -108,16 +114,16 @@ class Essay(BaseModel):
     source_type = Column(String(20), default=EssaySourceType.text.value,
                      nullable=False, comment='内容来源类型')
     
-    # 批改结果
-    corrected_content = Column(Text)
-    comments = Column(Text)
-    error_analysis = Column(JSON)
-    improvement_suggestions = Column(Text)
+    # 批改结果（大字段延迟加载，详情页通过 query_profiles.essay_detail_options 加载）
+    corrected_content = deferred(Column(Text), group='essay_text')
+    comments = deferred(Column(Text), group='essay_result')
+    error_analysis = deferred(Column(JSON), group='essay_result')
+    improvement_suggestions = deferred(Column(Text), group='essay_result')
     
     # AI批改结果
     ai_score = Column(Float)
     ai_comments = Column(Text)
-    ai_analysis = Column(JSON)
+    ai_analysis = deferred(Column(JSON), group='essay_result')
     
     # 统计信息
     view_count = Column(Integer, default=0)
@@ -132,7 +138,7 @@ class Essay(BaseModel):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # 关系 - 使用字符串形式引用模型，避免循环导入
-    user = relationship('User', back_populates='essays', lazy='joined')
+    user = relationship('User', back_populates='essays', lazy='select')
     corrections = relationship('Correction', back_populates='essay',
                              lazy='dynamic', cascade='all, delete-orphan')
     feedbacks = relationship('UserFeedback', back_populates='essay',
@@ -150,6 +156,22 @@ class Essay(BaseModel):
             enum_values=[s.value for s in EssayStatus]
         )
     
+    @validates('content')
+    def validate_content(self, key, value):
+        """写入正文时同步更新预览"""
+        self.preview = self.make_preview(value)
+        return value
+    
+    @staticmethod
+    def make_preview(content):
+        """截取正文前 PREVIEW_LENGTH 个字符作为列表预览"""
+        if not content:
+            return ''
+        content = ' '.join(content.split())
+        if len(content) > Essay.PREVIEW_LENGTH:
+            return content[:Essay.PREVIEW_LENGTH] + '...'
+        return content
+    
     @validates('source_type')
     def validate_source_type(self, key, value):
         """验证source_type值"""
@@ -253,7 +275,9 @@ class Essay(BaseModel):
     
     def sync_correction_results(self, correction):
         """
-        同步批改结果到作文
+        用批改结果刷新作文的列表摘要（总分、总体评价）
+
+        完整结果只保存在 correction.results，不复制到作文
         
         Args:
             correction: Correction对象
@@ -270,14 +294,8 @@ class Essay(BaseModel):
                 if isinstance(results, dict):
                     if 'score' in results:
                         self.score = results['score']
-                    if 'corrected_content' in results:
-                        self.corrected_content = results['corrected_content']
                     if 'comments' in results or 'overall_assessment' in results:
                         self.comments = results.get('comments') or results.get('overall_assessment')
-                    if 'error_analysis' in results or 'spelling_errors' in results:
-                        self.error_analysis = results.get('error_analysis') or results.get('spelling_errors')
-                    if 'improvement_suggestions' in results:
-                        self.improvement_suggestions = results['improvement_suggestions']
                 
                 # 更新批改完成时间
                 self.corrected_at = datetime.utcnow()
@@ -320,6 +338,7 @@ class Essay(BaseModel):
             'title': self.title,
             'content': self.content,
             'word_count': self.word_count,
+            'preview': self.preview,
             'user_id': self.user_id,
             'author_name': self.author_name,
             'status': self.status,
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+会员用量预测数据模型
+由夜间批量任务预先计算，预测接口直接读取
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, Integer, Float, Boolean, Date, DateTime, ForeignKey, JSON
+
+from app.models.db import db, BaseModel
+
+class UsagePrediction(BaseModel):
+    """会员用量预测模型（每个用户一行，每晚覆盖）"""
+    __tablename__ = 'usage_predictions'
+
+    user_id = Column(Integer, ForeignKey('users.id'), unique=True, nullable=False, index=True)
+    membership_id = Column(Integer, ForeignKey('memberships.id'))
+    computed_at = Column(DateTime, nullable=False)  # 计算时间
+    window_days = Column(Integer, nullable=False)  # 统计窗口天数
+
+    # 用量特征
+    daily_average_usage = Column(Float, default=0)  # 窗口内日均用量
+    rolling_7_day_average = Column(Float, default=0)  # 最近7天日均用量
+    trend_per_day = Column(Float, default=0)  # 线性趋势（每天变化量）
+    projected_daily_usage = Column(Float, default=0)  # 剩余会员期内预计日均用量
+
+    # 预测结果
+    days_remaining = Column(Integer)
+    predicted_total_usage = Column(Integer, default=0)
+    remaining_quota = Column(Integer)  # 为空表示无限制
+    will_exceed_limit = Column(Boolean, default=False)
+    quota_completion_date = Column(Date)
+    usage_history = Column(JSON)  # 窗口内每日用量
+
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f'<UsagePrediction user={self.user_id}>'
@@ -10,6 +10,8 @@ from flask import Blueprint, render_template, redirect, url_for, request, g, abo
 from app.core.auth.auth_decorators import login_required, admin_required
 from app.models.user import User, UserProfile, MembershipLevel
 from app.models.essay import Essay
+from app.core.db.query_profiles import essay_listing_options
+from app.core.admin.admin_queries import user_listing_query, filter_users_by_keyword, user_summaries
 from app.models.membership import MembershipPlan, Membership
 from datetime import datetime, timedelta
 from sqlalchemy import or_
@@ -107,6 +109,7 @@ def index():
     
     recent_users = []
     recent_essays = []
+    authors = {}
     users_count = 0
     essays_count = 0
     today_users = 0
@@ -146,7 +149,8 @@ def index():
             })
         
         # 4. 最近10篇作文
-        recent_essays = Essay.query.order_by(Essay.created_at.desc()).limit(10).all()
+        recent_essays = Essay.query.options(*essay_listing_options()).order_by(Essay.created_at.desc()).limit(10).all()
+        authors = user_summaries([essay.user_id for essay in recent_essays])
         
         # 更新高级会员数量
         try:
@@ -194,6 +198,7 @@ def index():
         today_users=today_users,
         users_by_day=users_by_day,
         recent_essays=recent_essays,
+        authors=authors,
         stats=stats,
         system_info=system_info,
         recent_users=recent_users
@@ -296,15 +301,11 @@ def users():
     role = request.args.get('role', '')
     status = request.args.get('status', '')
     
-    # 构建查询
-    query = User.query
+    # 构建查询（模板逐行显示用户资料，按页批量加载）
+    query = user_listing_query(with_profile=True)
     
-    # 应用搜索条件
-    if search:
-        query = query.filter(or_(
-            User.username.ilike(f'%{search}%'),
-            User.email.ilike(f'%{search}%')
-        ))
+    # 应用搜索条件（三元组索引，不可用时回退到LIKE）
+    query = filter_users_by_keyword(query, search)
     
     # 应用用户类型过滤
     if user_type:
@@ -393,6 +394,7 @@ def essays():
     
     # 默认值
     essays = []
+    authors = {}
     pagination = None
     page = 1
     status = ""
@@ -408,7 +410,7 @@ def essays():
         # 构建查询 - 使用更安全的查询构建方法
         try:
             # 基本查询
-            essay_query = db.session.query(Essay)
+            essay_query = db.session.query(Essay).options(*essay_listing_options())
             
             # 确保返回对象有created_at字段
             essay_query = essay_query.filter(Essay.created_at != None)
@@ -445,6 +447,9 @@ def essays():
                         valid_essays.append(essay)
                     
                     essays = valid_essays
+                    
+                    # 作者用户名：一次IN查询（请求级缓存）
+                    authors = user_summaries([essay.user_id for essay in essays])
             except Exception as pagination_error:
                 logger.error(f"分页查询失败: {str(pagination_error)}")
                 essays = []
@@ -464,6 +469,7 @@ def essays():
     return render_template(
         'admin/essays.html',
         essays=essays,
+        authors=authors,
         pagination=pagination,
         current_page=page,
         status=status,
@@ -22,6 +22,11 @@ from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.security import generate_password_hash
 from app.core.correction.file_service import FileService
 from app.core.correction.correction_service import CorrectionService
+from app.core.correction.interface import CorrectionResult
+from app.core.correction.status_cache import essay_status_cache, status_payload, make_etag
+from app.core.correction.batch_ingest import batch_ingest_service
+from app.core.user.activity_buffer import user_activity_buffer
+from app.core.analytics.usage_analytics import UsageAnalytics
 from app.utils.input_sanitizer import sanitize_input
 from flask_wtf.csrf import generate_csrf
 
@@ -38,6 +43,7 @@ logger = logging.getLogger('app')
 from app.models.essay import Essay, EssaySourceType, EssayStatus
 from app.models.correction import Correction, CorrectionType, CorrectionStatus
 from app.models.user import User, UserProfile
+from app.core.db.query_profiles import essay_detail_options, correction_detail_options
 
 # Import form classes
 from app.forms import EssayCorrectionForm
@@ -238,6 +244,10 @@ def correction():
                                 db.session.commit()
                                 logger.info(f"用户 {user_id} 批改次数已更新，剩余 {user.get_remaining_corrections()} 次")
                         
+                        # 记录使用事件并累加会员用量（进入写回缓冲）
+                        UsageAnalytics.log_usage_event(user_id, 'essay_submit', resource_id=essay.id,
+                                                       metadata={'source': 'upload'})
+                        
                         # 创建异步批改任务
                         logger.info(f"创建异步批改任务: {essay.id}")
                         process_essay_correction.delay(essay.id)
@@ -269,122 +279,31 @@ def correction():
 def batch_upload():
     """批量上传作文处理"""
     if request.method == 'POST':
+        if not current_user.is_authenticated:
+            return jsonify({'success': False, 'error': '请先登录'}), 401
         if 'files[]' not in request.files:
             return jsonify({
                 'success': False,
                 'error': '请至少选择一个文件上传'
             })
             
-        files = request.files.getlist('files[]')
-        if not files or all(not f.filename for f in files):
+        # 请求内只保存文件并登记批次，提取、入库和批改都在后台任务中完成
+        author_name = current_user.username if current_user.username else f"用户{current_user.id}"
+        result = batch_ingest_service.create_batch(current_user.id, request.files.getlist('files[]'), author_name)
+        if result['status'] != 'success':
             return jsonify({
                 'success': False,
-                'error': '请至少选择一个文件上传'
+                'error': result['message'],
+                'rejected': result.get('rejected', [])
             })
-            
-        # 检查文件数量限制
-        if len(files) > 10:
-            return jsonify({
-                'success': False,
-                'error': '一次最多只能上传10个文件'
-            })
-            
-        results = []
-        success_count = 0
-        error_count = 0
-        
-        for file in files:
-            if not file or not file.filename:
-                continue
-                
-            try:
-                # 处理文件内容
-                content, file_title = process_document(file)
-                if not content:
-                    raise ValueError('文件处理失败，内容为空')
-                
-                # 计算字数
-                word_count = len(content.strip())
-                
-                # 使用当前用户用户名作为作者名
-                author_name = current_user.username if current_user.username else f"用户{current_user.id}"
-                
-                # 创建Essay记录
-                essay = Essay(
-                    title=file_title or os.path.splitext(secure_filename(file.filename))[0],
-                    content=content,
-                    user_id=current_user.id,
-                    author_name=author_name,
-                    word_count=word_count,
-                    source_type=EssaySourceType.upload.value,
-                    status=EssayStatus.PENDING.value,
-                    is_public=False,
-                    view_count=0,
-                    like_count=0,
-                    comment_count=0,
-                    correction_count=0
-                )
-                db.session.add(essay)
-                db.session.flush()  # 获取essay.id
-                
-                # 创建Correction记录
-                correction = Correction(
-                    essay_id=essay.id,
-                    type=CorrectionType.AI.value,
-                    status=CorrectionStatus.PENDING.value
-                )
-                db.session.add(correction)
-                db.session.flush()  # 获取correction.id
-                
-                # 提交批改任务
-                from app.tasks.correction_tasks import process_essay_correction
-                task = process_essay_correction.apply_async(args=[essay.id])
-                
-                # 更新任务ID
-                correction.task_id = task.id
-                db.session.commit()
-                
-                # 记录成功结果
-                results.append({
-                    'filename': file.filename,
-                    'status': 'processing',
-                    'essay_id': essay.id,
-                    'task_id': task.id
-                })
-                success_count += 1
-                current_app.logger.info(f"成功处理文件: {file.filename}, essay_id: {essay.id}, task_id: {task.id}")
-                
-            except Exception as e:
-                error_message = str(e)
-                current_app.logger.error(f"处理文件失败 {file.filename}: {error_message}")
-                results.append({
-                    'filename': file.filename,
-                    'status': 'error',
-                    'error': error_message
-                })
-                error_count += 1
-                if 'db' in locals():
-                    db.session.rollback()
         
-        # 返回处理结果
-        response_data = {
+        return jsonify({
             'success': True,
-            'results': results,
-            'total': len(files),
-            'success_count': success_count,
-            'error_count': error_count
-        }
-        
-        # 设置闪现消息
-        if success_count > 0:
-            if error_count == 0:
-                flash(f'成功上传并开始处理 {success_count} 个文件', 'success')
-            else:
-                flash(f'成功上传 {success_count} 个文件，{error_count} 个文件失败', 'warning')
-        else:
-            flash('所有文件上传失败', 'danger')
-        
-        return jsonify(response_data)
+            'batch_id': result['batch_id'],
+            'status_url': url_for('main.batch_upload_status', batch_id=result['batch_id']),
+            'accepted': result['accepted'],
+            'rejected': result['rejected']
+        }), 202
     
     # GET请求：显示上传页面
     csrf_token = generate_csrf() # 生成CSRF令牌
@@ -404,48 +323,45 @@ def batch_upload():
             
     return render_template(
         'batch_upload.html',
-        max_files=10,
-        max_file_size=5 * 1024 * 1024,  # 5MB
-        allowed_extensions=['txt', 'doc', 'docx', 'pdf', 'jpg', 'jpeg', 'png'],
+        max_files=batch_ingest_service.max_files,
+        max_file_size=batch_ingest_service.max_file_size,
+        max_archive_size=batch_ingest_service.max_archive_size,
+        allowed_extensions=['txt', 'doc', 'docx', 'pdf', 'jpg', 'jpeg', 'png', 'zip'],
         csrf_token=csrf_token,  # 传递令牌到模板
         remaining_info=remaining_info # 传递会员信息
     )
 
+@main_bp.route('/batch_upload/<batch_id>/status')
+@login_required
+def batch_upload_status(batch_id):
+    """批量上传进度：批次阶段和每个文件的处理状态"""
+    result = batch_ingest_service.get_batch_status(batch_id, current_user.id, current_user.is_admin)
+    if result['status'] != 'success':
+        return jsonify({'success': False, 'error': result['message']}), result.get('code', 400)
+    return jsonify({'success': True, 'batch': result['batch']})
+
+HISTORY_PAGE_SIZE = 20
+
 @main_bp.route('/history')
 @login_required
 def user_history():
-    """用户作文历史记录页面"""
+    """用户作文历史记录页面（首屏一页，后续由 /history/data 无限滚动加载）"""
     try:
         # 确保当前用户已登录且有ID
         if not current_user or not current_user.is_authenticated:
             flash('请先登录', 'warning')
             return redirect(url_for('main.login'))
         
-        # 获取当前用户的作文，按创建时间倒序排列，添加空值检查
-        essays = Essay.query.filter_by(user_id=current_user.id).filter(Essay.created_at != None).order_by(Essay.created_at.desc()).all()
-        
-        # 添加预览内容（限制文本长度）
-        valid_essays = []
-        for essay in essays:
-            if essay is None:
-                continue
-                
-            # 确保作文有内容属性
-            if not hasattr(essay, 'content') or essay.content is None:
-                essay.content = ""
-                essay.preview = "(无内容)"
-            else:
-                # 截取作文内容前200个字符作为预览
-                if len(essay.content) > 200:
-                    essay.preview = essay.content[:200] + '...'
-                else:
-                    essay.preview = essay.content
-            
-            valid_essays.append(essay)
+        # 只查询列表列和预览，按 (created_at, id) 键集分页
+        result = CorrectionService().get_user_essay_history(current_user.id, limit=HISTORY_PAGE_SIZE)
+        if result['status'] != 'success':
+            return render_template('error.html', error_code=500, error_message="加载历史记录时出错，请稍后再试。")
+        valid_essays = result['essays']
+        next_cursor = result['next_cursor']
         
         # 传递作文列表到模板
         try:
-            return render_template('user_history.html', essays=valid_essays)
+            return render_template('user_history.html', essays=valid_essays, next_cursor=next_cursor)
         except Exception as template_error:
             current_app.logger.error(f"模板渲染失败: {template_error}")
             # 检查模板是否存在
@@ -458,7 +374,7 @@ def user_history():
                     
             # 尝试使用带路径的模板名或错误模板
             try:
-                return render_template('/user_history.html', essays=valid_essays)
+                return render_template('/user_history.html', essays=valid_essays, next_cursor=next_cursor)
             except Exception:
                 return render_template('error.html', 
                                        error_code=500, 
@@ -468,6 +384,29 @@ def user_history():
         current_app.logger.error(f"Failed to render user_history.html. Error: {e}\nTraceback:\n{tb}")
         return render_template('error.html', error_code=500, error_message="加载历史记录时出错，请稍后再试。")
 
+@main_bp.route('/history/data')
+@login_required
+def user_history_data():
+    """
+    作文历史分页数据API（无限滚动）
+    
+    查询参数:
+        - cursor: 上一页返回的 next_cursor
+        - limit: 每页数量，默认20，最大100
+        - status: 按状态过滤
+        - q: 在自己的作文中全文检索（按相关度排序，附带高亮）
+    """
+    result = CorrectionService().get_user_essay_history(
+        current_user.id,
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', HISTORY_PAGE_SIZE, type=int),
+        status=request.args.get('status'),
+        keyword=request.args.get('q')
+    )
+    if result['status'] != 'success':
+        return jsonify({'success': False, 'message': result['message']}), 400
+    return jsonify({'success': True, 'essays': result['essays'], 'next_cursor': result['next_cursor']})
+
 @main_bp.route('/membership')
 @login_required
 def membership():
@@ -570,7 +509,7 @@ def profile():
 def results(essay_id):
     """显示作文批改结果"""
     try:
-        essay = Essay.query.get_or_404(essay_id)
+        essay = Essay.query.options(*essay_detail_options()).get_or_404(essay_id)
         
         # 检查权限
         if essay.user_id != current_user.id:
@@ -583,16 +522,15 @@ def results(essay_id):
         else:
             essay.corrected_at_formatted = '未知'
         
-        correction = Correction.query.filter_by(essay_id=essay_id).first()
+        correction = Correction.query.options(*correction_detail_options()).filter_by(essay_id=essay_id).first()
         
         if not correction or not correction.results:
             flash('作文正在批改中，请稍后刷新页面查看结果。', 'info')
             return render_template('results.html', essay=essay, correction=None, results=None)
             
-        # 解析批改结果
-        try:
-            results_data = json.loads(correction.results)
-        except json.JSONDecodeError:
+        # 解析批改结果（Correction.results 为唯一来源，存储层已完成解码）
+        results_data = CorrectionResult.from_correction(correction, essay).content
+        if not results_data:
             current_app.logger.error(f"解析批改结果JSON数据失败，essay_id={essay_id}")
             flash('解析批改结果数据出错。', 'danger')
             return redirect(url_for('main.user_history'))
@@ -639,24 +577,9 @@ def login():
                 # 使用Flask-Login登录用户，但不更新用户最后登录时间
                 login_user(user, remember=bool(request.form.get('remember')))
                 
-                # 异步更新用户登录信息
-                try:
-                    # 使用单独的线程异步更新用户登录数据
-                    from threading import Thread
-                    update_thread = Thread(
-                        target=update_login_info, 
-                        args=(
-                            user_id, 
-                            datetime.now(), 
-                            request.remote_addr,
-                            current_app.config['SQLALCHEMY_DATABASE_URI']
-                        )
-                    )
-                    update_thread.daemon = True  # 设置为守护线程
-                    update_thread.start()
-                    logger.info(f"已启动异步线程更新用户登录信息: {user_id}")
-                except Exception as thread_err:
-                    logger.error(f"启动异步更新线程失败: {str(thread_err)}")
+                # 登录时间/IP写入用户活动缓冲，由后台线程批量写回
+                user_activity_buffer.record_login(
+                    user_id, datetime.now(), request.remote_addr, request.headers.get('User-Agent'))
                 
                 # 设置session变量
                 session['user_id'] = user_id
@@ -686,50 +609,6 @@ def login():
     
     return render_template('login.html')
 
-def update_login_info(user_id, login_time, login_ip, db_uri):
-    """
-    异步更新用户登录信息
-    
-    Args:
-        user_id: 用户ID
-        login_time: 登录时间
-        login_ip: 登录IP地址
-        db_uri: 数据库连接URI
-    """
-    try:
-        # 延迟导入以避免循环引用
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        from sqlalchemy.pool import NullPool
-        
-        # 创建不使用连接池的引擎
-        engine = create_engine(db_uri, poolclass=NullPool)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        try:
-            # 延迟导入用户模型
-            from app.models.user import User
-            
-            # 查询用户并更新登录信息
-            user = session.query(User).get(user_id)
-            if user:
-                user.last_login_at = login_time
-                user.last_login_ip = login_ip
-                session.commit()
-                logging.getLogger(__name__).info(f"异步更新用户登录信息成功: {user_id}")
-            else:
-                logging.getLogger(__name__).warning(f"异步更新登录信息失败: 用户 {user_id} 不存在")
-        except Exception as db_error:
-            session.rollback()
-            logging.getLogger(__name__).error(f"异步更新用户登录信息时数据库错误: {str(db_error)}")
-        finally:
-            # 务必关闭会话和连接
-            session.close()
-            engine.dispose()
-    except Exception as e:
-        logging.getLogger(__name__).error(f"异步更新用户登录信息失败: {str(e)}")
-
 @main_bp.route('/register', methods=['GET', 'POST'])
 def register():
     """用户注册"""
@@ -926,7 +805,12 @@ def batch_delete_essays():
 
 @main_bp.route('/api/v1/correction/essays/status/<int:essay_id>')
 def get_essay_status(essay_id):
-    """获取作文批改状态API"""
+    """
+    获取作文批改状态API
+
+    状态只读Redis状态缓存，不加载作文记录。响应带ETag，请求携带 If-None-Match 且状态未变化时返回304；
+    同时指定 wait=<秒> 则长轮询等待状态变化（最长 ESSAY_STATUS_MAX_WAIT 秒，默认5秒，等待期间占用一个worker）
+    """
     try:
         # 检查用户是否已登录
         if not current_user.is_authenticated:
@@ -936,32 +820,30 @@ def get_essay_status(essay_id):
                 'redirect': '/login'
             }), 401  # 401 Unauthorized
         
-        # 使用filter_by而不是get_or_404，以更好地处理不存在的记录
-        essay = Essay.query.filter_by(id=essay_id).first()
+        record = essay_status_cache.get_status(essay_id)
         
-        if not essay:
+        if not record:
             return jsonify({
                 'success': False,
                 'message': f'作文不存在，ID: {essay_id}'
             }), 404
         
         # 检查用户权限
-        if essay.user_id != current_user.id and not current_user.is_admin:
+        if record.get('user_id') != current_user.id and not current_user.is_admin:
             return jsonify({
                 'success': False,
                 'message': '没有权限查看此作文'
             }), 403
         
-        # 获取批改状态
-        status = essay.status
-        correction = Correction.query.filter_by(essay_id=essay_id).first()
-        
-        logger.info(f"成功获取作文状态, essay_id: {essay_id}, 状态: {status}")
-        return jsonify({
-            'success': True,
-            'status': status,
-            'correction_id': correction.id if correction else None
-        })
+        record, not_modified = essay_status_cache.wait_if_unchanged(
+            record, request.headers.get('If-None-Match'), request.args.get('wait', 0, type=float))
+        if not_modified:
+            response = current_app.response_class(status=304)
+        else:
+            response = jsonify(status_payload(record))
+        response.headers['ETag'] = make_etag(record)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         logger.error(f"获取作文状态时出错: {str(e)}", exc_info=True)
         return jsonify({
@@ -44,13 +44,18 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    // 轮询批改状态
+    // 轮询批改状态：携带ETag长轮询，状态未变化时服务端最多等待5秒（ESSAY_STATUS_MAX_WAIT）后返回304
+    let statusEtag = null;
     async function pollCorrectionStatus(essayId) {
         try {
-            const response = await fetch(`/api/v1/correction/essays/status/${essayId}`);
+            const headers = statusEtag ? {'If-None-Match': statusEtag} : {};
+            const response = await fetch(`/api/v1/correction/essays/status/${essayId}?wait=5`, {headers});
             
             // 检查HTTP状态码
-            if (response.status === 401) {
+            if (response.status === 304) {
+                setTimeout(() => pollCorrectionStatus(essayId), 1000);
+                return;
+            } else if (response.status === 401) {
                 // 用户未登录或会话已过期
                 const result = await response.json();
                 statusText.textContent = '登录状态已过期';
@@ -76,21 +81,22 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             
+            statusEtag = response.headers.get('ETag');
             const result = await response.json();
             
             if (result.success) {
                 switch(result.status) {
                     case 'pending':
                         statusText.textContent = '等待批改中...';
-                        setTimeout(() => pollCorrectionStatus(essayId), 2000);
+                        setTimeout(() => pollCorrectionStatus(essayId), 100);
                         break;
                     case 'processing':
                         statusText.textContent = '正在处理中...';
-                        setTimeout(() => pollCorrectionStatus(essayId), 2000);
+                        setTimeout(() => pollCorrectionStatus(essayId), 100);
                         break;
                     case 'correcting':
                         statusText.textContent = '正在批改中...';
-                        setTimeout(() => pollCorrectionStatus(essayId), 2000);
+                        setTimeout(() => pollCorrectionStatus(essayId), 100);
                         break;
                     case 'completed':
                         statusText.textContent = '批改完成！';
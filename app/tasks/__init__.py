@@ -42,6 +42,8 @@ celery.autodiscover_tasks(['app.tasks'])
 try:
     # 批改任务
     from app.tasks.correction_tasks import process_essay_correction
+    # 批量导入任务
+    from app.tasks.batch_ingest_tasks import ingest_batch, finalize_batch
     # 用户任务 (如果存在)
     try:
         from app.tasks.user_tasks import process_user_tasks
@@ -291,7 +291,7 @@ def generate_monthly_report(self, year_month=None, send_to_admin=True):
             )
             
             # 使用迭代器分块获取数据
-            for chunk in iterate_in_chunks(user_activity_query, chunk_size=5000):
+            for chunk in iterate_in_chunks(user_activity_query, chunk_size=5000, key_column=UserActivity.user_id):
                 # 将当前块的用户ID添加到集合中
                 for activity in chunk:
                     active_users_set.add(activity.user_id)
@@ -311,7 +311,7 @@ def generate_monthly_report(self, year_month=None, send_to_admin=True):
             # 获取本月平均作文分数 - 使用分块处理以减轻内存压力
             avg_score_processing_start = time.time()
             
-            essays_query = session.query(Essay.score).filter(
+            essays_query = session.query(Essay.id, Essay.score).filter(
                 Essay.created_at.between(start_timestamp, end_timestamp),
                 Essay.status == 'completed'
             )
@@ -320,7 +320,7 @@ def generate_monthly_report(self, year_month=None, send_to_admin=True):
             total_score = 0.0
             total_count = 0
             
-            for chunk in iterate_in_chunks(essays_query, chunk_size=5000):
+            for chunk in iterate_in_chunks(essays_query, chunk_size=5000, key_column=Essay.id):
                 for essay in chunk:
                     if essay.score is not None:
                         total_score += essay.score
@@ -347,12 +347,12 @@ def generate_monthly_report(self, year_month=None, send_to_admin=True):
                     return "90-100"
             
             # 分块处理分数分布
-            scores_query = session.query(Essay.score).filter(
+            scores_query = session.query(Essay.id, Essay.score).filter(
                 Essay.created_at.between(start_timestamp, end_timestamp),
                 Essay.status == 'completed'
             )
             
-            for chunk in iterate_in_chunks(scores_query, chunk_size=5000):
+            for chunk in iterate_in_chunks(scores_query, chunk_size=5000, key_column=Essay.id):
                 for essay in chunk:
                     if essay.score is not None:
                         score_range = get_score_range(essay.score)
@@ -640,4 +640,42 @@ def generate_user_progress_report(self, user_id, period=30):
         return {
             "status": "error",
             "message": f"生成用户进度报表异常: {str(e)}"
-        } 
\ No newline at end of file
+        } 
+
+@celery_app.task(
+    name='app.tasks.analytics_tasks.compute_usage_predictions',
+    bind=True,
+    max_retries=2,
+    default_retry_delay=600,
+)
+def compute_usage_predictions(self):
+    """
+    夜间批量计算全部有效会员的用量预测，预测接口直接读取结果
+    
+    Args:
+        self: Celery任务实例
+    
+    Returns:
+        dict: 计算结果（会员数、批数、耗时）
+    """
+    from flask import has_app_context
+    from app.core.analytics.usage_model import usage_model
+    
+    try:
+        if has_app_context():
+            return usage_model.run_nightly()
+        from app import create_app
+        with create_app().app_context():
+            return usage_model.run_nightly()
+    
+    except Exception as e:
+        logger.error(f"计算会员用量预测异常: {str(e)}", exc_info=True)
+        
+        # 尝试重试
+        if self.request.retries < self.max_retries:
+            self.retry(exc=e, countdown=self.default_retry_delay)
+        
+        return {
+            "status": "error",
+            "message": f"计算会员用量预测异常: {str(e)}"
+        }
@@ -8,14 +8,13 @@
 
 import os
 import logging
-import shutil
 import time
-import sqlite3
 import datetime
 from pathlib import Path
 from celery import shared_task
 
 from app.config import config
+from app.core.db.sqlite_backup import online_backup, online_restore, BackupError
 
 # 获取logger
 logger = logging.getLogger(__name__)
@@ -28,6 +27,19 @@ WEEKLY_BACKUPS_TO_KEEP = config.BACKUP_CONFIG.get('weekly_backups_to_keep', 4)
 MONTHLY_BACKUPS_TO_KEEP = config.BACKUP_CONFIG.get('monthly_backups_to_keep', 12)
 # 数据库路径
 DB_PATH = config.DB_CONFIG.get('path', 'instance/essay_correction.db')
+# 是否压缩备份输出
+BACKUP_COMPRESSION = config.BACKUP_CONFIG.get('compression', True)
+# 在线备份分步参数
+BACKUP_STEP_PAGES = config.BACKUP_CONFIG.get('backup_step_pages', 1024)
+BACKUP_STEP_SLEEP = config.BACKUP_CONFIG.get('backup_step_sleep', 0.005)
+
+
+def _backup_files(backup_dir, backup_type):
+    """列出指定类型的备份文件（包含压缩和未压缩格式），按文件名排序"""
+    return sorted(
+        list(backup_dir.glob(f"backup_{backup_type}_*.db")) +
+        list(backup_dir.glob(f"backup_{backup_type}_*.db.gz"))
+    )
 
 
 @shared_task(
@@ -63,7 +75,8 @@ def backup_database(backup_type='daily', db_path=None):
         
         # 创建备份文件名
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_file = backup_dir / f"backup_{backup_type}_{timestamp}.db"
+        suffix = '.db.gz' if BACKUP_COMPRESSION else '.db'
+        backup_file = backup_dir / f"backup_{backup_type}_{timestamp}{suffix}"
         
         # 检查数据库文件是否存在
         if not os.path.exists(db_path):
@@ -73,39 +86,35 @@ def backup_database(backup_type='daily', db_path=None):
                 "message": f"数据库文件不存在: {db_path}"
             }
         
-        # 复制数据库文件
-        shutil.copy2(db_path, backup_file)
-        
-        # 验证备份是否有效
+        # 使用在线备份API分步复制一致快照，校验通过后流式压缩写出
         try:
-            conn = sqlite3.connect(str(backup_file))
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA integrity_check;")
-            integrity_result = cursor.fetchone()[0]
-            conn.close()
-            
-            if integrity_result != "ok":
-                logger.error(f"备份文件完整性检查失败: {integrity_result}")
-                return {
-                    "status": "error",
-                    "message": f"备份文件完整性检查失败: {integrity_result}"
-                }
-        except Exception as e:
-            logger.error(f"备份文件验证失败: {str(e)}")
-            if os.path.exists(backup_file):
-                os.remove(backup_file)
-            raise e
+            stats = online_backup(
+                db_path,
+                str(backup_file),
+                compress=BACKUP_COMPRESSION,
+                step_pages=BACKUP_STEP_PAGES,
+                step_sleep=BACKUP_STEP_SLEEP
+            )
+        except BackupError as e:
+            logger.error(f"备份失败: {str(e)}")
+            return {
+                "status": "error",
+                "message": str(e)
+            }
         
         # 清理旧备份
         cleanup_old_backups(backup_type)
         
         processing_time = time.time() - start_time
-        logger.info(f"{backup_type}数据库备份完成，文件: {backup_file}, 耗时: {processing_time:.2f}秒")
+        logger.info(f"{backup_type}数据库备份完成，文件: {backup_file}, "
+                    f"大小: {stats['backup_size']}/{stats['source_size']} 字节, 耗时: {processing_time:.2f}秒")
         
         return {
             "status": "success",
             "message": f"{backup_type}数据库备份完成",
             "backup_file": str(backup_file),
+            "backup_size": stats['backup_size'],
+            "source_size": stats['source_size'],
             "processing_time": processing_time
         }
     
@@ -139,7 +148,7 @@ def cleanup_old_backups(backup_type):
         backup_dir = Path(BACKUP_DIR) / backup_type
         
         # 列出所有备份
-        backup_files = sorted([f for f in backup_dir.glob(f"backup_{backup_type}_*.db")])
+        backup_files = _backup_files(backup_dir, backup_type)
         
         # 如果备份文件数量超过限制，删除最旧的备份
         if len(backup_files) > backups_to_keep:
@@ -181,38 +190,19 @@ def restore_database(self, backup_file, target_db_path=None):
                 "message": f"备份文件不存在: {backup_file}"
             }
         
-        # 验证备份文件完整性
-        try:
-            conn = sqlite3.connect(backup_file)
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA integrity_check;")
-            integrity_result = cursor.fetchone()[0]
-            conn.close()
-            
-            if integrity_result != "ok":
-                logger.error(f"备份文件完整性检查失败: {integrity_result}")
-                return {
-                    "status": "error",
-                    "message": f"备份文件完整性检查失败: {integrity_result}"
-                }
-        except Exception as e:
-            logger.error(f"备份文件验证失败: {str(e)}")
-            return {
-                "status": "error",
-                "message": f"备份文件验证失败: {str(e)}"
-            }
-        
-        # 创建临时备份
+        # 创建当前数据库的临时快照，恢复失败时用于回滚
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         temp_backup = f"{target_db_path}.{timestamp}.bak"
         if os.path.exists(target_db_path):
-            shutil.copy2(target_db_path, temp_backup)
+            online_backup(target_db_path, temp_backup, compress=False, verify=False,
+                          step_pages=BACKUP_STEP_PAGES, step_sleep=BACKUP_STEP_SLEEP)
             logger.info(f"已创建临时备份: {temp_backup}")
         
-        # 恢复数据库
+        # 恢复数据库：校验备份后通过在线备份API写回，避免覆盖正在使用的数据库文件
         try:
-            shutil.copy2(backup_file, target_db_path)
-            logger.info(f"数据库恢复完成，目标文件: {target_db_path}")
+            stats = online_restore(backup_file, target_db_path,
+                                   step_pages=BACKUP_STEP_PAGES, step_sleep=BACKUP_STEP_SLEEP)
+            logger.info(f"数据库恢复完成，目标文件: {target_db_path}, 耗时: {stats['total_time']:.2f}秒")
             
             # 删除临时备份
             if os.path.exists(temp_backup):
@@ -229,7 +219,8 @@ def restore_database(self, backup_file, target_db_path=None):
             # 如果恢复失败，尝试还原临时备份
             logger.error(f"数据库恢复失败: {str(e)}")
             if os.path.exists(temp_backup):
-                shutil.copy2(temp_backup, target_db_path)
+                online_restore(temp_backup, target_db_path)
+                os.remove(temp_backup)
                 logger.info(f"已还原临时备份: {temp_backup}")
             
             return {
@@ -281,11 +272,11 @@ def list_backups(backup_type=None):
             
             # 列出该类型的所有备份
             backups = []
-            for backup_file in sorted(backup_dir.glob(f"backup_{btype}_*.db")):
+            for backup_file in _backup_files(backup_dir, btype):
                 # 获取文件信息
                 file_stats = backup_file.stat()
                 # 提取时间戳
-                timestamp_str = backup_file.name.replace(f"backup_{btype}_", "").replace(".db", "")
+                timestamp_str = backup_file.name.replace(f"backup_{btype}_", "").replace(".gz", "").replace(".db", "")
                 try:
                     timestamp = datetime.datetime.strptime(timestamp_str, '%Y%m%d_%H%M%S')
                 except ValueError:
@@ -294,6 +285,7 @@ def list_backups(backup_type=None):
                 backups.append({
                     "file": str(backup_file),
                     "size": file_stats.st_size,
+                    "compressed": backup_file.name.endswith('.gz'),
                     "created_at": datetime.datetime.fromtimestamp(file_stats.st_ctime).isoformat(),
                     "timestamp": timestamp.isoformat() if timestamp else None
                 })
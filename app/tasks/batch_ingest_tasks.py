@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+作文批量导入任务模块
+批次的文本提取、批量入库和结果汇总
+"""
+
+import logging
+from contextlib import contextmanager
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _app_context():
+    """在没有应用上下文的worker中创建并推送应用上下文"""
+    from flask import has_app_context
+    if has_app_context():
+        yield
+        return
+    from app import create_app
+    ctx = create_app().app_context()
+    ctx.push()
+    try:
+        yield
+    finally:
+        ctx.pop()
+
+
+@shared_task(bind=True, name='app.tasks.batch_ingest_tasks.ingest_batch', queue='correction')
+def ingest_batch(self, batch_id):
+    """
+    导入批次：展开压缩包、并行提取文本、批量写入作文并提交批改任务
+
+    Args:
+        self: Celery任务实例
+        batch_id: 批次ID
+
+    Returns:
+        dict: 导入结果
+    """
+    from app.core.correction.batch_ingest import batch_ingest_service
+
+    logger.info(f"开始导入批次: {batch_id}, 任务ID: {self.request.id}")
+    with _app_context():
+        try:
+            return batch_ingest_service.ingest(batch_id)
+        except Exception as e:
+            logger.error(f"导入批次 {batch_id} 时出错: {str(e)}", exc_info=True)
+            from app.models.db import db
+            from app.models.task_status import TaskStatus
+            db.session.rollback()
+            task_status = TaskStatus.query.filter_by(task_id=batch_id).first()
+            if task_status:
+                task_status.mark_as_failure(e)
+            return {'status': 'error', 'message': str(e)}
+
+
+@shared_task(bind=True, name='app.tasks.batch_ingest_tasks.finalize_batch', queue='correction')
+def finalize_batch(self, batch_id, poll=False):
+    """
+    批次内所有批改任务结束后汇总结果（chord回调）
+
+    Args:
+        self: Celery任务实例
+        batch_id: 批次ID
+        poll: 轮询模式（结果后端不支持chord时）：仍有作文未批改完成则稍后重试，
+              超过最多轮询次数后按当前状态汇总
+
+    Returns:
+        dict: 汇总结果
+    """
+    from app.core.correction.batch_ingest import (
+        batch_ingest_service, FINALIZE_POLL_SECONDS, FINALIZE_POLL_MAX_RETRIES
+    )
+
+    wait = poll and self.request.retries < FINALIZE_POLL_MAX_RETRIES
+    with _app_context():
+        result = batch_ingest_service.finalize(batch_id, wait_for_pending=wait)
+    if result is None:
+        raise self.retry(countdown=FINALIZE_POLL_SECONDS, max_retries=FINALIZE_POLL_MAX_RETRIES)
+    logger.info(f"批次 {batch_id} 批改完成: {result}")
+    return result
@@ -11,10 +11,12 @@ import time
 import math
 import concurrent.futures
 from functools import wraps
+from itertools import islice
 from datetime import datetime
-from typing import List, Dict, Any, Callable, Optional, Tuple, Union, Iterator
+from typing import List, Dict, Any, Callable, Optional, Tuple, Union, Iterator, Iterable
 import threading
 
+from sqlalchemy import insert, update, delete, select, inspect
 from sqlalchemy.orm import Session
 from app.models.db import db
 from app.tasks.logging_config import get_task_logger
@@ -25,93 +27,165 @@ logger = get_task_logger()
 # 线程局部存储，用于保存每个线程的上下文数据
 thread_local = threading.local()
 
+# 批处理器保留的错误明细上限，避免大批量失败时错误列表无限增长
+MAX_COLLECTED_ERRORS = 100
+
+# 任务状态字符串到TaskState的映射
+_TASK_STATE_ALIASES = {
+    'started': 'running',
+    'running': 'running',
+    'progress': 'running',
+    'completed': 'success',
+    'success': 'success',
+    'failed': 'failed',
+    'error': 'failed',
+}
+
+
+def iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """
+    将任意可迭代对象按批次切分，不要求预先物化为列表
+    
+    Args:
+        items: 可迭代对象
+        batch_size: 每批数量
+        
+    Yields:
+        List: 每批项目
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            break
+        yield batch
+
+
+def _process_batch(batch, process_func, error_handler):
+    """顺序处理一个批次，返回该批次的结果与错误"""
+    batch_results = []
+    batch_errors = []
+    
+    for item in batch:
+        try:
+            batch_results.append(process_func(item))
+        except Exception as e:
+            batch_errors.append({"item": item, "error": str(e)})
+            if error_handler:
+                try:
+                    error_handler(item, e)
+                except Exception as handler_error:
+                    logger.error(f"错误处理器异常: {str(handler_error)}")
+    
+    return {
+        "processed": len(batch_results),
+        "failed": len(batch_errors),
+        "results": batch_results,
+        "errors": batch_errors
+    }
+
+
+def _future_result(future, batch_len):
+    """取出线程池中批次的结果，批次整体异常时计为全部失败"""
+    try:
+        return future.result()
+    except Exception as e:
+        logger.error(f"批处理任务异常: {str(e)}")
+        return {"processed": 0, "failed": batch_len, "results": [], "errors": [{"item": None, "error": str(e)}]}
+
+
+def iter_batch_results(
+    items: Iterable[Any],
+    process_func: Callable[[Any], Any],
+    batch_size: int = 100,
+    max_workers: int = 4,
+    use_threading: bool = True,
+    error_handler: Optional[Callable[[Any, Exception], None]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    流式批处理，逐批产出处理结果
+    
+    多线程模式下最多只有 max_workers * 2 个批次在途，内存占用与数据总量无关。
+    
+    Args:
+        items: 待处理的项目（任意可迭代对象）
+        process_func: 处理单个项目的函数
+        batch_size: 每批处理的项目数量
+        max_workers: 最大工作线程数
+        use_threading: 是否使用多线程处理
+        error_handler: 错误处理函数，接受项目和异常作为参数
+        
+    Yields:
+        Dict: 每批的处理结果（processed, failed, results, errors）
+    """
+    batches = iter_batches(items, batch_size)
+    
+    if not (use_threading and max_workers > 1):
+        for batch in batches:
+            yield _process_batch(batch, process_func, error_handler)
+        return
+    
+    max_in_flight = max_workers * 2
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {}
+        for batch in batches:
+            future = executor.submit(_process_batch, batch, process_func, error_handler)
+            in_flight[future] = len(batch)
+            if len(in_flight) >= max_in_flight:
+                done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield _future_result(future, in_flight.pop(future))
+        
+        for future in concurrent.futures.as_completed(list(in_flight)):
+            yield _future_result(future, in_flight.pop(future))
+
+
 def batch_processor(
-    items: List[Any], 
+    items: Iterable[Any], 
     process_func: Callable[[Any], Any], 
     batch_size: int = 100,
     max_workers: int = 4,
     use_threading: bool = True,
-    error_handler: Optional[Callable[[Any, Exception], None]] = None
+    error_handler: Optional[Callable[[Any, Exception], None]] = None,
+    collect_results: bool = True,
+    progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
 ) -> Dict[str, Any]:
     """
     通用批处理函数，支持多线程处理
     
     Args:
-        items: 待处理的项目列表
+        items: 待处理的项目（列表或任意可迭代对象）
         process_func: 处理单个项目的函数，接受一个项目作为参数，返回处理结果
         batch_size: 每批处理的项目数量
         max_workers: 最大工作线程数
         use_threading: 是否使用多线程处理
         error_handler: 错误处理函数，接受项目和异常作为参数
+        collect_results: 是否在返回值中保留每项结果；大批量处理时应关闭
+        progress_callback: 进度回调 progress_callback(已处理数, 总数)
         
     Returns:
         Dict: 处理结果
     """
     start_time = time.time()
-    total_items = len(items)
+    total_items = len(items) if hasattr(items, '__len__') else None
     processed_count = 0
     error_count = 0
     results = []
     errors = []
     
-    logger.info(f"开始批处理 {total_items} 项，批次大小: {batch_size}, 最大工作线程: {max_workers}")
-
-    # 将项目分成批次
-    batches = [items[i:i + batch_size] for i in range(0, total_items, batch_size)]
+    logger.info(f"开始批处理 {total_items if total_items is not None else '流式'} 项，"
+                f"批次大小: {batch_size}, 最大工作线程: {max_workers}")
     
-    # 定义批处理函数
-    def process_batch(batch):
-        batch_results = []
-        batch_errors = []
-        batch_processed = 0
-        batch_failed = 0
-        
-        for item in batch:
-            try:
-                result = process_func(item)
-                batch_results.append(result)
-                batch_processed += 1
-            except Exception as e:
-                batch_failed += 1
-                error_info = {"item": item, "error": str(e)}
-                batch_errors.append(error_info)
-                if error_handler:
-                    try:
-                        error_handler(item, e)
-                    except Exception as handler_error:
-                        logger.error(f"错误处理器异常: {str(handler_error)}")
-        
-        return {
-            "processed": batch_processed,
-            "failed": batch_failed,
-            "results": batch_results,
-            "errors": batch_errors
-        }
-    
-    # 使用多线程或直接处理
-    if use_threading and max_workers > 1 and len(batches) > 1:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(process_batch, batch) for batch in batches]
-            
-            # 收集结果
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    batch_result = future.result()
-                    processed_count += batch_result["processed"]
-                    error_count += batch_result["failed"]
-                    results.extend(batch_result["results"])
-                    errors.extend(batch_result["errors"])
-                except Exception as e:
-                    logger.error(f"批处理任务异常: {str(e)}")
-                    error_count += 1
-    else:
-        # 单线程处理
-        for batch in batches:
-            batch_result = process_batch(batch)
-            processed_count += batch_result["processed"]
-            error_count += batch_result["failed"]
+    for batch_result in iter_batch_results(items, process_func, batch_size, max_workers,
+                                           use_threading, error_handler):
+        processed_count += batch_result["processed"]
+        error_count += batch_result["failed"]
+        if collect_results:
             results.extend(batch_result["results"])
-            errors.extend(batch_result["errors"])
+        if len(errors) < MAX_COLLECTED_ERRORS:
+            errors.extend(batch_result["errors"][:MAX_COLLECTED_ERRORS - len(errors)])
+        if progress_callback:
+            progress_callback(processed_count + error_count, total_items)
     
     processing_time = time.time() - start_time
     
@@ -119,7 +193,7 @@ def batch_processor(
     
     return {
         "status": "success" if error_count == 0 else "partial_success" if processed_count > 0 else "error",
-        "total": total_items,
+        "total": processed_count + error_count,
         "processed": processed_count,
         "failed": error_count,
         "processing_time": processing_time,
@@ -128,82 +202,369 @@ def batch_processor(
     }
 
 
-def iterate_in_chunks(query, chunk_size=1000):
+def _primary_key_attribute(query):
+    """获取实体查询的主键属性，列查询返回None"""
+    descriptions = query.column_descriptions
+    if len(descriptions) != 1:
+        return None
+    entity = descriptions[0].get('entity')
+    if entity is None or descriptions[0].get('expr') is not entity:
+        return None
+    mapper = inspect(entity)
+    return getattr(entity, mapper.get_property_by_column(mapper.primary_key[0]).key)
+
+
+def iterate_in_chunks(query, chunk_size=1000, key_column=None):
     """
-    优化的大数据集查询迭代器，避免一次性加载所有数据到内存中
+    基于键集（keyset）的大数据集查询迭代器，避免一次性加载所有数据到内存中
+    
+    每块以上一块最后一行的键值作为下界（WHERE key > :last ORDER BY key LIMIT n），
+    查询耗时不随偏移量增长，迭代过程中删除或更新已处理的行也不会跳过数据。
     
     Args:
         query: SQLAlchemy查询对象
         chunk_size: 每次获取的记录数量
+        key_column: 排序键列，必须唯一且出现在查询结果中；默认使用实体主键
         
     Yields:
-        每批查询结果
+        每批查询结果（按键列升序）
+        
+    Raises:
+        ValueError: 键集分页时查询已带ORDER BY（结果只能按键列排序，不会静默丢弃调用方的排序）
     """
-    offset = 0
+    if key_column is None:
+        key_column = _primary_key_attribute(query)
+    
+    if key_column is None:
+        # 无法确定排序键时退回到OFFSET分页
+        logger.debug("iterate_in_chunks 未指定键列，使用OFFSET分页")
+        offset = 0
+        while True:
+            chunk = query.limit(chunk_size).offset(offset).all()
+            if not chunk:
+                break
+            yield chunk
+            offset += chunk_size
+        return
+    
+    if query._order_by_clauses:
+        raise ValueError("iterate_in_chunks 按键列排序分块，查询不能带ORDER BY")
+    
+    ordered = query.order_by(key_column)
+    last_key = None
     while True:
-        chunk = query.limit(chunk_size).offset(offset).all()
+        chunk_query = ordered if last_key is None else ordered.filter(key_column > last_key)
+        chunk = chunk_query.limit(chunk_size).all()
         if not chunk:
             break
         yield chunk
-        offset += chunk_size
+        if len(chunk) < chunk_size:
+            break
+        last_key = getattr(chunk[-1], key_column.key)
+
+
+def _table_of(model_or_table):
+    """兼容模型类和Table对象"""
+    return getattr(model_or_table, '__table__', model_or_table)
 
 
 def chunked_insert(
     session: Session, 
     model_class: Any, 
-    data: List[Dict], 
-    chunk_size: int = 1000
+    data: Iterable[Dict], 
+    chunk_size: int = 1000,
+    progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
 ) -> Dict[str, Any]:
     """
-    优化的批量插入函数，将数据分块插入以避免单个事务过大
+    批量插入函数，按块以 executemany 方式插入并逐块提交
     
     Args:
         session: 数据库会话
-        model_class: 模型类
-        data: 待插入的数据列表，每项是字典格式
+        model_class: 模型类或Table对象
+        data: 待插入的数据（字典的列表或生成器）
         chunk_size: 每批插入的记录数量
+        progress_callback: 进度回调 progress_callback(已处理数, 总数)
         
     Returns:
         Dict: 处理结果
     """
     start_time = time.time()
-    total_records = len(data)
+    total_records = len(data) if hasattr(data, '__len__') else None
     inserted_count = 0
     error_count = 0
-    chunk_count = math.ceil(total_records / chunk_size)
+    stmt = insert(_table_of(model_class))
     
-    logger.info(f"开始分块插入 {total_records} 条记录，每批 {chunk_size} 条，预计 {chunk_count} 个批次")
+    logger.info(f"开始分块插入 {total_records if total_records is not None else '流式'} 条记录，每批 {chunk_size} 条")
     
-    for i in range(0, total_records, chunk_size):
-        chunk = data[i:i+chunk_size]
+    for chunk_index, chunk in enumerate(iter_batches(data, chunk_size), start=1):
         try:
-            # 创建模型实例列表
-            instances = [model_class(**item) for item in chunk]
-            
-            # 批量插入
-            session.bulk_save_objects(instances)
+            # 传入参数列表时SQLAlchemy使用executemany，一个批次一次往返
+            session.execute(stmt, chunk)
             session.commit()
-            
             inserted_count += len(chunk)
-            logger.debug(f"已插入批次 {i//chunk_size + 1}/{chunk_count}，进度: {inserted_count}/{total_records}")
-        
+            logger.debug(f"已插入批次 {chunk_index}，进度: {inserted_count}")
         except Exception as e:
             session.rollback()
             error_count += len(chunk)
-            logger.error(f"批次 {i//chunk_size + 1}/{chunk_count} 插入失败: {str(e)}")
+            logger.error(f"批次 {chunk_index} 插入失败: {str(e)}")
+        
+        if progress_callback:
+            progress_callback(inserted_count + error_count, total_records)
     
     processing_time = time.time() - start_time
     logger.info(f"分块插入完成，成功: {inserted_count}，失败: {error_count}，耗时: {processing_time:.2f}秒")
     
     return {
         "status": "success" if error_count == 0 else "partial_success" if inserted_count > 0 else "error",
-        "total": total_records,
+        "total": inserted_count + error_count,
         "inserted": inserted_count,
         "failed": error_count,
         "processing_time": processing_time
     }
 
 
+def chunked_update(
+    session: Session,
+    model_class: Any,
+    ids: Iterable[Any],
+    values: Dict[str, Any],
+    chunk_size: int = 1000,
+    extra_condition=None,
+    progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+    return_ids: bool = False
+) -> Dict[str, Any]:
+    """
+    按主键分块执行批量UPDATE，每块一条语句并提交
+    
+    Args:
+        session: 数据库会话
+        model_class: 模型类
+        ids: 主键列表或生成器
+        values: 要更新的列值
+        chunk_size: 每批更新的记录数量
+        extra_condition: 额外的WHERE条件（如只更新特定状态的行）
+        progress_callback: 进度回调 progress_callback(已处理数, 总数)
+        return_ids: 是否用RETURNING返回实际更新的主键（updated_ids）
+        
+    Returns:
+        Dict: 处理结果，updated为实际更新的行数
+    """
+    start_time = time.time()
+    total_records = len(ids) if hasattr(ids, '__len__') else None
+    pk = _primary_key_column(model_class)
+    seen = 0
+    updated_count = 0
+    error_count = 0
+    updated_ids = []
+    
+    for chunk in iter_batches(ids, chunk_size):
+        stmt = update(model_class).where(pk.in_(chunk)).values(**values)
+        if extra_condition is not None:
+            stmt = stmt.where(extra_condition)
+        if return_ids:
+            stmt = stmt.returning(pk)
+        try:
+            result = session.execute(stmt.execution_options(synchronize_session=False))
+            chunk_ids = list(result.scalars()) if return_ids else None
+            session.commit()
+            if return_ids:
+                updated_ids.extend(chunk_ids)
+                updated_count += len(chunk_ids)
+            else:
+                updated_count += result.rowcount
+        except Exception as e:
+            session.rollback()
+            error_count += len(chunk)
+            logger.error(f"批量更新 {model_class.__name__} 失败: {str(e)}")
+        seen += len(chunk)
+        if progress_callback:
+            progress_callback(seen, total_records)
+    
+    result = {
+        "status": "success" if error_count == 0 else "partial_success" if updated_count > 0 else "error",
+        "total": seen,
+        "updated": updated_count,
+        "failed": error_count,
+        "processing_time": time.time() - start_time
+    }
+    if return_ids:
+        result["updated_ids"] = updated_ids
+    return result
+
+
+def chunked_delete(
+    session: Session,
+    model_class: Any,
+    condition,
+    chunk_size: int = 1000,
+    progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+    total: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    按主键键集分块删除满足条件的记录，每块提交一次
+    
+    失败的批次会被跳过而不是反复重试，避免死循环。
+    
+    Args:
+        session: 数据库会话
+        model_class: 模型类
+        condition: 删除条件
+        chunk_size: 每批删除的记录数量
+        progress_callback: 进度回调 progress_callback(已处理数, 总数)
+        total: 预先统计的总数（仅用于进度显示）
+        
+    Returns:
+        Dict: 处理结果
+    """
+    start_time = time.time()
+    pk = _primary_key_column(model_class)
+    deleted_count = 0
+    error_count = 0
+    last_id = None
+    
+    while True:
+        id_query = select(pk).where(condition).order_by(pk).limit(chunk_size)
+        if last_id is not None:
+            id_query = id_query.where(pk > last_id)
+        batch_ids = session.execute(id_query).scalars().all()
+        if not batch_ids:
+            break
+        last_id = batch_ids[-1]
+        
+        try:
+            result = session.execute(
+                delete(model_class).where(pk.in_(batch_ids)).execution_options(synchronize_session=False)
+            )
+            session.commit()
+            deleted_count += result.rowcount
+        except Exception as e:
+            session.rollback()
+            error_count += len(batch_ids)
+            logger.error(f"批量删除 {model_class.__name__} 失败: {str(e)}")
+        
+        if progress_callback:
+            progress_callback(deleted_count + error_count, total)
+        if len(batch_ids) < chunk_size:
+            break
+    
+    return {
+        "status": "success" if error_count == 0 else "partial_success" if deleted_count > 0 else "error",
+        "deleted": deleted_count,
+        "failed": error_count,
+        "processing_time": time.time() - start_time
+    }
+
+
+def _primary_key_column(model_class):
+    """获取模型的主键属性"""
+    mapper = inspect(model_class)
+    return getattr(model_class, mapper.get_property_by_column(mapper.primary_key[0]).key)
+
+
+def record_task_status(task_name: str, status: str = 'started', task_id: Optional[str] = None) -> Optional[str]:
+    """
+    创建任务状态记录
+    
+    Args:
+        task_name: 任务名称
+        status: 初始状态
+        task_id: 任务ID，默认自动生成
+        
+    Returns:
+        Optional[str]: 任务ID，记录失败时返回None
+    """
+    from uuid import uuid4
+    from app.models.task_status import TaskStatus
+    
+    task_id = task_id or str(uuid4())
+    try:
+        task_status = TaskStatus(task_id=task_id, task_name=task_name,
+                                 status=_TASK_STATE_ALIASES.get(status, status),
+                                 started_at=datetime.utcnow())
+        db.session.add(task_status)
+        db.session.commit()
+        return task_id
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"记录任务状态失败: {str(e)}")
+        return None
+
+
+def update_task_status(
+    task_id: Optional[str],
+    status: str,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+    progress: Optional[Dict[str, Any]] = None
+) -> bool:
+    """
+    更新任务状态记录
+    
+    Args:
+        task_id: 任务ID
+        status: 状态（started/running/completed/failed 或 TaskState值）
+        result: 任务结果
+        error: 错误信息
+        progress: 进度信息，写入task_metadata['progress']
+        
+    Returns:
+        bool: 是否更新成功
+    """
+    if not task_id:
+        return False
+    
+    from app.models.task_status import TaskStatus
+    
+    try:
+        task_status = TaskStatus.query.filter_by(task_id=task_id).first()
+        if not task_status:
+            logger.debug(f"任务状态记录不存在: {task_id}")
+            return False
+        
+        state = _TASK_STATE_ALIASES.get(status, status)
+        task_status.status = state
+        if state in ('success', 'failed'):
+            task_status.completed_at = datetime.utcnow()
+        if result is not None:
+            task_status.result = result
+        if error:
+            task_status.error = str(error)
+        if progress is not None:
+            task_status.task_metadata = dict(task_status.task_metadata or {}, progress=progress)
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"更新任务状态失败: {task_id}, 错误: {str(e)}")
+        return False
+
+
+def make_progress_callback(task_id: Optional[str], min_interval: float = 2.0) -> Callable[[int, Optional[int]], None]:
+    """
+    创建写入任务状态的进度回调，按时间间隔节流
+    
+    Args:
+        task_id: 任务ID
+        min_interval: 两次写入之间的最小间隔（秒）
+        
+    Returns:
+        Callable: progress_callback(已处理数, 总数)
+    """
+    last_update = {'time': 0.0}
+    
+    def callback(done: int, total: Optional[int] = None):
+        now = time.time()
+        if now - last_update['time'] < min_interval and (total is None or done < total):
+            return
+        last_update['time'] = now
+        progress = {'done': done, 'total': total, 'updated_at': datetime.utcnow().isoformat()}
+        if total:
+            progress['percent'] = round(done * 100.0 / total, 1)
+        update_task_status(task_id, 'running', progress=progress)
+    
+    return callback
+
+
 def get_thread_session():
     """
     获取当前线程的数据库会话
@@ -12,13 +12,15 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Union
 
 from app.tasks.celery_app import celery_app
+from sqlalchemy import select, insert, update
 from app.tasks.batch_optimization import (
-    batch_processor, 
+    iter_batches,
     iterate_in_chunks, 
-    chunked_insert,
+    chunked_update,
+    chunked_delete,
+    make_progress_callback,
     monitor_performance,
-    prioritize_task,
-    with_thread_session
+    prioritize_task
 )
 from app.tasks.logging_config import get_task_logger
 from app.models.db import db
@@ -26,6 +28,7 @@ from app.models.essay import Essay
 from app.models.user import User
 from app.models.correction import Correction
 from app.models.task_status import TaskStatus, TaskState
+from app.core.correction.status_cache import essay_status_cache
 
 # 获取任务专用日志记录器
 logger = get_task_logger()
@@ -90,7 +93,7 @@ def bulk_update_essay_status(
         status: 目标状态
         notify_users: 是否通知用户
         batch_size: 批量处理的尺寸
-        max_workers: 最大工作线程数
+        max_workers: 最大工作线程数（保留参数，批量UPDATE不再需要多线程）
         
     Returns:
         Dict: 处理结果
@@ -111,94 +114,97 @@ def bulk_update_essay_status(
         except Exception as e:
             logger.warning(f"记录任务状态失败: {str(e)}")
         
-        # 定义单个作文处理函数
-        @with_thread_session
-        def update_essay_status(session, essay_id):
-            essay = session.query(Essay).get(essay_id)
-            if not essay:
-                return {
-                    "essay_id": essay_id,
-                    "status": "error",
-                    "message": "作文不存在"
-                }
-            
-            # 更新状态
-            previous_status = essay.status
-            essay.status = status
-            essay.updated_at = datetime.now().timestamp()
-            
-            # 添加状态变更记录
+        progress_callback = make_progress_callback(self.request.id)
+        
+        # 状态历史模型为可选功能
+        try:
             from app.models.essay_status_history import EssayStatusHistory
-            status_history = EssayStatusHistory(
-                essay_id=essay_id,
-                previous_status=previous_status,
-                new_status=status,
-                changed_by='system',
-                reason=f'批量状态更新任务 {self.request.id}'
-            )
-            session.add(status_history)
-            
-            # 提交更改
-            try:
-                session.commit()
-                logger.debug(f"已更新作文 {essay_id} 状态: {previous_status} -> {status}")
+        except ImportError:
+            EssayStatusHistory = None
+        
+        total = len(essay_ids)
+        processed_count = 0
+        missing_ids = []
+        failed_ids = []
+        updated_essays = []
+        
+        with db.session() as session:
+            for batch in iter_batches(essay_ids, batch_size):
+                # 一次查询取出本批作文的当前状态
+                previous = dict(session.execute(
+                    select(Essay.id, Essay.status).where(Essay.id.in_(batch))
+                ).all())
+                missing_ids.extend(essay_id for essay_id in batch if essay_id not in previous)
+                found_ids = list(previous)
                 
-                # 如果需要通知用户
-                if notify_users and essay.user_id:
+                if found_ids:
+                    # 整批一条UPDATE（同时递增乐观锁版本号），状态历史在同一事务中写入，两者同时提交或回滚
                     try:
-                        from app.tasks.notification_tasks import send_task_failure_notification
-                        send_task_failure_notification.delay(
-                            task_id=self.request.id,
-                            related_type='essay',
-                            related_id=essay_id,
-                            error_message=f"作文状态已更新: {previous_status} -> {status}"
+                        session.execute(
+                            update(Essay).where(Essay.id.in_(found_ids))
+                            .values(status=status, updated_at=datetime.utcnow(), version=Essay.version + 1)
+                            .execution_options(synchronize_session=False)
                         )
-                    except Exception as notify_error:
-                        logger.error(f"通知用户失败 {essay.user_id}: {str(notify_error)}")
+                        if EssayStatusHistory is not None:
+                            session.execute(insert(EssayStatusHistory), [
+                                {
+                                    'essay_id': essay_id,
+                                    'previous_status': previous[essay_id],
+                                    'new_status': status,
+                                    'changed_by': 'system',
+                                    'reason': f'批量状态更新任务 {self.request.id}'
+                                }
+                                for essay_id in found_ids
+                            ])
+                        session.commit()
+                    except Exception as e:
+                        session.rollback()
+                        logger.error(f"批量更新作文状态失败: {str(e)}")
+                        failed_ids.extend(found_ids)
+                    else:
+                        # 批量UPDATE不触发会话事件，提交后直接写入状态缓存
+                        essay_status_cache.publish_many(found_ids, status)
+                        processed_count += len(found_ids)
+                        updated_essays.extend(found_ids)
                 
-                return {
-                    "essay_id": essay_id,
-                    "status": "success",
-                    "previous_status": previous_status,
-                    "new_status": status
-                }
-            except Exception as commit_error:
-                session.rollback()
-                logger.error(f"更新作文 {essay_id} 状态失败: {str(commit_error)}")
-                return {
-                    "essay_id": essay_id,
-                    "status": "error",
-                    "message": str(commit_error)
-                }
+                progress_callback(processed_count + len(missing_ids) + len(failed_ids), total)
         
-        # 错误处理函数
-        def handle_error(essay_id, error):
-            logger.error(f"处理作文 {essay_id} 时发生错误: {str(error)}")
-            # 可以在这里添加额外的错误处理逻辑
+        # 如果需要通知用户
+        if notify_users and updated_essays:
+            from app.tasks.notification_tasks import send_task_failure_notification
+            for essay_id in updated_essays:
+                try:
+                    send_task_failure_notification.delay(
+                        task_id=self.request.id,
+                        related_type='essay',
+                        related_id=essay_id,
+                        error_message=f"作文状态已更新为: {status}"
+                    )
+                except Exception as notify_error:
+                    logger.error(f"通知作文 {essay_id} 的用户失败: {str(notify_error)}")
         
-        # 使用批处理器执行更新
-        result = batch_processor(
-            items=essay_ids,
-            process_func=update_essay_status,
-            batch_size=batch_size,
-            max_workers=max_workers,
-            use_threading=True,
-            error_handler=handle_error
-        )
+        error_count = len(missing_ids) + len(failed_ids)
+        result = {
+            "status": "success" if error_count == 0 else "partial_success" if processed_count > 0 else "error",
+            "total": total,
+            "processed": processed_count,
+            "failed": error_count,
+            "errors": (
+                [{"item": essay_id, "error": "作文不存在"} for essay_id in missing_ids[:100]] +
+                [{"item": essay_id, "error": "批量更新失败"} for essay_id in failed_ids[:100]]
+            ),
+            "processing_time": time.time() - start_time
+        }
+        logger.info(f"批量更新作文状态完成，成功: {processed_count}, 失败: {error_count}")
         
         # 更新任务状态
         if 'task_status' in locals():
-            if result['status'] == 'success':
-                task_status.mark_as_success(result=result)
-            elif result['status'] == 'partial_success':
-                task_status.mark_as_success(
-                    result=result,
-                    warning_message=f"部分作文更新失败: {result['failed']}/{result['total']}"
-                )
-            else:
+            if result['status'] == 'error':
                 task_status.mark_as_failure(
-                    error_message=f"批量更新作文状态失败: {result['failed']}/{result['total']}"
+                    error=f"批量更新作文状态失败: {result['failed']}/{result['total']}"
                 )
+            else:
+                task_status.mark_as_success(result=result)
         
         return result
         
@@ -207,7 +213,7 @@ def bulk_update_essay_status(
         
         # 更新任务状态
         if 'task_status' in locals():
-            task_status.mark_as_failure(error_message=str(e))
+            task_status.mark_as_failure(error=str(e))
         
         # 尝试重试
         if self.request.retries < self.max_retries:
@@ -269,83 +275,81 @@ def reprocess_failed_corrections(
             logger.warning(f"记录任务状态失败: {str(e)}")
         
         # 计算时间范围
-        end_date = datetime.now()
+        end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=time_range_days)
         
-        # 转换为时间戳
-        start_timestamp = start_date.timestamp()
-        end_timestamp = end_date.timestamp()
+        progress_callback = make_progress_callback(self.request.id)
+        from app.tasks.correction_tasks import batch_process_essays
         
-        # 查询失败的作文
         with db.session() as session:
-            failed_essays = session.query(Essay).filter(
+            # 按主键键集分批读取失败作文的ID，不加载作文内容
+            failed_query = session.query(Essay.id).filter(
                 Essay.status == 'failed',
-                Essay.created_at.between(start_timestamp, end_timestamp)
-            ).limit(max_essays).all()
-            
-            logger.info(f"找到 {len(failed_essays)} 个失败的作文")
-            
-            if not failed_essays:
-                result = {
-                    "status": "success",
-                    "message": f"未找到需要重新处理的失败作文",
-                    "total": 0,
-                    "processing_time": time.time() - start_time
-                }
-                
-                if 'task_status' in locals():
-                    task_status.mark_as_success(result=result)
-                
-                return result
-            
-            # 获取作文ID
-            essay_ids = [essay.id for essay in failed_essays]
-            
-            # 分批重新提交作文批改任务
-            from app.tasks.correction_tasks import batch_process_essays
+                Essay.created_at.between(start_date, end_date)
+            )
             
-            total_batches = (len(essay_ids) + batch_size - 1) // batch_size
+            total_essays = 0
             submitted_batches = 0
             batch_results = []
             
-            for i in range(0, len(essay_ids), batch_size):
-                batch = essay_ids[i:i+batch_size]
+            for chunk in iterate_in_chunks(failed_query, chunk_size=batch_size, key_column=Essay.id):
+                batch = [row.id for row in chunk][:max_essays - total_essays]
+                batch_number = len(batch_results) + 1
+                total_essays += len(batch)
                 
                 try:
-                    # 将作文状态更新为待处理
-                    for essay_id in batch:
-                        essay = session.query(Essay).get(essay_id)
-                        if essay:
-                            essay.status = 'pending'
-                    session.commit()
+                    # 将本批作文状态更新为待处理（一条UPDATE）
+                    reset = chunked_update(session, Essay, batch, {'status': 'pending'},
+                                           chunk_size=batch_size, extra_condition=Essay.status == 'failed',
+                                           return_ids=True)
+                    essay_status_cache.publish_many(reset['updated_ids'], 'pending')
                     
                     # 提交批处理任务
                     batch_task = batch_process_essays.delay(batch, high_priority)
                     
                     batch_results.append({
-                        "batch": i // batch_size + 1,
+                        "batch": batch_number,
                         "essay_count": len(batch),
                         "task_id": batch_task.id,
                         "status": "submitted"
                     })
                     
                     submitted_batches += 1
-                    logger.info(f"已提交批次 {submitted_batches}/{total_batches}, "
-                               f"包含 {len(batch)} 个作文, 任务ID: {batch_task.id}")
+                    logger.info(f"已提交批次 {batch_number}, 包含 {len(batch)} 个作文, 任务ID: {batch_task.id}")
                     
                 except Exception as batch_error:
-                    logger.error(f"提交批次 {i // batch_size + 1} 失败: {str(batch_error)}")
+                    logger.error(f"提交批次 {batch_number} 失败: {str(batch_error)}")
                     batch_results.append({
-                        "batch": i // batch_size + 1,
+                        "batch": batch_number,
                         "essay_count": len(batch),
                         "status": "error",
                         "message": str(batch_error)
                     })
+                
+                progress_callback(total_essays, max_essays)
+                if total_essays >= max_essays:
+                    break
+            
+            logger.info(f"找到 {total_essays} 个失败的作文")
+            
+            if not total_essays:
+                result = {
+                    "status": "success",
+                    "message": f"未找到需要重新处理的失败作文",
+                    "total": 0,
+                    "processing_time": time.time() - start_time
+                }
+                
+                if 'task_status' in locals():
+                    task_status.mark_as_success(result=result)
+                
+                return result
             
+            total_batches = len(batch_results)
             result = {
                 "status": "success" if submitted_batches == total_batches else "partial_success",
                 "message": f"已提交 {submitted_batches}/{total_batches} 批作文重新批改",
-                "total_essays": len(essay_ids),
+                "total_essays": total_essays,
                 "submitted_batches": submitted_batches,
                 "total_batches": total_batches,
                 "batch_results": batch_results,
@@ -354,13 +358,7 @@ def reprocess_failed_corrections(
             
             # 更新任务状态
             if 'task_status' in locals():
-                if result['status'] == 'success':
-                    task_status.mark_as_success(result=result)
-                else:
-                    task_status.mark_as_success(
-                        result=result,
-                        warning_message=f"部分批次提交失败: {total_batches - submitted_batches}/{total_batches}"
-                    )
+                task_status.mark_as_success(result=result)
             
             return result
             
@@ -369,7 +367,7 @@ def reprocess_failed_corrections(
         
         # 更新任务状态
         if 'task_status' in locals():
-            task_status.mark_as_failure(error_message=str(e))
+            task_status.mark_as_failure(error=str(e))
         
         # 尝试重试
         if self.request.retries < self.max_retries:
@@ -429,26 +427,23 @@ def bulk_delete_old_data(
             logger.warning(f"记录任务状态失败: {str(e)}")
         
         # 计算截止日期
-        cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-        cutoff_timestamp = cutoff_date.timestamp()
+        cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
         
         # 获取要使用的模型和查询条件
         if data_type == 'task_status':
-            from app.models.task_status import TaskStatus
             model = TaskStatus
-            condition = TaskStatus.created_at < cutoff_timestamp
+            condition = TaskStatus.created_at < cutoff_date
             id_column = TaskStatus.id
             date_column = TaskStatus.created_at
         elif data_type == 'corrections':
-            from app.models.correction import Correction
             model = Correction
-            condition = Correction.created_at < cutoff_timestamp
+            condition = Correction.created_at < cutoff_date
             id_column = Correction.id
             date_column = Correction.created_at
         elif data_type == 'user_activity':
             from app.models.user_activity import UserActivity
             model = UserActivity
-            condition = UserActivity.created_at < cutoff_timestamp
+            condition = UserActivity.created_at < cutoff_date
             id_column = UserActivity.id
             date_column = UserActivity.created_at
         else:
@@ -456,7 +451,7 @@ def bulk_delete_old_data(
             logger.error(error_msg)
             
             if 'task_status' in locals():
-                task_status.mark_as_failure(error_message=error_msg)
+                task_status.mark_as_failure(error=error_msg)
                 
             return {
                 "status": "error",
@@ -491,9 +486,6 @@ def bulk_delete_old_data(
                 oldest_record = session.query(db.func.min(date_column)).filter(condition).scalar()
                 newest_record = session.query(db.func.max(date_column)).filter(condition).scalar()
                 
-                oldest_date = datetime.fromtimestamp(oldest_record) if oldest_record else None
-                newest_date = datetime.fromtimestamp(newest_record) if newest_record else None
-                
                 result = {
                     "status": "success",
                     "message": f"找到 {total_records} 条要删除的 {data_type} 记录，干运行模式未执行删除",
@@ -501,8 +493,8 @@ def bulk_delete_old_data(
                     "deleted": 0,
                     "dry_run": True,
                     "cutoff_date": cutoff_date.isoformat(),
-                    "oldest_record_date": oldest_date.isoformat() if oldest_date else None,
-                    "newest_record_date": newest_date.isoformat() if newest_date else None,
+                    "oldest_record_date": oldest_record.isoformat() if oldest_record else None,
+                    "newest_record_date": newest_record.isoformat() if newest_record else None,
                     "processing_time": time.time() - start_time
                 }
                 
@@ -511,34 +503,16 @@ def bulk_delete_old_data(
                 
                 return result
             
-            # 实际执行删除操作
-            deleted_count = 0
-            error_count = 0
-            
-            # 分批处理删除
-            while True:
-                # 获取一批要删除的记录ID
-                batch_ids = session.query(id_column).filter(condition).limit(batch_size).all()
-                if not batch_ids:
-                    break
-                
-                # 将ID列表转换为纯整数列表
-                batch_ids = [id_tuple[0] for id_tuple in batch_ids]
-                
-                try:
-                    # 执行批量删除
-                    delete_count = session.query(model).filter(
-                        id_column.in_(batch_ids)
-                    ).delete(synchronize_session=False)
-                    
-                    session.commit()
-                    deleted_count += delete_count
-                    logger.info(f"已删除 {deleted_count}/{total_records} 条 {data_type} 记录")
-                    
-                except Exception as batch_error:
-                    session.rollback()
-                    error_count += len(batch_ids)
-                    logger.error(f"删除 {data_type} 批次数据时出错: {str(batch_error)}")
+            # 按主键键集分批删除，每批一条DELETE并提交
+            delete_result = chunked_delete(
+                session, model, condition,
+                chunk_size=batch_size,
+                progress_callback=make_progress_callback(self.request.id),
+                total=total_records
+            )
+            deleted_count = delete_result['deleted']
+            error_count = delete_result['failed']
+            logger.info(f"已删除 {deleted_count}/{total_records} 条 {data_type} 记录")
             
             result = {
                 "status": "success" if error_count == 0 else "partial_success",
@@ -553,13 +527,7 @@ def bulk_delete_old_data(
             
             # 更新任务状态
             if 'task_status' in locals():
-                if result['status'] == 'success':
-                    task_status.mark_as_success(result=result)
-                else:
-                    task_status.mark_as_success(
-                        result=result,
-                        warning_message=f"部分记录删除失败: {error_count}/{total_records}"
-                    )
+                task_status.mark_as_success(result=result)
             
             return result
             
@@ -568,7 +536,7 @@ def bulk_delete_old_data(
         
         # 更新任务状态
         if 'task_status' in locals():
-            task_status.mark_as_failure(error_message=str(e))
+            task_status.mark_as_failure(error=str(e))
         
         # 尝试重试
         if self.request.retries < self.max_retries:
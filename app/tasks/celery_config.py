@@ -206,6 +206,7 @@ task_routes = {
     'app.tasks.correction_tasks.process_essay_correction': {'queue': 'correction'},
     'app.tasks.correction_tasks.high_priority_essay_correction': {'queue': 'correction.priority'},
     'app.tasks.correction_tasks.batch_process_essays': {'queue': 'correction'},
+    'app.tasks.batch_ingest_tasks.*': {'queue': 'correction'},
     
     # 邮件任务
     'app.tasks.notification_tasks.*': {'queue': 'email'},
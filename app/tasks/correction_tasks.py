@@ -20,6 +20,9 @@ from redis.exceptions import LockError
 from app.models.essay import Essay, EssayStatus
 from app.models.correction import Correction, CorrectionStatus
 from app.core.correction.correction_service import CorrectionService
+from app.core.monitoring.tracing import (
+    span, record_span, start_trace, headers_from_task_request, TRACEPARENT_HEADER, ENQUEUED_AT_HEADER
+)
 from app.extensions import db
 
 logger = logging.getLogger(__name__)
@@ -29,6 +32,34 @@ def process_essay_correction(self, essay_id):
     """
     处理文章批改任务
     
+    延续提交请求带来的链路上下文，记录排队等待时间和各处理阶段的耗时
+    
+    Args:
+        self: Celery任务实例
+        essay_id: 文章ID
+        
+    Returns:
+        dict: 包含批改结果的字典
+    """
+    headers = headers_from_task_request(self.request)
+    with start_trace(essay_id=essay_id, traceparent=headers.get(TRACEPARENT_HEADER)):
+        try:
+            enqueued_at = float(headers.get(ENQUEUED_AT_HEADER))
+        except (TypeError, ValueError):
+            enqueued_at = None
+        record_span('queue_wait', enqueued_at, time.time())
+        
+        with span('task', task_id=self.request.id) as current:
+            result = _run_essay_correction(self, essay_id)
+            if not (isinstance(result, dict) and result.get('success')):
+                current['outcome'] = 'error'
+            return result
+
+
+def _run_essay_correction(self, essay_id):
+    """
+    执行批改任务的各个阶段
+    
     Args:
         self: Celery任务实例
         essay_id: 文章ID
@@ -56,9 +87,10 @@ def process_essay_correction(self, essay_id):
         # 应用上下文处理
         if not has_app_context():
             logger.info("未检测到应用上下文，正在创建新的应用上下文...")
-            app = create_app()
-            ctx = app.app_context()
-            ctx.push()
+            with span('app_context'):
+                app = create_app()
+                ctx = app.app_context()
+                ctx.push()
             logger.info("已创建并推送新的应用上下文")
         else:
             logger.info("检测到现有应用上下文，继续使用当前上下文")
@@ -85,7 +117,9 @@ def process_essay_correction(self, essay_id):
             lock = redis_client.lock(lock_name, timeout=lock_timeout)
             
             # 非阻塞方式获取锁
-            have_lock = lock.acquire(blocking=False)
+            with span('lock_acquire') as lock_span:
+                have_lock = lock.acquire(blocking=False)
+                lock_span['attributes']['acquired'] = have_lock
             
             if not have_lock:
                 logger.warning(f"无法获取作文处理锁，可能已有进程正在处理: {essay_id}")
@@ -124,7 +158,8 @@ def process_essay_correction(self, essay_id):
         logger.info(f"查询文章 ID: {essay_id}")
         
         # 使用get方法获取作文，性能更好
-        essay = db.session.get(Essay, essay_id)
+        with span('load_essay'):
+            essay = db.session.get(Essay, essay_id)
         
         if not essay:
             logger.error(f"找不到文章 ID: {essay_id}")
@@ -166,7 +201,8 @@ def process_essay_correction(self, essay_id):
                 if retry_count > 0:
                     logger.info(f"第 {retry_count} 次重试批改作文: {essay_id}")
                     # 等待一段时间再重试
-                    time.sleep(retry_count * 5)  # 5秒, 10秒
+                    with span('retry_backoff', attempt=retry_count):
+                        time.sleep(retry_count * 5)  # 5秒, 10秒
                 
                 # 执行批改
                 result = service.perform_correction(essay)
@@ -38,6 +38,9 @@ from app.models.db import db
 from app.models.essay import Essay, EssayStatus
 from app.models.correction import Correction, CorrectionStatus
 from app.models.task_status import TaskStatus, TaskState
+from app.core.db.query_profiles import essay_scan_options, correction_scan_options
+from app.core.correction.reconciliation import reconcile_stale_essays
+from app.tasks.batch_optimization import record_task_status, update_task_status
 from app.tasks.celery_app import celery_app
 from app.config import get_settings
 from app.database import get_db_path
@@ -297,14 +300,12 @@ def check_essay_statuses():
 def _process_check_essay_statuses(task_id):
     """实际处理作文状态检查的内部函数"""
     try:
-        # 查找长时间处于处理中状态的作文
-        stale_time = datetime.utcnow() - timedelta(hours=2)  # 2小时视为过期
-        stale_essays = Essay.query.filter(
-            Essay.status == 'correcting',
-            Essay.updated_at < stale_time
-        ).all()
-        
-        if not stale_essays:
+        # 查找长时间处于处理中状态的作文（2小时视为过期），分块修复
+        stale_time = datetime.utcnow() - timedelta(hours=2)
+        stats = reconcile_stale_essays(stale_time, celery_app=celery_app)
+        processed_count = stats['processed_count']
+        
+        if not processed_count:
             logger.info("没有发现滞留的作文")
             
             # 更新任务状态
@@ -319,84 +320,22 @@ def _process_check_essay_statuses(task_id):
                 "processed_count": 0
             }
         
-        # 记录滞留的作文数量
-        logger.info(f"发现 {len(stale_essays)} 篇滞留的作文")
-        
-        # 处理滞留的作文
-        processed_count = 0
-        for essay in stale_essays:
-            try:
-                logger.info(f"处理滞留作文: essay_id={essay.id}, 状态={essay.status}, 更新时间={essay.updated_at}")
-                
-                # 获取相关的批改记录
-                correction = Correction.query.filter_by(essay_id=essay.id).first()
-                
-                if not correction:
-                    logger.warning(f"作文 {essay.id} 没有关联的批改记录")
-                    # 将作文状态重置为pending
-                    essay.status = 'pending'
-                    db.session.add(essay)
-                    processed_count += 1
-                    continue
-                
-                # 检查任务状态
-                task_id = correction.task_id
-                if task_id:
-                    task_result = AsyncResult(task_id, app=celery_app)
-                    task_status = task_result.state
-                    logger.info(f"任务 {task_id} 的状态为: {task_status}")
-                    
-                    if task_status in ["PENDING", "STARTED", "RETRY"]:
-                        # 任务仍在处理但时间过长，重置为待处理状态
-                        logger.info(f"任务 {task_id} 运行时间过长，重置状态")
-                        essay.status = 'pending'
-                        correction.status = 'pending'
-                        correction.task_id = None
-                    elif task_status == "SUCCESS":
-                        # 任务已成功但状态未更新
-                        essay.status = 'completed'
-                        correction.status = 'completed'
-                        logger.info(f"更新作文 {essay.id} 和批改 {correction.id} 的状态为completed")
-                    elif task_status in ["FAILURE", "REVOKED"]:
-                        # 任务已失败
-                        essay.status = 'failed'
-                        correction.status = 'failed'
-                        correction.error = "任务执行失败或被撤销"
-                        logger.info(f"更新作文 {essay.id} 和批改 {correction.id} 的状态为failed")
-                    else:
-                        # 未知状态，重置为待处理
-                        essay.status = 'pending'
-                        correction.status = 'pending'
-                        correction.task_id = None
-                        logger.info(f"未知任务状态，重置作文 {essay.id} 和批改 {correction.id} 的状态为pending")
-                else:
-                    # 没有任务ID，重置为待处理
-                    essay.status = 'pending'
-                    correction.status = 'pending'
-                    logger.info(f"批改记录无任务ID，重置作文 {essay.id} 和批改 {correction.id} 的状态为pending")
-                
-                db.session.add(essay)
-                db.session.add(correction)
-                processed_count += 1
-                
-            except Exception as e:
-                logger.error(f"处理作文 {essay.id} 时出错: {str(e)}")
-                logger.error(traceback.format_exc())
-        
-        # 提交所有更改
-        db.session.commit()
-        logger.info(f"已处理 {processed_count} 篇滞留的作文")
+        logger.info(f"已处理 {processed_count} 篇滞留的作文: 重置 {stats['pending']} 篇, "
+                    f"完成 {stats['completed']} 篇, 失败 {stats['failed']} 篇, "
+                    f"无批改记录 {stats['missing_correction']} 篇")
         
         # 更新任务状态
         update_task_status(task_id, "completed", result={
             "message": f"已处理 {processed_count} 篇滞留的作文",
-            "processed_count": processed_count
+            "processed_count": processed_count,
+            "details": stats
         })
         
         return {
             "status": "success",
             "message": f"已处理 {processed_count} 篇滞留的作文",
-            "processed_count": processed_count
+            "processed_count": processed_count,
+            "details": stats
         }
         
     except Exception as e:
@@ -582,7 +521,7 @@ def check_correction_system_health(self, max_stuck_time_minutes=30):
             logger.info(f"[{task_id}] 检查卡住的作文 (阈值: {max_stuck_time_minutes}分钟)")
             
             # 1. 检查"CORRECTING"状态卡住的作文
-            stuck_correcting_essays = Essay.query.filter(
+            stuck_correcting_essays = Essay.query.options(*essay_scan_options()).filter(
                 Essay.status == EssayStatus.CORRECTING.value,
                 Essay.updated_at < threshold_time,
                 Essay.is_deleted == False
@@ -590,7 +529,7 @@ def check_correction_system_health(self, max_stuck_time_minutes=30):
             
             # 2. 检查"PENDING"状态长时间未处理的作文
             long_pending_threshold = datetime.utcnow() - timedelta(hours=2)
-            stuck_pending_essays = Essay.query.filter(
+            stuck_pending_essays = Essay.query.options(*essay_scan_options()).filter(
                 Essay.status == EssayStatus.PENDING.value,
                 Essay.updated_at < long_pending_threshold,
                 Essay.is_deleted == False
@@ -613,7 +552,7 @@ def check_correction_system_health(self, max_stuck_time_minutes=30):
                     logger.info(f"[{task_id}] 处理卡住的作文: ID={essay.id}, 状态={essay.status}, 卡住时间={stuck_time}")
                     
                     # 获取关联的批改记录
-                    correction = Correction.query.filter_by(essay_id=essay.id).first()
+                    correction = Correction.query.options(*correction_scan_options()).filter_by(essay_id=essay.id).first()
                     
                     # 检查是否有任务ID
                     if correction and correction.task_id:
@@ -682,7 +621,7 @@ def check_correction_system_health(self, max_stuck_time_minutes=30):
                     logger.info(f"[{task_id}] 处理长时间PENDING的作文: ID={essay.id}, 状态={essay.status}, 未处理时间={pending_time}")
                     
                     # 获取关联的批改记录
-                    correction = Correction.query.filter_by(essay_id=essay.id).first()
+                    correction = Correction.query.options(*correction_scan_options()).filter_by(essay_id=essay.id).first()
                     
                     # 如果没有批改记录或任务ID，尝试重新提交
                     if not correction or not correction.task_id:
@@ -740,4 +679,44 @@ def check_correction_system_health(self, max_stuck_time_minutes=30):
             logger.info(f"[{task_id}] 将在 60 秒后重试批改系统健康检查")
             self.retry(exc=e, countdown=60)
             
-        return {"status": "error", "message": error_msg} 
\ No newline at end of file
+        return {"status": "error", "message": error_msg} 
+
+@celery_app.task(
+    name='app.tasks.maintenance_tasks.sync_search_index',
+    bind=True,
+    max_retries=2,
+    acks_late=True,
+    queue='periodic'
+)
+def sync_search_index(self, max_batches=20):
+    """
+    消费全文检索发件箱，把新增/修改/删除的作文同步到FTS5索引
+    
+    Args:
+        self: Celery任务实例
+        max_batches: 本次最多处理的批数（每批 SEARCH_INDEX_BATCH_SIZE 条）
+        
+    Returns:
+        dict: 同步结果
+    """
+    from app.core.search import fulltext_index
+    
+    try:
+        if has_app_context():
+            processed = fulltext_index.sync_all(max_batches=max_batches)
+        else:
+            from app import create_app
+            with create_app().app_context():
+                processed = fulltext_index.sync_all(max_batches=max_batches)
+        if processed:
+            logger.info(f"全文检索索引已同步 {processed} 条发件箱记录")
+        return {'status': 'success', 'processed': processed}
+    
+    except Exception as e:
+        logger.error(f"同步全文检索索引失败: {str(e)}")
+        
+        # 尝试重试
+        if self.request.retries < self.max_retries:
+            self.retry(exc=e, countdown=60)
+            
+        return {'status': 'error', 'message': str(e)}
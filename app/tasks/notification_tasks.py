@@ -262,4 +262,50 @@ def process_failed_tasks_notification(self):
         return {
             'status': 'error',
             'message': f'处理失败任务通知失败: {str(e)}'
-        } 
\ No newline at end of file
+        } 
+
+@celery_app.task(
+    name='app.tasks.notification_tasks.send_email_batch',
+    bind=True,
+    queue='email'
+)
+def send_email_batch(self, recipients, subject_template, text_template=None, html_template=None,
+                     context=None, attempt=0, max_attempts=3):
+    """
+    批量发送同一模板的邮件，复用worker内的SMTP连接
+    
+    Args:
+        self: Celery任务实例
+        recipients: 收件人字典列表，须包含 email
+        subject_template: 主题模板
+        text_template: 纯文本正文模板（可选）
+        html_template: HTML正文模板（可选）
+        context: 共用模板变量
+        attempt: 当前是第几次重试
+        max_attempts: 临时失败（4xx）的最多尝试次数
+        
+    Returns:
+        Dict: 发送结果，含逐收件人的结果
+    """
+    from app.core.notification.mail_dispatcher import mail_dispatcher
+    
+    result = mail_dispatcher.send_batch(recipients, subject_template, text_template, html_template, context)
+    
+    # 临时失败（SMTP 4xx）的收件人稍后单独重试
+    by_email = {recipient.get('email'): recipient for recipient in recipients}
+    transient = [by_email[item['email']] for item in result['results']
+                 if item['status'] == 'failed' and 400 <= (item.get('smtp_code') or 0) < 500
+                 and item['email'] in by_email]
+    if transient and attempt + 1 < max_attempts:
+        send_email_batch.apply_async(
+            args=[transient, subject_template, text_template, html_template, context],
+            kwargs={'attempt': attempt + 1, 'max_attempts': max_attempts},
+            countdown=60 * (attempt + 1)
+        )
+        result['retrying'] = len(transient)
+        logger.info(f"批量邮件任务 {self.request.id}: {len(transient)} 个收件人临时失败，将重试")
+    
+    for item in result['results']:
+        if item['status'] == 'failed':
+            logger.warning(f"邮件发送失败: 用户 {item['user_id']} ({item['email']}): {item['error']}")
+    return result
@@ -16,6 +16,18 @@ beat_schedule = {
         'schedule': crontab(hour=2, minute=0)
     },
     
+    # 每天凌晨2点30分批量计算会员用量预测
+    'compute-usage-predictions': {
+        'task': 'app.tasks.analytics_tasks.compute_usage_predictions',
+        'schedule': crontab(hour=2, minute=30)
+    },
+    
+    # 每分钟同步全文检索索引（消费作文发件箱）
+    'sync-search-index': {
+        'task': 'app.tasks.maintenance_tasks.sync_search_index',
+        'schedule': crontab()
+    },
+    
     # 每月1号凌晨3点生成上月的月度报表
     'generate-monthly-report': {
         'task': 'app.tasks.analytics_tasks.generate_monthly_report',
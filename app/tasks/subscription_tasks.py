@@ -6,7 +6,9 @@
 处理会员订阅相关的后台任务，包括过期检查、续费通知等
 """
 
+import json
 import logging
+from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 
@@ -20,7 +22,10 @@ from app.models.db import db
 from app.utils.date_util import format_date
 from celery import shared_task
 from app.models.membership import Membership
-from app.tasks.user_tasks import send_notification_email
+from app.config import config
+from app.core.analytics import subscription_metrics
+from app.tasks.notification_tasks import send_email_batch
+from app.core.notification.mail_dispatcher import iter_chunks
 
 logger = logging.getLogger(__name__)
 
@@ -432,6 +437,15 @@ def generate_subscription_report(start_date: str = None, end_date: str = None) -
         }
 
 
+# 续订提醒模板，每批邮件只编译一次
+RENEWAL_REMINDER_SUBJECT = "您的会员即将于 {{ end_date }} 到期提醒"
+RENEWAL_REMINDER_BODY = (
+    "尊敬的 {{ username }}，\n\n您的会员资格即将于 {{ end_date }} 到期。"
+    "为了确保您能继续享受会员权益，请及时续订。\n\n感谢您的支持！"
+)
+RENEWAL_REMINDER_BATCH_SIZE = 200
+
+
 @shared_task(name="tasks.send_subscription_renewal_reminders")
 def send_subscription_renewal_reminders(days_before_expiry: int = 7):
     """
@@ -448,52 +462,45 @@ def send_subscription_renewal_reminders(days_before_expiry: int = 7):
         # 可能需要稍微放宽结束日期以覆盖当天到期的情况
         reminder_date_end = reminder_date_start + timedelta(days=1) 
 
-        # 查询即将到期的有效会员资格
-        # 注意：这里的查询逻辑依赖于 Membership 和 Subscription 模型的具体设计
-        # 假设 Membership 存储了会员状态和到期日期
-        expiring_memberships = Membership.query.filter(
+        # 一次联表查询即将到期的有效会员及其用户邮箱，分批读取不整体载入
+        rows = db.session.query(
+            Membership.id, Membership.end_date, User.id, User.username, User.email
+        ).join(User, User.id == Membership.user_id).filter(
             Membership.is_active == True,
             Membership.end_date >= reminder_date_start,
             Membership.end_date < reminder_date_end,
-            # 可选：排除已经自动续订或已取消的用户
-            # Membership.auto_renew == False, 
-            # Membership.status != 'cancelled'
-        ).all()
+        ).order_by(Membership.id).execution_options(yield_per=RENEWAL_REMINDER_BATCH_SIZE)
 
-        if not expiring_memberships:
-            logger.info("没有找到即将到期的会员订阅。")
-            return {"status": "success", "message": "没有需要发送的提醒", "reminders_sent": 0}
-
-        sent_count = 0
-        failed_count = 0
-        for membership in expiring_memberships:
-            try:
-                user = User.query.get(membership.user_id)
-                if not user or not user.email:
-                    logger.warning(f"会员 {membership.id} (用户 {membership.user_id}) 缺少用户信息或邮箱，无法发送提醒。")
+        def recipients():
+            for membership_id, end_date, user_id, username, email in rows:
+                if not email:
+                    logger.warning(f"会员 {membership_id} (用户 {user_id}) 缺少邮箱，无法发送提醒。")
                     continue
+                yield {
+                    'user_id': user_id,
+                    'email': email,
+                    'username': username,
+                    'end_date': end_date.strftime('%Y-%m-%d'),
+                }
 
-                # 准备邮件内容
-                subject = f"您的会员即将于 {membership.end_date.strftime('%Y-%m-%d')} 到期提醒"
-                # 可以创建一个更丰富的HTML模板
-                body = f"尊敬的 {user.username}，\n\n您的会员资格即将于 {membership.end_date.strftime('%Y-%m-%d')} 到期。"
-                body += "为了确保您能继续享受会员权益，请及时续订。\n\n感谢您的支持！"
+        # 每批收件人一个邮件任务，worker内复用SMTP连接、按速率发送并逐收件人记录结果
+        queued_count = 0
+        batch_count = 0
+        for chunk in iter_chunks(recipients(), RENEWAL_REMINDER_BATCH_SIZE):
+            send_email_batch.delay(chunk, RENEWAL_REMINDER_SUBJECT, RENEWAL_REMINDER_BODY)
+            queued_count += len(chunk)
+            batch_count += 1
 
-                # 异步发送邮件
-                send_notification_email.delay(user.email, subject, body)
-                logger.info(f"已为用户 {user.id} ({user.email}) 创建续订提醒邮件任务，会员到期日: {membership.end_date.strftime('%Y-%m-%d')}")
-                sent_count += 1
+        if not queued_count:
+            logger.info("没有找到即将到期的会员订阅。")
+            return {"status": "success", "message": "没有需要发送的提醒", "reminders_sent": 0}
 
-            except Exception as e:
-                logger.error(f"为会员 {membership.id} (用户 {membership.user_id}) 发送提醒时出错: {e}", exc_info=True)
-                failed_count += 1
-        
-        logger.info(f"会员续订提醒任务完成：成功发送 {sent_count} 封，失败 {failed_count} 封。")
+        logger.info(f"会员续订提醒任务完成：{queued_count} 封提醒分 {batch_count} 批提交发送。")
         return {
             "status": "success", 
             "message": f"提醒发送完成", 
-            "reminders_sent": sent_count, 
-            "failures": failed_count
+            "reminders_sent": queued_count, 
+            "batches": batch_count
         }
 
     except Exception as e:
@@ -694,69 +701,18 @@ def analyze_subscription_churn():
     try:
         logger.info("开始执行会员流失分析任务")
         
-        # 获取当前时间
-        now = datetime.now()
+        # 获取当前时间（与会员到期时间同为UTC）
+        now = datetime.utcnow()
         
-        # 计算近期（30天）的流失率
-        thirty_days_ago = now - timedelta(days=30)
-        start_timestamp = thirty_days_ago.timestamp()
+        # 近期（30天）流失率：一次按计划分组的聚合查询，结果按天缓存
+        def compute_churn():
+            return dict(subscription_metrics.churn_report(now, window_days=30), status='success')
         
-        # 获取30天前活跃的会员总数
-        active_members_30days_ago = db.session.query(Membership).filter(
-            Membership.is_active == True,
-            Membership.created_at < start_timestamp,
-            Membership.end_date > thirty_days_ago
-        ).count()
-        
-        # 获取这些会员中已流失的数量（未续费）
-        churned_members = db.session.query(Membership).filter(
-            Membership.is_active == False,
-            Membership.created_at < start_timestamp,
-            Membership.end_date.between(thirty_days_ago, now),
-            ~db.session.exists().where(
-                Subscription.membership_id == Membership.id,
-                Subscription.created_at > Membership.end_date.timestamp(),
-                Subscription.status == 'success'
-            )
-        ).count()
-        
-        # 计算流失率
-        churn_rate = (churned_members / active_members_30days_ago) * 100 if active_members_30days_ago > 0 else 0
-        
-        # 按会员计划分组统计流失率
-        plan_churn_rates = []
-        all_plans = MembershipPlan.query.all()
-        
-        for plan in all_plans:
-            plan_members_30days_ago = db.session.query(Membership).filter(
-                Membership.is_active == True,
-                Membership.created_at < start_timestamp,
-                Membership.end_date > thirty_days_ago,
-                Membership.plan_id == plan.id
-            ).count()
-            
-            plan_churned_members = db.session.query(Membership).filter(
-                Membership.is_active == False,
-                Membership.created_at < start_timestamp,
-                Membership.end_date.between(thirty_days_ago, now),
-                Membership.plan_id == plan.id,
-                ~db.session.exists().where(
-                    Subscription.membership_id == Membership.id,
-                    Subscription.created_at > Membership.end_date.timestamp(),
-                    Subscription.status == 'success'
-                )
-            ).count()
-            
-            plan_churn_rate = (plan_churned_members / plan_members_30days_ago) * 100 if plan_members_30days_ago > 0 else 0
-            
-            plan_churn_rates.append({
-                "plan_id": plan.id,
-                "plan_code": plan.code,
-                "plan_name": plan.name,
-                "members_count": plan_members_30days_ago,
-                "churned_count": plan_churned_members,
-                "churn_rate": round(plan_churn_rate, 2)
-            })
+        churn = subscription_metrics.report_cache.get_or_compute('churn', {'window_days': 30}, compute_churn)
+        active_members_30days_ago = churn['active_members']
+        churned_members = churn['churned_members']
+        churn_rate = churn['churn_rate']
+        plan_churn_rates = churn['plans']
         
         # 找出流失风险高的会员
         # 风险因素：
@@ -765,54 +721,21 @@ def analyze_subscription_churn():
         # 3. 最近一次续费时有延迟的会员（可能在犹豫）
         at_risk_members = []
         
-        # 获取即将在30天内到期的会员
-        expiring_soon = db.session.query(Membership).filter(
-            Membership.is_active == True,
-            Membership.end_date.between(now, now + timedelta(days=30)),
-            Membership.is_auto_renew == False
-        ).all()
-        
-        for membership in expiring_soon:
-            user = User.query.get(membership.user_id)
-            if not user:
-                continue
-            
-            plan = MembershipPlan.query.get(membership.plan_id)
-            if not plan:
-                continue
-            
-            # 分析使用频率变化
-            recent_period = db.session.query(db.session.func.count(Essay.id)).filter(
-                Essay.user_id == user.id,
-                Essay.created_at.between(
-                    (now - timedelta(days=30)).timestamp(),
-                    now.timestamp()
-                )
-            ).scalar()
-            
-            previous_period = db.session.query(db.session.func.count(Essay.id)).filter(
-                Essay.user_id == user.id,
-                Essay.created_at.between(
-                    (now - timedelta(days=60)).timestamp(),
-                    (now - timedelta(days=30)).timestamp()
-                )
-            ).scalar()
+        # 即将在30天内到期的会员，用户、计划、作文数和最近付费时间由一次联表查询带出
+        for member in subscription_metrics.iter_expiring_members(now, days=30):
+            recent_period = member['recent_usage']
+            previous_period = member['previous_usage']
             
             # 计算使用频率变化率，避免除以零
             usage_change_rate = 0
             if previous_period > 0:
                 usage_change_rate = ((recent_period - previous_period) / previous_period) * 100
             
-            # 获取用户上次续费情况
-            last_renewal = db.session.query(Subscription).filter(
-                Subscription.membership_id == membership.id,
-                Subscription.status == 'success'
-            ).order_by(db.session.desc(Subscription.created_at)).first()
-            
             # 计算上次续费是否有延迟
             renewal_delay = 0
-            if last_renewal and last_renewal.created_at > membership.start_date.timestamp():
-                renewal_delay = (datetime.fromtimestamp(last_renewal.created_at) - membership.start_date).days
+            last_paid_at = member['last_paid_at']
+            if last_paid_at and member['start_date'] and last_paid_at > member['start_date']:
+                renewal_delay = (last_paid_at - member['start_date']).days
             
             # 计算流失风险分数（0-100）
             # 使用频率下降50%或以上：+50分
@@ -827,7 +750,7 @@ def analyze_subscription_churn():
             elif usage_change_rate <= -10:
                 risk_score += 10
             
-            if not membership.is_auto_renew:
+            if not member['is_auto_renew']:
                 risk_score += 20
             
             if renewal_delay > 0:
@@ -860,13 +783,13 @@ def analyze_subscription_churn():
                 
                 # 添加到风险列表
                 at_risk_members.append({
-                    "user_id": user.id,
-                    "username": user.username,
-                    "email": user.email,
-                    "membership_id": membership.id,
-                    "plan_name": plan.name,
-                    "end_date": membership.end_date.isoformat(),
-                    "days_remaining": (membership.end_date - now).days,
+                    "user_id": member['user_id'],
+                    "username": member['username'],
+                    "email": member['email'],
+                    "membership_id": member['membership_id'],
+                    "plan_name": member['plan_name'],
+                    "end_date": member['end_date'].isoformat(),
+                    "days_remaining": (member['end_date'] - now).days,
                     "usage_change_rate": round(usage_change_rate, 2),
                     "recent_usage": recent_period,
                     "previous_usage": previous_period,
@@ -875,39 +798,48 @@ def analyze_subscription_churn():
                     "intervention_strategy": intervention_strategy,
                     "discount_offer": discount_offer
                 })
-                
-                # 为高风险用户创建干预通知
-                if intervention_strategy != "no_action":
-                    from app.models.notification import Notification
-                    
-                    title = "我们想念您的使用"
-                    content = f"我们注意到您的{plan.name}会员将在{(membership.end_date - now).days}天后到期。"
-                    
-                    if intervention_strategy == "high_discount_personalized":
-                        title = f"专属优惠：为您提供{discount_offer}%的续费折扣"
-                        content += f"为了感谢您的支持，我们特别为您提供{discount_offer}%的续费折扣。同时，我们会根据您的使用习惯，为您推荐最适合的内容和功能。"
-                    elif intervention_strategy == "medium_discount":
-                        title = f"会员续费优惠：享受{discount_offer}%折扣"
-                        content += f"为了感谢您的支持，我们为您提供{discount_offer}%的续费折扣。不要错过这个机会！"
-                    elif intervention_strategy == "small_discount_value":
-                        title = f"会员续费提醒：享受{discount_offer}%折扣"
-                        content += f"为了让您继续享受高质量的作文批改服务，我们为您提供{discount_offer}%的续费折扣。"
-                    
-                    # 创建通知
-                    Notification.create(
-                        user_id=user.id,
-                        type="churn_prevention",
-                        title=title,
-                        content=content,
-                        metadata={
-                            "risk_score": risk_score,
-                            "intervention_strategy": intervention_strategy,
-                            "discount_offer": discount_offer,
-                            "days_remaining": (membership.end_date - now).days
-                        }
-                    )
-                    
-                    logger.info(f"为高风险流失用户 {user.username}({user.id}) 创建了干预通知")
+        
+        # 为高风险用户创建干预通知（遍历结束后一次批量插入）
+        notifications = []
+        for item in at_risk_members:
+            intervention_strategy = item["intervention_strategy"]
+            discount_offer = item["discount_offer"]
+            if intervention_strategy == "no_action":
+                continue
+            
+            title = "我们想念您的使用"
+            content = f"我们注意到您的{item['plan_name']}会员将在{item['days_remaining']}天后到期。"
+            
+            if intervention_strategy == "high_discount_personalized":
+                title = f"专属优惠：为您提供{discount_offer}%的续费折扣"
+                content += f"为了感谢您的支持，我们特别为您提供{discount_offer}%的续费折扣。同时，我们会根据您的使用习惯，为您推荐最适合的内容和功能。"
+            elif intervention_strategy == "medium_discount":
+                title = f"会员续费优惠：享受{discount_offer}%折扣"
+                content += f"为了感谢您的支持，我们为您提供{discount_offer}%的续费折扣。不要错过这个机会！"
+            elif intervention_strategy == "small_discount_value":
+                title = f"会员续费提醒：享受{discount_offer}%折扣"
+                content += f"为了让您继续享受高质量的作文批改服务，我们为您提供{discount_offer}%的续费折扣。"
+            
+            notifications.append({
+                "user_id": item["user_id"],
+                "type": "churn_prevention",
+                "title": title,
+                "content": content,
+                "extra_data": {
+                    "risk_score": item["risk_score"],
+                    "intervention_strategy": intervention_strategy,
+                    "discount_offer": discount_offer,
+                    "days_remaining": item["days_remaining"]
+                }
+            })
+        
+        if notifications:
+            from sqlalchemy import insert
+            from app.models.notification import Notification
+            
+            db.session.execute(insert(Notification), notifications)
+            db.session.commit()
+            logger.info(f"为 {len(notifications)} 个高风险流失用户创建了干预通知")
         
         # 保存分析报告
         report_dir = Path(config.BACKUP_CONFIG.get('reports_dir', 'reports')) / 'churn'
@@ -8,6 +8,7 @@
 
 import logging
 import time
+from datetime import datetime
 from celery import shared_task
 
 from app.tasks.celery_app import celery_app
@@ -16,6 +17,7 @@ from app.utils.exceptions import EmailError
 from app.models.db import db
 from app.models.user import User
 from app.models.user_activity import UserActivity
+from app.core.user.activity_buffer import user_activity_buffer
 from app.utils.websocket_manager import notify_user
 
 # 获取logger
@@ -196,38 +198,36 @@ def process_user_activity(user_id, activity_type, activity_data=None):
         if activity_data is None:
             activity_data = {}
         
-        # 记录用户活动
-        with db.session() as session:
-            activity = UserActivity(
+        # 活动记录和派生计数都进入写回缓冲，由后台线程批量写回
+        if activity_type == "login":
+            # 登录活动：最后登录时间/IP与登录记录
+            login_time = activity_data.get('login_time')
+            user_activity_buffer.record_login(
+                user_id,
+                datetime.fromtimestamp(login_time) if login_time else datetime.now(),
+                activity_data.get('ip'),
+                activity_data.get('user_agent')
+            )
+        else:
+            now = datetime.now()
+            user_activity_buffer.add_row(
+                UserActivity,
                 user_id=user_id,
-                activity_type=activity_type,
-                activity_data=activity_data
+                type=activity_type,
+                ip_address=activity_data.get('ip'),
+                user_agent=(activity_data.get('user_agent') or '')[:200] or None,
+                description=activity_data.get('description'),
+                extra_data=activity_data,
+                created_at=now,
+                updated_at=now
             )
-            session.add(activity)
-            session.commit()
-        
-        # 根据活动类型处理不同的逻辑
-        if activity_type == "login":
-            # 登录活动可能需要更新用户的最后登录时间
-            with db.session() as session:
-                user = session.query(User).get(user_id)
-                if user:
-                    user.last_login_time = time.time()
-                    user.login_count = (user.login_count or 0) + 1
-                    session.commit()
-        
-        elif activity_type == "essay_submitted":
-            # 可以处理作文提交后的用户数据更新
-            with db.session() as session:
-                user = session.query(User).get(user_id)
-                if user:
-                    user.essay_count = (user.essay_count or 0) + 1
-                    session.commit()
+            if activity_type == "essay_submitted":
+                # 作文提交后累加用户作文数
+                user_activity_buffer.increment(User, user_id, essay_count=1)
         
         return {
             "status": "success",
-            "message": "用户活动处理成功",
-            "activity_id": activity.id if 'activity' in locals() else None
+            "message": "用户活动已记录"
         }
     
     except Exception as e:
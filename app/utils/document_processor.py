@@ -179,6 +179,46 @@ def extract_text_from_image(file_path):
         logger.error(f"处理图片文件时出错: {e}")
         raise Exception("无法从图片中提取文本")
 
+def extract_document(file_path, original_filename):
+    """
+    从已保存的文件中提取文本内容
+    
+    Args:
+        file_path: 文件路径
+        original_filename: 原始文件名（用于判断类型和生成标题，保留中文字符）
+        
+    Returns:
+        tuple: (文本内容, 文件标题)
+    """
+    if '.' not in original_filename:
+        raise ValueError(f"文件没有扩展名: {original_filename}")
+    original_ext = original_filename.rsplit('.', 1)[1].lower()
+    if original_ext not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"不支持的文件格式: .{original_ext}")
+    
+    # 根据文件类型提取文本
+    content = None
+    if original_ext == 'txt':
+        content = extract_text_from_txt(file_path)
+    elif original_ext == 'docx':
+        content = extract_text_from_docx(file_path)
+    elif original_ext == 'doc':
+        content = extract_text_from_doc(file_path)
+    elif original_ext == 'pdf':
+        content = extract_text_from_pdf(file_path)
+    elif original_ext in ['jpg', 'jpeg', 'png', 'gif']:
+        content = extract_text_from_image(file_path)
+        
+    if not content:
+        raise ValueError("文件内容为空")
+    logger.info(f"成功从.{original_ext}文件提取文本，长度: {len(content)}")
+        
+    # 从原始文件名中提取标题 (保留中文字符)
+    title = os.path.splitext(os.path.basename(original_filename))[0]
+    
+    return content.strip(), title
+
+
 def process_document(file):
     """
     处理上传的文档文件，提取文本内容
@@ -227,31 +267,7 @@ def process_document(file):
         logger.info(f"原始文件名: {original_filename}, 安全文件名: {safe_filename}, 扩展名: .{original_ext}")
         logger.info(f"临时文件路径: {temp_file}")
         
-        # 根据文件类型提取文本
-        content = None
-        if original_ext == 'txt':
-            content = extract_text_from_txt(temp_file)
-            logger.info(f"成功从.txt文件提取文本，长度: {len(content)}")
-        elif original_ext == 'docx':
-            content = extract_text_from_docx(temp_file)
-            logger.info(f"成功从.docx文件提取文本，长度: {len(content)}")
-        elif original_ext == 'doc':
-            content = extract_text_from_doc(temp_file)
-            logger.info(f"成功从.doc文件提取文本，长度: {len(content)}")
-        elif original_ext == 'pdf':
-            content = extract_text_from_pdf(temp_file)
-            logger.info(f"成功从.pdf文件提取文本，长度: {len(content)}")
-        elif original_ext in ['jpg', 'jpeg', 'png', 'gif']:
-            content = extract_text_from_image(temp_file)
-            logger.info(f"成功从图片文件提取文本，长度: {len(content)}")
-            
-        if not content:
-            raise ValueError("文件内容为空")
-            
-        # 从原始文件名中提取标题 (保留中文字符)
-        title = os.path.splitext(original_filename)[0]
-        
-        return content.strip(), title
+        return extract_document(temp_file, original_filename)
         
     except Exception as e:
         logger.error(f"处理文件时发生错误: {str(e)}")
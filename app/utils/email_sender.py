@@ -3,12 +3,15 @@
 
 """
 邮件发送工具
-提供邮件发送功能，支持HTML模板和附件
+提供邮件发送功能，支持HTML模板和附件；SMTP连接在进程内池化复用
 """
 
 import os
+import time
+import atexit
 import logging
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
@@ -28,6 +31,242 @@ jinja_env = Environment(
     autoescape=True
 )
 
+def get_mail_settings() -> Dict[str, Any]:
+    """读取邮件配置，兼容 MAIL_* 与小写键两种写法"""
+    mail_config = config.MAIL_CONFIG or {}
+
+    def pick(upper, lower, default=None):
+        value = mail_config.get(upper)
+        if value is None:
+            value = mail_config.get(lower)
+        return default if value is None else value
+
+    return {
+        'server': pick('MAIL_SERVER', 'smtp_server', 'localhost'),
+        'port': int(pick('MAIL_PORT', 'smtp_port', 25)),
+        'username': pick('MAIL_USERNAME', 'username'),
+        'password': pick('MAIL_PASSWORD', 'password'),
+        'use_tls': bool(pick('MAIL_USE_TLS', 'use_tls', False)),
+        'use_ssl': bool(pick('MAIL_USE_SSL', 'use_ssl', False)),
+        'sender_email': pick('MAIL_DEFAULT_SENDER', 'sender_email', ''),
+        'sender_name': pick('MAIL_SENDER_NAME', 'sender_name', ''),
+    }
+
+
+class SMTPConnectionPool:
+    """
+    SMTP连接池
+    每个进程（Celery worker）复用已登录的SMTP连接：空闲过久的连接先NOOP探活，
+    单个连接发送一定数量的邮件后主动更换，连接断开时重连并重试一次
+    """
+
+    def __init__(self, max_size: int = 4, max_idle: float = 60.0, max_messages: int = 500,
+                 timeout: float = 30.0, settings_loader=None):
+        """
+        初始化连接池
+
+        Args:
+            max_size: 最多保留的空闲连接数
+            max_idle: 空闲超过该秒数的连接使用前先NOOP探活
+            max_messages: 单个连接最多发送的邮件数
+            timeout: 连接超时（秒）
+            settings_loader: 邮件配置读取函数，默认 get_mail_settings
+        """
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self.settings_loader = settings_loader or get_mail_settings
+        self._idle = []
+        self._lock = threading.Lock()
+        self._stats = {'connects': 0, 'reuses': 0, 'messages': 0, 'reconnects': 0, 'closed': 0}
+        atexit.register(self.close_all)
+
+    def _connect(self) -> Dict[str, Any]:
+        settings = self.settings_loader()
+        if settings['use_ssl']:
+            server = smtplib.SMTP_SSL(settings['server'], settings['port'], timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(settings['server'], settings['port'], timeout=self.timeout)
+            if settings['use_tls']:
+                server.starttls()
+        if settings['username']:
+            server.login(settings['username'], settings['password'] or '')
+        with self._lock:
+            self._stats['connects'] += 1
+        return {'server': server, 'messages': 0, 'last_used': time.monotonic()}
+
+    def _close(self, conn: Dict[str, Any]):
+        try:
+            conn['server'].quit()
+        except Exception:
+            try:
+                conn['server'].close()
+            except Exception:
+                pass
+        with self._lock:
+            self._stats['closed'] += 1
+
+    def _acquire(self) -> Dict[str, Any]:
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._connect()
+            if time.monotonic() - conn['last_used'] > self.max_idle:
+                try:
+                    conn['server'].noop()
+                except Exception:
+                    self._close(conn)
+                    continue
+            with self._lock:
+                self._stats['reuses'] += 1
+            return conn
+
+    def _release(self, conn: Dict[str, Any]):
+        conn['last_used'] = time.monotonic()
+        if conn['messages'] < self.max_messages:
+            with self._lock:
+                if len(self._idle) < self.max_size:
+                    self._idle.append(conn)
+                    return
+        self._close(conn)
+
+    def sendmail(self, from_addr: str, to_addrs: List[str], message: str) -> Dict[str, Any]:
+        """
+        通过池中的连接发送一封邮件
+
+        Returns:
+            Dict: 被拒绝的收件人（smtplib.sendmail 的返回值）
+
+        Raises:
+            smtplib.SMTPException: 发送失败（所有收件人被拒绝等）；服务器应答错误时连接RSET后复用，
+                传输错误时连接关闭
+        """
+        conn = self._acquire()
+        try:
+            try:
+                refused = conn['server'].sendmail(from_addr, to_addrs, message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # 服务器已关闭连接：重连后重试一次（重连失败时旧连接已关闭，不再重复关闭）
+                self._close(conn)
+                conn = None
+                with self._lock:
+                    self._stats['reconnects'] += 1
+                conn = self._connect()
+                refused = conn['server'].sendmail(from_addr, to_addrs, message)
+        except smtplib.SMTPRecipientsRefused:
+            # 连接仍可用，只是收件人被拒绝
+            conn['messages'] += 1
+            self._release(conn)
+            raise
+        except smtplib.SMTPResponseException as e:
+            # 服务器拒绝了这封邮件（发件人被拒、DATA失败、451等），会话本身仍可用：
+            # RSET清除事务后放回池中；421表示服务器即将关闭连接，重连失败时没有连接
+            if conn is not None:
+                if e.smtp_code == 421:
+                    self._close(conn)
+                else:
+                    conn['messages'] += 1
+                    try:
+                        conn['server'].rset()
+                    except Exception:
+                        self._close(conn)
+                    else:
+                        self._release(conn)
+            raise
+        except Exception:
+            if conn is not None:
+                self._close(conn)
+            raise
+        conn['messages'] += 1
+        with self._lock:
+            self._stats['messages'] += 1
+        self._release(conn)
+        return refused
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接复用统计"""
+        with self._lock:
+            return dict(self._stats, idle=len(self._idle))
+
+
+def create_smtp_pool_from_env() -> SMTPConnectionPool:
+    """
+    根据环境变量创建SMTP连接池
+
+    环境变量:
+        SMTP_POOL_SIZE: 最多保留的空闲连接数，默认4
+        SMTP_POOL_MAX_IDLE: 空闲多少秒后使用前探活，默认60
+        SMTP_POOL_MAX_MESSAGES: 单个连接最多发送的邮件数，默认500
+        SMTP_TIMEOUT: 连接超时（秒），默认30
+    """
+    return SMTPConnectionPool(
+        max_size=int(os.environ.get('SMTP_POOL_SIZE', 4)),
+        max_idle=float(os.environ.get('SMTP_POOL_MAX_IDLE', 60)),
+        max_messages=int(os.environ.get('SMTP_POOL_MAX_MESSAGES', 500)),
+        timeout=float(os.environ.get('SMTP_TIMEOUT', 30)),
+    )
+
+
+smtp_pool = create_smtp_pool_from_env()
+
+
+def build_message(
+    recipient: Union[str, List[str]],
+    subject: str,
+    html_content: str = None,
+    text_content: str = None,
+    attachments: List[Dict[str, Any]] = None,
+    settings: Dict[str, Any] = None
+) -> MIMEMultipart:
+    """
+    构建邮件
+
+    Args:
+        recipient: 收件人邮箱或邮箱列表
+        subject: 邮件主题
+        html_content: HTML内容（可选）
+        text_content: 纯文本内容（可选）
+        attachments: 附件列表，每个附件为字典，包含文件名和文件内容
+        settings: 邮件配置，默认 get_mail_settings()
+
+    Returns:
+        MIMEMultipart: 邮件对象
+    """
+    settings = settings or get_mail_settings()
+    msg = MIMEMultipart()
+    msg['Subject'] = subject
+    msg['From'] = formataddr((settings['sender_name'], settings['sender_email']))
+    msg['Date'] = formatdate(localtime=True)
+    msg['To'] = ', '.join(recipient) if isinstance(recipient, list) else recipient
+    
+    if html_content:
+        msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+    if text_content:
+        msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
+    
+    # 添加附件
+    for attachment in attachments or []:
+        if 'filename' not in attachment or 'content' not in attachment:
+            continue
+        attach_part = MIMEApplication(attachment['content'])
+        attach_part.add_header(
+            'Content-Disposition', 
+            'attachment', 
+            filename=attachment['filename']
+        )
+        msg.attach(attach_part)
+    return msg
+
+
 def send_email(
     recipient: Union[str, List[str]],
     subject: str,
@@ -37,7 +276,7 @@ def send_email(
     attachments: List[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
-    发送邮件
+    发送邮件（使用进程内的SMTP连接池）
     
     Args:
         recipient: 收件人邮箱或邮箱列表
@@ -51,72 +290,33 @@ def send_email(
         Dict: 发送结果
     """
     try:
-        # 读取邮件配置
-        email_config = config.MAIL_CONFIG
-        
-        # 创建邮件
-        msg = MIMEMultipart()
-        msg['Subject'] = subject
-        msg['From'] = formataddr((email_config.get('sender_name', ''), email_config.get('sender_email', '')))
-        msg['Date'] = formatdate(localtime=True)
-        
-        # 设置收件人
-        if isinstance(recipient, list):
-            msg['To'] = ', '.join(recipient)
-        else:
-            msg['To'] = recipient
-        
-        # 设置邮件内容
+        html_content = None
         if template:
             # 使用模板生成HTML内容
             try:
                 template_obj = jinja_env.get_template(f"{template}.html")
                 html_content = template_obj.render(**(data or {}))
-                msg.attach(MIMEText(html_content, 'html', 'utf-8'))
                 
                 # 尝试添加纯文本版本
                 try:
                     text_template = jinja_env.get_template(f"{template}.txt")
-                    plain_content = text_template.render(**(data or {}))
-                    msg.attach(MIMEText(plain_content, 'plain', 'utf-8'))
+                    text_content = text_template.render(**(data or {}))
                 except:
                     # 如果纯文本模板不存在，则使用一个简单的纯文本内容
-                    msg.attach(MIMEText("请使用支持HTML的邮件客户端查看此邮件。", 'plain', 'utf-8'))
+                    text_content = "请使用支持HTML的邮件客户端查看此邮件。"
             except Exception as e:
                 logger.error(f"模板渲染失败: {str(e)}", exc_info=True)
                 return {"status": "error", "message": f"模板渲染失败: {str(e)}"}
-        elif text_content:
-            # 使用纯文本内容
-            msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
-        else:
+        elif not text_content:
             logger.error("发送邮件失败: 未提供内容")
             return {"status": "error", "message": "未提供邮件内容"}
         
-        # 添加附件
-        if attachments:
-            for attachment in attachments:
-                if 'filename' not in attachment or 'content' not in attachment:
-                    continue
-                
-                attach_part = MIMEApplication(attachment['content'])
-                attach_part.add_header(
-                    'Content-Disposition', 
-                    'attachment', 
-                    filename=attachment['filename']
-                )
-                msg.attach(attach_part)
+        settings = get_mail_settings()
+        msg = build_message(recipient, subject, html_content, text_content, attachments, settings)
         
         # 发送邮件
-        with smtplib.SMTP(email_config.get('smtp_server'), email_config.get('smtp_port')) as server:
-            if email_config.get('use_tls'):
-                server.starttls()
-            
-            server.login(email_config.get('username'), email_config.get('password'))
-            
-            if isinstance(recipient, list):
-                server.sendmail(email_config.get('sender_email'), recipient, msg.as_string())
-            else:
-                server.sendmail(email_config.get('sender_email'), [recipient], msg.as_string())
+        recipients = recipient if isinstance(recipient, list) else [recipient]
+        smtp_pool.sendmail(settings['sender_email'], recipients, msg.as_string())
         
         logger.info(f"邮件发送成功，收件人: {recipient}, 主题: {subject}")
         
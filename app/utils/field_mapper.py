@@ -7,11 +7,77 @@ import os
 import yaml
 import logging
 import copy
-from typing import Dict, Any, List, Optional, Union
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Callable, Union
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAPPING_FILE = "config/field_mappings.yaml"
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_FEEDBACK_LIST_FIELDS = ("strengths", "weaknesses", "improvements")
+
+
+def _validate_score(value: Any) -> Any:
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str) and value.replace('.', '', 1).isdigit():
+        return float(value)
+    logger.warning(f"无效的分数值: {value}")
+    return None
+
+
+def _validate_text(value: Any) -> Any:
+    return value.strip() if isinstance(value, str) else str(value)
+
+
+def _validate_list(value: Any) -> Any:
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if item]
+    if isinstance(value, str):
+        # 尝试拆分为列表
+        items = [item.strip() for item in value.split('\n') if item.strip()]
+        return items if items else [value.strip()]
+    return [str(value)]
+
+
+def _validate_processing_time(value: Any) -> Any:
+    return value if isinstance(value, (int, float)) else str(value)
+
+
+def _keep_value(value: Any) -> Any:
+    return value
+
+
+def _compile_getter(paths: List[Tuple[str, ...]]) -> Callable[[Dict[str, Any]], Any]:
+    """
+    将候选字段路径编译为取值函数，依次尝试各路径，返回第一个非None的值
+
+    Args:
+        paths: 候选路径列表，每个路径为已拆分的键元组
+    """
+    if len(paths) == 1 and len(paths[0]) == 1:
+        key = paths[0][0]
+        return lambda data: data.get(key)
+
+    def getter(data: Dict[str, Any]) -> Any:
+        for path in paths:
+            value = data
+            for key in path:
+                if not isinstance(value, dict):
+                    value = None
+                    break
+                value = value.get(key)
+                if value is None:
+                    break
+            if value is not None:
+                return value
+        return None
+    return getter
+
+
 class FieldMapper:
     """
     字段映射器，用于标准化不同AI服务的响应字段。
@@ -19,12 +85,27 @@ class FieldMapper:
     该类负责将不同AI服务提供商的字段名称转换为标准化的内部字段名称，
     确保无论使用哪个AI服务，系统内部处理的数据结构都是一致的。
     
+    映射在加载时按提供商编译为扁平的计划 [(取值函数, 类别, 父级键, 字段名, 校验函数)]，
+    默认结果结构也预先展开，normalize_result 只做取值、校验和赋值，不再逐次拆分路径和深拷贝。
+    
     示例:
-        field_mapper = FieldMapper()
+        field_mapper = get_field_mapper()
         normalized_result = field_mapper.normalize_result(api_response, "deepseek")
     """
 
-    def __init__(self, mapping_file: str = "config/field_mappings.yaml"):
+    # 映射文件 providers 段中的标准字段 -> 结果结构中的 (类别, 字段路径)，未列出的保持原位置
+    STANDARD_FIELD_TARGETS = {
+        ("scores", "total_score"): ("scores", "total"),
+        ("scores", "dimensions.writing"): ("scores", "dimensions.grammar"),
+        ("analyses", "overall_comment"): ("analyses", "summary"),
+        ("analyses", "dimension_comments.content"): ("analyses", "content"),
+        ("analyses", "dimension_comments.language"): ("analyses", "language"),
+        ("analyses", "dimension_comments.structure"): ("analyses", "structure"),
+        ("analyses", "improvement_suggestions"): ("feedback", "improvements"),
+        ("analyses", "error_corrections"): ("feedback", "corrections"),
+    }
+
+    def __init__(self, mapping_file: str = DEFAULT_MAPPING_FILE):
         """
         初始化字段映射器
         
@@ -55,12 +136,24 @@ class FieldMapper:
                 "processing_time": 0
             }
         }
+        self._plans: Dict[str, List[tuple]] = {}
+        self._lookup: Dict[str, Dict[Tuple[str, str], str]] = {}
         self._load_mappings()
+        self._template = self._compile_template(self.core_fields)
+        self._compile_all()
         
+    def _resolve_mapping_file(self) -> str:
+        """相对路径在当前目录下找不到时，按项目根目录解析"""
+        if os.path.exists(self.mapping_file) or os.path.isabs(self.mapping_file):
+            return self.mapping_file
+        candidate = os.path.join(_PROJECT_ROOT, self.mapping_file)
+        return candidate if os.path.exists(candidate) else self.mapping_file
+
     def _load_mappings(self) -> None:
         """从配置文件加载字段映射"""
         try:
-            if not os.path.exists(self.mapping_file):
+            mapping_file = self._resolve_mapping_file()
+            if not os.path.exists(mapping_file):
                 logger.warning(f"映射文件 {self.mapping_file} 不存在，使用默认映射")
                 # 设置默认映射
                 self.mappings = {
@@ -87,15 +180,112 @@ class FieldMapper:
                 }
                 return
 
-            with open(self.mapping_file, 'r', encoding='utf-8') as f:
-                self.mappings = yaml.safe_load(f) or {}
+            with open(mapping_file, 'r', encoding='utf-8') as f:
+                loaded = yaml.safe_load(f) or {}
+
+            # 新格式：providers 段下按 类别 -> 标准字段 -> [候选字段名] 组织
+            self.mappings = loaded.get("providers", loaded) if isinstance(loaded, dict) else {}
                 
             if not self.mappings:
                 logger.warning(f"映射文件 {self.mapping_file} 为空或格式错误")
         except Exception as e:
             logger.exception(f"加载字段映射时出错: {str(e)}")
             self.mappings = {}
-            
+
+    @staticmethod
+    def _validator_for(category: str, field: str) -> Callable[[Any], Any]:
+        """按目标类别和字段选择校验函数（编译时确定，规则与逐值判断时一致）"""
+        if category == "scores":
+            if field == "total" or field.startswith("dimensions."):
+                return _validate_score
+        elif category == "analyses":
+            return _validate_text
+        elif category == "feedback":
+            if field in _FEEDBACK_LIST_FIELDS:
+                return _validate_list
+        elif category == "metadata":
+            return _validate_processing_time if field == "processing_time" else str
+        return _keep_value
+
+    @staticmethod
+    def _flatten_aliases(node: Dict[str, Any], prefix: str = "") -> List[Tuple[str, List[str]]]:
+        """将 标准字段 -> [候选字段名] 的嵌套映射展开为 [(点号路径, 候选字段名)]"""
+        items = []
+        for name, value in node.items():
+            path = f"{prefix}{name}"
+            if isinstance(value, dict):
+                items.extend(FieldMapper._flatten_aliases(value, f"{path}."))
+            elif isinstance(value, (list, tuple)):
+                items.append((path, [str(alias) for alias in value]))
+            elif isinstance(value, str):
+                items.append((path, [value]))
+        return items
+
+    def _provider_entries(self, provider_mappings: Dict[str, Any]) -> List[Tuple[List[str], str, str, str, str]]:
+        """
+        将一个提供商的映射统一为 [(候选源路径, 原类别, 原字段, 目标类别, 目标字段)]
+
+        兼容两种格式：
+            旧格式  类别 -> {源字段路径: 目标字段路径}
+            新格式  类别 -> {标准字段: [候选源字段路径]}（可嵌套）
+        """
+        entries = []
+        for category, field_mappings in provider_mappings.items():
+            if not isinstance(field_mappings, dict):
+                continue
+            if all(isinstance(value, str) for value in field_mappings.values()):
+                for source_field, target_field in field_mappings.items():
+                    entries.append(([source_field], category, target_field, category, target_field))
+                continue
+            for field, aliases in self._flatten_aliases(field_mappings):
+                target_category, target_field = self.STANDARD_FIELD_TARGETS.get(
+                    (category, field), (category, field))
+                entries.append((aliases, category, field, target_category, target_field))
+        return entries
+
+    def _compile_provider(self, provider: str) -> List[tuple]:
+        """编译一个提供商的映射计划"""
+        plan = []
+        lookup = {}
+        for aliases, category, field, target_category, target_field in \
+                self._provider_entries(self.mappings.get(provider) or {}):
+            if target_category not in self.core_fields:
+                logger.warning(f"目标类别 '{target_category}' 不存在，忽略映射 {provider}.{category}.{field}")
+                continue
+            parts = tuple(target_field.split('.'))
+            getter = _compile_getter([tuple(alias.split('.')) for alias in aliases])
+            validator = self._validator_for(target_category, target_field)
+            plan.append((getter, target_category, parts[:-1], parts[-1], validator))
+            for alias in aliases:
+                lookup.setdefault((category, alias), field)
+        self._lookup[provider] = lookup
+        return plan
+
+    def _compile_all(self) -> None:
+        """按提供商编译全部映射"""
+        self._plans = {}
+        for provider in self.mappings:
+            try:
+                self._plans[provider] = self._compile_provider(provider)
+            except Exception as e:
+                logger.exception(f"编译提供商 '{provider}' 的字段映射时出错: {str(e)}")
+
+    @staticmethod
+    def _compile_template(structure: Dict[str, Dict[str, Any]]) -> List[tuple]:
+        """
+        预先展开默认结果结构：[(类别, 字段浅拷贝模板, [(容器字段, 是否可浅拷贝)])]
+        """
+        template = []
+        for category, fields in structure.items():
+            containers = []
+            for key, value in fields.items():
+                if isinstance(value, (dict, list)):
+                    values = value.values() if isinstance(value, dict) else value
+                    shallow = not any(isinstance(item, (dict, list)) for item in values)
+                    containers.append((key, shallow))
+            template.append((category, dict(fields), tuple(containers)))
+        return template
+
     def get_standard_field(self, provider: str, category: str, field: str) -> Optional[str]:
         """
         获取标准字段名
@@ -108,13 +298,9 @@ class FieldMapper:
         Returns:
             Optional[str]: 标准字段名，如果未找到映射则返回None
         """
-        if provider not in self.mappings:
+        if provider not in self._lookup:
             return None
-            
-        if category not in self.mappings[provider]:
-            return None
-            
-        return self.mappings[provider][category].get(field)
+        return self._lookup[provider].get((category, field))
         
     def normalize_result(self, api_response: Dict[str, Any], provider: str) -> Dict[str, Any]:
         """
@@ -131,154 +317,38 @@ class FieldMapper:
             logger.error(f"无效的API响应: {type(api_response)}")
             return self._get_default_structure()
             
-        if provider not in self.mappings:
+        plan = self._plans.get(provider)
+        if plan is None:
             logger.warning(f"未找到提供商 '{provider}' 的映射")
             return self._get_default_structure()
             
-        # 创建结果结构的深拷贝
         result = self._get_default_structure()
         result["metadata"]["provider"] = provider
         
-        # 遍历每个类别的映射
-        for category, field_mappings in self.mappings[provider].items():
-            self._map_category_fields(api_response, result, category, field_mappings)
+        for getter, category, parents, leaf, validator in plan:
+            value = getter(api_response)
+            if value is None:
+                continue
+            try:
+                value = validator(value)
+            except Exception as e:
+                logger.exception(f"验证字段值时出错: {str(e)}")
+                continue
+            if value is None:
+                continue
+            target = result[category]
+            for key in parents:
+                child = target.get(key)
+                if not isinstance(child, dict):
+                    child = target[key] = {}
+                target = child
+            target[leaf] = value
             
         # 确保核心字段存在
         self._ensure_core_fields(result)
             
         return result
     
-    def _map_category_fields(self, source: Dict[str, Any], target: Dict[str, Any], 
-                            category: str, field_mappings: Dict[str, str]) -> None:
-        """
-        映射特定类别的字段
-        
-        Args:
-            source: 源数据
-            target: 目标数据
-            category: 字段类别
-            field_mappings: 字段映射
-        """
-        for source_field, target_field in field_mappings.items():
-            # 处理嵌套字段，如 "分项得分.内容主旨"
-            source_value = self._get_nested_value(source, source_field)
-            if source_value is None:
-                continue
-                
-            # 验证值类型
-            validated_value = self._validate_value(source_value, category, target_field)
-            if validated_value is None:
-                continue
-                
-            # 设置目标字段值
-            self._set_nested_value(target, category, target_field, validated_value)
-    
-    def _get_nested_value(self, data: Dict[str, Any], field_path: str) -> Any:
-        """
-        获取嵌套字段的值
-        
-        Args:
-            data: 数据字典
-            field_path: 字段路径，如 "分项得分.内容主旨"
-            
-        Returns:
-            Any: 字段值，如果未找到则返回None
-        """
-        parts = field_path.split('.')
-        current = data
-        
-        for part in parts:
-            if not isinstance(current, dict) or part not in current:
-                return None
-            current = current[part]
-            
-        return current
-        
-    def _set_nested_value(self, data: Dict[str, Any], category: str, field_path: str, value: Any) -> None:
-        """
-        设置嵌套字段的值
-        
-        Args:
-            data: 数据字典
-            category: 字段类别
-            field_path: 字段路径，如 "dimensions.content"
-            value: 要设置的值
-        """
-        if category not in data:
-            logger.warning(f"目标类别 '{category}' 不存在")
-            return
-            
-        target = data[category]
-        parts = field_path.split('.')
-        
-        # 处理嵌套路径
-        for i, part in enumerate(parts[:-1]):
-            if part not in target:
-                target[part] = {}
-            elif not isinstance(target[part], dict):
-                target[part] = {}
-            target = target[part]
-            
-        # 设置最终值
-        target[parts[-1]] = value
-    
-    def _validate_value(self, value: Any, category: str, field: str) -> Any:
-        """
-        验证字段值的类型
-        
-        Args:
-            value: 要验证的值
-            category: 字段类别
-            field: 字段名
-            
-        Returns:
-            Any: 验证后的值，如果无效则返回None
-        """
-        try:
-            # 验证分数字段
-            if category == "scores":
-                if field == "total" or field.startswith("dimensions."):
-                    if isinstance(value, (int, float)):
-                        return value
-                    elif isinstance(value, str) and value.replace('.', '', 1).isdigit():
-                        return float(value)
-                    else:
-                        logger.warning(f"无效的分数值: {value}")
-                        return None
-                        
-            # 验证分析字段
-            elif category == "analyses":
-                if isinstance(value, str):
-                    return value.strip()
-                else:
-                    return str(value)
-                    
-            # 验证反馈字段
-            elif category == "feedback":
-                if field in ["strengths", "weaknesses", "improvements"]:
-                    if isinstance(value, list):
-                        return [str(item).strip() for item in value if item]
-                    elif isinstance(value, str):
-                        # 尝试拆分为列表
-                        items = [item.strip() for item in value.split('\n') if item.strip()]
-                        return items if items else [value.strip()]
-                    else:
-                        return [str(value)]
-                        
-            # 元数据字段
-            elif category == "metadata":
-                if field == "processing_time" and isinstance(value, (int, float)):
-                    return value
-                else:
-                    return str(value)
-            
-            # 默认情况
-            return value
-            
-        except Exception as e:
-            logger.exception(f"验证字段值时出错: {str(e)}")
-            return None
-    
     def _ensure_core_fields(self, result: Dict[str, Any]) -> None:
         """
         确保核心字段存在
@@ -370,9 +440,38 @@ class FieldMapper:
     
     def _get_default_structure(self) -> Dict[str, Any]:
         """
-        获取默认结果结构
+        获取默认结果结构（按预展开的模板复制，只复制容器字段）
         
         Returns:
             Dict[str, Any]: 默认结果结构
         """
-        return copy.deepcopy(self.core_fields) 
\ No newline at end of file
+        result = {}
+        for category, fields, containers in self._template:
+            fields = fields.copy()
+            for key, shallow in containers:
+                fields[key] = fields[key].copy() if shallow else copy.deepcopy(fields[key])
+            result[category] = fields
+        return result
+
+
+_shared_mappers: Dict[str, FieldMapper] = {}
+_shared_lock = threading.Lock()
+
+
+def get_field_mapper(mapping_file: str = DEFAULT_MAPPING_FILE) -> FieldMapper:
+    """
+    获取共享的字段映射器，同一映射文件在进程内只加载和编译一次，供各AI客户端共用
+
+    Args:
+        mapping_file: 字段映射配置文件路径
+
+    Returns:
+        FieldMapper: 字段映射器
+    """
+    mapper = _shared_mappers.get(mapping_file)
+    if mapper is None:
+        with _shared_lock:
+            mapper = _shared_mappers.get(mapping_file)
+            if mapper is None:
+                mapper = _shared_mappers[mapping_file] = FieldMapper(mapping_file)
+    return mapper
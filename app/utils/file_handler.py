@@ -14,6 +14,7 @@ import mimetypes
 from pathlib import Path
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
+from flask import Request, current_app
 
 # 图像处理库
 try:
@@ -48,6 +49,30 @@ from app.config import config
 
 logger = logging.getLogger(__name__)
 
+
+class UploadRequest(Request):
+    """按端点放宽请求体上限的请求类
+
+    ENDPOINT_MAX_CONTENT_LENGTH 中登记的端点（如批量上传）使用各自的上限，
+    其余请求仍受全局 MAX_CONTENT_LENGTH 限制。上限在路由匹配后、任何
+    before_request（包括CSRF校验解析表单）之前即生效。
+    """
+
+    @property
+    def max_content_length(self):
+        if self._max_content_length is not None:
+            return self._max_content_length
+        if current_app and self.endpoint:
+            limit = current_app.config.get('ENDPOINT_MAX_CONTENT_LENGTH', {}).get(self.endpoint)
+            if limit is not None:
+                return limit
+        return super().max_content_length
+
+    @max_content_length.setter
+    def max_content_length(self, value):
+        self._max_content_length = value
+
+
 class FileHandler:
     """文件处理工具类，支持各种文件格式的处理"""
     
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+热路径日志策略
+AI批改链路上的请求/响应载荷只按 1/N 抽样记录（错误总是记录），载荷在日志真正输出时才格式化并按预算截断；
+各模块的日志级别可通过 LOG_MODULE_LEVELS 单独调整
+
+抽样按批改链路决定：同一次批改（同一trace_id，从HTTP提交延续到Celery任务）的所有载荷日志
+要么全部记录、要么全部不记录，便于对照同一次调用的请求和响应
+"""
+
+import os
+import json
+import zlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _to_text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list, tuple)):
+        try:
+            return json.dumps(value, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            return str(value)
+    return str(value)
+
+
+def truncate(value: Any, limit: int) -> str:
+    """
+    转为文本并截断到指定长度
+
+    Args:
+        value: 任意对象（字典/列表按JSON输出）
+        limit: 最大字符数，<=0 表示不截断
+
+    Returns:
+        str: 截断后的文本，末尾注明原长度
+    """
+    text = _to_text(value)
+    if limit <= 0 or len(text) <= limit:
+        return text
+    return f"{text[:limit]}...(共{len(text)}字符)"
+
+
+def sampling_key(default: Any = None) -> Any:
+    """
+    载荷抽样键：当前批改链路的trace_id，不在链路中时为 default
+
+    Args:
+        default: 没有链路时使用的键（如API请求ID）
+
+    Returns:
+        抽样键，均为空时返回None
+    """
+    try:
+        from app.core.monitoring.tracing import current_context
+    except ImportError:
+        return default
+    ctx = current_context()
+    return ctx.trace_id if ctx is not None else default
+
+
+class LazyPayload:
+    """延迟格式化的载荷，只有日志记录被处理器输出时才会调用 __str__"""
+
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value: Any, limit: int):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        return truncate(self.value, self.limit)
+
+    __repr__ = __str__
+
+
+class LogPolicy:
+    """
+    载荷日志策略
+
+    sample_rate: 每 N 次批改记录一次载荷（1 表示全部记录，0 表示只在出错时记录）
+    max_chars: 单条载荷的截断预算
+    """
+
+    def __init__(self, sample_rate: int = 100, max_chars: int = 500, message_chars: int = 100):
+        self.sample_rate = sample_rate
+        self.max_chars = max_chars
+        self.message_chars = message_chars
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def sample(self, key: Any = None) -> bool:
+        """
+        是否记录载荷
+
+        Args:
+            key: 抽样键，默认为当前批改链路的trace_id（见 sampling_key）；
+                 同一个键总是得到同样的结果，没有键时按进程内计数每N次记录一次
+
+        Returns:
+            bool: 是否记录
+        """
+        if self.sample_rate <= 0:
+            return False
+        if self.sample_rate == 1:
+            return True
+        if key is None:
+            key = sampling_key()
+        if key is not None:
+            return zlib.crc32(str(key).encode('utf-8')) % self.sample_rate == 0
+        with self._lock:
+            self._counter += 1
+            return self._counter % self.sample_rate == 1
+
+    def payload(self, value: Any, limit: Optional[int] = None) -> LazyPayload:
+        """包装为延迟格式化的载荷"""
+        return LazyPayload(value, self.max_chars if limit is None else limit)
+
+    def log_payload(self, log: logging.Logger, label: str, value: Any, is_error: bool = False,
+                    level: int = logging.INFO, key: Any = None) -> bool:
+        """
+        按策略记录载荷
+
+        Args:
+            log: 日志器
+            label: 载荷说明，如"请求参数"
+            value: 载荷
+            is_error: 是否出错，出错时不抽样、以ERROR级别记录
+            level: 抽样记录时使用的级别
+            key: 抽样键，见 sample
+
+        Returns:
+            bool: 是否记录
+        """
+        if is_error:
+            level = logging.ERROR
+        if not log.isEnabledFor(level):
+            return False
+        if not is_error and not self.sample(key):
+            return False
+        log.log(level, "%s: %s", label, self.payload(value))
+        return True
+
+
+def apply_module_levels(spec: Optional[str]) -> Dict[str, int]:
+    """
+    按模块设置日志级别
+
+    Args:
+        spec: 形如 "app.core.ai=WARNING,core.llm_func=DEBUG" 的配置
+
+    Returns:
+        Dict[str, int]: 已应用的 模块 -> 级别
+    """
+    applied = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        name, level_name = (part.strip() for part in item.split('=', 1))
+        level = logging.getLevelName(level_name.upper())
+        if not name or not isinstance(level, int):
+            logger.warning(f"忽略无效的模块日志级别配置: {item.strip()}")
+            continue
+        logging.getLogger(name).setLevel(level)
+        applied[name] = level
+    return applied
+
+
+def create_policy_from_env() -> LogPolicy:
+    """
+    根据环境变量创建策略
+
+    环境变量:
+        AI_PAYLOAD_LOG_SAMPLE: 载荷抽样间隔N（每N次批改记录一次），默认100
+        AI_LOG_MAX_CHARS: 单条载荷截断长度，默认500
+        AI_LOG_MESSAGE_CHARS: 监控日志中每条消息内容的截断长度，默认100
+    """
+    return LogPolicy(
+        sample_rate=int(os.environ.get('AI_PAYLOAD_LOG_SAMPLE', 100)),
+        max_chars=int(os.environ.get('AI_LOG_MAX_CHARS', 500)),
+        message_chars=int(os.environ.get('AI_LOG_MESSAGE_CHARS', 100)),
+    )
+
+
+log_policy = create_policy_from_env()
@@ -12,6 +12,8 @@ import asyncio
 import aiohttp
 import json
 import time
+from app.core.ai.json_extract import extract_json_text, parse_json_object
+from app.utils.log_policy import log_policy
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -55,8 +57,8 @@ async def create_chat_completion(**kwargs):
         if not deepseek_api_key:
             raise Exception("DeepSeek API密钥未设置，无法使用DeepSeek AI")
             
-        logger.info("【发送API请求】")
-        logger.info(f"请求参数: {kwargs}")
+        # 请求/响应载荷按策略抽样记录，出错时总是记录
+        log_policy.log_payload(logger, "【发送API请求】请求参数", kwargs)
         
         # 使用OpenAI SDK直接调用
         response = await client.chat.completions.create(
@@ -64,8 +66,7 @@ async def create_chat_completion(**kwargs):
             stream=False
         )
         
-        logger.info("【收到API响应】")
-        logger.info(f"响应对象: {response}")
+        log_policy.log_payload(logger, "【收到API响应】响应对象", response)
         
         if not response or not response.choices:
             raise Exception("API返回结果为空")
@@ -73,6 +74,7 @@ async def create_chat_completion(**kwargs):
     except Exception as e:
         error_msg = str(e)
         logger.error(f"DeepSeek API错误: {error_msg}")
+        log_policy.log_payload(logger, "失败请求的参数", kwargs, is_error=True)
         if any(err in error_msg.lower() for err in ["rate_limit", "too_many_requests"]):
             raise Exception("服务请求过于频繁，请稍后重试")
         elif any(err in error_msg.lower() for err in ["timeout", "connect", "connection"]):
@@ -91,8 +93,7 @@ async def create_chat_completion(**kwargs):
 
 async def get_model_response(**kwargs):
     try:
-        logger.info("【调用模型】")
-        logger.info(f"请求参数: {kwargs}")
+        log_policy.log_payload(logger, "【调用模型】请求参数", kwargs)
         
         response = await create_chat_completion(
             model=deepseek_model,  # 使用环境变量中指定的模型
@@ -101,8 +102,7 @@ async def get_model_response(**kwargs):
             **kwargs
         )
         
-        logger.info("【模型响应成功】")
-        logger.info(f"响应内容: {response}")
+        log_policy.log_payload(logger, "【模型响应成功】响应内容", response)
         
         return response
     except Exception as e:
@@ -121,8 +121,7 @@ parser = JsonOutputParser()
 
 async def model(messages):
     try:
-        logger.info("【处理消息】")
-        logger.info(f"原始消息: {messages}")
+        log_policy.log_payload(logger, "【处理消息】原始消息", messages)
         
         # 转换消息格式
         formatted_messages = []
@@ -144,7 +143,7 @@ async def model(messages):
         else:
             formatted_messages = [{"role": "user", "content": str(messages)}]
         
-        logger.info(f"格式化后的消息: {formatted_messages}")
+        log_policy.log_payload(logger, "格式化后的消息", formatted_messages, level=logging.DEBUG)
         
         # 使用常规文本模型
         response = await create_chat_completion(
@@ -155,8 +154,7 @@ async def model(messages):
             timeout=60.0  # 设置60秒超时时间
         )
         
-        logger.info("【模型响应成功】")
-        logger.info(f"响应内容: {response}")
+        log_policy.log_payload(logger, "【模型响应成功】响应内容", response)
         
         return response
     except Exception as e:
@@ -203,7 +201,7 @@ async def handler_spell_error(article: str) -> Dict[str, Union[int, str]]:
     
     # 尝试解析JSON响应
     try:
-        logger.info(f"尝试解析错别字JSON: {response_text}")
+        log_policy.log_payload(logger, "尝试解析错别字JSON", response_text)
         result = parser.parse(response_text)
         
         # 确保解析结果包含必要的字段
@@ -245,7 +243,7 @@ async def handler_spell_error(article: str) -> Dict[str, Union[int, str]]:
             if errors:
                 result["解析"] = errors
         
-        logger.info(f"处理后的错别字结果: {result}")
+        log_policy.log_payload(logger, "处理后的错别字结果", result)
         return result
         
     except Exception as e:
@@ -285,7 +283,7 @@ async def handler_content_analysis(subject: str, article: str) -> Dict[str, Unio
     
     # 尝试解析JSON响应
     try:
-        logger.info(f"尝试解析内容主旨JSON: {response_text}")
+        log_policy.log_payload(logger, "尝试解析内容主旨JSON", response_text)
         result = parser.parse(response_text)
         
         # 确保解析结果包含必要的字段
@@ -360,9 +358,9 @@ async def handler_content_analysis(subject: str, article: str) -> Dict[str, Unio
             
             # 将所有分析项合并为一个字符串
             result["解析"] = "\n\n".join(formatted_analysis)
-            logger.info(f"格式化后的内容主旨解析: {result['解析']}")
+            log_policy.log_payload(logger, "格式化后的内容主旨解析", result['解析'], level=logging.DEBUG)
             
-        logger.info(f"处理后的内容主旨结果: {result}")
+        log_policy.log_payload(logger, "处理后的内容主旨结果", result)
         return result
         
     except Exception as e:
@@ -401,7 +399,7 @@ async def handler_express_analysis(subject: str, article: str) -> Dict[str, Unio
     
     # 尝试解析JSON响应
     try:
-        logger.info(f"尝试解析JSON: {response_text}")
+        log_policy.log_payload(logger, "尝试解析JSON", response_text)
         result = parser.parse(response_text)
         # 确保解析结果包含必要的字段
         if "表达文采得分" not in result:
@@ -469,12 +467,12 @@ async def handler_express_analysis(subject: str, article: str) -> Dict[str, Unio
             
             # 将所有分析项合并为一个字符串
             result["解析"] = "\n".join(formatted_analysis)
-            logger.info(f"格式化后的表达文采解析: {result['解析']}")
+            log_policy.log_payload(logger, "格式化后的表达文采解析", result['解析'], level=logging.DEBUG)
         
         return result
     except Exception as e:
         logger.error(f"JSON解析错误: {e}")
-        logger.error(f"原始响应: {response_text}")
+        log_policy.log_payload(logger, "原始响应", response_text, is_error=True)
         return {"表达文采得分": "0", "解析": {
             "论证手法解析": "JSON解析失败，请重试。", 
             "引经据典解析": "", 
@@ -758,35 +756,10 @@ def extract_json_from_response(response_text: str) -> str:
     for old, new in field_replacements.items():
         processed_text = processed_text.replace(old, new)
     
-    # 尝试多种模式提取JSON
-    patterns = [
-        r'```json\s*({.*?})\s*```',  # 标准JSON代码块
-        r'```\s*({.*?})\s*```',      # 无语言声明的代码块
-        r'```json(.*?)```',          # 标准JSON代码块，允许不以大括号开始
-        r'```(.*?)```',              # 任何代码块
-        r'{[\s\S]*}',                # 直接查找最外层的大括号
-        r'JSON:\s*({.*?})\s*$'       # 无代码块形式
-    ]
-    
-    # 尝试匹配所有模式
-    for pattern in patterns:
-        match = re.search(pattern, processed_text, re.DOTALL)
-        if match:
-            extracted = match.group(1) if '{' in match.group(1) else match.group(0)
-            # 进一步清理：确保提取到的是一个完整的JSON对象
-            if extracted.strip().startswith('{') and extracted.strip().endswith('}'):
-                return extracted
-            elif '{' in extracted and '}' in extracted:
-                # 尝试只保留最外层的大括号部分
-                start = extracted.find('{')
-                end = extracted.rfind('}') + 1
-                return extracted[start:end]
-    
-    # 如果没有匹配任何模式，尝试直接提取最外层的大括号
-    if '{' in processed_text and '}' in processed_text:
-        start = processed_text.find('{')
-        end = processed_text.rfind('}') + 1
-        return processed_text[start:end]
+    # 单次线性扫描提取第一个完整的JSON对象（优先代码块）
+    extracted = extract_json_text(processed_text)
+    if extracted:
+        return extracted
     
     # 如果仍然无法提取，返回原始文本
     logger.warning(f"无法从响应中提取JSON格式内容，返回原始文本")
@@ -808,8 +781,10 @@ def parse_unified_response(response_text: str, session_id: str = "unknown") -> D
         json_str = extract_json_from_response(response_text)
         logger.info(f"[{session_id}] 提取的JSON字符串: {json_str[:200]}...")
         
-        # 解析JSON
-        result = json.loads(json_str)
+        # 解析JSON，失败时容错修复
+        result = parse_json_object(json_str)
+        if result is None:
+            raise ValueError("无法解析评分结果JSON")
         
         # 检查必要字段，注意：只检查必要的字段，不要检查可能不存在的字段
         required_fields = ["总得分", "等级评定", "分项得分", "错别字"]
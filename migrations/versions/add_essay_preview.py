@@ -0,0 +1,69 @@
+"""add essays.preview and (user_id, created_at, id) index for keyset history paging
+
+Revision ID: add_essay_preview
+Revises: compress_correction_results
+Create Date: 2026-10-18 22:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_essay_preview'
+down_revision = 'compress_correction_results'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+# 迁移固定在编写时的取值，不引用应用模型（Essay.PREVIEW_LENGTH / Essay.make_preview）
+PREVIEW_LENGTH = 200
+
+
+def make_preview(content):
+    """截取正文前 PREVIEW_LENGTH 个字符作为列表预览"""
+    if not content:
+        return ''
+    content = ' '.join(content.split())
+    if len(content) > PREVIEW_LENGTH:
+        return content[:PREVIEW_LENGTH] + '...'
+    return content
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # 由 db.create_all() 建表的库已包含该列和索引，这里跳过已存在的列和索引
+    columns = {column['name'] for column in inspector.get_columns('essays')}
+    indexes = {index['name'] for index in inspector.get_indexes('essays')}
+    with op.batch_alter_table('essays', schema=None) as batch_op:
+        if 'preview' not in columns:
+            batch_op.add_column(sa.Column('preview', sa.String(length=PREVIEW_LENGTH + 3), nullable=True))
+        if 'ix_essays_user_created' not in indexes:
+            batch_op.create_index('ix_essays_user_created', ['user_id', 'created_at', 'id'], unique=False)
+
+    # 按主键分批回填预览
+    essays = sa.table('essays', sa.column('id', sa.Integer), sa.column('content', sa.Text),
+                      sa.column('preview', sa.String))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(essays.c.id, essays.c.content)
+            .where(essays.c.id > last_id)
+            .order_by(essays.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        bind.execute(
+            essays.update().where(essays.c.id == sa.bindparam('_id')).values(preview=sa.bindparam('preview')),
+            [{'_id': row.id, 'preview': make_preview(row.content)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+
+def downgrade():
+    with op.batch_alter_table('essays', schema=None) as batch_op:
+        batch_op.drop_index('ix_essays_user_created')
+        batch_op.drop_column('preview')
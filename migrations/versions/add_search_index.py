@@ -0,0 +1,68 @@
+"""add FTS5 full-text search index for essays and users
+
+Revision ID: add_search_index
+Revises: add_usage_predictions
+Create Date: 2026-10-19 02:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_search_index'
+down_revision = 'add_usage_predictions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5虚拟表和触发器只用于SQLite，其他数据库由应用回退到LIKE
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    # 应用启动时可能已创建（app.core.search.fulltext.FullTextIndex.ensure_schema）
+    inspector = sa.inspect(bind)
+    if 'essay_search_outbox' in inspector.get_table_names():
+        return
+
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS essay_search USING fts5("
+               "owner, title, content, feedback, tokenize='unicode61', prefix='1')")
+    op.execute("CREATE TABLE IF NOT EXISTS essay_search_outbox ("
+               "id INTEGER PRIMARY KEY AUTOINCREMENT, essay_id INTEGER NOT NULL)")
+    op.execute("CREATE TRIGGER IF NOT EXISTS essays_search_ai AFTER INSERT ON essays BEGIN "
+               "INSERT INTO essay_search_outbox (essay_id) VALUES (new.id); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS essays_search_au AFTER UPDATE OF "
+               "title, content, comments, improvement_suggestions, user_id, is_deleted ON essays BEGIN "
+               "INSERT INTO essay_search_outbox (essay_id) VALUES (new.id); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS essays_search_ad AFTER DELETE ON essays BEGIN "
+               "INSERT INTO essay_search_outbox (essay_id) VALUES (old.id); END")
+    # 已有作文由周期任务 sync_search_index 分批建立索引
+    op.execute("INSERT INTO essay_search_outbox (essay_id) SELECT id FROM essays ORDER BY id")
+
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5("
+               "username, email, name, content='users', content_rowid='id', tokenize='trigram')")
+    op.execute("CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN "
+               "INSERT INTO user_search (rowid, username, email, name) "
+               "VALUES (new.id, new.username, new.email, new.name); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN "
+               "INSERT INTO user_search (user_search, rowid, username, email, name) "
+               "VALUES ('delete', old.id, old.username, old.email, old.name); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF username, email, name ON users BEGIN "
+               "INSERT INTO user_search (user_search, rowid, username, email, name) "
+               "VALUES ('delete', old.id, old.username, old.email, old.name); "
+               "INSERT INTO user_search (rowid, username, email, name) "
+               "VALUES (new.id, new.username, new.email, new.name); END")
+    op.execute("INSERT INTO user_search (user_search) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    for trigger in ('essays_search_ai', 'essays_search_au', 'essays_search_ad',
+                    'users_search_ai', 'users_search_ad', 'users_search_au'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS essay_search_outbox")
+    op.execute("DROP TABLE IF EXISTS essay_search")
+    op.execute("DROP TABLE IF EXISTS user_search")
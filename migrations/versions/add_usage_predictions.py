@@ -0,0 +1,53 @@
+"""add usage_predictions table for nightly precomputed membership usage predictions
+
+Revision ID: add_usage_predictions
+Revises: add_essay_preview
+Create Date: 2026-10-19 00:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_usage_predictions'
+down_revision = 'add_essay_preview'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 应用启动时 db.create_all() 可能已建好该表
+    inspector = sa.inspect(op.get_bind())
+    if 'usage_predictions' in inspector.get_table_names():
+        return
+    op.create_table(
+        'usage_predictions',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('membership_id', sa.Integer(), nullable=True),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.Column('window_days', sa.Integer(), nullable=False),
+        sa.Column('daily_average_usage', sa.Float(), nullable=True),
+        sa.Column('rolling_7_day_average', sa.Float(), nullable=True),
+        sa.Column('trend_per_day', sa.Float(), nullable=True),
+        sa.Column('projected_daily_usage', sa.Float(), nullable=True),
+        sa.Column('days_remaining', sa.Integer(), nullable=True),
+        sa.Column('predicted_total_usage', sa.Integer(), nullable=True),
+        sa.Column('remaining_quota', sa.Integer(), nullable=True),
+        sa.Column('will_exceed_limit', sa.Boolean(), nullable=True),
+        sa.Column('quota_completion_date', sa.Date(), nullable=True),
+        sa.Column('usage_history', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('is_deleted', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['membership_id'], ['memberships.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_usage_predictions_user_id'), 'usage_predictions', ['user_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_usage_predictions_user_id'), table_name='usage_predictions')
+    op.drop_table('usage_predictions')
@@ -0,0 +1,110 @@
+"""store correction results as single-encoded, compressed JSON
+
+Revision ID: compress_correction_results
+Revises: merge_heads_and_add_scores
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.db.json_types import encode_json_payload, decode_json_payload, unwrap_json_value
+
+
+# revision identifiers, used by Alembic.
+revision = 'compress_correction_results'
+down_revision = 'merge_heads_and_add_scores'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def _rewrite_rows(bind, table, columns, convert):
+    """按主键分批重写指定列"""
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, *[table.c[name] for name in columns])
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            values = {name: convert(getattr(row, name)) for name in columns}
+            values['_id'] = row.id
+            updates.append(values)
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam('_id'))
+            .values({name: sa.bindparam(name) for name in columns}),
+            updates
+        )
+        last_id = rows[-1].id
+
+
+def _encode(value):
+    if value is None:
+        return None
+    return encode_json_payload(decode_json_payload(value))
+
+
+def _decode_to_text(value):
+    if value is None:
+        return None
+    return json.dumps(decode_json_payload(value), ensure_ascii=False)
+
+
+def _unwrap_text(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return json.dumps(value, ensure_ascii=False)
+    return json.dumps(unwrap_json_value(value), ensure_ascii=False)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # 1. corrections.results / extra_data 改为二进制存储（单次编码，大结果压缩）
+    with op.batch_alter_table('corrections', schema=None) as batch_op:
+        batch_op.alter_column('results', existing_type=sa.JSON(), type_=sa.LargeBinary(),
+                              existing_nullable=True,
+                              postgresql_using="convert_to(results::text, 'UTF8')")
+        batch_op.alter_column('extra_data', existing_type=sa.JSON(), type_=sa.LargeBinary(),
+                              existing_nullable=True,
+                              postgresql_using="convert_to(extra_data::text, 'UTF8')")
+
+    corrections = sa.table('corrections', sa.column('id', sa.Integer),
+                           sa.column('results', sa.LargeBinary), sa.column('extra_data', sa.LargeBinary))
+    _rewrite_rows(bind, corrections, ['results', 'extra_data'], _encode)
+
+    # 2. essays.error_analysis / ai_analysis 展开历史上被二次编码的JSON字符串
+    essays = sa.table('essays', sa.column('id', sa.Integer),
+                      sa.column('error_analysis', sa.Text), sa.column('ai_analysis', sa.Text))
+    _rewrite_rows(bind, essays, ['error_analysis', 'ai_analysis'], _unwrap_text)
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    corrections = sa.table('corrections', sa.column('id', sa.Integer),
+                           sa.column('results', sa.LargeBinary), sa.column('extra_data', sa.LargeBinary))
+    _rewrite_rows(bind, corrections, ['results', 'extra_data'],
+                  lambda value: None if value is None else _decode_to_text(value).encode('utf-8'))
+
+    with op.batch_alter_table('corrections', schema=None) as batch_op:
+        batch_op.alter_column('results', existing_type=sa.LargeBinary(), type_=sa.JSON(),
+                              existing_nullable=True,
+                              postgresql_using="convert_from(results, 'UTF8')::json")
+        batch_op.alter_column('extra_data', existing_type=sa.LargeBinary(), type_=sa.JSON(),
+                              existing_nullable=True,
+                              postgresql_using="convert_from(extra_data, 'UTF8')::json")
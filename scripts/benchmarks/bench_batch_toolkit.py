@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批处理工具基准测试
+在合成的作文表上比较旧实现（OFFSET分页、逐行ORM更新、bulk_save_objects插入）
+与键集分块、批量UPDATE/DELETE、executemany插入的耗时
+
+用法:
+    python scripts/benchmarks/bench_batch_toolkit.py --rows 200000 --sqlite /tmp/bench_batch.db
+"""
+
+import os
+import sys
+import time
+import argparse
+
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, select, delete
+from sqlalchemy.orm import declarative_base, Session
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+from app.tasks import batch_optimization  # noqa: E402
+
+Base = declarative_base()
+
+
+class BenchEssay(Base):
+    __tablename__ = 'bench_essays'
+    id = Column(Integer, primary_key=True)
+    title = Column(String(200))
+    content = Column(Text)
+    status = Column(String(20), index=True)
+    created_at = Column(DateTime)
+
+
+def make_rows(count):
+    for i in range(count):
+        yield {'title': f'作文{i}', 'content': '内容' * 200, 'status': 'failed' if i % 3 == 0 else 'completed'}
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    value = func()
+    print(f"{label}: {time.perf_counter() - start:.2f}s")
+    return value
+
+
+def fresh_session(path, rows=None):
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    if rows:
+        batch_optimization.chunked_insert(session, BenchEssay, make_rows(rows), chunk_size=5000)
+    return session
+
+
+def legacy_offset_iteration(session, chunk_size):
+    offset, total = 0, 0
+    query = session.query(BenchEssay.id, BenchEssay.status).order_by(BenchEssay.id)
+    while True:
+        chunk = query.limit(chunk_size).offset(offset).all()
+        if not chunk:
+            return total
+        total += len(chunk)
+        offset += chunk_size
+
+
+def keyset_iteration(session, chunk_size):
+    query = session.query(BenchEssay.id, BenchEssay.status)
+    return sum(len(chunk) for chunk in batch_optimization.iterate_in_chunks(query, chunk_size, key_column=BenchEssay.id))
+
+
+def legacy_row_updates(session, ids):
+    for essay_id in ids:
+        essay = session.get(BenchEssay, essay_id)
+        essay.status = 'pending'
+        session.commit()
+
+
+def legacy_delete_loop(session, chunk_size):
+    while True:
+        batch_ids = [row[0] for row in session.query(BenchEssay.id).filter(BenchEssay.status == 'failed').limit(chunk_size)]
+        if not batch_ids:
+            return
+        session.query(BenchEssay).filter(BenchEssay.id.in_(batch_ids)).delete(synchronize_session=False)
+        session.commit()
+
+
+def run(rows, path, chunk_size, update_count):
+    session = fresh_session(path)
+    timed(f'bulk_save_objects 插入 {rows} 行', lambda: [
+        (session.bulk_save_objects([BenchEssay(**row) for row in batch]), session.commit())
+        for batch in batch_optimization.iter_batches(make_rows(rows), 5000)
+    ])
+    session.close()
+
+    session = fresh_session(path)
+    timed(f'chunked_insert(executemany) 插入 {rows} 行',
+          lambda: batch_optimization.chunked_insert(session, BenchEssay, make_rows(rows), chunk_size=5000))
+
+    timed(f'OFFSET 分页遍历 (每块 {chunk_size})', lambda: legacy_offset_iteration(session, chunk_size))
+    timed(f'键集分块遍历 (每块 {chunk_size})', lambda: keyset_iteration(session, chunk_size))
+
+    ids = session.execute(select(BenchEssay.id).where(BenchEssay.status == 'completed').limit(update_count)).scalars().all()
+    timed(f'逐行ORM更新 {len(ids)} 篇', lambda: legacy_row_updates(session, ids))
+    ids = session.execute(select(BenchEssay.id).where(BenchEssay.status == 'completed').limit(update_count)).scalars().all()
+    timed(f'chunked_update 更新 {len(ids)} 篇',
+          lambda: batch_optimization.chunked_update(session, BenchEssay, ids, {'status': 'pending'}, chunk_size=chunk_size))
+
+    timed('旧删除循环', lambda: legacy_delete_loop(session, chunk_size))
+    session.execute(BenchEssay.__table__.update().where(BenchEssay.status == 'pending').values(status='failed'))
+    session.commit()
+    timed('chunked_delete 键集删除',
+          lambda: batch_optimization.chunked_delete(session, BenchEssay, BenchEssay.status == 'failed', chunk_size=chunk_size))
+    session.close()
+    os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批处理工具基准测试')
+    parser.add_argument('--rows', type=int, default=200000, help='合成作文数量')
+    parser.add_argument('--sqlite', default='/tmp/bench_batch_toolkit.db', help='SQLite文件路径')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='每块记录数')
+    parser.add_argument('--updates', type=int, default=5000, help='状态更新的作文数量')
+    args = parser.parse_args()
+    run(args.rows, args.sqlite, args.chunk_size, args.updates)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
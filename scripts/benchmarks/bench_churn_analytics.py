@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+会员流失/续订/转化统计基准测试
+在合成的会员数据库（默认100万会员）上比较逐计划循环计数（整体和每个计划各两次COUNT，
+流失数使用逐行关联的NOT EXISTS子查询）与集合式分组聚合的耗时，并测量按天缓存命中的耗时
+
+用法:
+    python scripts/benchmarks/bench_churn_analytics.py --memberships 1000000 --workdir /tmp/bench_churn
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+os.environ.setdefault('SECRET_KEY', 'bench')
+
+from sqlalchemy import create_engine, func, and_, or_  # noqa: E402
+from sqlalchemy.orm import scoped_session, sessionmaker  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.models.db import db  # noqa: E402
+from app.models.membership import Membership, MembershipPlan  # noqa: E402
+from app.models.subscription import Subscription  # noqa: E402
+from app.core.analytics import subscription_metrics  # noqa: E402
+from app.core.analytics.subscription_metrics import DailyReportCache, PAID_STATUSES  # noqa: E402
+
+PLANS = [('basic', '基础会员'), ('premium', '高级会员'), ('professional', '专业会员'),
+         ('yearly', '年度会员'), ('trial', '体验会员')]
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def build_database(path, memberships, now):
+    """生成合成的用户、会员和订阅数据（直接用sqlite3批量写入）"""
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+    stamp = now.strftime(DATE_FORMAT)
+    conn.executemany(
+        'INSERT INTO membership_plans (id, name, code, price, duration_days, created_at, updated_at, is_deleted) '
+        'VALUES (?, ?, ?, 10, 30, ?, ?, 0)',
+        [(index + 1, name, code, stamp, stamp) for index, (code, name) in enumerate(PLANS)])
+
+    users, members, subscriptions = [], [], []
+
+    def flush():
+        conn.executemany('INSERT INTO users (id, username, email, password_hash, created_at, updated_at, is_deleted) '
+                         'VALUES (?, ?, ?, ?, ?, ?, 0)', users)
+        conn.executemany('INSERT INTO memberships (user_id, plan_id, start_date, end_date, is_active, is_auto_renew, '
+                         'created_at, updated_at, is_deleted) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)', members)
+        conn.executemany('INSERT INTO subscriptions (user_id, plan_id, status, auto_renew, start_date, end_date, '
+                         'created_at, updated_at, is_deleted) VALUES (?, ?, ?, 0, ?, ?, ?, ?, 0)', subscriptions)
+        users.clear()
+        members.clear()
+        subscriptions.clear()
+
+    for user_id in range(1, memberships + 1):
+        created = now - timedelta(days=rng.uniform(0, 720))
+        end_date = created + timedelta(days=rng.choice((30, 90, 365)) + rng.uniform(0, 200))
+        plan_id = rng.randint(1, len(PLANS))
+        created_s, end_s = created.strftime(DATE_FORMAT), end_date.strftime(DATE_FORMAT)
+        users.append((user_id, f'user{user_id}', f'user{user_id}@example.com', 'x', created_s, created_s))
+        members.append((user_id, plan_id, created_s, end_s, end_date > now, rng.random() < 0.3, created_s, created_s))
+        # 首次付费，约40%的用户在到期前后续订
+        subscriptions.append((user_id, plan_id, 'expired', created_s, end_s, created_s, created_s))
+        if rng.random() < 0.4:
+            renewed = (end_date + timedelta(days=rng.uniform(-3, 10))).strftime(DATE_FORMAT)
+            subscriptions.append((user_id, plan_id, rng.choice(PAID_STATUSES), renewed, renewed, renewed, renewed))
+        if len(users) >= 50000:
+            flush()
+    flush()
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def legacy_churn(now):
+    """原实现的查询形态：整体和每个计划各两次COUNT，流失数用逐行关联的NOT EXISTS"""
+    window_start = now - timedelta(days=30)
+
+    def counts(plan_id=None):
+        cohort = db.session.query(Membership).filter(
+            Membership.created_at < window_start, Membership.end_date > window_start)
+        churned = cohort.filter(
+            Membership.end_date <= now,
+            ~db.session.query(Subscription.id).filter(
+                Subscription.user_id == Membership.user_id,
+                Subscription.created_at >= Membership.end_date,
+                Subscription.status.in_(PAID_STATUSES)
+            ).exists())
+        if plan_id is not None:
+            cohort = cohort.filter(Membership.plan_id == plan_id)
+            churned = churned.filter(Membership.plan_id == plan_id)
+        return cohort.count(), churned.count()
+
+    active, churned = counts()
+    plans = {plan.id: counts(plan.id) for plan in MembershipPlan.query.all()}
+    return active, churned, plans
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label}: {time.perf_counter() - start:.2f}s")
+    return result
+
+
+def run(memberships, workdir, skip_legacy):
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, 'memberships.db')
+    now = datetime.now()
+    print(f"生成 {memberships} 个会员的合成数据...")
+    timed('生成数据', lambda: build_database(path, memberships, now))
+
+    app = create_app()
+    engine = create_engine(f'sqlite:///{path}')
+    with app.app_context():
+        # 报表函数使用 db.session，这里绑定到合成数据库
+        db.session = scoped_session(sessionmaker(bind=engine))
+        MembershipPlan.query = db.session.query_property()
+        subscription_metrics.report_cache = DailyReportCache(store='local')
+
+        if not skip_legacy:
+            active, churned, _ = timed('逐计划循环计数（流失）', lambda: legacy_churn(now))
+            print(f"  有效 {active}, 流失 {churned}")
+        report = timed('集合式分组聚合（流失）', lambda: subscription_metrics.churn_report(now))
+        print(f"  有效 {report['active_members']}, 流失 {report['churned_members']}, 流失率 {report['churn_rate']}%")
+        report = timed('集合式分组聚合（续订，90天）', lambda: subscription_metrics.renewal_report(90, now=now))
+        print(f"  到期 {report['expired']}, 续订 {report['renewed']}, 续订率 {report['renewal_rate']}%")
+        report = timed('集合式分组聚合（转化，30天）', lambda: subscription_metrics.conversion_report(30, now=now))
+        print(f"  新用户 {report['new_users']}, 付费 {report['paid_memberships']}")
+        count = timed('即将到期会员（联表，分批读取）',
+                      lambda: sum(1 for _ in subscription_metrics.iter_expiring_members(now)))
+        print(f"  {count} 个会员")
+
+        def cached():
+            return subscription_metrics.report_cache.get_or_compute(
+                'churn', {'window_days': 30},
+                lambda: dict(subscription_metrics.churn_report(now), status='success'))
+
+        timed('按天缓存（首次计算）', cached)
+        timed('按天缓存（命中）', cached)
+        db.session.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='会员流失/续订/转化统计基准测试')
+    parser.add_argument('--memberships', type=int, default=1000000, help='合成会员数量')
+    parser.add_argument('--workdir', default='/tmp/bench_churn', help='工作目录')
+    parser.add_argument('--skip-legacy', action='store_true', help='跳过逐计划循环计数')
+    args = parser.parse_args()
+    run(args.memberships, args.workdir, args.skip_legacy)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+字段映射标准化基准测试
+比较旧实现（每次遍历映射字典、拆分点号路径、分支校验、深拷贝默认结构）
+与编译后的映射计划在每条AI响应上的标准化耗时
+
+用法:
+    python scripts/benchmarks/bench_field_mapper.py --responses 2000 --repeat 5
+"""
+
+import os
+import sys
+import copy
+import time
+import random
+import logging
+import argparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+from app.utils.field_mapper import FieldMapper, get_field_mapper  # noqa: E402
+
+
+def legacy_validate(value, category, field):
+    """旧实现的逐值分支校验"""
+    if category == "scores":
+        if field == "total" or field.startswith("dimensions."):
+            if isinstance(value, (int, float)):
+                return value
+            elif isinstance(value, str) and value.replace('.', '', 1).isdigit():
+                return float(value)
+            return None
+    elif category == "analyses":
+        return value.strip() if isinstance(value, str) else str(value)
+    elif category == "feedback":
+        if field in ["strengths", "weaknesses", "improvements"]:
+            if isinstance(value, list):
+                return [str(item).strip() for item in value if item]
+            elif isinstance(value, str):
+                items = [item.strip() for item in value.split('\n') if item.strip()]
+                return items if items else [value.strip()]
+            return [str(value)]
+    elif category == "metadata":
+        if field == "processing_time" and isinstance(value, (int, float)):
+            return value
+        return str(value)
+    return value
+
+
+def legacy_normalize(mappings, core_fields, api_response, provider):
+    """旧实现：每条响应都遍历映射、拆分路径并深拷贝默认结构"""
+    result = copy.deepcopy(core_fields)
+    result["metadata"]["provider"] = provider
+    for category, field_mappings in mappings[provider].items():
+        for source_field, target_field in field_mappings.items():
+            current = api_response
+            for part in source_field.split('.'):
+                if not isinstance(current, dict) or part not in current:
+                    current = None
+                    break
+                current = current[part]
+            if current is None:
+                continue
+            value = legacy_validate(current, category, target_field)
+            if value is None:
+                continue
+            target = result[category]
+            parts = target_field.split('.')
+            for part in parts[:-1]:
+                if not isinstance(target.get(part), dict):
+                    target[part] = {}
+                target = target[part]
+            target[parts[-1]] = value
+    scores = result["scores"]
+    scores["total"] = max(0, min(50, scores["total"])) if isinstance(scores["total"], (int, float)) else 0
+    for dim in ["content", "language", "structure", "grammar"]:
+        scores["dimensions"].setdefault(dim, 0)
+    return result
+
+
+def make_response(rng):
+    return {
+        "总得分": rng.randint(30, 50),
+        "分项得分": {"内容主旨": rng.randint(10, 20), "语言文采": rng.randint(8, 15),
+                 "文章结构": rng.randint(5, 10), "文面书写": rng.randint(2, 5)},
+        "总体评价": "这篇作文立意明确，结构清晰。" * rng.randint(2, 6),
+        "内容分析": "内容充实，材料具体。" * rng.randint(2, 6),
+        "语言分析": "语言流畅，用词准确。" * rng.randint(2, 6),
+        "结构分析": "层次分明，首尾呼应。" * rng.randint(2, 6),
+        "写作建议": "\n".join(f"建议{i}：可以增加细节描写。" for i in range(rng.randint(1, 4))),
+        "错别字": [f"错{i}->对{i}" for i in range(rng.randint(0, 8))],
+    }
+
+
+def timed(func, responses, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for response in responses:
+            func(response)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best / len(responses) * 1e6
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='字段映射标准化基准测试')
+    arg_parser.add_argument('--responses', type=int, default=2000)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--seed', type=int, default=42)
+    args = arg_parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    responses = [make_response(rng) for _ in range(args.responses)]
+
+    # 旧实现只支持内置的扁平映射格式，两边使用同一份内置映射对比
+    builtin = FieldMapper(os.path.join(project_root, 'config', '__missing_field_mappings__.yaml'))
+    legacy_us = timed(lambda r: legacy_normalize(builtin.mappings, builtin.core_fields, r, 'deepseek'),
+                      responses, args.repeat)
+    compiled_us = timed(lambda r: builtin.normalize_result(r, 'deepseek'), responses, args.repeat)
+    template_legacy_us = timed(lambda r: copy.deepcopy(builtin.core_fields), responses, args.repeat)
+    template_us = timed(lambda r: builtin._get_default_structure(), responses, args.repeat)
+
+    print(f"响应: {args.responses} 条, 重复 {args.repeat} 次取最好成绩（单位: 微秒/条）")
+    print(f"{'项目':<28}{'旧实现':>10}{'编译计划':>10}{'加速':>8}")
+    print(f"{'normalize_result (内置映射)':<28}{legacy_us:>10.2f}{compiled_us:>10.2f}{legacy_us / compiled_us:>7.1f}x")
+    print(f"{'默认结构复制':<28}{template_legacy_us:>10.2f}{template_us:>10.2f}"
+          f"{template_legacy_us / template_us:>7.1f}x")
+
+    # 配置文件中的各提供商映射（多个候选字段名）共用同一个编译后的映射器
+    shared = get_field_mapper()
+    for provider in ('deepseek', 'dashscope', 'openai'):
+        provider_us = timed(lambda r: shared.normalize_result(r, provider), responses, args.repeat)
+        print(f"{'normalize_result (' + provider + ')':<28}{'-':>10}{provider_us:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+全文检索基准测试
+在合成的作文数据库（默认100万篇，中文正文）上测量：
+  - 建立FTS5二元分词索引的吞吐（消费发件箱）和索引大小
+  - 原来的 LIKE '%关键词%'（标题、标题+正文）与FTS5检索（按bm25排序取前20条并统计总数）的查询延迟
+  - 新增作文后增量同步的耗时
+  - 用户名子串检索：LIKE 与 trigram 索引
+
+用法:
+    python scripts/benchmarks/bench_fulltext_search.py --essays 1000000 --users 100000 --workdir /tmp/bench_search
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+os.environ.setdefault('SECRET_KEY', 'bench')
+
+from sqlalchemy import create_engine, or_, insert  # noqa: E402
+from sqlalchemy.orm import scoped_session, sessionmaker  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.models.db import db  # noqa: E402
+from app.models.essay import Essay  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.core.search import fulltext_index  # noqa: E402
+
+# 常用汉字，随机组成词表，按Zipf分布取词生成正文
+COMMON_CHARS = (
+    '的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所'
+    '民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日'
+    '那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想'
+    '已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指'
+    '几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权'
+    '收证改清美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温'
+    '传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般'
+)
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def build_vocabulary(rng, size=5000):
+    return [''.join(rng.choice(COMMON_CHARS) for _ in range(rng.choice((1, 2, 2, 2, 3, 4)))) for _ in range(size)]
+
+
+def make_text(rng, vocabulary, weights, length):
+    words = rng.choices(vocabulary, weights=weights, k=length)
+    return '，'.join(''.join(words[i:i + 6]) for i in range(0, len(words), 6)) + '。'
+
+
+def build_database(path, essays, users, now):
+    """生成合成的用户和作文（直接用sqlite3批量写入，不经过触发器，之后由发件箱建立索引）"""
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    rng = random.Random(42)
+    vocabulary = build_vocabulary(rng)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+    stamp = now.strftime(DATE_FORMAT)
+    conn.executemany(
+        'INSERT INTO users (id, username, email, password_hash, created_at, updated_at, is_deleted) '
+        'VALUES (?, ?, ?, ?, ?, ?, 0)',
+        [(user_id, f'{rng.choice(("zhang", "wang", "li", "liu", "chen"))}{user_id}', f'user{user_id}@example.com',
+          'x', stamp, stamp) for user_id in range(1, users + 1)])
+
+    rows = []
+    for essay_id in range(1, essays + 1):
+        created = (now - timedelta(minutes=essays - essay_id)).strftime(DATE_FORMAT)
+        content = make_text(rng, vocabulary, weights, rng.randint(60, 120))
+        rows.append((essay_id, rng.randint(1, users), make_text(rng, vocabulary, weights, 3)[:20], content,
+                     content[:200], make_text(rng, vocabulary, weights, 15), created, created))
+        if len(rows) >= 50000:
+            conn.executemany('INSERT INTO essays (id, user_id, title, content, preview, comments, created_at, '
+                             "updated_at, version, source_type, is_deleted) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, 'text', 0)",
+                             rows)
+            rows.clear()
+    conn.executemany('INSERT INTO essays (id, user_id, title, content, preview, comments, created_at, '
+                     "updated_at, version, source_type, is_deleted) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, 'text', 0)", rows)
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return vocabulary
+
+
+def measure(label, func, repeat=5):
+    """运行多次，输出中位数延迟"""
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    print(f"  {label}: {statistics.median(timings) * 1000:.1f}ms")
+    return result
+
+
+def like_titles(keyword, columns):
+    query = db.session.query(Essay.id).filter(or_(*[column.like(f'%{keyword}%') for column in columns]))
+    total = query.count()
+    rows = query.order_by(Essay.created_at.desc()).limit(20).all()
+    return total, rows
+
+
+def fts_search(keyword, user_id=None, columns=('title', 'content', 'feedback')):
+    matches = fulltext_index.essay_matches(keyword, user_id=user_id, columns=columns)
+    query = db.session.query(Essay.id, Essay.title).join(matches, matches.c.essay_id == Essay.id)
+    total = query.count()
+    rows = query.order_by(matches.c.rank).limit(20).all()
+    fulltext_index.highlights([row.id for row in rows], keyword)
+    return total, rows
+
+
+def run(essays, users, workdir, skip_like):
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, 'search.db')
+    now = datetime.utcnow()
+    print(f"生成 {essays} 篇作文、{users} 个用户的合成数据...")
+    start = time.perf_counter()
+    vocabulary = build_database(path, essays, users, now)
+    print(f"生成数据: {time.perf_counter() - start:.1f}s")
+
+    app = create_app()
+    engine = create_engine(f'sqlite:///{path}')
+    with app.app_context():
+        # 检索使用 db.session，这里绑定到合成数据库
+        db.session = scoped_session(sessionmaker(bind=engine))
+        fulltext_index.batch_size = 5000
+
+        start = time.perf_counter()
+        fulltext_index.ensure_schema()
+        indexed = fulltext_index.sync_all()
+        elapsed = time.perf_counter() - start
+        print(f"建立索引: {indexed} 篇，{elapsed:.1f}s（{indexed / elapsed:.0f} 篇/秒）")
+        db.session.remove()
+        conn = sqlite3.connect(path)
+        pages = {name: count for name, count in conn.execute(
+            "SELECT name, COUNT(*) FROM dbstat WHERE name LIKE 'essay_search%' OR name = 'essays' GROUP BY name")} \
+            if conn.execute("SELECT 1 FROM pragma_module_list WHERE name = 'dbstat'").fetchone() else {}
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        conn.close()
+        if pages:
+            essay_mb = pages.get('essays', 0) * page_size / 2 ** 20
+            index_mb = sum(count for name, count in pages.items() if name != 'essays') * page_size / 2 ** 20
+            print(f"  作文表 {essay_mb:.0f}MB，全文索引 {index_mb:.0f}MB")
+
+        queries = [('高频词', vocabulary[1] if len(vocabulary[1]) > 1 else vocabulary[2]),
+                   ('低频词', next(word for word in vocabulary[3000:] if len(word) == 3)),
+                   ('两个词', f'{vocabulary[5]} {vocabulary[40]}'),
+                   ('单字前缀', COMMON_CHARS[100])]
+        for label, keyword in queries:
+            print(f"{label}「{keyword}」")
+            if not skip_like:
+                total, _ = measure('LIKE 标题', lambda: like_titles(keyword, [Essay.title]), repeat=3)
+                print(f"    命中 {total}")
+                total, _ = measure('LIKE 标题+正文', lambda: like_titles(keyword, [Essay.title, Essay.content]), repeat=1)
+                print(f"    命中 {total}")
+            total, _ = measure('FTS5 标题+正文+反馈（bm25前20+总数+高亮）', lambda: fts_search(keyword))
+            print(f"    命中 {total}")
+            measure('FTS5 单个用户的作文', lambda: fts_search(keyword, user_id=7))
+
+        # 增量同步：批量插入1000篇作文（触发器写发件箱）后消费
+        rng = random.Random(1)
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+        db.session.execute(insert(Essay), [{
+            'user_id': rng.randint(1, users), 'title': '新作文', 'content': make_text(rng, vocabulary, weights, 90),
+        } for _ in range(1000)])
+        db.session.commit()
+        start = time.perf_counter()
+        synced = fulltext_index.sync_all()
+        print(f"增量同步 {synced} 篇: {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        print("用户名子串「zhang12」")
+        if not skip_like:
+            measure('LIKE', lambda: db.session.query(User.id).filter(User.username.like('%zhang12%')).count())
+        matches = fulltext_index.user_matches(username='zhang12')
+        measure('trigram索引', lambda: db.session.query(User.id).filter(User.id.in_(matches)).count())
+        db.session.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全文检索基准测试')
+    parser.add_argument('--essays', type=int, default=1000000, help='合成作文数量')
+    parser.add_argument('--users', type=int, default=100000, help='合成用户数量')
+    parser.add_argument('--workdir', default='/tmp/bench_search', help='工作目录')
+    parser.add_argument('--skip-like', action='store_true', help='跳过LIKE全表扫描')
+    args = parser.parse_args()
+    run(args.essays, args.users, args.workdir, args.skip_like)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
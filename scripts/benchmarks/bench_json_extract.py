@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+LLM输出JSON解析基准测试
+在合成的输出语料（正常、代码块包裹、尾随逗号、未转义引号、被截断、大段畸形文本）上
+比较旧的多轮正则 + eval 实现与单次扫描提取/修复实现的耗时和成功率
+
+用法:
+    python scripts/benchmarks/bench_json_extract.py --repeat 200 --malformed-size 20000
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+from app.core.ai.json_extract import parse_json_object  # noqa: E402
+
+
+def legacy_parse(response_text):
+    """旧实现：代码块正则、非贪婪对象扫描逐个json.loads、最后eval兜底"""
+    if not response_text:
+        return None
+    text = response_text.strip()
+    matches = re.findall(r'```(?:json)?(.*?)```', text, re.DOTALL)
+    if matches:
+        cleaned = matches[-1].strip()
+    else:
+        start, end = text.find('{'), text.rfind('}')
+        cleaned = text[start:end + 1] if start >= 0 and end > start else text
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+    for candidate in re.findall(r'({[\s\S]*?})', cleaned):
+        try:
+            result = json.loads(candidate)
+            if isinstance(result, dict):
+                return result
+        except json.JSONDecodeError:
+            continue
+    if all(c in '{}[](),:."\'0123456789truefalsenullabcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_- \n\t\r'
+           for c in cleaned):
+        try:
+            result = eval(cleaned.replace('null', 'None').replace('true', 'True').replace('false', 'False'))
+            if isinstance(result, dict):
+                return result
+        except Exception:
+            pass
+    return None
+
+
+def make_result(rng):
+    return {
+        "总得分": rng.randint(30, 50),
+        "分项得分": {"内容主旨": rng.randint(10, 20), "语言文采": rng.randint(8, 15),
+                 "文章结构": rng.randint(5, 10), "文面书写": rng.randint(2, 5)},
+        "总体评价": "这篇作文立意明确，结构清晰。" * rng.randint(5, 20),
+        "内容分析": "内容充实，材料具体。" * rng.randint(5, 20),
+        "语言分析": "语言流畅，用词准确。" * rng.randint(5, 20),
+        "结构分析": "层次分明，首尾呼应。" * rng.randint(5, 20),
+        "写作建议": "可以增加细节描写。" * rng.randint(5, 20),
+        "错别字": [f"错{i}->对{i}" for i in range(rng.randint(0, 8))],
+    }
+
+
+def build_corpus(seed, malformed_size):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(20):
+        text = json.dumps(make_result(rng), ensure_ascii=False, indent=2)
+        corpus.append(('valid', text))
+        corpus.append(('fenced', f"以下是批改结果：\n```json\n{text}\n```\n希望对你有帮助。"))
+        corpus.append(('trailing_comma', text.replace('\n}', ',\n}').replace('\n  }', ',\n  }')))
+        corpus.append(('unescaped_quote', text.replace('立意明确', '"立意"明确', 1)))
+        corpus.append(('truncated', text[:int(len(text) * rng.uniform(0.6, 0.95))]))
+    # 大段畸形输出：大量未闭合的左括号，旧实现的非贪婪扫描在这里退化为平方复杂度
+    corpus.append(('malformed', '{"总体评价": "' + '{段落' * (malformed_size // 3)))
+    corpus.append(('malformed', '分析：' + '{ "a": 1 ' * (malformed_size // 9) + '}'))
+    return corpus
+
+
+def run(parser_func, corpus, repeat):
+    timings = {}
+    parsed = {}
+    for kind, text in corpus:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = parser_func(text)
+        timings[kind] = timings.get(kind, 0.0) + (time.perf_counter() - start) / repeat
+        parsed.setdefault(kind, [0, 0])
+        parsed[kind][0] += 1 if result else 0
+        parsed[kind][1] += 1
+    return timings, parsed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='LLM输出JSON解析基准测试')
+    arg_parser.add_argument('--repeat', type=int, default=20)
+    arg_parser.add_argument('--malformed-size', type=int, default=20000)
+    arg_parser.add_argument('--seed', type=int, default=42)
+    args = arg_parser.parse_args()
+
+    corpus = build_corpus(args.seed, args.malformed_size)
+    print(f"语料: {len(corpus)} 条, 重复 {args.repeat} 次")
+    print(f"{'类型':<16}{'旧实现(ms)':>12}{'新实现(ms)':>12}{'旧成功':>8}{'新成功':>8}")
+    legacy_time, legacy_ok = run(legacy_parse, corpus, args.repeat)
+    new_time, new_ok = run(parse_json_object, corpus, args.repeat)
+    for kind in legacy_time:
+        print(f"{kind:<16}{legacy_time[kind] * 1000:>12.2f}{new_time[kind] * 1000:>12.2f}"
+              f"{legacy_ok[kind][0]:>5}/{legacy_ok[kind][1]:<3}{new_ok[kind][0]:>4}/{new_ok[kind][1]:<3}")
+    print(f"{'合计':<16}{sum(legacy_time.values()) * 1000:>12.2f}{sum(new_time.values()) * 1000:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批改热路径日志开销基准测试
+模拟一次批改在日志上的工作量：客户端方法枚举、请求参数与响应对象的INFO日志、
+DEBUG级别下被提前格式化的载荷、APIMonitor对请求参数的清理和JSON序列化，
+比较旧写法与日志策略（延迟格式化 + 1/N抽样 + 截断预算）下每次批改的耗时
+
+用法:
+    python scripts/benchmarks/bench_log_policy.py --corrections 2000 --sample 100
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+from app.utils.log_policy import LogPolicy  # noqa: E402
+from app.core.ai.api_monitor import APIMonitor  # noqa: E402
+
+
+class FakeClient:
+    """方法数量与DeepseekClient相当的客户端"""
+
+
+for _index in range(60):
+    setattr(FakeClient, f"method_{_index}", lambda self: None)
+
+
+def make_request(rng, essay_chars):
+    essay = ''.join(rng.choice('春天来了花开了我们去公园玩耍，。') for _ in range(essay_chars))
+    return {
+        "model": "deepseek-chat",
+        "messages": [{"role": "system", "content": "评分标准" * 400}, {"role": "user", "content": essay}],
+        "temperature": 0.3,
+        "max_tokens": 1800,
+    }
+
+
+def make_response(rng):
+    content = json.dumps({"总得分": rng.randint(30, 50), "总体评价": "立意明确。" * 80}, ensure_ascii=False)
+    return {"id": "chatcmpl-1", "model": "deepseek-chat",
+            "choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1800, "completion_tokens": 700}}
+
+
+def legacy_logging(log, monitor, client, request, response):
+    """旧写法：每次批改都枚举客户端方法并完整格式化载荷"""
+    methods = [m for m in dir(client) if not m.startswith('_') and callable(getattr(client, m))]
+    log.info(f"[AICorrectionService] 使用的AI客户端类型: {type(client).__name__}")
+    log.info(f"[AICorrectionService] 客户端可用方法: {methods}")
+    log.info("【发送API请求】")
+    log.info(f"请求参数: {request}")
+    log.debug(f"请求参数: {json.dumps(request)[:500]}...")
+    log.info("【收到API响应】")
+    log.info(f"响应对象: {response}")
+    log.debug(f"异步API完整响应: {json.dumps(response, ensure_ascii=False)[:500]}...")
+    entry = {"event": "api_call_start", "params": legacy_sanitize(request)}
+    json.dumps(entry, ensure_ascii=False)
+
+
+def legacy_sanitize(params):
+    sanitized = params.copy()
+    sanitized['messages'] = [dict(m) for m in params['messages']]
+    for i, msg in enumerate(sanitized['messages']):
+        if len(msg['content']) > 100:
+            sanitized['messages'][i]['content'] = msg['content'][:100] + "..."
+    return sanitized
+
+
+def policy_logging(log, monitor, policy, client, request, response):
+    """日志策略：延迟格式化，载荷按1/N抽样并截断"""
+    log.info("[AICorrectionService] 开始AI批改，essay_id=%s，内容长度: %d，客户端: %s",
+             None, len(request['messages'][-1]['content']), type(client).__name__)
+    policy.log_payload(log, "【发送API请求】请求参数", request)
+    policy.log_payload(log, "请求参数", request, level=logging.DEBUG)
+    policy.log_payload(log, "【收到API响应】响应对象", response)
+    policy.log_payload(log, "异步API响应", response, level=logging.DEBUG)
+    entry = {"event": "api_call_start"}
+    if policy.sample():
+        entry["params"] = monitor._sanitize_params(request)
+    json.dumps(entry, ensure_ascii=False)
+
+
+def timed(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='批改热路径日志开销基准测试')
+    arg_parser.add_argument('--corrections', type=int, default=2000)
+    arg_parser.add_argument('--sample', type=int, default=100)
+    arg_parser.add_argument('--essay-chars', type=int, default=1200)
+    arg_parser.add_argument('--seed', type=int, default=42)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(args.seed)
+    request, response = make_request(rng, args.essay_chars), make_response(rng)
+    client = FakeClient()
+    monitor = APIMonitor.__new__(APIMonitor)
+
+    # INFO级别、写入内存的处理器，包含真实的格式化开销
+    sink = io.StringIO()
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s'))
+    log = logging.getLogger('bench.hot_path')
+    log.propagate = False
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+
+    policy = LogPolicy(sample_rate=args.sample, max_chars=500, message_chars=100)
+
+    sink.seek(0), sink.truncate()
+    legacy_us = timed(lambda: legacy_logging(log, monitor, client, request, response), args.corrections)
+    legacy_bytes = sink.tell() / args.corrections
+    sink.seek(0), sink.truncate()
+    policy_us = timed(lambda: policy_logging(log, monitor, policy, client, request, response), args.corrections)
+    policy_bytes = sink.tell() / args.corrections
+
+    print(f"批改: {args.corrections} 次, 作文 {args.essay_chars} 字, 载荷抽样 1/{args.sample}")
+    print(f"{'写法':<12}{'微秒/次':>10}{'日志字符/次':>14}")
+    print(f"{'旧写法':<12}{legacy_us:>10.1f}{legacy_bytes:>14.0f}")
+    print(f"{'日志策略':<12}{policy_us:>10.1f}{policy_bytes:>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
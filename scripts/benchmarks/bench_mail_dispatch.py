@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量邮件分发基准测试
+以子进程启动本地SMTP桩服务（可配置每封延迟和451比例），比较逐封新建连接（连接+认证+发送+退出）
+与连接池 + MailDispatcher 批量发送的吞吐量，并输出桩服务端统计的连接数和认证数
+
+用法:
+    python scripts/benchmarks/bench_mail_dispatch.py --messages 2000 --latency-ms 2 --rate-451 0.01
+"""
+
+import os
+import sys
+import json
+import time
+import smtplib
+import argparse
+import subprocess
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+os.environ.setdefault('SECRET_KEY', 'bench')
+
+from app.utils import email_sender  # noqa: E402
+from app.core.notification import mail_dispatcher as dispatcher_module  # noqa: E402
+
+STUB_SCRIPT = os.path.join(project_root, 'scripts', 'benchmarks', 'stub_smtp_server.py')
+
+
+def start_stub(latency_ms, rate_451):
+    """启动桩服务子进程，返回 (进程, 端口)"""
+    process = subprocess.Popen(
+        [sys.executable, STUB_SCRIPT, '--port', '0', '--latency-ms', str(latency_ms), '--rate-451', str(rate_451)],
+        stderr=subprocess.PIPE, text=True)
+    line = process.stderr.readline()
+    return process, int(line.rsplit(':', 1)[1])
+
+
+def stub_stats(port):
+    conn = smtplib.SMTP('127.0.0.1', port, timeout=5)
+    try:
+        return json.loads(conn.docmd('XSTATS')[1])
+    finally:
+        conn.quit()
+
+
+def per_message(settings, recipients):
+    """原实现：每封邮件新建连接并登录"""
+    sent = failed = 0
+    for recipient in recipients:
+        message = email_sender.build_message(recipient['email'], f"{recipient['username']}，会员即将到期",
+                                             None, f"尊敬的 {recipient['username']}", settings=settings)
+        try:
+            server = smtplib.SMTP(settings['server'], settings['port'], timeout=30)
+            server.login(settings['username'], settings['password'])
+            server.sendmail(settings['sender_email'], [recipient['email']], message.as_string())
+            server.quit()
+            sent += 1
+        except smtplib.SMTPRecipientsRefused:
+            failed += 1
+    return sent, failed
+
+
+def pooled(recipients, rate):
+    """连接池 + 批量分发"""
+    pool = email_sender.SMTPConnectionPool()
+    dispatcher = dispatcher_module.MailDispatcher(pool=pool, rate_per_second=rate, burst=max(1, int(rate)))
+    result = dispatcher.send_batch(recipients, '{{ username }}，会员即将到期', '尊敬的 {{ username }}')
+    pool.close_all()
+    return result['sent'], result['failed']
+
+
+def run(messages, latency_ms, rate_451, rate):
+    recipients = [{'user_id': i, 'email': f'user{i}@example.com', 'username': f'用户{i}'} for i in range(messages)]
+    for label, func in (('逐封新建连接', None), ('连接池 + 批量分发', pooled)):
+        process, port = start_stub(latency_ms, rate_451)
+        settings = {
+            'server': '127.0.0.1', 'port': port, 'username': 'stub', 'password': 'stub',
+            'use_tls': False, 'use_ssl': False, 'sender_email': 'noreply@example.com', 'sender_name': '作文批改',
+        }
+        email_sender.get_mail_settings = lambda: dict(settings)
+        dispatcher_module.get_mail_settings = lambda: dict(settings)
+        try:
+            start = time.perf_counter()
+            if func is None:
+                sent, failed = per_message(settings, recipients)
+            else:
+                sent, failed = func(recipients, rate)
+            elapsed = time.perf_counter() - start
+            stats = stub_stats(port)
+        finally:
+            process.terminate()
+            process.wait(5)
+        # 统计查询本身占用一个连接
+        print(f"{label}: {elapsed:.2f}s, {messages / elapsed:.0f} 封/秒, 成功 {sent}, 失败 {failed}, "
+              f"连接 {stats['connections'] - 1}, 认证 {stats['auths']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量邮件分发基准测试')
+    parser.add_argument('--messages', type=int, default=2000, help='邮件数量')
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='桩服务每封邮件的处理延迟（毫秒）')
+    parser.add_argument('--rate-451', type=float, default=0.01, help='桩服务RCPT返回451的比例')
+    parser.add_argument('--rate', type=float, default=0, help='分发器限速（封/秒，0表示不限速）')
+    args = parser.parse_args()
+    run(args.messages, args.latency_ms, args.rate_451, args.rate)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
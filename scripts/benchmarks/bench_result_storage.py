@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批改结果存储基准测试
+在合成的作文批改结果数据集上比较旧格式（二次JSON编码、Essay/Correction双份存储）
+与新格式（单次编码 + 超阈值压缩）的存储体积和编解码耗时
+
+用法:
+    python scripts/benchmarks/bench_result_storage.py --count 100000
+    python scripts/benchmarks/bench_result_storage.py --count 100000 --sqlite /tmp/bench_results.db
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import importlib.util
+
+# 直接按文件加载存储模块，避免导入整个Flask应用
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+module_path = os.path.join(project_root, 'app', 'core', 'db', 'json_types.py')
+spec = importlib.util.spec_from_file_location('json_types', module_path)
+json_types = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(json_types)
+
+PHRASES = [
+    '文章结构清晰，层次分明', '语言表达较为流畅', '部分句子存在语病', '论据不够充分',
+    '开头点题，结尾呼应', '建议增加细节描写', '用词准确生动', '注意标点符号的使用',
+    '中心思想明确', '段落之间过渡自然', '可以适当引用名言', '存在错别字，需要仔细检查',
+]
+
+
+def make_result(rng):
+    """生成一条合成的批改结果，体积与真实DeepSeek结果相近"""
+    errors = [
+        {
+            'type': rng.choice(['错别字', '语法错误', '标点错误', '用词不当']),
+            'original': ''.join(rng.choice(PHRASES) for _ in range(2)),
+            'correction': rng.choice(PHRASES),
+            'explanation': ''.join(rng.choice(PHRASES) for _ in range(3)),
+        }
+        for _ in range(rng.randint(3, 25))
+    ]
+    return {
+        'score': rng.randint(20, 50),
+        'feedback': ''.join(rng.choice(PHRASES) for _ in range(rng.randint(5, 30))),
+        'details': {
+            'content_score': rng.randint(5, 10),
+            'language_score': rng.randint(5, 10),
+            'structure_score': rng.randint(5, 10),
+            'writing_score': rng.randint(5, 10),
+        },
+        'error_analysis': {'spelling_errors': errors},
+        'improvement_suggestions': '\n'.join(rng.choice(PHRASES) for _ in range(rng.randint(3, 10))),
+        'content_analysis': ''.join(rng.choice(PHRASES) for _ in range(rng.randint(5, 20))),
+        'language_analysis': ''.join(rng.choice(PHRASES) for _ in range(rng.randint(5, 20))),
+    }
+
+
+def legacy_rows(result):
+    """旧格式：Correction.results 与 Essay.error_analysis 都是 json.dumps 后写入JSON列"""
+    results_text = json.dumps(json.dumps(result, ensure_ascii=False))
+    error_text = json.dumps(json.dumps(result['error_analysis'], ensure_ascii=False))
+    duplicated = json.dumps(json.dumps(result['error_analysis'], ensure_ascii=False))  # correction.error_analysis
+    suggestions = result['improvement_suggestions']
+    return [results_text, error_text, duplicated, suggestions, suggestions, result['feedback'], result['feedback']]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(count, threshold, sqlite_path):
+    rng = random.Random(42)
+    dataset = [make_result(rng) for _ in range(count)]
+
+    legacy_bytes = 0
+    legacy_decode = []
+    for result in dataset:
+        rows = legacy_rows(result)
+        legacy_bytes += sum(len(value.encode('utf-8')) for value in rows)
+        start = time.perf_counter()
+        json.loads(json.loads(rows[0]))
+        legacy_decode.append(time.perf_counter() - start)
+
+    new_bytes = 0
+    compressed = 0
+    encode_times = []
+    decode_times = []
+    payloads = []
+    for result in dataset:
+        start = time.perf_counter()
+        payload = json_types.encode_json_payload(result, threshold=threshold)
+        encode_times.append(time.perf_counter() - start)
+        new_bytes += len(payload) + len(result['feedback'].encode('utf-8'))  # Essay仅保留摘要
+        compressed += payload[:1] == b'\x00'
+        start = time.perf_counter()
+        json_types.decode_json_payload(payload)
+        decode_times.append(time.perf_counter() - start)
+        payloads.append(payload)
+
+    print(f"数据集: {count} 条批改结果, 压缩阈值 {threshold} 字节, "
+          f"压缩算法 {json_types.JSON_COMPRESSION}")
+    print(f"旧格式存储: {legacy_bytes / 1024 / 1024:.1f} MB")
+    print(f"新格式存储: {new_bytes / 1024 / 1024:.1f} MB "
+          f"({new_bytes / legacy_bytes:.1%}), 压缩条数 {compressed}")
+    print(f"旧格式解码 p50/p99: {percentile(legacy_decode, 50) * 1e6:.0f}/{percentile(legacy_decode, 99) * 1e6:.0f} us")
+    print(f"新格式编码 p50/p99: {percentile(encode_times, 50) * 1e6:.0f}/{percentile(encode_times, 99) * 1e6:.0f} us")
+    print(f"新格式解码 p50/p99: {percentile(decode_times, 50) * 1e6:.0f}/{percentile(decode_times, 99) * 1e6:.0f} us")
+
+    if sqlite_path:
+        if os.path.exists(sqlite_path):
+            os.remove(sqlite_path)
+        conn = sqlite3.connect(sqlite_path)
+        conn.execute('CREATE TABLE legacy (id INTEGER PRIMARY KEY, results TEXT)')
+        conn.execute('CREATE TABLE compact (id INTEGER PRIMARY KEY, results BLOB)')
+        conn.executemany('INSERT INTO legacy (results) VALUES (?)',
+                         ((legacy_rows(result)[0],) for result in dataset))
+        conn.executemany('INSERT INTO compact (results) VALUES (?)', ((payload,) for payload in payloads))
+        conn.commit()
+
+        for table, decode in (('legacy', lambda v: json.loads(json.loads(v))),
+                              ('compact', json_types.decode_json_payload)):
+            start = time.perf_counter()
+            for (value,) in conn.execute(f'SELECT results FROM {table}'):
+                decode(value)
+            elapsed = time.perf_counter() - start
+            size = conn.execute(f'SELECT SUM(LENGTH(results)) FROM {table}').fetchone()[0]
+            print(f"SQLite {table}: 列体积 {size / 1024 / 1024:.1f} MB, 全表读取+解码 {elapsed:.2f}s")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批改结果存储基准测试')
+    parser.add_argument('--count', type=int, default=100000, help='合成作文数量')
+    parser.add_argument('--threshold', type=int, default=json_types.DEFAULT_COMPRESS_THRESHOLD,
+                        help='压缩阈值（字节）')
+    parser.add_argument('--sqlite', help='可选：写入SQLite文件并测量全表读取耗时')
+    args = parser.parse_args()
+    run(args.count, args.threshold, args.sqlite)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SQLite备份基准测试
+在合成的大型数据库上比较文件复制（shutil.copy2）与在线备份API（分步复制 + 流式压缩）
+的备份、校验和恢复耗时，并在备份期间持续写入以测量写入方被阻塞的时间
+
+用法:
+    python scripts/benchmarks/bench_sqlite_backup.py --rows 500000 --workdir /tmp/bench_backup
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import threading
+import importlib.util
+
+# 直接按文件加载备份模块，避免导入整个Flask应用
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+module_path = os.path.join(project_root, 'app', 'core', 'db', 'sqlite_backup.py')
+spec = importlib.util.spec_from_file_location('sqlite_backup', module_path)
+sqlite_backup = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(sqlite_backup)
+
+PHRASES = ['文章结构清晰', '语言表达流畅', '存在语病', '论据不够充分', '首尾呼应', '用词准确生动']
+
+
+def build_database(path, rows):
+    """生成合成的作文表"""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE essays (id INTEGER PRIMARY KEY, title TEXT, content TEXT, score REAL)')
+    conn.execute('CREATE INDEX ix_essays_score ON essays (score)')
+    batch = []
+    for i in range(rows):
+        content = ''.join(rng.choice(PHRASES) for _ in range(rng.randint(50, 200)))
+        batch.append((f'作文{i}', content, rng.uniform(20, 50)))
+        if len(batch) >= 10000:
+            conn.executemany('INSERT INTO essays (title, content, score) VALUES (?, ?, ?)', batch)
+            batch = []
+    if batch:
+        conn.executemany('INSERT INTO essays (title, content, score) VALUES (?, ?, ?)', batch)
+    conn.commit()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+
+
+class Writer(threading.Thread):
+    """备份期间持续写入，记录单次写入的最大等待时间"""
+
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.stop_event = threading.Event()
+        self.latencies = []
+
+    def run(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            conn.execute('UPDATE essays SET score = score + 0.01 WHERE id = ?', (random.randint(1, 1000),))
+            conn.commit()
+            self.latencies.append(time.perf_counter() - start)
+            time.sleep(0.002)
+        conn.close()
+
+
+def timed(label, func, db_path=None):
+    writer = None
+    if db_path:
+        writer = Writer(db_path)
+        writer.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    line = f"{label}: {elapsed:.2f}s"
+    if writer:
+        writer.stop_event.set()
+        writer.join()
+        if writer.latencies:
+            line += f", 写入 {len(writer.latencies)} 次, 最大写入等待 {max(writer.latencies) * 1000:.1f} ms"
+    print(line)
+    return result
+
+
+def run(rows, workdir, step_pages):
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, 'source.db')
+    print(f"生成 {rows} 行合成数据...")
+    build_database(db_path, rows)
+    print(f"源数据库大小: {os.path.getsize(db_path) / 1024 / 1024:.1f} MB")
+
+    copy_path = os.path.join(workdir, 'copy.db')
+    timed('shutil.copy2', lambda: shutil.copy2(db_path, copy_path), db_path)
+    timed('copy + integrity_check', lambda: sqlite_backup.check_integrity(copy_path))
+
+    plain_path = os.path.join(workdir, 'online.db')
+    timed(f'在线备份（未压缩, {step_pages}页/步）',
+          lambda: sqlite_backup.online_backup(db_path, plain_path, compress=False, step_pages=step_pages),
+          db_path)
+
+    gz_path = os.path.join(workdir, 'online.db.gz')
+    stats = timed(f'在线备份（gzip, {step_pages}页/步）',
+                  lambda: sqlite_backup.online_backup(db_path, gz_path, step_pages=step_pages),
+                  db_path)
+    print(f"压缩备份大小: {stats['backup_size'] / 1024 / 1024:.1f} MB "
+          f"({stats['backup_size'] / stats['source_size']:.1%})")
+
+    timed('verify_backup(gzip, integrity_check)', lambda: sqlite_backup.verify_backup(gz_path))
+    timed('verify_backup(gzip, quick_check)', lambda: sqlite_backup.verify_backup(gz_path, quick=True))
+
+    restore_path = os.path.join(workdir, 'restored.db')
+    shutil.copy2(db_path, restore_path)
+    timed('online_restore(gzip)',
+          lambda: sqlite_backup.online_restore(gz_path, restore_path, step_pages=step_pages))
+
+    for path in (copy_path, plain_path, gz_path, restore_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite备份基准测试')
+    parser.add_argument('--rows', type=int, default=500000, help='合成作文数量')
+    parser.add_argument('--workdir', default='/tmp/bench_sqlite_backup', help='工作目录')
+    parser.add_argument('--step-pages', type=int, default=sqlite_backup.DEFAULT_STEP_PAGES,
+                        help='在线备份每步页数')
+    args = parser.parse_args()
+    run(args.rows, args.workdir, args.step_pages)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+会员用量预测基准测试
+在合成的会员/作文数据库上比较：
+  - 单次接口延迟：原实现（读取会员、计划和30天内全部作文 .all() 后循环计算）、
+    即时向量化计算（一次分组聚合）、读取夜间预先计算的结果
+  - 夜间批量吞吐：逐会员执行原实现 与 UsageModel.run_nightly 分批向量化计算并写入
+
+用法:
+    python scripts/benchmarks/bench_usage_prediction.py --members 20000 --essays-per-day 1.5 --workdir /tmp/bench_usage
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+os.environ.setdefault('SECRET_KEY', 'bench')
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import scoped_session, sessionmaker  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.models.db import db  # noqa: E402
+from app.models.essay import Essay  # noqa: E402
+from app.models.membership import Membership, MembershipPlan  # noqa: E402
+from app.core.analytics.usage_model import UsageModel  # noqa: E402
+
+PLANS = [('basic', '基础会员', 100), ('premium', '高级会员', 500), ('unlimited', '无限会员', 0)]
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def build_database(path, members, essays_per_day, now):
+    """生成合成的用户、会员和最近45天的作文（直接用sqlite3批量写入）"""
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+    stamp = now.strftime(DATE_FORMAT)
+    conn.executemany(
+        'INSERT INTO membership_plans (id, name, code, price, duration_days, max_essays_total, '
+        'created_at, updated_at, is_deleted) VALUES (?, ?, ?, 10, 30, ?, ?, ?, 0)',
+        [(index + 1, name, code, limit, stamp, stamp) for index, (code, name, limit) in enumerate(PLANS)])
+
+    users, memberships, essays = [], [], []
+
+    def flush():
+        conn.executemany('INSERT INTO users (id, username, email, password_hash, created_at, updated_at, is_deleted) '
+                         'VALUES (?, ?, ?, ?, ?, ?, 0)', users)
+        conn.executemany('INSERT INTO memberships (user_id, plan_id, start_date, end_date, is_active, '
+                         'essays_used_total, created_at, updated_at, is_deleted) VALUES (?, ?, ?, ?, 1, ?, ?, ?, 0)',
+                         memberships)
+        conn.executemany('INSERT INTO essays (user_id, title, content, version, source_type, created_at) '
+                         "VALUES (?, 't', 'x', 0, 'text', ?)", essays)
+        users.clear()
+        memberships.clear()
+        essays.clear()
+
+    for user_id in range(1, members + 1):
+        start = now - timedelta(days=rng.uniform(0, 25))
+        end = start + timedelta(days=rng.choice((30, 90, 365)))
+        user_s = start.strftime(DATE_FORMAT)
+        users.append((user_id, f'user{user_id}', f'user{user_id}@example.com', 'x', user_s, user_s))
+        rate = rng.expovariate(1 / essays_per_day)
+        count = int(rate * 45)
+        memberships.append((user_id, rng.randint(1, len(PLANS)), user_s, end.strftime(DATE_FORMAT),
+                            count // 2, user_s, user_s))
+        for _ in range(count):
+            created = now - timedelta(days=rng.uniform(0, 45))
+            essays.append((user_id, created.strftime(DATE_FORMAT)))
+        if len(users) >= 20000:
+            flush()
+    flush()
+    conn.commit()
+    conn.execute('ANALYZE')
+    total = conn.execute('SELECT COUNT(*) FROM essays').fetchone()[0]
+    conn.close()
+    return total
+
+
+def legacy_prediction(user_id, now):
+    """原实现的查询形态：会员、计划各一次查询，30天内的作文整行读取后循环计算"""
+    membership = Membership.query.filter_by(user_id=user_id).first()
+    plan = db.session.get(MembershipPlan, membership.plan_id)
+    days_remaining = (membership.end_date.date() - now.date()).days
+    essays = Essay.query.filter(
+        Essay.user_id == user_id,
+        Essay.created_at >= now - timedelta(days=30)
+    ).order_by(Essay.created_at).all()
+    daily = Counter(essay.created_at.date() for essay in essays)
+    daily_avg_usage = sum(daily.values()) / 30
+    predicted_total_usage = int(daily_avg_usage * days_remaining)
+    remaining_quota = plan.max_essays_total - membership.essays_used_total if plan.max_essays_total > 0 else None
+    return {
+        'daily_average_usage': daily_avg_usage,
+        'predicted_total_usage': predicted_total_usage,
+        'will_exceed_limit': remaining_quota is not None and predicted_total_usage > remaining_quota,
+    }
+
+
+def per_call(label, func, user_ids):
+    start = time.perf_counter()
+    for user_id in user_ids:
+        func(user_id)
+    elapsed = time.perf_counter() - start
+    print(f"{label}: 平均 {elapsed / len(user_ids) * 1000:.2f}ms/次（{len(user_ids)} 次）")
+    return elapsed
+
+
+def run(members, essays_per_day, workdir, calls, legacy_members):
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, 'usage.db')
+    now = datetime.utcnow()
+    print(f"生成 {members} 个会员的合成数据...")
+    start = time.perf_counter()
+    essays = build_database(path, members, essays_per_day, now)
+    print(f"生成数据: {time.perf_counter() - start:.2f}s（{essays} 篇作文）")
+
+    app = create_app()
+    engine = create_engine(f'sqlite:///{path}')
+    with app.app_context():
+        # 模型使用 db.session，这里绑定到合成数据库
+        db.session = scoped_session(sessionmaker(bind=engine))
+        Membership.query = db.session.query_property()
+        Essay.query = db.session.query_property()
+        model = UsageModel()
+        rng = random.Random(7)
+        sample = [rng.randint(1, members) for _ in range(calls)]
+
+        per_call('单次接口（原实现，作文整行读取后循环）', lambda user_id: legacy_prediction(user_id, now), sample)
+        model.max_age_hours = 0
+        per_call('单次接口（即时向量化计算）', lambda user_id: model.get_prediction(user_id, now), sample)
+
+        legacy_sample = list(range(1, min(legacy_members, members) + 1))
+        elapsed = per_call('夜间批量（原实现逐会员）', lambda user_id: legacy_prediction(user_id, now), legacy_sample)
+        print(f"  吞吐 {len(legacy_sample) / elapsed:.0f} 个会员/秒")
+        result = model.run_nightly(now)
+        print(f"夜间批量（分批向量化并写入）: {result['seconds']:.2f}s，"
+              f"{result['members']} 个会员，{result['batches']} 批，"
+              f"吞吐 {result['members'] / max(result['seconds'], 1e-6):.0f} 个会员/秒")
+
+        model.max_age_hours = 36
+        per_call('单次接口（读取预先计算结果）', lambda user_id: model.get_prediction(user_id, now), sample)
+        db.session.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='会员用量预测基准测试')
+    parser.add_argument('--members', type=int, default=20000, help='合成会员数量')
+    parser.add_argument('--essays-per-day', type=float, default=1.5, help='每个会员平均每天提交的作文数')
+    parser.add_argument('--calls', type=int, default=500, help='单次接口测量的调用次数')
+    parser.add_argument('--legacy-members', type=int, default=5000, help='原实现逐会员批量测量的会员数')
+    parser.add_argument('--workdir', default='/tmp/bench_usage', help='工作目录')
+    args = parser.parse_args()
+    run(args.members, args.essays_per_day, args.workdir, args.calls, args.legacy_members)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,409 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批改链路压测驱动
+通过 POST /api/v1/essays（JSON正文）和 POST /api/v1/essays/file（txt/png上传，png走OCR）提交作文，
+轮询 GET /api/v1/essays/<id> 直到批改完成，统计吞吐量、端到端延迟的p50/p95/p99和各阶段耗时：
+    提交      提交请求的HTTP往返（含文件识别、写库和任务入队）
+    排队      提交返回到首次观察到 processing/correcting
+    批改      首次观察到处理中到观察到 completed
+    端到端    开始提交到观察到 completed
+    服务端    作文记录 updated_at - created_at
+LLM/OCR接口自身的延迟和429/超时次数取自桩服务的 /stats（见 stub_llm_server.py），
+服务端各阶段（上传、提取、排队等待、加锁、状态转换、LLM调用、解析、映射、写库）的耗时
+取自 GET /api/monitoring/essays/<id>/timeline
+
+用法:
+    # 启动桩服务并以桩服务环境变量启动2个Celery worker，Flask需以相同环境变量单独启动
+    python scripts/benchmarks/load_correction.py --start-stub --latency lognormal:2.5,0.4 --rate-429 0.02 \\
+        --workers 2 --worker-concurrency 8 --essays 200 --concurrency 20 --username loadtest --password secret
+
+    # 使用已运行的桩服务和worker，JWT令牌认证，结果写入JSON
+    python scripts/benchmarks/load_correction.py --stub-url http://127.0.0.1:8900 --token <JWT> \\
+        --essays 100 --file-ratio 0.3 --image-ratio 0.5 --output load_report.json
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import struct
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_llm_server import StubConfig, start_stub_in_thread, stub_env, summarize  # noqa: E402
+
+PROCESSING_STATUSES = ('processing', 'correcting')
+FINAL_STATUSES = ('completed', 'failed')
+STAGES = [('submit', '提交'), ('queue', '排队'), ('correction', '批改'),
+          ('end_to_end', '端到端'), ('server', '服务端')]
+
+_SENTENCES = [
+    "清晨的阳光洒在操场上，同学们在跑道上奔跑。",
+    "老师的一句鼓励，让我重新找回了学习的信心。",
+    "奶奶的手布满皱纹，却总能做出最香的饭菜。",
+    "那次失败让我明白，坚持比天赋更重要。",
+    "窗外的雨淅淅沥沥地下着，我静静地读着一本旧书。",
+    "我们在社区里做志愿者，帮助老人整理花园。",
+    "放学路上，夕阳把我们的影子拉得很长很长。",
+    "科技改变了生活，也让我们更加珍惜面对面的交流。",
+]
+
+
+def make_essay(rng: random.Random, min_chars: int, max_chars: int) -> str:
+    """按句子池拼出一篇长度在范围内的作文"""
+    target = rng.randint(min_chars, max_chars)
+    parts = []
+    length = 0
+    while length < target:
+        sentence = rng.choice(_SENTENCES)
+        parts.append(sentence)
+        length += len(sentence)
+        if rng.random() < 0.2:
+            parts.append('\n')
+    return ''.join(parts)
+
+
+def make_png(width: int = 32, height: int = 32) -> bytes:
+    """生成一张白色PNG，内容由OCR桩返回，这里只需要合法的图片文件"""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    raw = b''.join(b'\x00' + b'\xff' * (width * 3) for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+class LoadDriver:
+    """提交作文并轮询结果，记录每篇作文各阶段的时间点"""
+
+    def __init__(self, app_url: str, token: Optional[str] = None, username: Optional[str] = None,
+                 password: Optional[str] = None, poll_interval: float = 0.5, timeout: float = 600.0):
+        self.app_url = app_url.rstrip('/')
+        self.token = token
+        self.username = username
+        self.password = password
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        """每个线程一个会话（连接复用，会话认证时各自登录）"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            if self.token:
+                session.headers['Authorization'] = f"Bearer {self.token}"
+            elif self.username:
+                response = session.post(f"{self.app_url}/api/v1/auth/login",
+                                        json={'username': self.username, 'password': self.password}, timeout=30)
+                if response.status_code != 200:
+                    raise RuntimeError(f"登录失败: HTTP {response.status_code} {response.text[:200]}")
+            self._local.session = session
+        return session
+
+    def submit(self, job: Dict[str, Any]) -> requests.Response:
+        session = self._session()
+        if job['kind'] == 'json':
+            return session.post(f"{self.app_url}/api/v1/essays", timeout=120,
+                                json={'title': job['title'], 'content': job['content'], 'grade': job['grade']})
+        if job['kind'] == 'image':
+            files = {'file': (f"{job['title']}.png", job['content'], 'image/png')}
+        else:
+            files = {'file': (f"{job['title']}.txt", job['content'].encode('utf-8'), 'text/plain')}
+        return session.post(f"{self.app_url}/api/v1/essays/file", timeout=120,
+                            data={'title': job['title'], 'grade': job['grade']}, files=files)
+
+    def run_one(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        提交一篇作文并等待批改结束
+
+        Returns:
+            Dict: kind、status 以及 submitted/accepted/processing/finished 等时间点（perf_counter秒）
+        """
+        record = {'kind': job['kind'], 'status': 'submit_failed', 'submitted': time.perf_counter()}
+        try:
+            response = self.submit(job)
+        except requests.RequestException as e:
+            record['error'] = str(e)
+            return record
+        record['accepted'] = time.perf_counter()
+        body = response.json() if response.headers.get('Content-Type', '').startswith('application/json') else {}
+        essay_id = body.get('essay_id') or (body.get('data') or {}).get('essay_id')
+        if response.status_code not in (200, 201) or not essay_id:
+            record['error'] = f"HTTP {response.status_code}: {str(body.get('message') or response.text)[:200]}"
+            return record
+
+        record['essay_id'] = essay_id
+        record['status'] = 'timeout'
+        session = self._session()
+        deadline = record['accepted'] + self.timeout
+        while time.perf_counter() < deadline:
+            time.sleep(self.poll_interval)
+            try:
+                poll = session.get(f"{self.app_url}/api/v1/essays/{essay_id}", timeout=30)
+                essay = poll.json() if poll.status_code == 200 else {}
+            except (requests.RequestException, ValueError):
+                continue
+            status = essay.get('status')
+            now = time.perf_counter()
+            if status in PROCESSING_STATUSES and 'processing' not in record:
+                record['processing'] = now
+            if status in FINAL_STATUSES:
+                record['status'] = status
+                record['finished'] = now
+                record.setdefault('processing', now)
+                created, updated = _parse_time(essay.get('created_at')), _parse_time(essay.get('updated_at'))
+                if created and updated:
+                    record['server_seconds'] = (updated - created).total_seconds()
+                if status == 'failed':
+                    record['error'] = essay.get('error_message')
+                record['server_stages'] = self.fetch_timeline(session, essay_id)
+                break
+        return record
+
+    def fetch_timeline(self, session: requests.Session, essay_id: int) -> Dict[str, float]:
+        """读取作文的服务端阶段时间线，返回 阶段 -> 累计毫秒"""
+        try:
+            response = session.get(f"{self.app_url}/api/monitoring/essays/{essay_id}/timeline", timeout=30)
+            if response.status_code == 200:
+                return (response.json().get('data') or {}).get('stages') or {}
+        except (requests.RequestException, ValueError):
+            pass
+        return {}
+
+
+def build_jobs(count: int, file_ratio: float, image_ratio: float, min_chars: int, max_chars: int,
+               seed: int) -> List[Dict[str, Any]]:
+    """按比例生成JSON提交、txt上传和png上传的作文任务"""
+    rng = random.Random(seed)
+    png = make_png()
+    grades = ['primary', 'junior', 'senior']
+    jobs = []
+    for index in range(count):
+        job = {'title': f"压测作文{index + 1}", 'grade': rng.choice(grades)}
+        if rng.random() < file_ratio:
+            if rng.random() < image_ratio:
+                job.update(kind='image', content=png)
+            else:
+                job.update(kind='txt', content=make_essay(rng, min_chars, max_chars))
+        else:
+            job.update(kind='json', content=make_essay(rng, min_chars, max_chars))
+        jobs.append(job)
+    return jobs
+
+
+def stage_durations(records: List[Dict[str, Any]]) -> Dict[str, List[float]]:
+    """从时间点计算各阶段耗时（只统计批改完成的作文，提交阶段统计所有被接受的提交）"""
+    stages = {name: [] for name, _ in STAGES}
+    for record in records:
+        if 'accepted' in record:
+            stages['submit'].append(record['accepted'] - record['submitted'])
+        if record['status'] != 'completed':
+            continue
+        stages['queue'].append(record['processing'] - record['accepted'])
+        stages['correction'].append(record['finished'] - record['processing'])
+        stages['end_to_end'].append(record['finished'] - record['submitted'])
+        if 'server_seconds' in record:
+            stages['server'].append(record['server_seconds'])
+    return stages
+
+
+def build_report(records: List[Dict[str, Any]], wall_seconds: float,
+                 stub_stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """汇总压测结果"""
+    statuses: Dict[str, int] = {}
+    kinds: Dict[str, int] = {}
+    for record in records:
+        statuses[record['status']] = statuses.get(record['status'], 0) + 1
+        kinds[record['kind']] = kinds.get(record['kind'], 0) + 1
+    completed = statuses.get('completed', 0)
+    errors = [record['error'] for record in records if record.get('error')]
+    server_stages: Dict[str, List[float]] = {}
+    for record in records:
+        if record['status'] != 'completed':
+            continue
+        for stage, milliseconds in (record.get('server_stages') or {}).items():
+            server_stages.setdefault(stage, []).append(milliseconds / 1000)
+    return {
+        'essays': len(records),
+        'kinds': kinds,
+        'statuses': statuses,
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_per_minute': round(completed / wall_seconds * 60, 2) if wall_seconds > 0 else 0.0,
+        'stages': {name: summarize(values) for name, values in stage_durations(records).items()},
+        'server_stages': {stage: summarize(values) for stage, values in sorted(server_stages.items())},
+        'stub': stub_stats,
+        'sample_errors': errors[:5],
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n作文: {report['essays']} 篇 {report['kinds']}  结果: {report['statuses']}")
+    print(f"耗时: {report['wall_seconds']:.1f} 秒, 吞吐量: {report['throughput_per_minute']:.1f} 篇/分钟")
+    print(f"{'阶段':<8}{'次数':>6}{'均值':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'最大':>9}  (秒)")
+    for name, label in STAGES:
+        stats = report['stages'][name]
+        if not stats['count']:
+            print(f"{label:<8}{0:>6}")
+            continue
+        print(f"{label:<8}{stats['count']:>6}{stats['mean']:>9.2f}{stats['p50']:>9.2f}"
+              f"{stats['p95']:>9.2f}{stats['p99']:>9.2f}{stats['max']:>9.2f}")
+    if report['server_stages']:
+        print("服务端阶段（链路时间线）:")
+        for stage, stats in report['server_stages'].items():
+            print(f"  {stage:<20}{stats['count']:>6}{stats['mean']:>9.3f}{stats['p50']:>9.3f}"
+                  f"{stats['p95']:>9.3f}{stats['p99']:>9.3f}{stats['max']:>9.3f}")
+    for route, data in ((report.get('stub') or {}).get('routes') or {}).items():
+        latency = data['latency']
+        line = f"桩服务 {route:<16}{data['outcomes']}"
+        if latency['count']:
+            line += f"  p50 {latency['p50']:.2f}s p95 {latency['p95']:.2f}s p99 {latency['p99']:.2f}s"
+        print(line)
+    for error in report['sample_errors']:
+        print(f"错误示例: {error}")
+
+
+def start_workers(count: int, concurrency: int, pool: str, env: Dict[str, str]) -> List[subprocess.Popen]:
+    """以桩服务环境变量启动Celery批改worker"""
+    workers = []
+    worker_env = dict(os.environ, **env)
+    for index in range(count):
+        command = [sys.executable, '-m', 'celery', '-A', 'app.tasks.celery_app:celery_app', 'worker',
+                   '-Q', 'correction', '-c', str(concurrency), '-P', pool,
+                   '-n', f"loadtest{index + 1}@%h", '--loglevel=WARNING']
+        workers.append(subprocess.Popen(command, cwd=project_root, env=worker_env))
+    return workers
+
+
+def stop_workers(workers: List[subprocess.Popen]) -> None:
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        try:
+            worker.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+
+
+def fetch_stub_stats(stub_url: Optional[str], reset: bool = False) -> Optional[Dict[str, Any]]:
+    if not stub_url:
+        return None
+    try:
+        if reset:
+            requests.post(f"{stub_url}/stats/reset", timeout=5)
+            return None
+        return requests.get(f"{stub_url}/stats", timeout=5).json()
+    except requests.RequestException as e:
+        print(f"无法访问桩服务统计: {e}")
+        return None
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='批改链路压测驱动')
+    arg_parser.add_argument('--app-url', default='http://127.0.0.1:5000')
+    arg_parser.add_argument('--token', default=os.environ.get('LOAD_TEST_TOKEN'), help='JWT令牌')
+    arg_parser.add_argument('--username', help='会话登录用户名（未提供令牌时使用）')
+    arg_parser.add_argument('--password')
+    arg_parser.add_argument('--essays', type=int, default=50)
+    arg_parser.add_argument('--concurrency', type=int, default=10, help='同时在途的作文数')
+    arg_parser.add_argument('--rate', type=float, default=0.0, help='每秒提交篇数，0表示尽快提交')
+    arg_parser.add_argument('--file-ratio', type=float, default=0.3, help='通过文件上传提交的比例')
+    arg_parser.add_argument('--image-ratio', type=float, default=0.3, help='文件上传中png图片（走OCR）的比例')
+    arg_parser.add_argument('--min-chars', type=int, default=400)
+    arg_parser.add_argument('--max-chars', type=int, default=1200)
+    arg_parser.add_argument('--poll-interval', type=float, default=0.5)
+    arg_parser.add_argument('--timeout', type=float, default=600.0, help='单篇作文等待批改的最长秒数')
+    arg_parser.add_argument('--seed', type=int, default=42)
+    arg_parser.add_argument('--stub-url', help='已运行的桩服务地址，用于读取 /stats')
+    arg_parser.add_argument('--start-stub', action='store_true', help='在本进程内启动桩服务')
+    arg_parser.add_argument('--stub-port', type=int, default=8900)
+    arg_parser.add_argument('--latency', default='lognormal:2.5,0.4')
+    arg_parser.add_argument('--ocr-latency', default='uniform:0.5,1.5')
+    arg_parser.add_argument('--rate-429', type=float, default=0.0)
+    arg_parser.add_argument('--rate-timeout', type=float, default=0.0)
+    arg_parser.add_argument('--workers', type=int, default=0, help='启动的Celery worker进程数，0表示使用已有worker')
+    arg_parser.add_argument('--worker-concurrency', type=int, default=4)
+    arg_parser.add_argument('--worker-pool', default='threads', help='worker池类型：threads/prefork/eventlet')
+    arg_parser.add_argument('--worker-warmup', type=float, default=10.0, help='启动worker后等待的秒数')
+    arg_parser.add_argument('--output', help='结果JSON文件')
+    args = arg_parser.parse_args()
+
+    if not args.token and not args.username:
+        arg_parser.error('需要提供 --token（或 LOAD_TEST_TOKEN）或 --username/--password')
+
+    stub_server = None
+    stub_url = args.stub_url.rstrip('/') if args.stub_url else None
+    if args.start_stub:
+        stub_server = start_stub_in_thread(port=args.stub_port, config=StubConfig(
+            chat_latency=args.latency, ocr_latency=args.ocr_latency,
+            rate_429=args.rate_429, rate_timeout=args.rate_timeout, seed=args.seed))
+        stub_url = f"http://127.0.0.1:{stub_server.server_address[1]}"
+        print(f"桩服务已启动: {stub_url}")
+    if stub_url:
+        print("Flask需以如下环境变量启动，图片上传的OCR才会走桩服务:")
+        print('    ' + ' '.join(f"{key}={value}" for key, value in stub_env(stub_url).items()))
+
+    workers = []
+    if args.workers:
+        if not stub_url:
+            arg_parser.error('--workers 需要配合 --start-stub 或 --stub-url 使用')
+        workers = start_workers(args.workers, args.worker_concurrency, args.worker_pool, stub_env(stub_url))
+        print(f"已启动 {args.workers} 个Celery worker（并发 {args.worker_concurrency}，池 {args.worker_pool}），"
+              f"等待 {args.worker_warmup:.0f} 秒")
+        time.sleep(args.worker_warmup)
+
+    driver = LoadDriver(args.app_url, token=args.token, username=args.username, password=args.password,
+                        poll_interval=args.poll_interval, timeout=args.timeout)
+    jobs = build_jobs(args.essays, args.file_ratio, args.image_ratio, args.min_chars, args.max_chars, args.seed)
+    fetch_stub_stats(stub_url, reset=True)
+
+    def paced(index_job):
+        index, job = index_job
+        if args.rate > 0:
+            delay = start + index / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return driver.run_one(job)
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            records = list(pool.map(paced, enumerate(jobs)))
+        wall_seconds = time.perf_counter() - start
+        report = build_report(records, wall_seconds, fetch_stub_stats(stub_url))
+    finally:
+        stop_workers(workers)
+        if stub_server:
+            stub_server.shutdown()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
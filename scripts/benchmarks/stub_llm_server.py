@@ -0,0 +1,456 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批改链路压测用的本地LLM/OCR桩服务
+提供OpenAI兼容的 /v1/chat/completions（DeepSeek等客户端）、DashScope文本生成接口（阿里云千问客户端）
+和千问视觉OCR接口，返回预置的中文批改JSON/识别文本；延迟按可配置的分布采样，
+并按比例注入429限流和超时（挂起请求直到客户端超时），/stats 返回各接口的调用次数与延迟分位数
+
+用法:
+    python scripts/benchmarks/stub_llm_server.py --port 8900 --latency lognormal:2.5,0.4 \\
+        --ocr-latency uniform:0.5,1.5 --rate-429 0.02 --rate-timeout 0.005
+
+    Flask和Celery worker使用以下环境变量指向桩服务:
+    AI_PROVIDER=deepseek DEEPSEEK_API_KEY=stub DEEPSEEK_BASE_URL=http://127.0.0.1:8900/v1
+    QWEN_API_KEY=stub QWEN_API_URL=http://127.0.0.1:8900/api/v1/services/aigc/multimodal-generation/generation
+
+延迟分布写法:
+    fixed:2.0            固定2秒
+    uniform:1,3          1~3秒均匀分布
+    lognormal:2.5,0.4    中位数2.5秒、sigma为0.4的对数正态分布（贴近真实LLM的长尾）
+    exp:2.0              均值2秒的指数分布
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# 预置的批改结果，字段与批改提示词要求的输出一致
+CANNED_CORRECTIONS = [
+    {
+        "总得分": 43,
+        "分项得分": {"内容主旨": 17, "语言文采": 13, "文章结构": 9, "文面书写": 4},
+        "总体评价": "文章立意明确，围绕中心选材，结构完整，语言较为流畅。",
+        "内容分析": "选材贴近生活，细节描写较为具体，情感真挚。",
+        "语言分析": "用词准确，句式有变化，个别句子略显口语化。",
+        "结构分析": "开头点题，中间层次清楚，结尾照应开头。",
+        "写作建议": "可以增加环境描写烘托情感；注意段落之间的过渡。",
+        "错别字": ["再接再励->再接再厉"],
+    },
+    {
+        "总得分": 36,
+        "分项得分": {"内容主旨": 14, "语言文采": 11, "文章结构": 7, "文面书写": 4},
+        "总体评价": "内容基本切题，但中心不够突出，部分段落展开不足。",
+        "内容分析": "材料较为单薄，缺少典型事例支撑观点。",
+        "语言分析": "语言通顺，修辞运用较少，表达偏平淡。",
+        "结构分析": "段落划分基本合理，结尾略显仓促。",
+        "写作建议": "围绕中心补充一个具体事例；结尾可以升华主题。",
+        "错别字": ["即使->既使", "部署->布署"],
+    },
+    {
+        "总得分": 47,
+        "分项得分": {"内容主旨": 19, "语言文采": 14, "文章结构": 10, "文面书写": 4},
+        "总体评价": "构思新颖，情感饱满，语言富有表现力，是一篇佳作。",
+        "内容分析": "以小见大，选材独特，思考有深度。",
+        "语言分析": "善用比喻和排比，语言生动。",
+        "结构分析": "线索清晰，首尾呼应，详略得当。",
+        "写作建议": "个别长句可以拆分，使节奏更明快。",
+        "错别字": [],
+    },
+]
+
+# OCR接口返回的识别文本
+CANNED_OCR_TEXT = (
+    "春天的校园\n"
+    "清晨，我走进校园，一阵花香扑面而来。操场边的柳树抽出了嫩绿的新芽，"
+    "像一位温柔的姑娘梳理着长发。教学楼前的玉兰花开得正盛，洁白的花瓣在阳光下闪闪发光。"
+    "同学们三五成群地在花坛边读书，琅琅的书声和鸟儿的歌声交织在一起。"
+    "我爱春天的校园，它让我感受到了生命的美好和成长的喜悦。"
+)
+
+
+class LatencyModel:
+    """按分布采样的接口延迟（秒）"""
+
+    def __init__(self, kind: str, params: List[float]):
+        self.kind = kind
+        self.params = params
+
+    def sample(self, rng: random.Random) -> float:
+        """采样一次延迟"""
+        if self.kind == 'fixed':
+            return self.params[0]
+        if self.kind == 'uniform':
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == 'lognormal':
+            median, sigma = self.params
+            return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        if self.kind == 'exp':
+            return rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+        return 0.0
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{','.join(str(p) for p in self.params)}"
+
+
+_LATENCY_ARITY = {'fixed': 1, 'uniform': 2, 'lognormal': 2, 'exp': 1}
+
+
+def parse_latency(spec: str) -> LatencyModel:
+    """
+    解析延迟分布配置
+
+    Args:
+        spec: 如 "fixed:2"、"uniform:1,3"、"lognormal:2.5,0.4"、"exp:2"，纯数字视为固定延迟
+
+    Returns:
+        LatencyModel: 延迟模型
+
+    Raises:
+        ValueError: 配置格式错误
+    """
+    spec = (spec or '0').strip()
+    if ':' not in spec:
+        return LatencyModel('fixed', [float(spec)])
+    kind, _, raw = spec.partition(':')
+    kind = kind.strip().lower()
+    if kind not in _LATENCY_ARITY:
+        raise ValueError(f"不支持的延迟分布: {kind}")
+    params = [float(part) for part in raw.split(',') if part.strip()]
+    if len(params) != _LATENCY_ARITY[kind] or any(p < 0 for p in params):
+        raise ValueError(f"延迟分布参数错误: {spec}")
+    return LatencyModel(kind, params)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """线性插值分位数，q取0~100，空列表返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    """汇总一组耗时（秒）：次数、均值和p50/p95/p99"""
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 4),
+        'p50': round(percentile(values, 50), 4),
+        'p95': round(percentile(values, 95), 4),
+        'p99': round(percentile(values, 99), 4),
+        'max': round(max(values), 4),
+    }
+
+
+class StubConfig:
+    """桩服务配置：各接口的延迟分布、故障注入比例和预置结果"""
+
+    def __init__(self, chat_latency: str = 'lognormal:2.5,0.4', ocr_latency: str = 'uniform:0.5,1.5',
+                 rate_429: float = 0.0, rate_timeout: float = 0.0, hang_seconds: float = 150.0,
+                 retry_after: int = 1, fenced_ratio: float = 0.3, seed: Optional[int] = None,
+                 corrections: Optional[List[Dict[str, Any]]] = None, ocr_text: str = CANNED_OCR_TEXT):
+        self.chat_latency = parse_latency(chat_latency)
+        self.ocr_latency = parse_latency(ocr_latency)
+        if rate_429 < 0 or rate_timeout < 0 or rate_429 + rate_timeout > 1:
+            raise ValueError("故障注入比例之和必须在0~1之间")
+        self.rate_429 = rate_429
+        self.rate_timeout = rate_timeout
+        self.hang_seconds = hang_seconds
+        self.retry_after = retry_after
+        self.fenced_ratio = fenced_ratio
+        self.corrections = corrections or CANNED_CORRECTIONS
+        self.ocr_text = ocr_text
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def plan(self, route: str) -> Dict[str, Any]:
+        """
+        为一次请求确定结果和延迟
+
+        Returns:
+            Dict: outcome 为 ok/429/timeout，delay 为响应前等待的秒数，
+            ok 时附带预置结果的下标和是否包在markdown代码块中
+        """
+        with self._lock:
+            roll = self._rng.random()
+            latency = self.ocr_latency if route == 'ocr' else self.chat_latency
+            if roll < self.rate_429:
+                return {'outcome': '429', 'delay': min(latency.sample(self._rng), 0.2)}
+            if roll < self.rate_429 + self.rate_timeout:
+                return {'outcome': 'timeout', 'delay': self.hang_seconds}
+            return {
+                'outcome': 'ok',
+                'delay': latency.sample(self._rng),
+                'index': self._rng.randrange(len(self.corrections)),
+                'fenced': self._rng.random() < self.fenced_ratio,
+            }
+
+
+class StubStats:
+    """线程安全的调用统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._started = time.time()
+            self._latencies: Dict[str, List[float]] = {}
+            self._outcomes: Dict[str, Dict[str, int]] = {}
+
+    def record(self, route: str, outcome: str, seconds: float) -> None:
+        with self._lock:
+            outcomes = self._outcomes.setdefault(route, {})
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            if outcome == 'ok':
+                self._latencies.setdefault(route, []).append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {}
+            for route, outcomes in self._outcomes.items():
+                routes[route] = {'outcomes': dict(outcomes),
+                                 'latency': summarize(self._latencies.get(route, []))}
+            return {'uptime': round(time.time() - self._started, 3), 'routes': routes}
+
+
+def _route_for(path: str) -> Optional[str]:
+    path = path.split('?', 1)[0].rstrip('/')
+    if path.endswith('/chat/completions'):
+        return 'chat'
+    if 'multimodal-generation' in path or '/vision/' in path:
+        return 'ocr'
+    if path.endswith('/text-generation/generation'):
+        return 'text_generation'
+    return None
+
+
+def _estimate_tokens(payload: Dict[str, Any]) -> int:
+    messages = payload.get('messages') or payload.get('input', {}).get('messages') or []
+    chars = 0
+    for message in messages:
+        content = message.get('content', '') if isinstance(message, dict) else ''
+        chars += len(content) if isinstance(content, str) else len(json.dumps(content, ensure_ascii=False))
+    return max(1, chars // 2)
+
+
+def build_chat_response(payload: Dict[str, Any], content: str) -> Dict[str, Any]:
+    """OpenAI兼容的 chat.completion 响应"""
+    prompt_tokens = _estimate_tokens(payload)
+    completion_tokens = max(1, len(content) // 2)
+    return {
+        'id': f"chatcmpl-stub-{int(time.time() * 1000)}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': payload.get('model', 'deepseek-chat'),
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                  'total_tokens': prompt_tokens + completion_tokens},
+    }
+
+
+def build_dashscope_response(payload: Dict[str, Any], content: str) -> Dict[str, Any]:
+    """DashScope格式响应，同时带 output.text 和 output.choices，兼容文本生成与视觉识别两种解析方式"""
+    input_tokens = _estimate_tokens(payload)
+    return {
+        'request_id': f"stub-{int(time.time() * 1000)}",
+        'output': {
+            'text': content,
+            'finish_reason': 'stop',
+            'choices': [{'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+        },
+        'usage': {'input_tokens': input_tokens, 'output_tokens': max(1, len(content) // 2)},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """桩服务请求处理器，配置与统计挂在 server 上"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):  # noqa: A002 - 覆盖基类签名
+        if self.server.verbose:
+            sys.stderr.write("%s - %s\n" % (self.address_string(), format % args))
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path == '/stats':
+            self._send_json(200, self.server.stats.snapshot())
+        elif path in ('', '/health'):
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': {'message': f'未知路径: {self.path}'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if self.path.rstrip('/') == '/stats/reset':
+            self.server.stats.reset()
+            self._send_json(200, {'status': 'ok'})
+            return
+
+        route = _route_for(self.path)
+        if route is None:
+            self._send_json(404, {'error': {'message': f'未知路径: {self.path}'}})
+            return
+        try:
+            payload = json.loads(raw.decode('utf-8') or '{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': '请求体不是合法的JSON'}})
+            return
+
+        config = self.server.stub_config
+        plan = config.plan(route)
+        start = time.perf_counter()
+        time.sleep(plan['delay'])
+        elapsed = time.perf_counter() - start
+        self.server.stats.record(route, plan['outcome'], elapsed)
+
+        if plan['outcome'] == '429':
+            self._send_json(429, {'error': {'message': 'Rate limit reached (stub)', 'type': 'rate_limit_error',
+                                            'code': 'rate_limit_exceeded'}},
+                            headers={'Retry-After': str(config.retry_after)})
+            return
+        if plan['outcome'] == 'timeout':
+            # 客户端通常已经超时断开，这里只是释放连接
+            self._send_json(504, {'error': {'message': 'Upstream timeout (stub)'}})
+            return
+
+        if route == 'ocr':
+            self._send_json(200, build_dashscope_response(payload, config.ocr_text))
+            return
+        content = json.dumps(config.corrections[plan['index']], ensure_ascii=False, indent=2)
+        if plan['fenced']:
+            content = f"以下是批改结果：\n```json\n{content}\n```"
+        if route == 'chat':
+            self._send_json(200, build_chat_response(payload, content))
+        else:
+            self._send_json(200, build_dashscope_response(payload, content))
+
+
+def create_stub_server(host: str = '127.0.0.1', port: int = 8900, config: Optional[StubConfig] = None,
+                       verbose: bool = False) -> ThreadingHTTPServer:
+    """
+    创建桩服务（未启动）
+
+    Args:
+        host: 监听地址
+        port: 端口，0表示随机分配
+        config: 桩服务配置
+        verbose: 是否输出访问日志
+
+    Returns:
+        ThreadingHTTPServer: 调用 serve_forever() 启动，server_address 为实际地址
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.stub_config = config or StubConfig()
+    server.stats = StubStats()
+    server.verbose = verbose
+    return server
+
+
+def start_stub_in_thread(host: str = '127.0.0.1', port: int = 0,
+                         config: Optional[StubConfig] = None) -> ThreadingHTTPServer:
+    """在后台线程中启动桩服务，返回server（调用 shutdown() 停止）"""
+    server = create_stub_server(host, port, config)
+    thread = threading.Thread(target=server.serve_forever, name='stub-llm-server', daemon=True)
+    thread.start()
+    return server
+
+
+def stub_env(base_url: str) -> Dict[str, str]:
+    """
+    让Flask和Celery worker指向桩服务的环境变量
+
+    Args:
+        base_url: 桩服务地址，如 http://127.0.0.1:8900
+    """
+    base_url = base_url.rstrip('/')
+    return {
+        'AI_PROVIDER': 'deepseek',
+        'DEEPSEEK_API_KEY': 'stub',
+        'DEEPSEEK_BASE_URL': f"{base_url}/v1",
+        'OPENAI_API_KEY': 'stub',
+        'ALIYUN_API_KEY': 'stub',
+        'ALIYUN_BASE_URL': f"{base_url}/api/v1",
+        'QWEN_API_KEY': 'stub',
+        'QWEN_API_URL': f"{base_url}/api/v1/services/aigc/multimodal-generation/generation",
+        'DASHSCOPE_API_KEY': 'stub',
+        'DASHSCOPE_BASE_URL': f"{base_url}/api/v1/services/vision/text-generation",
+    }
+
+
+def load_corrections(path: str) -> List[Dict[str, Any]]:
+    """从JSON文件加载预置批改结果（对象或对象列表）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    corrections = data if isinstance(data, list) else [data]
+    if not corrections or not all(isinstance(item, dict) for item in corrections):
+        raise ValueError(f"预置批改结果必须是JSON对象或对象列表: {path}")
+    return corrections
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='批改链路压测用的本地LLM/OCR桩服务')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8900)
+    arg_parser.add_argument('--latency', default='lognormal:2.5,0.4', help='批改接口延迟分布')
+    arg_parser.add_argument('--ocr-latency', default='uniform:0.5,1.5', help='OCR接口延迟分布')
+    arg_parser.add_argument('--rate-429', type=float, default=0.0, help='返回429的比例')
+    arg_parser.add_argument('--rate-timeout', type=float, default=0.0, help='挂起直到客户端超时的比例')
+    arg_parser.add_argument('--hang-seconds', type=float, default=150.0, help='超时注入时挂起的秒数')
+    arg_parser.add_argument('--retry-after', type=int, default=1, help='429响应的Retry-After秒数')
+    arg_parser.add_argument('--fenced-ratio', type=float, default=0.3, help='批改结果包在markdown代码块中的比例')
+    arg_parser.add_argument('--corrections', help='预置批改结果JSON文件（对象或对象列表）')
+    arg_parser.add_argument('--seed', type=int)
+    arg_parser.add_argument('--verbose', action='store_true')
+    args = arg_parser.parse_args()
+
+    config = StubConfig(
+        chat_latency=args.latency, ocr_latency=args.ocr_latency,
+        rate_429=args.rate_429, rate_timeout=args.rate_timeout, hang_seconds=args.hang_seconds,
+        retry_after=args.retry_after, fenced_ratio=args.fenced_ratio, seed=args.seed,
+        corrections=load_corrections(args.corrections) if args.corrections else None,
+    )
+    server = create_stub_server(args.host, args.port, config, verbose=args.verbose)
+    base_url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"桩服务已启动: {base_url}  批改延迟 {config.chat_latency}, OCR延迟 {config.ocr_latency}, "
+          f"429 {args.rate_429:.1%}, 超时 {args.rate_timeout:.1%}")
+    print("Flask和Celery worker的环境变量:")
+    for key, value in stub_env(base_url).items():
+        print(f"    {key}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats.snapshot(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+邮件发送测试与压测用的本地SMTP桩服务
+实现EHLO/HELO、AUTH PLAIN/LOGIN（任意凭据均通过）、MAIL/RCPT/DATA、RSET、NOOP、QUIT，
+收到的邮件只计数（保留最近的若干封的收件人），不投递；每封邮件的处理延迟可配置，
+并可按比例对RCPT返回451临时失败，用于验证逐收件人的结果记录；
+扩展命令 XSTATS 以JSON返回连接数、认证数、邮件数等统计（供测试和压测读取）
+
+应用进程使用eventlet猴子补丁，测试中应以子进程方式启动桩服务（--port 0 自动选择端口，
+启动后在标准错误输出 "SMTP桩服务已启动: host:port"）
+
+用法:
+    python scripts/benchmarks/stub_smtp_server.py --port 8025 --latency-ms 5 --rate-451 0.01
+
+    Flask和Celery worker使用以下环境变量指向桩服务:
+    MAIL_SERVER=127.0.0.1 MAIL_PORT=8025 MAIL_USE_TLS= MAIL_USERNAME=stub MAIL_PASSWORD=stub
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import socketserver
+from collections import deque
+
+
+class SMTPStats:
+    """桩服务的连接与邮件计数"""
+
+    def __init__(self, keep: int = 100):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.auths = 0
+        self.messages = 0
+        self.recipients = 0
+        self.rejected = 0
+        self.received = deque(maxlen=keep)
+
+    def snapshot(self, received: bool = False):
+        with self.lock:
+            stats = {
+                'connections': self.connections,
+                'auths': self.auths,
+                'messages': self.messages,
+                'recipients': self.recipients,
+                'rejected': self.rejected,
+            }
+            if received:
+                stats['received'] = [item['to'] for item in self.received]
+            return stats
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """单个SMTP会话"""
+
+    def reply(self, line: str):
+        self.wfile.write((line + '\r\n').encode('utf-8'))
+        self.wfile.flush()
+
+    def readline(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.stats.lock:
+            server.stats.connections += 1
+        self.reply('220 stub-smtp ESMTP ready')
+        sender, recipients = None, []
+        while True:
+            line = self.readline()
+            if line is None:
+                return
+            command = line[:4].upper()
+            argument = line[5:] if len(line) > 5 else ''
+            if command in ('EHLO', 'HELO'):
+                if command == 'EHLO':
+                    self.wfile.write(b'250-stub-smtp\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 10485760\r\n')
+                    self.wfile.flush()
+                else:
+                    self.reply('250 stub-smtp')
+            elif command == 'AUTH':
+                mechanism = argument.split(' ')[0].upper()
+                if mechanism == 'LOGIN' and len(argument.split(' ')) == 1:
+                    self.reply('334 VXNlcm5hbWU6')
+                    self.readline()
+                    self.reply('334 UGFzc3dvcmQ6')
+                    self.readline()
+                elif mechanism == 'LOGIN':
+                    self.reply('334 UGFzc3dvcmQ6')
+                    self.readline()
+                with server.stats.lock:
+                    server.stats.auths += 1
+                self.reply('235 2.7.0 Authentication successful')
+            elif command == 'MAIL':
+                sender, recipients = argument, []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                if server.rate_451 and random.random() < server.rate_451:
+                    with server.stats.lock:
+                        server.stats.rejected += 1
+                    self.reply('451 4.3.0 Temporary failure')
+                else:
+                    recipients.append(argument.split(':', 1)[-1].strip('<> '))
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                if not recipients:
+                    self.reply('554 No valid recipients')
+                    continue
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    size += len(data_line)
+                if server.latency:
+                    time.sleep(server.latency)
+                with server.stats.lock:
+                    server.stats.messages += 1
+                    server.stats.recipients += len(recipients)
+                    server.stats.received.append({'from': sender, 'to': list(recipients), 'size': size})
+                sender, recipients = None, []
+                self.reply('250 OK queued')
+            elif command == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif command == 'NOOP':
+                self.reply('250 OK')
+            elif line.upper() == 'XSTATS':
+                self.reply('250 ' + json.dumps(server.stats.snapshot(received=True)))
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    """多线程SMTP桩服务"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, rate_451: float = 0.0):
+        self.stats = SMTPStats()
+        self.latency = latency
+        self.rate_451 = rate_451
+        super().__init__((host, port), SMTPHandler)
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self):
+        """在后台线程中运行，返回自身"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地SMTP桩服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='每封邮件的处理延迟（毫秒）')
+    parser.add_argument('--rate-451', type=float, default=0.0, help='RCPT返回451临时失败的比例')
+    args = parser.parse_args()
+
+    server = StubSMTPServer(args.host, args.port, args.latency_ms / 1000.0, args.rate_451)
+    print(f"SMTP桩服务已启动: {args.host}:{server.port}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"统计: {server.stats.snapshot()}", file=sys.stderr)
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
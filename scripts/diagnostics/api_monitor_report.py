@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+API监控日志汇总脚本
+读取 logs/api 下的监控日志（旧格式、NDJSON、NDJSON.gz），按提供商输出调用次数、错误率和延迟分位数
+
+用法:
+    python scripts/diagnostics/api_monitor_report.py --since 20250101 --provider deepseek
+    python scripts/diagnostics/api_monitor_report.py --log-dir /var/log/autocorrection/api --json
+"""
+
+import os
+import sys
+import json
+import argparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from app.core.ai.api_monitor import summarize_api_logs  # noqa: E402
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='API监控日志汇总')
+    arg_parser.add_argument('--log-dir', default=os.path.join(project_root, 'logs', 'api'))
+    arg_parser.add_argument('--since', help='起始日期 YYYYMMDD（含）')
+    arg_parser.add_argument('--until', help='结束日期 YYYYMMDD（含）')
+    arg_parser.add_argument('--provider', help='只统计指定提供商')
+    arg_parser.add_argument('--json', action='store_true', help='以JSON输出')
+    args = arg_parser.parse_args()
+
+    summary = summarize_api_logs(args.log_dir, args.since, args.until, args.provider)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+    if not summary:
+        print(f"{args.log_dir} 中没有匹配的API调用记录")
+        return
+
+    print(f"{'提供商':<16}{'调用':>8}{'错误':>8}{'错误率':>9}{'平均(s)':>10}{'p50(s)':>9}{'p95(s)':>9}{'最大(s)':>9}")
+    for name, stats in sorted(summary.items()):
+        print(f"{name:<16}{stats['calls']:>8}{stats['errors']:>8}{stats['error_rate']:>9.2%}"
+              f"{stats['avg']:>10.3f}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['max']:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -14,8 +14,8 @@ from pathlib import Path
 import uuid
 from flask import Flask
 from flask.testing import FlaskClient
-from sqlalchemy import event
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
 # 确保app模块可以被导入
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -80,6 +80,40 @@ def session(db):
     db.session = old_session
 
 
+@pytest.fixture
+def sqlite_engine(app):
+    """按模型元数据建表的内存SQLite引擎，engine.statements 记录执行过的SQL（用于统计查询次数）"""
+    engine = create_engine('sqlite://')
+    statements = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    with app.app_context():
+        _db.metadata.create_all(engine)
+    engine.statements = statements
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlite_session(sqlite_engine):
+    """绑定内存SQLite的独立会话（不替换 db.session），session.statements 为执行过的SQL"""
+    session = Session(sqlite_engine)
+    session.statements = sqlite_engine.statements
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def app_session(app, sqlite_engine, monkeypatch):
+    """在应用上下文中把 db.session 替换为绑定内存SQLite的会话，session.statements 为执行过的SQL"""
+    with app.app_context():
+        session = scoped_session(sessionmaker(bind=sqlite_engine))
+        monkeypatch.setattr(_db, 'session', session)
+        session.statements = sqlite_engine.statements
+        yield session
+        session.remove()
+
+
 @pytest.fixture
 def client(app) -> FlaskClient:
     """测试客户端"""
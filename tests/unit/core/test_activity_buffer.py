@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试用户活动写回缓冲的合并与批量写回
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.db import db
+from app.models.user import User
+from app.models.user_activity import UserActivity
+from app.models.usage_log import UsageLog
+from app.models.membership import Membership, MembershipPlan
+from app.core.analytics.usage_analytics import UsageAnalytics
+from app.core.user.activity_buffer import UserActivityBuffer
+
+
+@pytest.fixture
+def buffer_session(app_session, monkeypatch):
+    # 测试中同步写回，不启动后台线程
+    monkeypatch.setattr(UserActivityBuffer, '_ensure_thread', lambda self: None)
+    return app_session
+
+
+def add_users(session, count):
+    users = [User(username=f'login{i}', email=f'login{i}@example.com', password_hash='x') for i in range(count)]
+    session.add_all(users)
+    session.commit()
+    return [user.id for user in users]
+
+
+def test_logins_are_coalesced_and_flushed_in_bulk(buffer_session):
+    first, second = add_users(buffer_session, 2)
+    buffer = UserActivityBuffer()
+    start = datetime(2026, 3, 1, 8, 0)
+    buffer.record_login(first, start, '10.0.0.1', 'agent')
+    buffer.record_login(first, start + timedelta(minutes=5), '10.0.0.2')
+    buffer.record_login(second, start, '10.0.0.3')
+    # 乱序到达的较早登录不覆盖最后登录时间
+    buffer.record_login(first, start + timedelta(minutes=1), '10.0.0.9')
+    assert buffer.get_stats()['pending_users'] == 2
+
+    buffer_session.statements.clear()
+    result = buffer.flush()
+
+    assert result == {'status': 'success', 'users': 2, 'rows': 4, 'counters': 0}
+    writes = [s for s in buffer_session.statements if s.startswith(('UPDATE', 'INSERT'))]
+    assert len(writes) == 2
+    users = {user.id: user for user in buffer_session.query(User).all()}
+    assert users[first].last_login_at == start + timedelta(minutes=5)
+    assert users[first].last_login_ip == '10.0.0.2'
+    assert users[second].last_login_ip == '10.0.0.3'
+    logins = buffer_session.query(UserActivity).filter_by(user_id=first, type='login').count()
+    assert logins == 3
+    assert buffer.flush() == {'status': 'success', 'users': 0, 'rows': 0, 'counters': 0}
+
+
+def test_failed_flush_keeps_pending_and_rows_are_bounded(buffer_session, monkeypatch):
+    (user_id,) = add_users(buffer_session, 1)
+    buffer = UserActivityBuffer(max_rows=2)
+    for minute in range(3):
+        buffer.record_login(user_id, datetime(2026, 3, 1, 8, minute), '10.0.0.1')
+    assert buffer.get_stats()['dropped'] == 1
+
+    def broken_commit():
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(buffer_session, 'commit', broken_commit)
+    assert buffer.flush()['status'] == 'error'
+    stats = buffer.get_stats()
+    assert stats['pending_users'] == 1
+    assert stats['pending_rows'] == 2
+    assert stats['flush_errors'] == 1
+
+    monkeypatch.undo()
+    monkeypatch.setattr(db, 'session', buffer_session)
+    assert buffer.flush()['rows'] == 2
+    assert buffer_session.query(User).get(user_id).last_login_at == datetime(2026, 3, 1, 8, 2)
+
+
+def test_usage_events_and_counters_are_written_in_batches(buffer_session, monkeypatch):
+    first, second = add_users(buffer_session, 2)
+    plan = MembershipPlan(name='基础', code='basic', price=0, duration_days=30)
+    buffer_session.add(plan)
+    buffer_session.flush()
+    yesterday = datetime.now() - timedelta(days=1)
+    buffer_session.add_all([
+        Membership(user_id=first, plan_id=plan.id, end_date=datetime(2030, 1, 1),
+                   essays_used_today=4, essays_used_total=10, last_essay_date=yesterday),
+        Membership(user_id=second, plan_id=plan.id, end_date=datetime(2030, 1, 1),
+                   essays_used_today=1, essays_used_total=1, last_essay_date=datetime.now()),
+    ])
+    buffer_session.commit()
+    buffer = UserActivityBuffer()
+    monkeypatch.setattr('app.core.analytics.usage_analytics.user_activity_buffer', buffer)
+    # 会员存在性按用户缓存，这里视为已缓存
+    monkeypatch.setattr(UsageAnalytics, '_has_membership', staticmethod(lambda user_id: True))
+
+    buffer_session.statements.clear()
+    for essay_id in range(3):
+        assert UsageAnalytics.log_usage_event(first, 'essay_submit', essay_id)['status'] == 'success'
+    UsageAnalytics.log_usage_event(second, 'essay_submit', 9, {'source': 'upload'})
+    UsageAnalytics.log_usage_event(second, 'essay_view', 9)
+    buffer.increment(User, first, essay_count=3)
+    buffer.increment(User, second, essay_count=1)
+    # 记录事件不访问数据库
+    assert buffer_session.statements == []
+
+    result = buffer.flush()
+
+    assert result == {'status': 'success', 'users': 0, 'rows': 5, 'counters': 4}
+    writes = [s for s in buffer_session.statements if s.startswith(('UPDATE', 'INSERT'))]
+    assert len(writes) == 3
+    assert buffer_session.query(UsageLog).filter_by(type='essay_submit').count() == 4
+    memberships = {m.user_id: m for m in buffer_session.query(Membership).all()}
+    # 上次用量在昨天：今日用量从本批开始计
+    assert (memberships[first].essays_used_today, memberships[first].essays_used_total) == (3, 13)
+    assert (memberships[second].essays_used_today, memberships[second].essays_used_total) == (2, 2)
+    users = {user.id: user for user in buffer_session.query(User).all()}
+    assert (users[first].essay_count, users[second].essay_count) == (3, 1)
+
+
+def test_deleted_user_does_not_block_later_flushes(buffer_session):
+    first, second = add_users(buffer_session, 2)
+    buffer = UserActivityBuffer()
+    login = datetime(2026, 3, 1, 8, 0)
+    buffer.update_user(first, last_login_at=login, last_login_ip='10.0.0.1')
+    buffer.update_user(second, last_login_at=login, last_login_ip='10.0.0.2')
+    buffer_session.query(User).filter_by(id=second).delete()
+    buffer_session.commit()
+
+    assert buffer.flush()['status'] == 'success'
+    assert buffer_session.query(User).get(first).last_login_at == login
+    stats = buffer.get_stats()
+    assert (stats['pending_users'], stats['flush_errors']) == (0, 0)
+
+
+def test_rows_that_violate_constraints_are_rejected_alone(buffer_session):
+    (user_id,) = add_users(buffer_session, 1)
+    buffer = UserActivityBuffer()
+    buffer.record_login(user_id, datetime(2026, 3, 1, 8, 0), '10.0.0.1')
+    # user_id 为 NOT NULL，这一行无论重试多少次都写不进去
+    buffer.add_row(UserActivity, user_id=None, type='login')
+    buffer.increment(User, user_id, essay_count=2)
+
+    assert buffer.flush()['status'] == 'success'
+    assert buffer_session.query(UserActivity).count() == 1
+    assert buffer_session.query(User).get(user_id).essay_count == 2
+    stats = buffer.get_stats()
+    assert (stats['rejected'], stats['pending_rows'], stats['flush_errors']) == (1, 0, 0)
+    assert buffer.flush() == {'status': 'success', 'users': 0, 'rows': 0, 'counters': 0}
+
+
+def test_deleted_membership_does_not_block_usage_accounting(buffer_session):
+    first, second = add_users(buffer_session, 2)
+    plan = MembershipPlan(name='基础', code='basic', price=0, duration_days=30)
+    buffer_session.add(plan)
+    buffer_session.flush()
+    buffer_session.add_all([Membership(user_id=user_id, plan_id=plan.id, end_date=datetime(2030, 1, 1),
+                                       essays_used_total=0) for user_id in (first, second)])
+    buffer_session.commit()
+    buffer = UserActivityBuffer()
+    for user_id in (first, second):
+        buffer.add_row(UsageLog, user_id=user_id, type='essay_submit')
+        buffer.increment_membership_usage(user_id)
+    buffer_session.query(Membership).filter_by(user_id=second).delete()
+    buffer_session.commit()
+
+    assert buffer.flush()['status'] == 'success'
+    buffer.increment_membership_usage(first)
+    assert buffer.flush()['status'] == 'success'
+    assert buffer_session.query(Membership).filter_by(user_id=first).one().essays_used_total == 2
+    assert buffer.get_stats()['flush_errors'] == 0
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试管理后台数据访问层的查询次数：列表和详情页的查询次数固定，不随行数增长
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.user import User, UserProfile
+from app.models.essay import Essay
+from app.models.membership import Membership, MembershipPlan
+from app.models.subscription import Subscription
+from app.core.admin.admin_service import AdminService
+from app.core.admin.admin_queries import user_summaries, user_summary
+
+NOW = datetime(2026, 3, 1, 12, 0, 0)
+
+
+def seed(session, users=3, essays_per_user=4):
+    plan = MembershipPlan(name='高级会员', code='premium', price=99, duration_days=30)
+    session.add(plan)
+    session.flush()
+    user_ids = []
+    for index in range(users):
+        user = User(username=f'user{index}', email=f'user{index}@example.com', password_hash='x',
+                    created_at=NOW + timedelta(minutes=index))
+        user.profile = UserProfile(essay_monthly_limit=30, essay_monthly_used=index)
+        user.membership = Membership(plan_id=plan.id, end_date=NOW + timedelta(days=30))
+        user.subscriptions = [
+            Subscription(plan_id=plan.id, status='active', start_date=NOW, end_date=NOW + timedelta(days=30),
+                         created_at=NOW),
+            Subscription(plan_id=plan.id, status='expired', start_date=NOW - timedelta(days=60),
+                         end_date=NOW - timedelta(days=30), created_at=NOW - timedelta(days=60)),
+        ]
+        user.essays = [Essay(title=f'{index}-{number}', content='正文', created_at=NOW + timedelta(hours=number))
+                       for number in range(essays_per_user)]
+        session.add(user)
+        session.flush()
+        user_ids.append(user.id)
+    session.commit()
+    session.expunge_all()
+    return user_ids
+
+
+def count_queries(session, func):
+    session.expunge_all()
+    session.statements.clear()
+    result = func()
+    return result, len(session.statements)
+
+
+def test_essay_listing_loads_authors_with_the_page(app_session):
+    seed(app_session)
+    service = AdminService()
+
+    small, small_queries = count_queries(app_session, lambda: service.get_essays(per_page=2))
+    large, large_queries = count_queries(app_session, lambda: service.get_essays(per_page=12))
+
+    # 分页总数 + 一次带作者JOIN的列表查询，与每页行数无关
+    assert small_queries == large_queries == 2
+    essays = large['data']['essays']
+    assert len(essays) == 12
+    assert all(essay['username'] == f"user{essay['title'].split('-')[0]}" for essay in essays)
+    assert 'content' not in app_session.statements[-1].split('FROM')[0]
+
+
+def test_user_listing_and_detail_query_counts(app_session):
+    user_ids = seed(app_session)
+    service = AdminService()
+
+    users, queries = count_queries(app_session, lambda: service.get_users(per_page=10))
+    assert queries == 2
+    assert [user['username'] for user in users['data']['users']] == ['user2', 'user1', 'user0']
+
+    # 用户（资料、会员JOIN）+ 订阅批量加载 + 最近作文（含总数）
+    detail, queries = count_queries(app_session, lambda: service.get_user_detail(user_ids[1]))
+    assert queries == 3
+    data = detail['data']
+    assert data['profile']['essay_monthly_used'] == 1
+    assert [sub['status'] for sub in data['subscriptions']] == ['active', 'expired']
+    assert data['subscriptions'][0]['plan'] == 'premium' and data['subscriptions'][0]['is_active']
+    assert [essay['title'] for essay in data['essays']] == ['1-3', '1-2', '1-1', '1-0']
+    assert data['essay_count'] == 4
+
+
+def test_user_summaries_are_cached_per_request(app_session, app):
+    user_ids = seed(app_session, essays_per_user=0)
+
+    summaries, queries = count_queries(app_session, lambda: user_summaries(user_ids + [user_ids[0], 999]))
+    assert queries == 1
+    assert summaries[user_ids[0]].username == 'user0' and summaries[999] is None
+
+    _, queries = count_queries(app_session, lambda: (user_summaries(user_ids), user_summary(999)))
+    assert queries == 0
+
+    # 新的请求（应用上下文）重新查询
+    with app.app_context():
+        _, queries = count_queries(app_session, lambda: user_summary(user_ids[2]))
+    assert queries == 1
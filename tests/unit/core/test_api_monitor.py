@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试API监控日志的缓冲、批量写入、轮转与汇总
+"""
+
+import os
+import json
+
+import pytest
+
+from app.core.ai import api_monitor
+from app.core.ai.api_monitor import APIMonitor, summarize_api_logs, iter_log_entries, FORMAT_NDJSON_GZ
+
+
+def record_calls(monitor, provider, latencies, errors=0):
+    for index, latency in enumerate(latencies):
+        request_id = monitor.log_api_call(provider, 'model', 'correct_essay', {}, request_id=f"{provider}-{index}")
+        failed = index < errors
+        monitor.log_api_response(request_id, 'error' if failed else 'success', latency,
+                                 error='超时' if failed else None)
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    monitor = APIMonitor(log_dir=str(tmp_path), batch_size=50, flush_interval=0.05)
+    yield monitor
+    monitor.stop()
+
+
+def test_batched_write_and_summary(monitor, tmp_path):
+    record_calls(monitor, 'deepseek', [1.0, 2.0, 3.0, 4.0], errors=1)
+    record_calls(monitor, 'openai', [0.5, 0.5])
+    monitor.flush()
+
+    stats = monitor.get_stats()
+    assert stats['written'] == 12 and stats['dropped'] == 0 and stats['buffered'] == 0
+    assert stats['batches'] < 12
+    summary = summarize_api_logs(str(tmp_path))
+    assert summary['deepseek']['calls'] == 4
+    assert summary['deepseek']['errors'] == 1
+    assert summary['deepseek']['p95'] == 4.0
+    assert summary['openai']['error_rate'] == 0
+    assert list(summarize_api_logs(str(tmp_path), provider='openai')) == ['openai']
+
+
+def test_summary_bounds_pending_requests(tmp_path):
+    lines = [{'request_id': str(index), 'event': 'api_call_start', 'provider': 'deepseek'} for index in range(5)]
+    lines += [{'request_id': str(index), 'event': 'api_call_end', 'status': 'success', 'response_time': 1.0}
+              for index in range(5)]
+    (tmp_path / 'api_20250101.log').write_text(''.join(json.dumps(line) + '\n' for line in lines), encoding='utf-8')
+
+    summary = summarize_api_logs(str(tmp_path), max_pending=3)
+    # 只暂存最近3个未结束的请求，更早的结束记录按 unknown 统计
+    assert (summary['deepseek']['calls'], summary['unknown']['calls']) == (3, 2)
+
+
+def test_error_traceback_keeps_tail(monitor, tmp_path):
+    trace = 'Traceback (most recent call last):\n' + '  frame\n' * 1000 + 'TimeoutError: 超时'
+    monitor.log_api_response('r1', 'error', 1.0, error='超时', traceback=trace)
+    monitor.flush()
+
+    [entry] = list(iter_log_entries(str(tmp_path)))
+    assert len(entry['traceback']) < api_monitor.MAX_TRACEBACK_CHARS + 50
+    assert entry['traceback'].endswith('TimeoutError: 超时')
+    assert entry['traceback'].startswith(f'...(共{len(trace)}字符)')
+
+
+def test_ring_buffer_drops_oldest(tmp_path):
+    monitor = APIMonitor(log_dir=str(tmp_path), buffer_size=5, batch_size=1000, flush_interval=60)
+    for index in range(8):
+        monitor._enqueue({'event': 'api_call_start', 'request_id': str(index), 'provider': 'p'})
+    monitor.flush()
+    monitor.stop()
+    stats = monitor.get_stats()
+    assert stats['enqueued'] == 8
+    assert stats['dropped'] == 3 and stats['written'] == 5
+    assert [entry['request_id'] for entry in iter_log_entries(str(tmp_path))] == ['3', '4', '5', '6', '7']
+
+
+def test_size_rotation_and_gzip(tmp_path):
+    monitor = APIMonitor(log_dir=str(tmp_path), batch_size=1, flush_interval=0.01,
+                         max_bytes=200, file_format=FORMAT_NDJSON_GZ)
+    for _ in range(10):
+        record_calls(monitor, 'deepseek', [1.0, 1.0])
+        monitor.flush()
+    monitor.stop()
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) > 1 and all(name.endswith('.ndjson.gz') for name in files)
+    assert summarize_api_logs(str(tmp_path))['deepseek']['calls'] == 20
+
+
+def test_reads_legacy_format(tmp_path):
+    legacy = tmp_path / 'api_20250101.log'
+    entries = [
+        {'request_id': '1', 'event': 'api_call_start', 'provider': 'deepseek'},
+        {'request_id': '1', 'event': 'api_call_end', 'status': 'success', 'response_time': 2.5},
+    ]
+    legacy.write_text(''.join(f"2025-01-01 10:00:00 - INFO - {json.dumps(e)}\n" for e in entries),
+                      encoding='utf-8')
+    assert summarize_api_logs(str(tmp_path), since='20250101')['deepseek']['avg'] == 2.5
+    assert summarize_api_logs(str(tmp_path), since='20250102') == {}
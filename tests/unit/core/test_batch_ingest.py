@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试作文批量导入：批次登记、压缩包展开、并行提取与批量入库
+"""
+
+import io
+import zipfile
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.models.user import User, UserProfile
+from app.models.essay import Essay
+from app.models.correction import Correction
+from app.models.task_status import TaskStatus, TaskState
+from app.core.correction.batch_ingest import BatchIngestService
+from app.tasks.batch_ingest_tasks import finalize_batch
+
+
+@pytest.fixture
+def ingest_session(app_session, monkeypatch):
+    monkeypatch.setattr(TaskStatus, 'query', app_session.query_property())
+    return app_session
+
+
+@pytest.fixture
+def user_id(ingest_session):
+    user = User(username='batch_user', email='batch@example.com', password_hash='x')
+    user.profile = UserProfile(essay_monthly_limit=10, essay_monthly_used=0)
+    ingest_session.add(user)
+    ingest_session.commit()
+    return user.id
+
+
+def upload(name, data):
+    return FileStorage(stream=io.BytesIO(data), filename=name)
+
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_batch_is_registered_without_extracting(ingest_session, user_id, tmp_path):
+    service = BatchIngestService(storage_root=str(tmp_path), max_file_size=100)
+    result = service.create_batch(user_id, [
+        upload('a.txt', '春天来了'.encode('utf-8')),
+        upload('b.exe', b'MZ'),
+        upload('c.txt', b'x' * 200),
+    ], enqueue=False)
+
+    assert result['status'] == 'success'
+    assert result['accepted'] == 1
+    assert [item['filename'] for item in result['rejected']] == ['b.exe', 'c.txt']
+    task_status = TaskStatus.query.filter_by(task_id=result['batch_id']).one()
+    assert task_status.status == TaskState.PENDING
+    assert task_status.task_metadata['progress'] == {'phase': 'uploaded', 'done': 0, 'total': 1}
+    assert Essay.query.with_session(ingest_session).count() == 0
+
+    too_many = BatchIngestService(storage_root=str(tmp_path), max_files=1)
+    assert too_many.create_batch(user_id, [upload('a.txt', b'a'), upload('b.txt', b'b')],
+                                 enqueue=False)['status'] == 'error'
+
+
+def test_ingest_bulk_inserts_essays_and_corrections(ingest_session, user_id, tmp_path, monkeypatch):
+    service = BatchIngestService(storage_root=str(tmp_path), workers=4, insert_chunk_size=2)
+    archive = make_zip({
+        'class1/张三.txt': '我的家乡'.encode('utf-8'),
+        'class1/李四.txt': '我的老师'.encode('utf-8'),
+        'class1/空白.txt': b'',
+        '__MACOSX/class1/._x.txt': b'junk',
+        'readme.md': b'ignored',
+    })
+    batch_id = service.create_batch(user_id, [
+        upload('王五.txt', '秋天的雨'.encode('utf-8')),
+        upload('作文.zip', archive),
+    ], author_name='老师', enqueue=False)['batch_id']
+
+    enqueued = []
+
+    def enqueue(batch, items, finalizer_id):
+        # 提交任务前批改阶段的状态已提交，回调的汇总结果不会再被覆盖
+        progress = TaskStatus.query.filter_by(task_id=batch).one().task_metadata['progress']
+        enqueued.append((items, finalizer_id, progress['phase']))
+
+    monkeypatch.setattr(service, '_enqueue', enqueue)
+    ingest_session.statements.clear()
+    result = service.ingest(batch_id)
+
+    assert result['status'] == 'success'
+    assert result['inserted'] == 3
+    assert result['failed'] == 1
+    # 3篇作文按每块2篇写入，每块一次批量写入批改记录
+    # （SQLite不保证多行RETURNING的顺序，作文INSERT由SQLAlchemy逐行执行，仍在同一事务内）
+    correction_inserts = [s for s in ingest_session.statements if s.startswith('INSERT INTO corrections')]
+    assert len(correction_inserts) == 2
+
+    essays = Essay.query.with_session(ingest_session).order_by(Essay.id).all()
+    assert sorted(essay.title for essay in essays) == ['张三', '李四', '王五']
+    assert all(essay.author_name == '老师' and essay.source_type == 'upload' for essay in essays)
+    assert all(essay.preview == essay.content for essay in essays)
+    corrections = Correction.query.with_session(ingest_session).all()
+    assert sorted(c.essay_id for c in corrections) == [essay.id for essay in essays]
+    # 批改任务使用批改记录中预先写入的task_id提交
+    assert {(item['essay_id'], item['task_id']) for item in enqueued[0][0]} == \
+        {(c.essay_id, c.task_id) for c in corrections}
+    assert all(c.task_id for c in corrections)
+    assert ingest_session.query(UserProfile).filter_by(user_id=user_id).one().essay_monthly_used == 3
+
+    task_status = TaskStatus.query.filter_by(task_id=batch_id).one()
+    files = task_status.task_metadata['files']
+    assert task_status.task_metadata['finalizer_id'] == enqueued[0][1]
+    assert enqueued[0][2] == 'correcting'
+    assert task_status.task_metadata['progress']['phase'] == 'correcting'
+    by_name = {entry['filename']: entry for entry in files}
+    assert by_name['作文.zip']['status'] == 'expanded'
+    assert by_name['空白.txt']['status'] == 'failed'
+    assert by_name['张三.txt']['archive'] == '作文.zip'
+    assert {by_name[name]['essay_id'] for name in ('张三.txt', '李四.txt', '王五.txt')} == {e.id for e in essays}
+    assert not any('content' in entry or 'path' in entry for entry in files)
+    assert not (tmp_path / batch_id).exists()
+
+    status = service.get_batch_status(batch_id, user_id)
+    assert status['status'] == 'success'
+    assert status['batch']['counts'] == {'pending': 3, 'failed': 1}
+    assert service.get_batch_status(batch_id, user_id + 1)['code'] == 403
+
+    summary = service.finalize(batch_id)
+    assert summary['statuses'] == {'pending': 3}
+    assert TaskStatus.query.filter_by(task_id=batch_id).one().status == TaskState.SUCCESS
+
+
+def test_ingest_without_extractable_files_fails_batch(ingest_session, user_id, tmp_path):
+    service = BatchIngestService(storage_root=str(tmp_path))
+    batch_id = service.create_batch(user_id, [upload('broken.zip', b'not a zip')], enqueue=False)['batch_id']
+
+    result = service.ingest(batch_id, enqueue=False)
+
+    assert result['status'] == 'error'
+    task_status = TaskStatus.query.filter_by(task_id=batch_id).one()
+    assert task_status.status == TaskState.FAILED
+    assert task_status.task_metadata['files'][0]['error'].startswith('无法读取压缩包')
+
+
+def test_ingest_stops_at_remaining_quota(ingest_session, user_id, tmp_path, monkeypatch):
+    profile = ingest_session.query(UserProfile).filter_by(user_id=user_id).one()
+    profile.essay_monthly_used = 8
+    ingest_session.commit()
+    service = BatchIngestService(storage_root=str(tmp_path))
+    batch_id = service.create_batch(user_id, [upload(f'{name}.txt', '春天来了'.encode('utf-8'))
+                                              for name in ('a', 'b', 'c')], enqueue=False)['batch_id']
+    monkeypatch.setattr(service, '_enqueue', lambda batch, items, finalizer_id: None)
+
+    result = service.ingest(batch_id)
+
+    assert result['inserted'] == 2 and result['failed'] == 1
+    assert Essay.query.with_session(ingest_session).count() == 2
+    ingest_session.refresh(profile)
+    assert profile.essay_monthly_used == 10
+    files = TaskStatus.query.filter_by(task_id=batch_id).one().task_metadata['files']
+    assert [entry['error'] for entry in files if entry['status'] == 'rejected'] == ['超出剩余批改次数']
+    # 次数用完后不再接收新批次
+    assert service.create_batch(user_id, [upload('d.txt', b'd')], enqueue=False)['status'] == 'error'
+
+
+def test_failed_correction_still_finalizes_batch(monkeypatch):
+    submitted = {}
+
+    class FakeChord:
+        def __init__(self, header):
+            submitted['header'] = header
+
+        def __call__(self, callback):
+            submitted['callback'] = callback
+
+    monkeypatch.setattr('celery.chord', FakeChord)
+    BatchIngestService()._enqueue('batch-1', [{'essay_id': 7, 'task_id': 'task-7'}], 'final-1')
+
+    assert submitted['header'][0].options['task_id'] == 'task-7'
+    assert submitted['callback'].options['task_id'] == 'final-1'
+    # 批改任务失败时chord不调用回调，错误回调同样汇总批次
+    errbacks = submitted['callback'].options['link_error']
+    assert [(errback['task'], tuple(errback['args'])) for errback in errbacks] == \
+        [(finalize_batch.name, ('batch-1',))]
+
+
+def test_group_fallback_polls_until_corrections_finish(ingest_session, user_id, tmp_path, monkeypatch):
+    class NoChord:
+        def __init__(self, header):
+            pass
+
+        def __call__(self, callback):
+            raise NotImplementedError('chord unsupported')
+
+    submitted = []
+    monkeypatch.setattr('celery.chord', NoChord)
+    monkeypatch.setattr('celery.group.apply_async', lambda self, *args, **kwargs: submitted.append('group'))
+    monkeypatch.setattr(finalize_batch, 'apply_async',
+                        lambda *args, **kwargs: submitted.append((kwargs['kwargs'], kwargs['task_id'])))
+    service = BatchIngestService(storage_root=str(tmp_path))
+    batch_id = service.create_batch(user_id, [upload('a.txt', '春天来了'.encode('utf-8'))], enqueue=False)['batch_id']
+    service.ingest(batch_id)
+
+    finalizer_id = TaskStatus.query.filter_by(task_id=batch_id).one().task_metadata['finalizer_id']
+    assert submitted == ['group', ({'poll': True}, finalizer_id)]
+    # 作文仍在等待批改时轮询模式不汇总，批改结束后汇总
+    assert service.finalize(batch_id, wait_for_pending=True) is None
+    ingest_session.query(Essay).update({'status': 'completed'})
+    ingest_session.commit()
+    assert service.finalize(batch_id, wait_for_pending=True)['statuses'] == {'completed': 1}
+    assert TaskStatus.query.filter_by(task_id=batch_id).one().status == TaskState.SUCCESS
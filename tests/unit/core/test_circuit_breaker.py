@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试AI提供商熔断器
+"""
+
+import time
+
+import pytest
+
+from app.core.ai import circuit_breaker
+from app.core.ai.circuit_breaker import (
+    CircuitBreaker, CircuitOpenError, _LocalStore, circuit_open_result,
+    STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
+)
+from app.core.ai.provider_router import ProviderRouter
+
+
+@pytest.fixture(autouse=True)
+def isolated_breakers(monkeypatch):
+    """每个测试使用独立的进程内状态存储"""
+    monkeypatch.setattr(circuit_breaker, '_store', _LocalStore())
+    monkeypatch.setattr(circuit_breaker, '_breakers', {})
+
+
+def _breaker(store=None, **kwargs):
+    kwargs.setdefault('min_calls', 4)
+    kwargs.setdefault('open_seconds', 0.2)
+    return CircuitBreaker('deepseek/deepseek-chat', store=store or _LocalStore(), **kwargs)
+
+
+def test_trips_on_failure_rate():
+    breaker = _breaker()
+    for _ in range(2):
+        breaker.record_success(0.1)
+    breaker.record_failure(0.1)
+    assert breaker.state == STATE_CLOSED
+    breaker.record_failure(0.1)
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+    assert breaker.retry_after() > 0
+
+
+def test_trips_on_slow_calls():
+    breaker = _breaker(slow_call_seconds=1.0, slow_rate_threshold=0.75)
+    for _ in range(3):
+        breaker.record_success(2.0)
+    breaker.record_success(0.1)
+    assert breaker.state == STATE_OPEN
+
+
+def test_min_calls_prevents_early_trip():
+    breaker = _breaker(min_calls=10)
+    for _ in range(5):
+        breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+
+
+def test_state_shared_through_store():
+    store = _LocalStore()
+    worker_a, worker_b = _breaker(store), _breaker(store)
+    for _ in range(4):
+        worker_a.record_failure()
+    assert not worker_b.allow_request()
+
+
+def test_half_open_probes_then_close():
+    breaker = _breaker(half_open_max_calls=2)
+    for _ in range(4):
+        breaker.record_failure()
+    time.sleep(0.25)
+    assert breaker.state == STATE_HALF_OPEN
+
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+    # 探测名额用完后继续拒绝
+    assert not breaker.allow_request()
+
+    breaker.record_success(0.1)
+    assert breaker.state == STATE_HALF_OPEN
+    breaker.record_success(0.1)
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request()
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    time.sleep(0.25)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+
+
+def test_call_fast_fails_when_open():
+    breaker = _breaker()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        return {'status': 'error', 'message': 'timeout'}
+
+    for _ in range(4):
+        breaker.call(failing)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(failing)
+    assert len(calls) == 4
+
+
+def test_snapshot():
+    breaker = _breaker()
+    breaker.record_success(0.1)
+    breaker.record_failure(0.1)
+    snapshot = breaker.snapshot()
+    assert snapshot['state'] == STATE_CLOSED
+    assert snapshot['calls'] == 2
+    assert snapshot['failure_rate'] == 0.5
+
+
+class _Client:
+    def __init__(self, name, fail=False):
+        self.provider_name = name
+        self.model = f'{name}-model'
+        self.fail = fail
+        self.calls = 0
+
+    def correct_essay(self, essay_content, title=None, essay_type=None, prompt=None):
+        self.calls += 1
+        if self.fail:
+            return {'status': 'error', 'message': 'boom'}
+        return {'status': 'success', 'result': {'total_score': 40}}
+
+
+def test_router_skips_open_provider():
+    broken, healthy = _Client('broken', fail=True), _Client('healthy')
+    router = ProviderRouter({'broken': broken, 'healthy': healthy}, default_budget=0.05)
+    breaker = circuit_breaker.get_client_breaker(broken)
+    breaker.min_calls = 1
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+
+    result = router.correct_essay('作文内容')
+    assert result['provider'] == 'healthy'
+    assert broken.calls == 0
+
+
+def test_circuit_open_result():
+    breaker = _breaker(min_calls=1, open_seconds=30)
+    breaker.record_failure()
+
+    result = circuit_open_result(breaker, essay_id='7')
+    assert result['status'] == 'error' and result['circuit_open'] is True
+    assert 0 < result['retry_after'] <= 30
+    assert 'deepseek/deepseek-chat' in result['message']
+
+
+def test_router_all_providers_open():
+    client = _Client('only', fail=True)
+    router = ProviderRouter({'only': client}, default_budget=0.05)
+    breaker = circuit_breaker.get_client_breaker(client)
+    breaker.min_calls = 1
+    breaker.record_failure()
+
+    result = router.correct_essay('作文内容')
+    assert result['status'] == 'error'
+    assert result['circuit_open'] is True
+    assert client.calls == 0
+
+
+def test_only_one_worker_moves_open_to_half_open():
+    store = _LocalStore()
+    first, second = _breaker(store, half_open_max_calls=2), _breaker(store, half_open_max_calls=2)
+    for _ in range(4):
+        first.record_failure()
+    time.sleep(0.25)
+    # 第一个worker读到打开状态后，第二个worker先完成转换并放行一个探测
+    reads = [first._read_state()]
+    assert second.allow_request()
+    read_state = first._read_state
+    first._read_state = lambda: reads.pop() if reads else read_state()
+
+    # 转换失败的一方不清零探测计数，半开期间总共只放行 half_open_max_calls 个请求
+    assert first.allow_request()
+    assert not second.allow_request()
+    assert first.state == STATE_HALF_OPEN
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试作文历史的键集分页与预览列
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.user import User
+from app.models.essay import Essay
+from app.core.correction.correction_service import CorrectionService
+
+
+def add_essays(session, count):
+    user = User(username='history_user', email='history@example.com', password_hash='x')
+    session.add(user)
+    session.flush()
+    base = datetime(2026, 1, 1)
+    for index in range(count):
+        # 每两篇同一创建时间，验证 (created_at, id) 决胜
+        session.add(Essay(title=f'作文{index}', content=f'第{index}篇\n' + '正文' * 150, user_id=user.id,
+                          created_at=base + timedelta(minutes=index // 2)))
+    session.commit()
+    return user.id
+
+
+def test_preview_follows_content():
+    essay = Essay(title='t', content='春天\n来了  ' + '花' * 300, user_id=1)
+    assert essay.preview.startswith('春天 来了 ')
+    assert len(essay.preview) == Essay.PREVIEW_LENGTH + 3
+    essay.content = '短文'
+    assert essay.preview == '短文'
+
+
+def test_keyset_pages_cover_all_essays_without_loading_content(app_session):
+    user_id = add_essays(app_session, 7)
+    service = CorrectionService()
+
+    app_session.statements.clear()
+    seen, cursor = [], None
+    while True:
+        result = service.get_user_essay_history(user_id, cursor=cursor, limit=3)
+        assert result['status'] == 'success'
+        seen.extend(essay['title'] for essay in result['essays'])
+        cursor = result['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == [f'作文{index}' for index in range(6, -1, -1)]
+    selects = [s for s in app_session.statements if s.lstrip().upper().startswith('SELECT')]
+    assert len(selects) == 3
+    assert all('essays.content' not in s for s in selects)
+
+
+def test_invalid_cursor(app_session):
+    result = CorrectionService().get_user_essay_history(1, cursor='!!bad')
+    assert result['status'] == 'error'
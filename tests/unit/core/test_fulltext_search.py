@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试作文全文检索（中文二元分词、发件箱同步、排序和高亮）与用户三元组检索
+"""
+
+import pytest
+from sqlalchemy import insert
+
+from app.models.user import User
+from app.models.essay import Essay
+from app.models.correction import Correction, CorrectionStatus
+from app.core.admin.admin_service import AdminService
+from app.core.correction.correction_service import CorrectionService
+from app.core.search import fulltext_index, tokenize_text, build_match_query, highlight
+
+
+@pytest.fixture
+def search_session(app_session):
+    assert fulltext_index.ensure_schema()
+    return app_session
+
+
+def add_users(session, *names):
+    users = [User(username=name, email=f'{name}@example.com', password_hash='x') for name in names]
+    session.add_all(users)
+    session.commit()
+    return [user.id for user in users]
+
+
+def test_bigram_tokenizer_and_query():
+    assert tokenize_text('春天的故事, Spring!') == '春天 天的 的故 故事 事 spring'
+    assert tokenize_text('我 和你') == '我 和你 你'
+    assert build_match_query('春天故事 spr 花') == '"春天 天故 故事" AND "spr"* AND "花"*'
+    assert build_match_query('，。!') is None
+    assert highlight('<b>春天</b>', '春天') == '&lt;b&gt;<mark>春天</mark>&lt;/b&gt;'
+
+
+def test_outbox_keeps_index_in_sync(search_session):
+    alice, bob = add_users(search_session, 'alice', 'bob')
+    search_session.add(Essay(user_id=alice, title='我的春天', content='公园里的花开了'))
+    search_session.commit()
+    # 批量插入不经过ORM事件，同样由触发器写入发件箱
+    search_session.execute(insert(Essay), [
+        {'user_id': bob, 'title': '秋天', 'content': '春天已经过去，树叶黄了'},
+        {'user_id': bob, 'title': '冬天', 'content': '下雪'},
+    ])
+    search_session.commit()
+    assert fulltext_index.pending() == 3
+    assert fulltext_index.sync_all() == 3
+
+    def search(query, **kwargs):
+        matches = fulltext_index.essay_matches(query, **kwargs)
+        return [row.title for row in search_session.query(Essay.title).join(
+            matches, matches.c.essay_id == Essay.id).order_by(matches.c.rank)]
+
+    # 标题命中排在正文命中之前；两个字的词和任意汉字子串都能检索
+    assert search('春天') == ['我的春天', '秋天']
+    assert search('花开') == ['我的春天']
+    assert search('天已经过') == ['秋天']
+    assert search('春天', user_id=bob) == ['秋天']
+    assert search('春天', columns=('title',)) == ['我的春天']
+
+    essay = search_session.query(Essay).filter_by(title='冬天').one()
+    essay.content = '春天快来了'
+    essay.comments = '结尾很有画面感'
+    search_session.commit()
+    deleted = search_session.query(Essay).filter_by(title='秋天').one()
+    search_session.delete(deleted)
+    search_session.commit()
+
+    # 检索只读索引，不消费发件箱；同步之后修改和删除可见
+    search_session.statements.clear()
+    assert search('下雪') == ['冬天']
+    assert not [s for s in search_session.statements if s.lstrip().upper().startswith(('INSERT', 'DELETE'))]
+    assert fulltext_index.pending() == 2
+    assert fulltext_index.sync_all() == 2
+    assert search('下雪') == []
+    assert search('春天') == ['我的春天', '冬天']
+    assert search('画面') == ['冬天']
+    # 单个汉字也能命中出现在汉字串末尾的字
+    assert search('感') == ['冬天']
+    assert search('了') == ['我的春天', '冬天']
+
+
+def test_broad_queries_rank_only_newest_matches(search_session, monkeypatch):
+    user_id, = add_users(search_session, 'alice')
+    search_session.add_all([Essay(user_id=user_id, title=f'作文{index}', content='我们的学校') for index in range(5)])
+    search_session.commit()
+    fulltext_index.sync_all()
+    monkeypatch.setattr(fulltext_index, 'max_matches', 2)
+
+    matches = fulltext_index.essay_matches('学校')
+    titles = sorted(title for title, in search_session.query(Essay.title).join(matches, matches.c.essay_id == Essay.id))
+    assert titles == ['作文3', '作文4']
+
+
+def test_corrected_essay_is_found_by_feedback(search_session):
+    alice, = add_users(search_session, 'alice')
+    essay = Essay(user_id=alice, title='周末', content='我们去爬山')
+    search_session.add(essay)
+    search_session.commit()
+    fulltext_index.sync_all()
+    # 新作文自动创建的待批改记录没有结果，不会进入发件箱
+    assert fulltext_index.pending() == 0
+    correction = search_session.query(Correction).filter_by(essay_id=essay.id).one()
+    correction.status = CorrectionStatus.COMPLETED.value
+    correction.results = {
+        'scores': {'total': 85},
+        'analyses': {'summary': '叙事完整'},
+        'improvement_suggestions': ['多使用比喻句', {'细节': '补充山顶的景色描写'}],
+    }
+    search_session.commit()
+    assert CorrectionService().sync_correction_results(correction.id, correction=correction)
+    assert search_session.get(Essay, essay.id).improvement_suggestions is None
+
+    # 改进建议只在 Correction.results 中，批改写入结果后由发件箱重建索引
+    assert fulltext_index.pending() > 0
+    fulltext_index.sync_all()
+    for term in ('比喻', '景色', '叙事'):
+        matches = fulltext_index.essay_matches(term, columns=('feedback',))
+        assert [row.essay_id for row in search_session.query(matches.c.essay_id)] == [essay.id]
+    assert '<mark>比喻</mark>' in fulltext_index.highlights([essay.id], '比喻')[essay.id]['snippet']
+
+    correction.is_deleted = True
+    search_session.commit()
+    fulltext_index.sync_all()
+    matches = fulltext_index.essay_matches('比喻')
+    assert search_session.query(matches.c.essay_id).all() == []
+
+
+def test_user_history_search_is_ranked_and_highlighted(search_session):
+    alice, bob = add_users(search_session, 'alice', 'bob')
+    search_session.add_all([Essay(user_id=alice, title=f'日记{index}', content='今天' + '写作文' * index)
+                            for index in range(1, 4)])
+    search_session.add(Essay(user_id=bob, title='写作文', content='别人的作文'))
+    search_session.commit()
+    fulltext_index.sync_all()
+    service = CorrectionService()
+
+    first = service.get_user_essay_history(alice, limit=2, keyword='作文')
+    second = service.get_user_essay_history(alice, cursor=first['next_cursor'], limit=2, keyword='作文')
+
+    titles = [essay['title'] for essay in first['essays'] + second['essays']]
+    assert titles == ['日记3', '日记2', '日记1']
+    assert second['next_cursor'] is None
+    assert first['essays'][0]['highlight']['snippet'].startswith('今天写<mark>作文</mark>')
+    assert service.get_user_essay_history(alice, cursor='x', keyword='作文')['status'] == 'error'
+
+
+def test_admin_searches_use_indexes(search_session):
+    user_ids = add_users(search_session, 'zhangsan01', 'lisi02', 'zhangwei03')
+    search_session.add(Essay(user_id=user_ids[1], title='读书笔记', content='这本书', comments='论据充分，结构清晰'))
+    search_session.add(Essay(user_id=user_ids[1], title='结构', content='无关'))
+    search_session.commit()
+    fulltext_index.sync_all()
+    service = AdminService()
+
+    search_session.statements.clear()
+    users = service.get_users(username='zhang')['data']
+    assert sorted(user['username'] for user in users['users']) == ['zhangsan01', 'zhangwei03']
+    assert any('user_search' in statement for statement in search_session.statements)
+
+    essays = service.get_essays(keyword='论据')['data']
+    assert [essay['title'] for essay in essays['essays']] == ['读书笔记']
+    assert '<mark>论据</mark>' in essays['essays'][0]['highlight']['snippet']
+    essays = service.get_essays(title='结构')['data']
+    assert [essay['title'] for essay in essays['essays']] == ['结构']
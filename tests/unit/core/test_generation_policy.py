@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试生成参数策略
+"""
+
+from app.core.ai.generation_policy import (
+    GenerationPolicy, grade_stage, accepts_generation_hints, TIER_CHAT, TIER_REASONER
+)
+from app.core.ai.prompt_templates import estimate_tokens
+
+SHORT_ESSAY = '春天来了，小草发芽了。' * 15
+LONG_ESSAY = '我们应当在奋斗中实现人生价值，这需要坚定的信念和不懈的努力。' * 60
+
+
+def test_estimate_tokens_chinese():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('春天' * 100) == 121
+    assert estimate_tokens('a' * 100) < estimate_tokens('春' * 100)
+
+
+def test_short_essay_gets_smaller_budget():
+    policy = GenerationPolicy()
+    short = policy.plan(SHORT_ESSAY, provider='deepseek', model='deepseek-chat')
+    long = policy.plan(LONG_ESSAY, provider='deepseek', model='deepseek-chat')
+    assert short['max_tokens'] < 4000
+    assert short['max_tokens'] < long['max_tokens']
+    assert short['timeout'] < long['timeout']
+
+
+def test_tier_selection():
+    policy = GenerationPolicy()
+    assert policy.plan(LONG_ESSAY, membership_level='free', provider='deepseek',
+                       model='deepseek-reasoner')['model'] == 'deepseek-chat'
+    plan = policy.plan(SHORT_ESSAY, grade='高二', membership_level='premium', provider='deepseek')
+    assert plan['tier'] == TIER_REASONER
+    assert plan['model'] == 'deepseek-reasoner'
+    assert plan['max_tokens'] > policy.plan(SHORT_ESSAY, provider='deepseek')['max_tokens']
+
+
+def test_tier_selection_disabled_keeps_model():
+    policy = GenerationPolicy(select_tier=False)
+    plan = policy.plan(SHORT_ESSAY, membership_level='premium', grade='senior',
+                       provider='deepseek', model='deepseek-reasoner')
+    assert plan['model'] == 'deepseek-reasoner'
+    assert plan['tier'] == TIER_REASONER
+    assert policy.plan(SHORT_ESSAY, provider='unknown', model='qwen-max')['model'] == 'qwen-max'
+
+
+def test_learns_from_observed_completions():
+    policy = GenerationPolicy(min_samples=5, min_tokens=100)
+    plan = policy.plan(SHORT_ESSAY, provider='deepseek')
+    for _ in range(10):
+        policy.observe(plan, 400, finish_reason='stop', elapsed=8.0)
+    tuned = policy.plan(SHORT_ESSAY, provider='deepseek')
+    assert tuned['max_tokens'] == int(400 * 1.3)
+    assert tuned['timeout'] < plan['timeout']
+
+
+def test_truncation_raises_limit():
+    policy = GenerationPolicy(min_samples=1, min_tokens=100)
+    plan = policy.plan(SHORT_ESSAY, provider='deepseek')
+    policy.observe(plan, plan['max_tokens'], finish_reason='length')
+    raised = policy.plan(SHORT_ESSAY, provider='deepseek')
+    assert raised['max_tokens'] == int(plan['max_tokens'] * 1.5)
+    assert policy.get_stats()['buckets'][f"{TIER_CHAT}/{plan['bucket']}"]['truncations'] == 1
+
+
+def test_grade_stage():
+    assert grade_stage('初二') == 'junior'
+    assert grade_stage('高一') == 'senior'
+    assert grade_stage('primary') == 'primary'
+    assert grade_stage(None) is None
+
+
+def test_accepts_generation_hints():
+    class Legacy:
+        def correct_essay(self, content):
+            pass
+
+    class Aware:
+        def correct_essay(self, content, grade=None, membership_level=None):
+            pass
+
+    assert not accepts_generation_hints(Legacy())
+    assert accepts_generation_hints(Aware())
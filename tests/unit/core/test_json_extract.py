@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试LLM输出JSON提取与修复
+"""
+
+import json
+import time
+import random
+
+import pytest
+
+from app.core.ai.json_extract import parse_json_object, extract_json_text, repair_json, iter_json_spans
+
+RESULT = {
+    "总得分": 45,
+    "分项得分": {"内容主旨": 18, "语言文采": 14, "文章结构": 9, "文面书写": 4},
+    "总体评价": "立意明确，结构清晰。",
+    "错别字": ["的->地", "在->再"],
+}
+TEXT = json.dumps(RESULT, ensure_ascii=False, indent=2)
+
+
+@pytest.mark.parametrize('raw', [
+    TEXT,
+    f"批改结果如下：\n```json\n{TEXT}\n```\n以上。",
+    f"```\n{TEXT}\n```",
+    f"前言 {TEXT} 后记",
+    TEXT.replace('\n}', ',\n}').replace('4\n  }', '4,\n  }'),
+])
+def test_parse_variants(raw):
+    assert parse_json_object(raw) == RESULT
+
+
+def test_repairs():
+    assert parse_json_object('{"评语": "他说"你好"然后走了", "b": 2}') == {'评语': '他说"你好"然后走了', 'b': 2}
+    assert parse_json_object('{"评语": "第一行\n第二行", "b": True, "c": None}') == \
+        {'评语': '第一行\n第二行', 'b': True, 'c': None}
+    assert parse_json_object("{'a': 'x', 'b': [1, 2,]}") == {'a': 'x', 'b': [1, 2]}
+    assert parse_json_object('{"a": 1 "b": 2}') == {'a': 1, 'b': 2}
+    assert parse_json_object('{a: 1, b: 优秀}') == {'a': 1, 'b': '优秀'}
+    assert parse_json_object('{"path": "C:\\dir"}') == {'path': 'C:\\dir'}
+
+
+def test_truncated_tail():
+    assert parse_json_object('{"总得分": 45, "总体评价": "这是一篇很好的文章，但是') == \
+        {'总得分': 45, '总体评价': '这是一篇很好的文章，但是'}
+    assert parse_json_object('{"总得分": 45, "错别字": ["a->b", "c') == {'总得分': 45, '错别字': ['a->b', 'c']}
+    assert parse_json_object('{"总得分": 45, "总体评价"') == {'总得分': 45}
+    assert parse_json_object('{"总得分": 45, "总体评价":') == {'总得分': 45}
+    # 被截断的数字不可信，直接丢弃
+    assert parse_json_object('{"a": 1, "总得分": 4') == {'a': 1}
+
+
+def test_first_balanced_object():
+    text = 'text {"x": {"y": [1, {"z": "}"}]}} more {"second": 1}'
+    assert extract_json_text(text) == '{"x": {"y": [1, {"z": "}"}]}}'
+    assert [complete for _, _, complete in iter_json_spans(text)] == [True, True]
+
+
+def test_invalid_inputs():
+    assert parse_json_object(None) is None
+    assert parse_json_object('') is None
+    assert parse_json_object('没有JSON') is None
+    assert parse_json_object('[1, 2]') is None
+    assert parse_json_object({'a': 1}) == {'a': 1}
+
+
+def test_no_eval():
+    assert parse_json_object("{'a': __import__('os').getcwd()}") != {'a': __import__('os').getcwd()}
+
+
+def test_fuzz_never_raises():
+    rng = random.Random(7)
+    alphabet = '{}[]",:\'\\ \n abc123中文'
+    for _ in range(500):
+        cut = TEXT[:rng.randint(0, len(TEXT))]
+        noise = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        for sample in (cut, cut + noise, noise + cut):
+            result = parse_json_object(sample)
+            assert result is None or isinstance(result, dict)
+        # 正常输出的任意截断前缀修复后都应是合法JSON
+        if len(cut) > 1:
+            json.loads(repair_json(cut))
+
+
+def test_large_malformed_is_linear():
+    malformed = '{"总体评价": "' + '{段落' * 20000
+    start = time.perf_counter()
+    parse_json_object(malformed)
+    parse_json_object('分析：' + '{ "a": 1 ' * 6000 + '}')
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试批改结果存储类型
+"""
+
+import json
+import pytest
+
+from app.core.db import json_types
+from app.core.db.json_types import (
+    encode_json_payload, decode_json_payload, unwrap_json_value, check_compression, ZLIB_PREFIX, ZSTD_PREFIX
+)
+from app.core.correction.interface import CorrectionResult
+
+
+class TestJsonPayload:
+    """测试单次编码与压缩存储"""
+
+    def test_small_payload_stored_as_plain_json(self):
+        payload = encode_json_payload({'score': 42, 'feedback': '结构清晰'})
+        assert payload == '{"score":42,"feedback":"结构清晰"}'.encode('utf-8')
+        assert decode_json_payload(payload) == {'score': 42, 'feedback': '结构清晰'}
+
+    def test_large_payload_compressed(self):
+        data = {'feedback': '语言表达较为流畅。' * 2000}
+        payload = encode_json_payload(data, threshold=1024)
+        assert payload.startswith(ZLIB_PREFIX)
+        assert len(payload) < len(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+        assert decode_json_payload(payload) == data
+
+    def test_zstd_is_explicit_opt_in(self, monkeypatch):
+        data = {'feedback': '语言表达较为流畅。' * 2000}
+        monkeypatch.setattr(json_types, 'ZSTD_AVAILABLE', False)
+        with pytest.raises(RuntimeError):
+            check_compression('zstd')
+        with pytest.raises(RuntimeError):
+            encode_json_payload(data, threshold=1024, algorithm='zstd')
+        with pytest.raises(ValueError):
+            check_compression('lz4')
+        assert check_compression(' ZLIB ') == 'zlib'
+        assert encode_json_payload(data, threshold=1024).startswith(ZLIB_PREFIX)
+
+    def test_zstd_payload_round_trip(self):
+        pytest.importorskip('zstandard')
+        data = {'feedback': '语言表达较为流畅。' * 2000}
+        payload = encode_json_payload(data, threshold=1024, algorithm='zstd')
+        assert payload.startswith(ZSTD_PREFIX)
+        assert decode_json_payload(payload) == data
+
+    def test_double_encoded_string_is_unwrapped(self):
+        data = {'error_analysis': {'spelling_errors': []}}
+        legacy = json.dumps(json.dumps(data))
+        assert decode_json_payload(legacy) == data
+        assert decode_json_payload(encode_json_payload(json.dumps(data))) == data
+
+    def test_plain_string_untouched(self):
+        assert unwrap_json_value('普通文本') == '普通文本'
+        assert decode_json_payload(None) is None
+
+
+class TestCorrectionResultView:
+    """测试批改结果访问器"""
+
+    def test_reads_from_correction_results(self):
+        class FakeCorrection:
+            essay_id = 1
+            status = 'completed'
+            score = None
+            results = {'score': 45, 'feedback': '很好', 'error_analysis': json.dumps({'a': 1})}
+
+        view = CorrectionResult.from_correction(FakeCorrection())
+        assert view.score == 45
+        assert view.comments == '很好'
+        assert view.error_analysis == {'a': 1}
+
+    def test_essay_keeps_only_listing_summary(self):
+        from app.models.essay import Essay
+
+        class FakeCorrection:
+            results = {'score': 45, 'comments': '很好', 'corrected_content': '修改后',
+                       'error_analysis': {'a': 1}, 'improvement_suggestions': '多读书'}
+
+        essay = Essay(title='t', content='c')
+        assert essay.sync_correction_results(FakeCorrection())
+        assert (essay.score, essay.comments) == (45, '很好')
+        assert essay.corrected_content is None
+        assert essay.error_analysis is None and essay.improvement_suggestions is None
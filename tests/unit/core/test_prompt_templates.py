@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试提示词模板注册与前缀缓存统计
+"""
+
+import pytest
+
+from app.core.ai.prompt_templates import (
+    PromptTemplate, PromptRegistry, PromptMetrics, get_template,
+    CORRECTION_TEMPLATE, GRADED_CORRECTION_TEMPLATE
+)
+from app.core.ai.deepseek_client import DeepseekClient
+
+
+def test_render_optional_sections():
+    template = PromptTemplate('t', 'v1', '静态前缀', [
+        ('title', '标题：{title}\n'),
+        (None, '内容：{content}'),
+    ])
+    assert template.render_user(content='正文') == '内容：正文'
+    assert template.render_user(content='正文', title='春天') == '标题：春天\n内容：正文'
+
+
+def test_system_prefix_is_byte_identical():
+    client = DeepseekClient.__new__(DeepseekClient)
+    first = client._prepare_correction_messages('第一篇作文', title='春天', essay_type='记叙文')
+    second = client._prepare_correction_messages('第二篇作文，内容不同', essay_type='议论文', prompt='写一件事')
+
+    assert first[0]['role'] == second[0]['role'] == 'system'
+    assert first[0]['content'] == second[0]['content'] == get_template(CORRECTION_TEMPLATE).system
+    assert '记叙文批改' in first[1]['content']
+    assert '议论文批改' in second[1]['content']
+    assert second[1]['content'].endswith('字数：10字')
+
+
+def test_graded_template_keeps_grade_out_of_prefix():
+    template = get_template(GRADED_CORRECTION_TEMPLATE)
+    primary = template.render(grade='小学', title='无标题', content='内容', length=2)
+    senior = template.render(grade='高中', title='无标题', content='内容', length=2)
+    assert primary[0] == senior[0]
+    assert '小学' in primary[1]['content']
+
+
+def test_registry_versions():
+    registry = PromptRegistry()
+    registry.register(PromptTemplate('t', 'v1', 'a', []))
+    registry.register(PromptTemplate('t', 'v2', 'b', []))
+    assert registry.get('t').version == 'v2'
+    registry.activate('t', 'v1')
+    assert registry.get('t').system == 'a'
+    with pytest.raises(KeyError):
+        registry.get('t', 'v3')
+    with pytest.raises(KeyError):
+        registry.get('missing')
+
+
+def test_metrics_cache_hit_rate():
+    metrics = PromptMetrics()
+    # DeepSeek字段
+    metrics.record('t@v1', {'prompt_tokens': 1000, 'prompt_cache_hit_tokens': 800, 'completion_tokens': 500})
+    # OpenAI字段
+    metrics.record('t@v1', {'prompt_tokens': 1000, 'prompt_tokens_details': {'cached_tokens': 0}})
+    metrics.record('t@v1', None)
+
+    stats = metrics.get_stats()['t@v1']
+    assert stats['requests'] == 2
+    assert stats['avg_prompt_tokens'] == 1000
+    assert stats['cache_hit_rate'] == 0.5
+    assert stats['cached_token_ratio'] == 0.4
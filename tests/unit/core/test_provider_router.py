@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试AI提供商对冲路由
+"""
+
+import time
+import threading
+
+import pytest
+
+from app.core.ai import AIClientFactory, circuit_breaker
+from app.core.ai.provider_router import ProviderRouter, ProviderStats, HedgeBudget
+
+
+@pytest.fixture(autouse=True)
+def isolated_breakers(monkeypatch):
+    """熔断器状态不在测试之间共享"""
+    monkeypatch.setattr(circuit_breaker, '_store', circuit_breaker._LocalStore())
+    monkeypatch.setattr(circuit_breaker, '_breakers', {})
+
+
+class FakeClient:
+    """按设定延迟返回结果的模拟客户端"""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        self.model = f'{name}-model'
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def correct_essay(self, essay_content, title=None, essay_type=None, prompt=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            return {'status': 'error', 'message': 'boom'}
+        return {'status': 'success', 'result': {'total_score': 40, 'model': self.model}}
+
+
+def _router(clients, **kwargs):
+    kwargs.setdefault('default_budget', 0.05)
+    return ProviderRouter(clients, **kwargs)
+
+
+def test_fast_primary_not_hedged():
+    fast, slow = FakeClient('fast'), FakeClient('slow', delay=0.2)
+    router = _router({'fast': fast, 'slow': slow})
+    router.stats['slow/slow-model'].record(0.2, True)
+    router.stats['fast/fast-model'].record(0.01, True)
+
+    result = router.correct_essay('作文内容')
+    assert result['provider'] == 'fast'
+    assert result['hedged'] is False
+    assert slow.calls == 0
+
+
+def test_slow_primary_is_hedged_and_backup_wins():
+    slow, fast = FakeClient('slow', delay=0.5), FakeClient('fast', delay=0.01)
+    router = _router({'slow': slow, 'fast': fast})
+    router.stats['slow/slow-model'].record(0.01, True)
+
+    start = time.perf_counter()
+    result = router.correct_essay('作文内容')
+    assert time.perf_counter() - start < 0.4
+    assert result['provider'] == 'fast'
+    assert result['hedged'] is True
+    assert router.counters['hedge_wins'] == 1
+
+
+def test_hedge_rate_is_capped():
+    budget = HedgeBudget(max_ratio=0.1, burst=1)
+    acquired = 0
+    for _ in range(100):
+        budget.on_request()
+        acquired += budget.try_acquire()
+    assert acquired <= 11
+
+
+def test_failover_on_error_and_error_ewma_demotes():
+    broken, healthy = FakeClient('broken', fail=True), FakeClient('healthy', delay=0.01)
+    router = _router({'broken': broken, 'healthy': healthy}, default_budget=5)
+    router.stats['broken/broken-model'].record(0.001, True)
+
+    result = router.correct_essay('作文内容')
+    assert result['provider'] == 'healthy'
+    assert router.counters['failovers'] == 1
+
+    for _ in range(5):
+        router.stats['broken/broken-model'].record(0.001, False)
+    assert router.rank_providers()[0] == 'healthy'
+
+
+def test_stats_percentile():
+    stats = ProviderStats()
+    for latency in range(1, 101):
+        stats.record(latency / 100.0, True)
+    assert 0.89 <= stats.percentile(0.9) <= 0.92
+
+
+
+def test_router_normalizes_provider_results():
+    aliyun, openai = FakeClient('aliyun_qianwen'), FakeClient('openai')
+    aliyun.correct_essay = lambda *args, **kwargs: {'status': 'success', 'result': {
+        'total_score': 42, 'content_score': 15, 'language_score': 12, 'structure_score': 9, 'writing_score': 6,
+        'overall_assessment': '立意清晰'}}
+    openai.correct_essay = lambda *args, **kwargs: {'status': 'success', 'result': {
+        'score': 42, 'comments': '立意清晰',
+        'details': {'content_score': 15, 'language_score': 12, 'structure_score': 9, 'writing_score': 6}}}
+
+    results = [_router({name: client}).correct_essay('作文内容')['result']
+               for name, client in (('aliyun_qianwen', aliyun), ('openai', openai))]
+    for data in results:
+        assert (data['score'], data['total_score'], data['scores']['total']) == (42, 42, 42)
+        assert data['feedback'] == data['comments'] == '立意清晰'
+        assert data['details'] == {'content_score': 15, 'language_score': 12, 'structure_score': 9,
+                                   'writing_score': 6}
+
+
+def test_router_counters_are_thread_safe():
+    router = _router({'healthy': FakeClient('healthy')})
+    threads = [threading.Thread(target=lambda: [router._count('requests') for _ in range(2000)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert router.get_stats()['counters']['requests'] == 16000
+
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError):
+        AIClientFactory().get_client('no-such-provider')
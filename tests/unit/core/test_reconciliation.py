@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试滞留作文状态修复
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.user import User
+from app.models.essay import Essay
+from app.models.correction import Correction
+from app.core.correction.reconciliation import reconcile_stale_essays, resolve_stale_status
+from app.core.correction.status_cache import EssayStatusCache, _LocalStatusBackend
+
+
+class FakeBackend:
+    """模拟键值存储结果后端，记录MGET调用次数"""
+
+    def __init__(self, states):
+        self.states = states
+        self.mget_calls = 0
+
+    def get_key_for_task(self, task_id):
+        return f'celery-task-meta-{task_id}'
+
+    def mget(self, keys):
+        self.mget_calls += 1
+        values = []
+        for key in keys:
+            state = self.states.get(key.replace('celery-task-meta-', ''))
+            values.append(None if state is None else json.dumps({'status': state}))
+        return values
+
+    def decode_result(self, value):
+        return json.loads(value)
+
+
+class FakeCeleryApp:
+    def __init__(self, states):
+        self.backend = FakeBackend(states)
+
+
+def test_resolve_stale_status():
+    assert resolve_stale_status(None, None) == ('pending', 'pending', False)
+    assert resolve_stale_status('t1', 'SUCCESS') == ('completed', 'completed', False)
+    assert resolve_stale_status('t1', 'REVOKED') == ('failed', 'failed', False)
+    assert resolve_stale_status('t1', 'STARTED') == ('pending', 'pending', True)
+
+
+def test_reconcile_in_chunks_with_bulk_updates(sqlite_session, monkeypatch):
+    session = sqlite_session
+    cache = EssayStatusCache(backend=_LocalStatusBackend())
+    monkeypatch.setattr('app.core.correction.reconciliation.essay_status_cache', cache)
+    user = User(username='recon', email='recon@example.com', password_hash='x')
+    session.add(user)
+    session.flush()
+
+    old = datetime.utcnow() - timedelta(hours=3)
+    states = {}
+    expected = {}
+    for i in range(7):
+        essay = Essay(title=f'作文{i}', content='内容', user_id=user.id, status='correcting')
+        session.add(essay)
+        session.flush()
+        if i == 6:
+            expected[essay.id] = ('pending', None)
+            continue
+        task_id = f'task-{i}' if i < 5 else None
+        state = ['SUCCESS', 'FAILURE', 'STARTED', 'PENDING', 'SUCCESS'][i] if task_id else None
+        if task_id and i != 3:
+            states[task_id] = state
+        correction = Correction(essay_id=essay.id, status='correcting', task_id=task_id)
+        session.add(correction)
+        session.flush()
+        essay_status, correction_status, clear_task = resolve_stale_status(task_id, state)
+        expected[essay.id] = (essay_status, correction_status)
+    session.commit()
+    session.execute(Essay.__table__.update().values(updated_at=old))
+    session.commit()
+
+    celery_app = FakeCeleryApp(states)
+    del session.statements[:]
+    stats = reconcile_stale_essays(datetime.utcnow() - timedelta(hours=2), chunk_size=3,
+                                   session=session, celery_app=celery_app)
+
+    assert stats['processed_count'] == 7
+    assert stats['chunks'] == 3
+    assert stats['missing_correction'] == 1
+    # 每块只调用一次MGET（第三块仅有无批改记录的作文时不调用）
+    assert celery_app.backend.mget_calls == 2
+    # 每块一次扫描查询，没有逐条的批改记录查询
+    selects = [s for s in session.statements if s.lstrip().upper().startswith('SELECT')]
+    assert len(selects) == 4
+
+    session.expire_all()
+    for essay_id, (essay_status, correction_status) in expected.items():
+        essay = session.get(Essay, essay_id)
+        assert essay.status == essay_status
+        if correction_status:
+            correction = session.query(Correction).filter_by(essay_id=essay_id).one()
+            assert correction.status == correction_status
+        # 批量UPDATE提交后写入状态缓存
+        assert cache.backend.read(essay_id)['status'] == essay_status
+    # 运行中但超时的任务应清除任务ID
+    assert session.query(Correction).filter_by(status='pending', task_id='task-2').count() == 0
+
+
+def test_corrections_of_essays_finished_during_scan_are_untouched(sqlite_session, monkeypatch):
+    session = sqlite_session
+    monkeypatch.setattr('app.core.correction.reconciliation.essay_status_cache',
+                        EssayStatusCache(backend=_LocalStatusBackend()))
+    user = User(username='recon2', email='recon2@example.com', password_hash='x')
+    session.add(user)
+    session.flush()
+    essays = [Essay(title=f'作文{i}', content='内容', user_id=user.id, status='correcting') for i in range(2)]
+    session.add_all(essays)
+    session.flush()
+    session.add_all([Correction(essay_id=essay.id, status='correcting', task_id=f'late-{essay.id}')
+                     for essay in essays])
+    session.commit()
+    session.execute(Essay.__table__.update().values(updated_at=datetime.utcnow() - timedelta(hours=3)))
+    session.commit()
+    finished_id = essays[0].id
+
+    # 扫描之后、批量UPDATE之前，第一篇作文批改完成
+    from app.core.correction import reconciliation
+    original = reconciliation._fetch_stale_chunk
+
+    def fetch_then_finish(*args, **kwargs):
+        rows = original(*args, **kwargs)
+        if rows:
+            session.execute(Essay.__table__.update().where(Essay.id == finished_id).values(status='completed'))
+            session.execute(Correction.__table__.update().where(Correction.essay_id == finished_id)
+                            .values(status='completed'))
+        return rows
+
+    monkeypatch.setattr(reconciliation, '_fetch_stale_chunk', fetch_then_finish)
+    reconcile_stale_essays(datetime.utcnow() - timedelta(hours=2), session=session,
+                           celery_app=FakeCeleryApp({}))
+
+    session.expire_all()
+    finished = session.query(Correction).filter_by(essay_id=finished_id).one()
+    assert (finished.status, finished.task_id) == ('completed', f'late-{finished_id}')
+    assert session.get(Essay, essays[1].id).status == 'pending'
+    assert session.query(Correction).filter_by(essay_id=essays[1].id).one().task_id is None
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试SQLite生产模式配置与在线备份
+"""
+
+import sqlite3
+import shutil
+import pytest
+
+from app.core.db import sqlite_backup
+from app.core.db.sqlite_backup import online_backup, online_restore, verify_backup, BackupError
+from app.core.db.sqlite_profile import build_pragma_statements
+
+
+def _make_db(path, rows=200):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE essays (id INTEGER PRIMARY KEY, content TEXT)')
+    conn.executemany('INSERT INTO essays (content) VALUES (?)', [(f'作文内容{i}' * 20,) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def _count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM essays').fetchone()[0]
+    finally:
+        conn.close()
+
+
+class TestOnlineBackup:
+    """测试在线备份与恢复"""
+
+    def test_compressed_backup_restore_roundtrip(self, tmp_path):
+        source = str(tmp_path / 'source.db')
+        _make_db(source)
+
+        backup_file = str(tmp_path / 'backup_daily_20260101_000000.db.gz')
+        stats = online_backup(source, backup_file, step_pages=4, step_sleep=0)
+        assert stats['compressed'] is True
+        assert stats['backup_size'] < stats['source_size']
+        assert verify_backup(backup_file) == 'ok'
+
+        target = str(tmp_path / 'target.db')
+        _make_db(target, rows=5)
+        online_restore(backup_file, target, step_pages=4, step_sleep=0)
+        assert _count(target) == 200
+
+    def test_insufficient_space_fails_before_copying(self, tmp_path, monkeypatch):
+        source = str(tmp_path / 'source.db')
+        _make_db(source)
+        required = sqlite_backup.required_backup_space(source)
+        assert required == 2 * (tmp_path / 'source.db').stat().st_size
+
+        usage = shutil.disk_usage(str(tmp_path))
+        monkeypatch.setattr(sqlite_backup.shutil, 'disk_usage', lambda path: usage._replace(free=required - 1))
+        with pytest.raises(BackupError):
+            online_backup(source, str(tmp_path / 'out.db.gz'))
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['source.db']
+
+    def test_missing_source_raises(self, tmp_path):
+        with pytest.raises(BackupError):
+            online_backup(str(tmp_path / 'missing.db'), str(tmp_path / 'out.db.gz'))
+        assert not (tmp_path / 'out.db.gz').exists()
+
+
+def test_pragma_statements_put_journal_mode_first():
+    statements = build_pragma_statements({'busy_timeout': 5000, 'journal_mode': 'WAL', 'mmap_size': None})
+    assert statements == ['PRAGMA journal_mode=WAL', 'PRAGMA busy_timeout=5000']
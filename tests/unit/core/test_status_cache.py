@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试作文状态缓存：提交后发布、只读缓存、ETag长轮询与SSE
+"""
+
+import threading
+
+import pytest
+
+from app.models.user import User
+from app.models.essay import Essay
+from app.core.correction import status_cache
+from app.core.correction.status_cache import (
+    EssayStatusCache, _LocalStatusBackend, install_status_listeners, make_etag
+)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = EssayStatusCache(backend=_LocalStatusBackend(), max_wait=2)
+    monkeypatch.setattr(status_cache, 'essay_status_cache', cache)
+    install_status_listeners()
+    return cache
+
+
+def make_essay(session):
+    user = User(username='status_user', email='status@example.com', password_hash='x')
+    session.add(user)
+    session.flush()
+    essay = Essay(title='t', content='c', user_id=user.id, status='pending')
+    session.add(essay)
+    session.commit()
+    return essay
+
+
+def test_transitions_publish_after_commit_only(cache, sqlite_session):
+    essay = make_essay(sqlite_session)
+    assert cache.get_status(essay.id)['status'] == 'pending'
+    assert cache.get_status(essay.id)['user_id'] == essay.user_id
+
+    essay.status = 'correcting'
+    sqlite_session.flush()
+    sqlite_session.rollback()
+    assert cache.get_status(essay.id)['status'] == 'pending'
+
+    essay = sqlite_session.get(Essay, essay.id)
+    essay.status = 'failed'
+    essay.error_message = 'timeout'
+    sqlite_session.commit()
+    record = cache.get_status(essay.id)
+    assert (record['status'], record['error_message'], record['version']) == ('failed', 'timeout', 2)
+
+    sqlite_session.delete(essay)
+    sqlite_session.commit()
+    assert cache.backend.read(record['essay_id']) is None
+
+
+def test_reads_hit_only_cache(cache, sqlite_session):
+    essay_id = make_essay(sqlite_session).id
+    sqlite_session.statements.clear()
+    for _ in range(5):
+        assert cache.get_status(essay_id)['status'] == 'pending'
+    assert sqlite_session.statements == []
+
+
+def test_etag_long_poll_wakes_on_change(cache):
+    record = cache.publish(7, 'pending', user_id=1)
+    etag = make_etag(record)
+
+    same, not_modified = cache.wait_if_unchanged(record, etag, wait=0)
+    assert not_modified and same is record
+    changed, not_modified = cache.wait_if_unchanged(record, '"7-0"', wait=0)
+    assert not not_modified
+
+    timer = threading.Timer(0.05, lambda: cache.publish(7, 'correcting', user_id=1))
+    timer.start()
+    changed, not_modified = cache.wait_if_unchanged(record, etag, wait=2)
+    timer.join()
+    assert not not_modified
+    assert changed['status'] == 'correcting' and make_etag(changed) != etag
+
+
+def test_sse_stream_ends_on_final_status(cache):
+    record = cache.publish(8, 'correcting', user_id=1)
+    threading.Timer(0.05, lambda: cache.publish(8, 'completed', user_id=1, correction_id=3)).start()
+    events = [chunk for chunk in cache.stream(8, record) if chunk.startswith('id:')]
+    assert len(events) == 2
+    assert '"status": "completed"' in events[-1]
+
+
+def test_hub_keeps_records_only_while_waited_on(cache):
+    # 没有等待者的作文状态变化不在进程内保留
+    for essay_id in range(100, 150):
+        cache.publish(essay_id, 'correcting', user_id=1)
+    assert cache.hub.tracked() == 0
+
+    record = cache.publish(9, 'pending', user_id=1)
+    threading.Timer(0.05, lambda: cache.publish(9, 'correcting', user_id=1)).start()
+    assert cache.wait_for_change(9, record['version'], 2)['status'] == 'correcting'
+    assert cache.hub.tracked() == 0
+    # 登记等待之前已经发生的变化立即返回
+    assert cache.wait_for_change(9, record['version'], 2)['status'] == 'correcting'
+
+
+def test_bulk_publish_updates_cache_and_wakes_waiters(cache, sqlite_session, monkeypatch):
+    essay = make_essay(sqlite_session)
+    record = cache.get_status(essay.id)
+    threading.Timer(0.05, lambda: cache.publish_many([essay.id, 404], 'completed')).start()
+    changed = cache.wait_for_change(essay.id, record['version'], 2)
+    assert (changed['status'], changed['version']) == ('completed', record['version'] + 1)
+    assert cache.backend.read(essay.id)['user_id'] == essay.user_id
+    # 批量写入的记录缺少user_id，读取时按未命中从数据库加载
+    loaded = []
+    monkeypatch.setattr(cache, '_load', lambda essay_id: loaded.append(essay_id))
+    assert 'user_id' not in cache.backend.read(404)
+    assert cache.get_status(404) is None and loaded == [404]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试集合式的会员流失、续订与转化统计
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.user import User
+from app.models.essay import Essay
+from app.models.membership import Membership, MembershipPlan
+from app.models.subscription import Subscription
+from app.core.analytics import subscription_metrics
+from app.core.analytics.membership_analytics import MembershipAnalytics
+from app.core.analytics.subscription_metrics import DailyReportCache
+
+NOW = datetime(2026, 6, 15, 12, 0)
+
+
+def seed(session):
+    """两个计划：basic 有3个窗口初有效的会员（1个续订、1个流失、1个未到期），premium 有1个流失"""
+    basic = MembershipPlan(name='基础会员', code='basic', price=10, duration_days=30)
+    premium = MembershipPlan(name='高级会员', code='premium', price=30, duration_days=30)
+    idle = MembershipPlan(name='年度会员', code='yearly', price=300, duration_days=365)
+    session.add_all([basic, premium, idle])
+    session.flush()
+
+    users = [User(username=f'member{i}', email=f'member{i}@example.com', password_hash='x',
+                  created_at=NOW - timedelta(days=90 if i < 4 else 5)) for i in range(6)]
+    session.add_all(users)
+    session.flush()
+    old = NOW - timedelta(days=60)
+    members = [
+        (basic, NOW - timedelta(days=10)),    # 到期后续订
+        (basic, NOW - timedelta(days=5)),     # 流失
+        (basic, NOW + timedelta(days=10)),    # 未到期
+        (premium, NOW - timedelta(days=20)),  # 流失
+    ]
+    for user, (plan, end_date) in zip(users, members):
+        session.add(Membership(user_id=user.id, plan_id=plan.id, end_date=end_date,
+                               start_date=old, created_at=old))
+    # 新注册用户：一个付费开通，一个未付费
+    session.add(Membership(user_id=users[4].id, plan_id=premium.id, end_date=NOW + timedelta(days=25),
+                           start_date=NOW - timedelta(days=3), created_at=NOW - timedelta(days=3)))
+    session.add(Membership(user_id=users[5].id, plan_id=basic.id, end_date=NOW + timedelta(days=25),
+                           start_date=NOW - timedelta(days=2), created_at=NOW - timedelta(days=2)))
+    session.add_all([
+        Subscription(user_id=users[0].id, plan_id=basic.id, status='active', start_date=NOW,
+                     end_date=NOW + timedelta(days=30), created_at=NOW - timedelta(days=8)),
+        # 到期前的付费不算续订
+        Subscription(user_id=users[1].id, plan_id=basic.id, status='expired', start_date=old,
+                     end_date=NOW - timedelta(days=5), created_at=old),
+        Subscription(user_id=users[4].id, plan_id=premium.id, status='active', start_date=NOW,
+                     end_date=NOW + timedelta(days=25), created_at=NOW - timedelta(days=3)),
+        Subscription(user_id=users[5].id, plan_id=basic.id, status='pending', start_date=NOW,
+                     end_date=NOW + timedelta(days=25), created_at=NOW - timedelta(days=2)),
+    ])
+    session.commit()
+    return users
+
+
+def test_churn_report_uses_one_grouped_query(app_session):
+    seed(app_session)
+    app_session.statements.clear()
+
+    report = subscription_metrics.churn_report(NOW, window_days=30)
+
+    # 一次聚合查询加一次计划名称查询，与计划数量无关
+    assert len(app_session.statements) == 2
+    assert (report['active_members'], report['churned_members'], report['churn_rate']) == (4, 2, 50.0)
+    plans = {plan['plan_code']: plan for plan in report['plans']}
+    assert (plans['basic']['members_count'], plans['basic']['churned_count']) == (3, 1)
+    assert plans['premium']['churn_rate'] == 100.0
+    assert plans['yearly']['members_count'] == 0
+
+
+def test_renewal_and_conversion_reports(app_session):
+    seed(app_session)
+
+    renewal = subscription_metrics.renewal_report(90, now=NOW)
+    assert (renewal['expired'], renewal['renewed'], renewal['renewal_rate']) == (3, 1, 33.33)
+    assert [(m['month'], m['expired'], m['renewed']) for m in renewal['months']] == [('2026-05', 1, 0),
+                                                                                    ('2026-06', 2, 1)]
+
+    conversion = subscription_metrics.conversion_report(30, now=NOW)
+    assert (conversion['new_users'], conversion['paid_memberships'], conversion['conversion_rate']) == (2, 1, 50.0)
+    assert conversion['plans'] == [{'plan_code': 'premium', 'plan_name': '高级会员',
+                                    'subscriptions': 1, 'percentage': 100.0}]
+    assert len(conversion['days']) == 31
+    assert {day['date']: day['new_memberships'] for day in conversion['days']}['2026-06-12'] == 1
+
+
+def test_early_renewal_counts_as_renewed(app_session):
+    plan = MembershipPlan(name='基础会员', code='basic', price=10, duration_days=30)
+    user = User(username='early', email='early@example.com', password_hash='x')
+    app_session.add_all([plan, user])
+    app_session.flush()
+    start = NOW - timedelta(days=40)
+    app_session.add(Membership(user_id=user.id, plan_id=plan.id, start_date=start, created_at=start,
+                               end_date=NOW - timedelta(days=3)))
+    app_session.add_all([
+        Subscription(user_id=user.id, plan_id=plan.id, status='expired', start_date=start,
+                     end_date=NOW - timedelta(days=3), created_at=start),
+        # 到期前一周提前续订
+        Subscription(user_id=user.id, plan_id=plan.id, status='active', start_date=NOW - timedelta(days=3),
+                     end_date=NOW + timedelta(days=27), created_at=NOW - timedelta(days=10)),
+    ])
+    app_session.commit()
+
+    renewal = subscription_metrics.renewal_report(90, now=NOW)
+    assert (renewal['expired'], renewal['renewed']) == (1, 1)
+    churn = subscription_metrics.churn_report(NOW, window_days=30)
+    assert (churn['active_members'], churn['churned_members']) == (1, 0)
+
+
+def test_expiring_members_carry_usage(app_session):
+    users = seed(app_session)
+    app_session.add_all(
+        [Essay(user_id=users[2].id, title='近期', content='x', created_at=NOW - timedelta(days=3))] +
+        [Essay(user_id=users[2].id, title='此前', content='x', created_at=NOW - timedelta(days=40 + i))
+         for i in range(3)])
+    app_session.commit()
+    app_session.statements.clear()
+
+    members = list(subscription_metrics.iter_expiring_members(NOW, days=30))
+
+    assert len(app_session.statements) == 1
+    assert [m['user_id'] for m in members] == [users[2].id, users[4].id, users[5].id]
+    assert (members[0]['recent_usage'], members[0]['previous_usage'], members[0]['plan_name']) == (1, 3, '基础会员')
+    assert members[1]['last_paid_at'] == NOW - timedelta(days=3)
+
+
+def test_reports_are_cached_per_day(app_session, monkeypatch):
+    seed(app_session)
+    cache = DailyReportCache(store='local')
+    monkeypatch.setattr(subscription_metrics, 'report_cache', cache)
+
+    first = MembershipAnalytics.get_membership_renewal_stats(90)
+    app_session.statements.clear()
+    second = MembershipAnalytics.get_membership_renewal_stats(90)
+
+    assert first['status'] == 'success'
+    assert second == first
+    assert app_session.statements == []
+    # 参数不同或换日则重新计算
+    MembershipAnalytics.get_membership_renewal_stats(30)
+    assert app_session.statements
+    calls = []
+    cache.get_or_compute('renewal', {'period_days': 90}, lambda: calls.append(1) or {'status': 'success'},
+                         day=NOW.date() + timedelta(days=1))
+    assert calls == [1]
+
+
+def test_report_cache_day_follows_utc(monkeypatch):
+    class LateEveningUTC(datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime(2026, 6, 15, 23, 30)
+
+    # 本地时区已是次日时，缓存日期仍按报表统计使用的UTC日期
+    monkeypatch.setattr(subscription_metrics, 'datetime', LateEveningUTC)
+    cache = DailyReportCache(store='local')
+    cache.get_or_compute('renewal', {'period_days': 90}, lambda: {'status': 'success'})
+    assert list(cache._local) == [cache.make_key('renewal', {'period_days': 90}, NOW.date())]
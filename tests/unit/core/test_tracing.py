@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试批改流水线的span记录、链路上下文传递与作文时间线
+"""
+
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core.monitoring import tracing
+from app.core.monitoring.tracing import (
+    span, traced, record_span, start_trace, bind_essay, trace_headers, headers_from_task_request,
+    get_essay_timeline, parse_traceparent, TRACEPARENT_HEADER, ENQUEUED_AT_HEADER
+)
+
+
+@pytest.fixture(autouse=True)
+def local_store(monkeypatch):
+    """使用进程内时间线存储"""
+    store = tracing._LocalTimelineStore()
+    monkeypatch.setattr(tracing, '_store', store)
+    return store
+
+
+def histogram_count(stage, outcome):
+    value = REGISTRY.get_sample_value('correction_stage_seconds_count', {'stage': stage, 'outcome': outcome})
+    return value or 0
+
+
+def test_spans_before_essay_id_are_flushed_on_bind():
+    with start_trace():
+        with span('upload'):
+            pass
+        with span('submit') as submit:
+            with span('db_write'):
+                bind_essay(101)
+            submit['attributes']['essay'] = 'ok'
+
+    timeline = get_essay_timeline(101)
+    stages = [entry['stage'] for entry in timeline['spans']]
+    assert sorted(stages) == ['db_write', 'submit', 'upload']
+    assert len(timeline['trace_ids']) == 1
+    by_stage = {entry['stage']: entry for entry in timeline['spans']}
+    assert by_stage['db_write']['parent_id'] == by_stage['submit']['span_id']
+    assert all(entry['essay_id'] == 101 for entry in timeline['spans'])
+
+
+def test_trace_propagates_through_task_headers():
+    class FakeRequest:
+        headers = None
+
+    with start_trace(essay_id=202) as ctx:
+        with span('enqueue'):
+            headers = trace_headers()
+    request = FakeRequest()
+    for name, value in headers.items():
+        setattr(request, name, value)
+
+    received = headers_from_task_request(request)
+    assert parse_traceparent(received[TRACEPARENT_HEADER]).trace_id == ctx.trace_id
+    with start_trace(essay_id=202, traceparent=received[TRACEPARENT_HEADER]):
+        record_span('queue_wait', float(received[ENQUEUED_AT_HEADER]), time.time())
+        with span('llm_call', model='deepseek-chat'):
+            pass
+
+    timeline = get_essay_timeline(202)
+    assert timeline['trace_ids'] == [ctx.trace_id]
+    assert [entry['stage'] for entry in timeline['spans']] == ['enqueue', 'queue_wait', 'llm_call']
+    assert timeline['spans'][2]['attributes'] == {'model': 'deepseek-chat'}
+    assert timeline['spans'][0]['offset_ms'] == 0
+    assert timeline['total_ms'] >= timeline['stages']['llm_call']
+
+
+def test_outcomes_and_histogram():
+    before = histogram_count('transition_state', 'error')
+
+    @traced('transition_state')
+    def transition(ok):
+        return ok
+
+    with start_trace(essay_id=303):
+        transition(True)
+        transition(False)
+        with pytest.raises(ValueError):
+            with span('json_parse'):
+                raise ValueError('bad json')
+
+    outcomes = [(entry['stage'], entry['outcome']) for entry in get_essay_timeline(303)['spans']]
+    assert outcomes == [('transition_state', 'ok'), ('transition_state', 'error'), ('json_parse', 'error')]
+    after = histogram_count('transition_state', 'error')
+    assert after == before + 1
+
+
+def test_invalid_headers_start_new_trace():
+    assert parse_traceparent('not-a-header') is None
+    assert headers_from_task_request(object()) == {}
+    with start_trace(essay_id=404, traceparent='00-xyz-abc-01') as ctx:
+        assert len(ctx.trace_id) == 32
+    assert record_span('queue_wait', None, time.time()) is None
+    assert get_essay_timeline(405)['spans'] == []
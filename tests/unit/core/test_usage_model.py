@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试向量化的会员用量建模与夜间批量预测
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.models.user import User
+from app.models.essay import Essay
+from app.models.membership import Membership, MembershipPlan
+from app.models.usage_prediction import UsagePrediction
+from app.core.analytics import usage_model as usage_model_module
+from app.core.analytics.usage_model import UsageModel, usage_features, project_usage
+from app.core.analytics.membership_analytics import MembershipAnalytics
+
+NOW = datetime(2026, 6, 15, 12, 0)
+
+
+def seed(session, members=5, now=NOW):
+    """每个会员第i个用户在窗口内每天提交 i 篇（第0个用户没有提交）"""
+    plan = MembershipPlan(name='基础会员', code='basic', price=10, duration_days=30, max_essays_total=100)
+    unlimited = MembershipPlan(name='无限会员', code='unlimited', price=99, duration_days=30, max_essays_total=0)
+    session.add_all([plan, unlimited])
+    session.flush()
+    users = [User(username=f'usage{i}', email=f'usage{i}@example.com', password_hash='x') for i in range(members)]
+    session.add_all(users)
+    session.flush()
+    for index, user in enumerate(users):
+        session.add(Membership(user_id=user.id, plan_id=unlimited.id if index == members - 1 else plan.id,
+                               end_date=now + timedelta(days=20), essays_used_total=10 * index))
+        session.add_all([Essay(user_id=user.id, title='t', content='x', created_at=now - timedelta(days=day, hours=1))
+                         for day in range(30) for _ in range(index)])
+    session.commit()
+    return [user.id for user in users]
+
+
+def test_features_and_projection_are_vectorized():
+    days = 30
+    matrix = np.vstack([np.zeros(days), np.full(days, 2.0), np.arange(days, dtype=float)])
+    features = usage_features(matrix)
+
+    assert features['mean'].tolist() == [0, 2, 14.5]
+    assert features['rolling_7'].tolist() == [0, 2, 26]
+    np.testing.assert_allclose(features['slope'], [0, 0, 1])
+
+    projection = project_usage(features, np.array([10, 10, 10]), np.array([np.nan, 15, 1000]), days)
+    # 上升趋势外推：未来10天趋势线的平均值 29 + 5.5
+    np.testing.assert_allclose(projection['projected_daily'], [0, 2, 34.5])
+    assert projection['predicted_total'].tolist() == [0, 20, 345]
+    assert projection['will_exceed'].tolist() == [False, True, False]
+    assert projection['days_until_exhausted'].tolist() == [-1, 7, -1]
+
+
+def test_nightly_batch_runs_one_aggregate_per_batch(app_session):
+    user_ids = seed(app_session)
+    model = UsageModel(batch_size=2)
+    app_session.statements.clear()
+
+    result = model.run_nightly(NOW)
+
+    assert (result['members'], result['batches']) == (5, 3)
+    essay_queries = [s for s in app_session.statements if 'FROM essays' in s]
+    assert len(essay_queries) == 3
+    predictions = {p.user_id: p for p in app_session.query(UsagePrediction).all()}
+    assert len(predictions) == 5
+    busy = predictions[user_ids[3]]
+    assert (busy.daily_average_usage, busy.trend_per_day) == (3, 0)
+    assert (busy.days_remaining, busy.predicted_total_usage, busy.remaining_quota) == (20, 60, 70)
+    assert predictions[user_ids[4]].remaining_quota is None
+    assert len(busy.usage_history) == 30
+
+    # 重新计算时覆盖已有结果
+    model.run_nightly(NOW)
+    assert app_session.query(UsagePrediction).count() == 5
+
+
+def test_api_reads_precomputed_prediction(app_session, monkeypatch):
+    now = datetime.utcnow()
+    user_ids = seed(app_session, members=3, now=now)
+    model = UsageModel()
+    model.run_nightly(now)
+    monkeypatch.setattr('app.core.analytics.membership_analytics.usage_model', model)
+    app_session.statements.clear()
+
+    result = MembershipAnalytics.get_membership_usage_predictions(user_ids[1])
+
+    assert len(app_session.statements) == 1
+    assert result['status'] == 'success'
+    assert result['plan_name'] == '基础会员'
+    assert result['total_remaining_quota'] == 90
+
+    # 没有预先计算的结果时即时计算
+    app_session.query(UsagePrediction).delete()
+    app_session.commit()
+    fresh = MembershipAnalytics.get_membership_usage_predictions(user_ids[1])
+    assert {key: fresh[key] for key in ('daily_average_usage', 'predicted_total_usage', 'plan_name')} == \
+        {key: result[key] for key in ('daily_average_usage', 'predicted_total_usage', 'plan_name')}
+    assert MembershipAnalytics.get_membership_usage_predictions(9999)['message'] == '未找到会员信息'
+
+
+def test_usage_history_uses_one_grouped_query(app_session):
+    user_ids = seed(app_session, members=3)
+    app_session.statements.clear()
+
+    history = usage_model_module.UsageModel().get_usage_history(user_ids[2], 31, now=NOW)
+
+    assert len(app_session.statements) == 1
+    assert len(history) == 31
+    assert history[0] == {'date': '2026-05-16', 'count': 0}
+    assert history[-1] == {'date': '2026-06-15', 'count': 2}
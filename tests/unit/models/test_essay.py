@@ -157,4 +157,44 @@ class TestEssayModel:
         db.session.add(essay)
         db.session.commit()
         
-        assert essay.source_type == expected 
\ No newline at end of file
+        assert essay.source_type == expected 
+
+class TestEssayLoadingProfiles:
+    """测试Essay/Correction的延迟加载与查询配置"""
+
+    def _compiled(self, query):
+        return str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+
+    def test_large_columns_deferred_by_default(self, app, db):
+        """默认查询不应加载正文和批改结果"""
+        sql = self._compiled(Essay.query)
+        assert 'essays.title' in sql
+        assert 'essays.content' not in sql
+        assert 'essays.error_analysis' not in sql
+        assert 'users' not in sql
+
+    def test_listing_and_scan_profiles(self, app, db):
+        """列表与扫描配置只选择元数据列"""
+        from app.core.db.query_profiles import essay_listing_options, essay_scan_options
+        listing_sql = self._compiled(Essay.query.options(*essay_listing_options()))
+        assert 'essays.status' in listing_sql
+        assert 'essays.content' not in listing_sql
+        assert 'essays.ai_comments' not in listing_sql
+
+        scan_sql = self._compiled(Essay.query.options(*essay_scan_options()))
+        assert 'essays.updated_at' in scan_sql
+        assert 'essays.title' not in scan_sql
+
+    def test_detail_profile_undefers_groups(self, app, db):
+        """详情配置应加载正文和批改结果"""
+        from app.core.db.query_profiles import essay_detail_options, correction_detail_options
+        from app.models.correction import Correction
+        sql = self._compiled(Essay.query.options(*essay_detail_options()))
+        assert 'essays.content' in sql
+        assert 'essays.corrected_content' in sql
+        assert 'essays.ai_analysis' in sql
+
+        assert 'corrections.results' not in self._compiled(Correction.query)
+        correction_sql = self._compiled(Correction.query.options(*correction_detail_options()))
+        assert 'corrections.results' in correction_sql
+        assert 'corrections.extra_data' in correction_sql
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试批处理工具函数（键集分块迭代、批量写入、流式批处理）
+"""
+
+import sys
+import types
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table
+
+from app.models.user import User
+from app.models.essay import Essay
+from app.tasks import batch_processor_tasks
+from app.tasks.batch_optimization import (
+    iterate_in_chunks, chunked_insert, chunked_update, chunked_delete, iter_batch_results, batch_processor
+)
+
+
+@pytest.fixture
+def sqlite_session(sqlite_session):
+    sqlite_session.add(User(id=1, username='batch', email='batch@example.com', password_hash='x'))
+    sqlite_session.commit()
+    return sqlite_session
+
+
+def _insert_essays(session, count):
+    return chunked_insert(session, Essay, (
+        {'title': f'作文{i}', 'content': '内容', 'user_id': 1, 'status': 'failed' if i % 2 else 'completed'}
+        for i in range(count)
+    ), chunk_size=10)
+
+
+def test_chunked_insert_uses_executemany(sqlite_session):
+    del sqlite_session.statements[:]
+    result = _insert_essays(sqlite_session, 25)
+    assert result['inserted'] == 25
+    inserts = [s for s in sqlite_session.statements if s.startswith('INSERT')]
+    assert len(inserts) == 3
+
+
+def test_iterate_in_chunks_uses_keyset(sqlite_session):
+    _insert_essays(sqlite_session, 25)
+    del sqlite_session.statements[:]
+    chunks = list(iterate_in_chunks(sqlite_session.query(Essay), chunk_size=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    selects = [s for s in sqlite_session.statements if s.startswith('SELECT')]
+    assert all('essays.id > ?' in s for s in selects[1:])
+
+    ids = [row.id for chunk in iterate_in_chunks(
+        sqlite_session.query(Essay.id).filter(Essay.status == 'failed'), chunk_size=4, key_column=Essay.id)
+        for row in chunk]
+    assert len(ids) == 12 and ids == sorted(ids)
+
+
+def test_chunked_update_and_delete(sqlite_session):
+    _insert_essays(sqlite_session, 25)
+    ids = [essay_id for (essay_id,) in sqlite_session.query(Essay.id)]
+    progress = []
+    result = chunked_update(sqlite_session, Essay, ids, {'status': 'pending'}, chunk_size=10,
+                            extra_condition=Essay.status == 'failed',
+                            progress_callback=lambda done, total: progress.append((done, total)))
+    assert result['updated'] == 12
+    assert progress[-1] == (25, 25)
+
+    result = chunked_delete(sqlite_session, Essay, Essay.status == 'pending', chunk_size=5)
+    assert result['deleted'] == 12
+    assert sqlite_session.query(Essay).count() == 13
+
+
+def test_iter_batch_results_streams_generators():
+    produced = []
+
+    def items():
+        for i in range(50):
+            produced.append(i)
+            yield i
+
+    stream = iter_batch_results(items(), lambda x: x * 2, batch_size=5, max_workers=2)
+    first = next(stream)
+    # 在途批次有上限，不会预先消费整个生成器
+    assert len(produced) <= 5 * (2 * 2 + 1)
+    rest = list(stream)
+    assert sum(batch['processed'] for batch in [first] + rest) == 50
+
+    result = batch_processor(iter(range(20)), lambda x: 1 / (x % 5), batch_size=4,
+                             use_threading=False, collect_results=False)
+    assert result['processed'] == 16 and result['failed'] == 4
+    assert result['results'] == []
+
+
+def test_iterate_in_chunks_rejects_ordered_query(sqlite_session):
+    with pytest.raises(ValueError):
+        next(iterate_in_chunks(sqlite_session.query(Essay).order_by(Essay.created_at), chunk_size=10))
+
+
+def test_bulk_status_update_and_history_commit_together(app_session, monkeypatch):
+    app_session.add(User(id=1, username='batch', email='batch@example.com', password_hash='x'))
+    app_session.commit()
+    _insert_essays(app_session, 4)
+    ids = [essay_id for (essay_id,) in app_session.query(Essay.id)]
+    versions = dict(app_session.query(Essay.id, Essay.version))
+    published = []
+    monkeypatch.setattr(batch_processor_tasks.essay_status_cache, 'publish_many',
+                        lambda essay_ids, status: published.extend(essay_ids))
+    # 状态历史表不存在：写历史失败时状态UPDATE一并回滚，也不发布到状态缓存
+    history = types.ModuleType('app.models.essay_status_history')
+    history.EssayStatusHistory = Table('essay_status_history', MetaData(), Column('essay_id', Integer))
+    monkeypatch.setitem(sys.modules, 'app.models.essay_status_history', history)
+
+    result = batch_processor_tasks.bulk_update_essay_status.apply((ids, 'archived'), task_id='bulk-1').get()
+    assert result['status'] == 'error' and published == []
+    assert app_session.query(Essay).filter_by(status='archived').count() == 0
+    assert dict(app_session.query(Essay.id, Essay.version)) == versions
+
+    monkeypatch.delitem(sys.modules, 'app.models.essay_status_history')
+    result = batch_processor_tasks.bulk_update_essay_status.apply((ids, 'archived'), task_id='bulk-2').get()
+    assert result['processed'] == 4 and sorted(published) == sorted(ids)
+    assert app_session.query(Essay).filter_by(status='archived').count() == 4
+    # 批量UPDATE同样递增版本号，此前读到旧版本的乐观锁更新会失败
+    assert dict(app_session.query(Essay.id, Essay.version)) == {
+        essay_id: version + 1 for essay_id, version in versions.items()}
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试编译后的字段映射计划
+"""
+
+import pytest
+
+from app.utils.field_mapper import FieldMapper, get_field_mapper
+
+RESPONSE = {
+    "总得分": "45",
+    "分项得分": {"内容主旨": 18, "语言文采": 14, "文章结构": 9, "文面书写": 4},
+    "总体评价": "  立意明确。 ",
+    "内容分析": "内容充实",
+    "写作建议": "增加细节\n\n注意标点",
+    "错别字": ["的->地"],
+}
+
+
+@pytest.fixture
+def builtin_mapper(tmp_path):
+    """映射文件不存在时使用内置的扁平映射"""
+    return FieldMapper(str(tmp_path / "missing.yaml"))
+
+
+def test_builtin_mapping(builtin_mapper):
+    result = builtin_mapper.normalize_result(RESPONSE, "deepseek")
+    assert result["scores"]["total"] == 45.0
+    assert result["scores"]["dimensions"] == {"content": 18, "language": 14, "structure": 9, "grammar": 4}
+    assert result["analyses"]["summary"] == "立意明确。"
+    assert result["feedback"]["improvements"] == ["增加细节", "注意标点"]
+    assert result["metadata"]["provider"] == "deepseek"
+    assert builtin_mapper.get_standard_field("deepseek", "scores", "总得分") == "total"
+
+
+@pytest.mark.parametrize("provider", ["deepseek", "dashscope", "openai"])
+def test_yaml_providers_share_core_structure(provider):
+    result = get_field_mapper().normalize_result(RESPONSE, provider)
+    assert result["scores"]["total"] == 45.0
+    assert result["scores"]["dimensions"]["grammar"] == 4
+    assert result["analyses"]["summary"] == "立意明确。"
+    assert result["analyses"]["content"] == "内容充实"
+    assert result["feedback"]["corrections"] == ["的->地"]
+
+
+def test_alias_order_and_invalid_scores(builtin_mapper):
+    mapper = get_field_mapper()
+    assert mapper.normalize_result({"score": 30, "总得分": 40}, "deepseek")["scores"]["total"] == 40
+    assert mapper.normalize_result({"score": 30}, "deepseek")["scores"]["total"] == 30
+    assert mapper.normalize_result({"总得分": "很好"}, "deepseek")["scores"]["total"] == 0
+    assert mapper.normalize_result({"总得分": 80}, "deepseek")["scores"]["total"] == 50
+    assert mapper.get_standard_field("openai", "scores", "总得分") == "total_score"
+
+
+def test_default_structure_is_independent(builtin_mapper):
+    first = builtin_mapper.normalize_result({"分项得分": {"内容主旨": 10}}, "deepseek")
+    first["feedback"]["strengths"].append("x")
+    second = builtin_mapper.normalize_result(None, "deepseek")
+    assert second["feedback"]["strengths"] == []
+    assert second["scores"]["dimensions"] == {}
+    assert builtin_mapper.core_fields["scores"]["dimensions"] == {}
+    assert builtin_mapper.normalize_result(RESPONSE, "unknown")["scores"]["total"] == 0
+
+
+def test_shared_mapper_is_cached():
+    assert get_field_mapper() is get_field_mapper()
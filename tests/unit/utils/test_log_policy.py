@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试热路径日志策略
+"""
+
+import logging
+
+from app.utils.log_policy import LogPolicy, LazyPayload, truncate, apply_module_levels
+from app.core.ai.api_monitor import APIMonitor
+from app.core.monitoring.tracing import start_trace
+
+
+class Exploding:
+    def __str__(self):
+        raise AssertionError("未输出的日志不应格式化载荷")
+
+
+def test_truncate_budget():
+    assert truncate("abc", 10) == "abc"
+    assert truncate("a" * 20, 5) == "aaaaa...(共20字符)"
+    assert truncate({"k": "值"}, 0) == '{"k": "值"}'
+
+
+def test_sampling_logs_first_of_every_n():
+    policy = LogPolicy(sample_rate=3)
+    assert [policy.sample() for _ in range(7)] == [True, False, False, True, False, False, True]
+    assert LogPolicy(sample_rate=0).sample() is False
+
+
+def test_one_sampling_decision_per_correction():
+    policy = LogPolicy(sample_rate=4)
+    decisions = {}
+    for index in range(40):
+        with start_trace(essay_id=None) as ctx:
+            decisions[ctx.trace_id] = [policy.sample() for _ in range(5)]
+    # 同一链路内的所有日志点结果一致，不受其他链路和调用次数影响
+    assert all(len(set(values)) == 1 for values in decisions.values())
+    assert 0 < sum(values[0] for values in decisions.values()) < 40
+    assert policy.sample('req-1') == policy.sample('req-1')
+
+
+def test_log_payload_sampled_and_errors_always(caplog):
+    policy = LogPolicy(sample_rate=100, max_chars=8)
+    log = logging.getLogger("test.log_policy")
+    with caplog.at_level(logging.INFO, logger="test.log_policy"):
+        assert policy.log_payload(log, "请求", "x" * 50) is True
+        assert policy.log_payload(log, "请求", "y" * 50) is False
+        assert policy.log_payload(log, "失败请求", "z" * 50, is_error=True) is True
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages == ["请求: xxxxxxxx...(共50字符)", "失败请求: zzzzzzzz...(共50字符)"]
+    assert caplog.records[-1].levelno == logging.ERROR
+
+
+def test_disabled_level_skips_formatting(caplog):
+    policy = LogPolicy(sample_rate=1)
+    log = logging.getLogger("test.log_policy.lazy")
+    with caplog.at_level(logging.INFO, logger="test.log_policy.lazy"):
+        assert policy.log_payload(log, "调试载荷", Exploding(), level=logging.DEBUG) is False
+    assert isinstance(policy.payload("abc"), LazyPayload)
+
+
+def test_apply_module_levels():
+    applied = apply_module_levels("test.module_a=WARNING, test.module_b=debug,broken,test.c=NOPE")
+    assert applied == {"test.module_a": logging.WARNING, "test.module_b": logging.DEBUG}
+    assert logging.getLogger("test.module_a").level == logging.WARNING
+
+
+def test_monitor_sanitize_does_not_mutate_request():
+    monitor = APIMonitor.__new__(APIMonitor)
+    request = {"api_key": "secret", "messages": [{"role": "user", "content": "长" * 500}]}
+    sanitized = monitor._sanitize_params(request)
+    assert sanitized["api_key"] == "********"
+    assert len(sanitized["messages"][0]["content"]) < 500
+    assert request["messages"][0]["content"] == "长" * 500
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试SMTP连接池与批量邮件分发（使用本地SMTP桩服务）
+"""
+
+import os
+import sys
+import json
+import time
+import smtplib
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import email_sender
+from app.utils.email_sender import SMTPConnectionPool
+from app.core.notification.mail_dispatcher import MailDispatcher, iter_chunks
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+STUB_SCRIPT = os.path.join(project_root, 'scripts', 'benchmarks', 'stub_smtp_server.py')
+
+
+class StubProcess:
+    """以子进程运行的SMTP桩服务（测试进程使用了eventlet猴子补丁）"""
+
+    def __init__(self, rate_451=0.0):
+        self.process = subprocess.Popen(
+            [sys.executable, STUB_SCRIPT, '--port', '0', '--rate-451', str(rate_451)],
+            stderr=subprocess.PIPE, text=True)
+        line = self.process.stderr.readline()
+        self.port = int(line.rsplit(':', 1)[1])
+
+    def stats(self):
+        conn = smtplib.SMTP('127.0.0.1', self.port, timeout=5)
+        try:
+            code, message = conn.docmd('XSTATS')
+            return json.loads(message)
+        finally:
+            conn.quit()
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(5)
+
+
+@pytest.fixture
+def smtp_stub(monkeypatch):
+    stubs = []
+
+    def start(rate_451=0.0):
+        stub = StubProcess(rate_451)
+        stubs.append(stub)
+        settings = {
+            'server': '127.0.0.1', 'port': stub.port, 'username': 'stub', 'password': 'stub',
+            'use_tls': False, 'use_ssl': False, 'sender_email': 'noreply@example.com', 'sender_name': '作文批改',
+        }
+        monkeypatch.setattr(email_sender, 'get_mail_settings', lambda: dict(settings))
+        monkeypatch.setattr('app.core.notification.mail_dispatcher.get_mail_settings', lambda: dict(settings))
+        return stub
+
+    yield start
+    for stub in stubs:
+        stub.stop()
+
+
+def test_pool_reuses_connection(smtp_stub):
+    stub = smtp_stub()
+    pool = SMTPConnectionPool(max_messages=3)
+    for index in range(5):
+        pool.sendmail('noreply@example.com', [f'u{index}@example.com'], 'Subject: hi\r\n\r\nbody')
+    pool.close_all()
+
+    stats = pool.get_stats()
+    assert stats['messages'] == 5
+    # 单个连接发送3封后更换
+    assert stats['connects'] == 2
+    # 统计查询本身占用一个连接
+    stub_stats = stub.stats()
+    assert (stub_stats['connections'], stub_stats['auths'], stub_stats['messages']) == (3, 2, 5)
+
+
+def test_send_email_goes_through_pool(smtp_stub, monkeypatch):
+    smtp_stub()
+    pool = SMTPConnectionPool()
+    monkeypatch.setattr(email_sender, 'smtp_pool', pool)
+    for _ in range(3):
+        result = email_sender.send_email('student@example.com', '批改完成', text_content='您的作文已批改完成')
+        assert result['status'] == 'success'
+    assert pool.get_stats()['connects'] == 1
+    assert email_sender.send_email('student@example.com', '空')['status'] == 'error'
+
+
+def test_batch_renders_per_recipient_and_tracks_results(smtp_stub):
+    stub = smtp_stub()
+    dispatcher = MailDispatcher(pool=SMTPConnectionPool(), rate_per_second=0)
+    recipients = [{'user_id': i, 'email': f'user{i}@example.com', 'username': f'用户{i}'} for i in range(4)]
+    recipients.append({'user_id': 99, 'email': None, 'username': '无邮箱'})
+
+    result = dispatcher.send_batch(recipients, '{{ username }}，会员将于{{ end_date }}到期',
+                                   '尊敬的 {{ username }}', context={'end_date': '2026-11-01'})
+
+    assert (result['sent'], result['failed']) == (4, 1)
+    assert result['results'][-1] == {'email': None, 'user_id': 99, 'status': 'failed', 'error': '缺少邮箱地址',
+                                     'smtp_code': None}
+    stub_stats = stub.stats()
+    assert stub_stats['received'] == [[f'user{i}@example.com'] for i in range(4)]
+    assert stub_stats['connections'] == 2
+
+
+def test_refused_recipient_is_recorded_and_connection_kept(smtp_stub):
+    smtp_stub(rate_451=1.0)
+    pool = SMTPConnectionPool()
+    dispatcher = MailDispatcher(pool=pool, rate_per_second=0)
+
+    result = dispatcher.send_batch([{'user_id': 1, 'email': 'a@example.com'}, {'user_id': 2, 'email': 'b@example.com'}],
+                                   '提醒', '正文')
+
+    assert result['status'] == 'error'
+    assert [item['error'][:3] for item in result['results']] == ['451', '451']
+    assert [item['smtp_code'] for item in result['results']] == [451, 451]
+    assert pool.get_stats()['connects'] == 1
+
+
+def test_failed_reconnect_closes_connection_once(monkeypatch):
+    class DroppedServer:
+        def sendmail(self, *args):
+            raise smtplib.SMTPServerDisconnected('connection closed')
+
+        def quit(self):
+            pass
+
+    pool = SMTPConnectionPool()
+    connects = iter([{'server': DroppedServer(), 'messages': 0, 'last_used': time.monotonic()}])
+
+    def connect():
+        conn = next(connects, None)
+        if conn is None:
+            raise ConnectionRefusedError('server down')
+        return conn
+
+    monkeypatch.setattr(pool, '_connect', connect)
+    with pytest.raises(ConnectionRefusedError):
+        pool.sendmail('noreply@example.com', ['a@example.com'], 'Subject: hi\r\n\r\nbody')
+    stats = pool.get_stats()
+    assert (stats['closed'], stats['reconnects'], stats['idle']) == (1, 1, 0)
+
+
+def test_rejected_message_resets_and_keeps_connection(monkeypatch):
+    class RejectingServer:
+        def __init__(self):
+            self.errors = [smtplib.SMTPDataError(451, b'4.3.0 try again'),
+                           smtplib.SMTPSenderRefused(550, b'sender refused', 'noreply@example.com'),
+                           smtplib.SMTPDataError(421, b'closing')]
+            self.resets, self.closed = 0, False
+
+        def sendmail(self, *args):
+            raise self.errors.pop(0)
+
+        def rset(self):
+            self.resets += 1
+
+        def quit(self):
+            self.closed = True
+
+    server = RejectingServer()
+    pool = SMTPConnectionPool()
+    connects = []
+
+    def connect():
+        connects.append(server)
+        return {'server': server, 'messages': 0, 'last_used': time.monotonic()}
+
+    monkeypatch.setattr(pool, '_connect', connect)
+    # 服务器拒绝单封邮件时连接经RSET后放回池中，下一封复用同一连接
+    for expected in (smtplib.SMTPDataError, smtplib.SMTPSenderRefused):
+        with pytest.raises(expected):
+            pool.sendmail('noreply@example.com', ['a@example.com'], 'Subject: hi\r\n\r\nbody')
+    assert (len(connects), server.resets, server.closed, pool.get_stats()['idle']) == (1, 2, False, 1)
+
+    # 421表示服务器正在关闭连接，不再放回池中
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.sendmail('noreply@example.com', ['a@example.com'], 'Subject: hi\r\n\r\nbody')
+    stats = pool.get_stats()
+    assert (server.resets, server.closed, stats['idle'], stats['closed']) == (2, True, 0, 1)
+
+
+def test_rate_limit_and_chunks(smtp_stub, monkeypatch):
+    smtp_stub()
+    sleeps = []
+    # 只替换分发模块引用的time，不影响其他线程的time.sleep
+    monkeypatch.setattr('app.core.notification.mail_dispatcher.time',
+                        SimpleNamespace(monotonic=time.monotonic, sleep=sleeps.append))
+    dispatcher = MailDispatcher(pool=SMTPConnectionPool(), rate_per_second=5, burst=2)
+    dispatcher.send_batch([{'email': f'r{i}@example.com'} for i in range(4)], '提醒', '正文')
+
+    # 前2封使用突发额度，之后每封等待约0.2秒
+    assert len(sleeps) == 2
+    assert all(0 < wait <= 0.2 for wait in sleeps)
+    assert [len(chunk) for chunk in iter_chunks(range(5), 2)] == [2, 2, 1]
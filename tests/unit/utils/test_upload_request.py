@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试按端点放宽的请求体上限
+"""
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+
+GLOBAL_LIMIT = 1024
+BATCH_LIMIT = 4096
+
+
+@pytest.fixture
+def limits(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', GLOBAL_LIMIT)
+    monkeypatch.setitem(app.config, 'ENDPOINT_MAX_CONTENT_LENGTH', {'main.batch_upload': BATCH_LIMIT})
+    return app
+
+
+def _form(app, path, size):
+    with app.test_request_context(path, method='POST', data=b'a=' + b'x' * (size - 2),
+                                  content_type='application/x-www-form-urlencoded'):
+        from flask import request
+        return request.max_content_length, len(request.form['a']) + 2
+
+
+def test_batch_upload_accepts_body_at_its_own_limit(limits):
+    assert _form(limits, '/batch_upload', BATCH_LIMIT) == (BATCH_LIMIT, BATCH_LIMIT)
+
+
+def test_batch_upload_rejects_body_over_its_own_limit(limits):
+    with pytest.raises(RequestEntityTooLarge):
+        _form(limits, '/batch_upload', BATCH_LIMIT + 1)
+
+
+def test_other_endpoints_keep_global_limit(limits):
+    assert _form(limits, '/login', GLOBAL_LIMIT) == (GLOBAL_LIMIT, GLOBAL_LIMIT)
+    with pytest.raises(RequestEntityTooLarge):
+        _form(limits, '/login', GLOBAL_LIMIT + 1)
+
+
+def test_batch_upload_default_limit_covers_archive_limit(app):
+    from app.core.correction.batch_ingest import batch_ingest_service
+    assert app.config['ENDPOINT_MAX_CONTENT_LENGTH']['main.batch_upload'] > batch_ingest_service.max_archive_size
+    assert app.config['ENDPOINT_MAX_CONTENT_LENGTH']['main.batch_upload'] > app.config['MAX_CONTENT_LENGTH']